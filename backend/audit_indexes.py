@@ -0,0 +1,206 @@
+"""
+BowlWise - Index Audit Script
+
+Runs explain() for every query shape the API issues (utils/index_registry.py)
+against a MongoDB instance and fails if any winning plan is a COLLSCAN.
+
+Data Flow:
+    QUERY_SHAPES → find(filter).sort(...).explain() → walk winning plan → report
+    aggregations → explain the pipeline (outer $match) + each $lookup
+                   sub-pipeline against its own collection, with the shape's
+                   lookup_vars bound as `let` variables (MongoDB 5.0+)
+
+How to run:
+    cd backend
+    python audit_indexes.py                 # ensure indexes, then audit
+    python audit_indexes.py --no-create     # audit existing indexes only
+
+When to run:
+    - After adding or changing a query in main.py
+    - After changing INDEXES in utils/index_registry.py
+    - In CI against a throwaway local Mongo
+
+Exit code:
+    0 = every shape is index-backed (or explicitly allowed to scan)
+    1 = at least one unexpected COLLSCAN
+
+Note: Uses PyMongo (sync) like import_products.py — this is a script, not
+the web server. Point MONGODB_URL at a local/staging database; the script
+creates indexes but never writes documents.
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import os                           # Access environment variables
+import sys                          # Exit code for CI
+from pymongo import MongoClient     # Sync MongoDB driver (not Motor - this is a script)
+
+from utils.index_registry import INDEXES, QUERY_SHAPES, QueryShape
+
+
+# ============================================
+# Configuration
+# ============================================
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "petai")
+
+
+# ============================================
+# Plan Inspection
+# ============================================
+
+def collect_stages(plan):
+    """
+    Recursively collect every "stage" name in an explain plan.
+
+    Handles both classic plans (inputStage / inputStages) and
+    slot-based engine plans (queryPlan nested under winningPlan).
+    """
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(collect_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(collect_stages(item))
+    return stages
+
+
+def winning_plan(explain_output):
+    """Extract the winning plan from explain() output."""
+    return explain_output.get("queryPlanner", {}).get("winningPlan", {})
+
+
+def winning_plans(explain_output):
+    """
+    Every winning plan anywhere in explain() output.
+
+    Aggregations nest the query plan under stages[0].$cursor (or report it at
+    the top level when the pipeline is pushed down into the query engine).
+    """
+    plans = []
+    if isinstance(explain_output, dict):
+        for key, value in explain_output.items():
+            if key == "winningPlan":
+                plans.append(value)
+            else:
+                plans.extend(winning_plans(value))
+    elif isinstance(explain_output, list):
+        for item in explain_output:
+            plans.extend(winning_plans(item))
+    return plans
+
+
+# ============================================
+# Audit
+# ============================================
+
+def ensure_indexes(db):
+    """Create every index from the registry (same specs the API uses at startup)."""
+    for collection_name, specs in INDEXES.items():
+        for spec in specs:
+            db[collection_name].create_index(spec.keys, **spec.options)
+
+
+def expand_shapes(shapes):
+    """
+    Add one shape per $lookup sub-pipeline after each aggregation shape.
+
+    A $lookup's sub-pipeline runs once per outer document against another
+    collection; explaining the outer pipeline does not show its plan.
+    """
+    expanded = []
+    for shape in shapes:
+        expanded.append(shape)
+        for stage in shape.pipeline or []:
+            lookup = stage.get("$lookup")
+            if not lookup or "pipeline" not in lookup:
+                continue
+            expanded.append(QueryShape(
+                f"{shape.name}.{lookup['as']}", lookup["from"], {},
+                used_by=shape.used_by, allow_collscan=shape.allow_collscan,
+                pipeline=lookup["pipeline"], lookup_vars=shape.lookup_vars,
+            ))
+    return expanded
+
+
+def explain(db, shape):
+    """Stage names of the winning plan(s) for one shape."""
+    if shape.pipeline is None:
+        cursor = db[shape.collection].find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        return collect_stages(winning_plan(cursor.explain()))
+
+    command = {"aggregate": shape.collection, "pipeline": shape.pipeline, "cursor": {}}
+    if shape.lookup_vars:
+        command["let"] = shape.lookup_vars
+    output = db.command("explain", command, verbosity="queryPlanner")
+    return collect_stages(winning_plans(output))
+
+
+def audit(db):
+    """
+    Explain every registered query shape (aggregations: plus each $lookup).
+
+    Returns: list of (shape, stages, ok) tuples
+    """
+    results = []
+    for shape in expand_shapes(QUERY_SHAPES):
+        stages = explain(db, shape)
+        ok = "COLLSCAN" not in stages or shape.allow_collscan
+        results.append((shape, stages, ok))
+    return results
+
+
+def print_report(results):
+    """Print one line per query shape, then a summary."""
+    for shape, stages, ok in results:
+        marker = "✓" if ok else "✗"
+        note = " (scan allowed)" if shape.allow_collscan and "COLLSCAN" in stages else ""
+        print(f"  {marker} {shape.collection}.{shape.name}: {' → '.join(stages) or '?'}{note}")
+        if not ok:
+            print(f"      used by: {shape.used_by}")
+            if shape.pipeline is not None:
+                print(f"      pipeline: {shape.pipeline}")
+            else:
+                print(f"      filter:  {shape.filter}")
+
+    failures = sum(1 for _, _, ok in results if not ok)
+    print()
+    print(f"Audited {len(results)} query shapes: {len(results) - failures} OK, {failures} COLLSCAN")
+    return failures
+
+
+# ============================================
+# Main Entry Point
+# ============================================
+
+def main():
+    """Ensure indexes (unless --no-create), audit all shapes, exit 1 on any COLLSCAN."""
+    print("=" * 60)
+    print("BowlWise - Index Audit")
+    print("=" * 60)
+    print()
+
+    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
+    db = client[DATABASE_NAME]
+
+    if "--no-create" not in sys.argv:
+        print("Ensuring indexes from registry...")
+        ensure_indexes(db)
+
+    print(f"Explaining query shapes against {DATABASE_NAME}...\n")
+    failures = print_report(audit(db))
+    client.close()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,9 @@ This script imports dog food product data from a Google Sheet into MongoDB.
 It's the data pipeline that populates your products collection.
 
 Data Flow:
-    Google Sheets (CSV) → This Script → MongoDB (products collection)
+    Google Sheets (CSV) → This Script → allergen check (allergen_report.json)
+                                      → MongoDB (products collection)
+                                      → catalog file (CATALOG_FILE, mmap'd by the API)
 
 How to run:
     cd backend
@@ -30,6 +32,10 @@ import requests                     # HTTP library for fetching the Google Sheet
 from pymongo import MongoClient     # Sync MongoDB driver (not Motor - this is a script)
 from datetime import datetime       # For timestamping imports
 
+from utils.catalog_version import bump_catalog_version  # Invalidates API ETags after import
+from utils.catalog_file import export_catalog_file      # Shared columnar catalog the API workers mmap
+from utils.allergens import run_allergen_check          # Allergens in ingredients vs allergen_tags
+
 
 # ============================================
 # Configuration
@@ -120,6 +126,10 @@ def clean_row(row):
         "brand": row.get('brand', '').strip(),
         "line": row.get('line', '').strip(),
 
+        # --- Normalized keys (lowercase, for index-backed prefix filters + stable paging) ---
+        "brand_key": row.get('brand', '').strip().lower(),
+        "line_key": row.get('line', '').strip().lower(),
+
         # --- Classification (normalized to lowercase) ---
         "format": row.get('format', '').strip().lower(),
         "life_stage": row.get('life_stage', '').strip().lower(),
@@ -236,6 +246,15 @@ def import_to_mongodb(rows):
             print("No valid products to import")
             return
 
+        # Derive allergens/allergen_terms from the ingredients and report
+        # allergens that allergen_tags is missing
+        allergen_summary = run_allergen_check(documents)
+        print(
+            f"Allergen check: {allergen_summary['flagged']}/{allergen_summary['checked']} products "
+            f"missing {allergen_summary['missing_tags']} allergen tags "
+            f"(see {allergen_summary['report']})"
+        )
+
         # Import using upsert (update if exists, insert if new)
         print(f"Importing {len(documents)} products to MongoDB...")
 
@@ -254,9 +273,17 @@ def import_to_mongodb(rows):
             elif result.modified_count > 0:
                 updated_count += 1
 
+        # Bump catalog version so API ETags change and clients refetch
+        version = bump_catalog_version(db)
+        # Write the catalog file for this version (API workers on this host map it)
+        catalog_bytes = export_catalog_file(db, version)
+
         print(f"Import complete!")
         print(f"   - {inserted_count} new products inserted")
         print(f"   - {updated_count} existing products updated")
+        print(f"   - Catalog version is now {version}")
+        if catalog_bytes is not None:
+            print(f"   - Catalog file written ({catalog_bytes:,} bytes)")
         print(f"   - Total products in database: {collection.count_documents({})}")
 
         # Show database statistics
@@ -0,0 +1,666 @@
+"""
+BowlWise - Load Test
+
+Answers "how many requests per second can one worker do, and how fast?"
+by booting the FastAPI app in-process (no server, no sockets) against a
+seeded database and driving a mix of realistic user flows at a fixed
+concurrency. Results go to a JSON report that can be diffed between
+commits.
+
+Data Flow:
+    --db memory | mongo → seed products (product_data.csv), users, claimed
+                          pets, purchase history (app repositories) + spending rollups
+        → app lifespan (migrations, catalog warm-up) → wait until ready
+        → N virtual users, each looping: pick a scenario by --mix weight
+            → requests through the ASGI app → (route template, status, latency)
+        → warm-up samples dropped → per-route throughput, p50/p95/p99, errors
+        → loadtest_report.json (+ comparison table with --baseline)
+
+Scenarios:
+    guest      POST /api/pets → recommendations → product details,
+               sometimes an allergy edit + re-fetch, or a revisit (If-None-Match)
+    browse     product list pages (filters, cursor) → product detail
+    dashboard  /api/auth/me → /api/dashboard → purchase history → spending trend
+    purchase   recommendations for an owned pet → POST /api/purchases → dashboard
+
+How to run:
+    cd backend
+    python load_test.py                                  # in-memory storage, default mix
+    python load_test.py --concurrency 32 --duration 60
+    python load_test.py --mix guest=1                    # recommendations only
+    python load_test.py --db mongo --database petai_loadtest
+    python load_test.py --output after.json --baseline before.json
+
+Notes:
+    - --db memory runs the app with STORAGE_BACKEND=memory: pets, products,
+      users and purchases live in process memory (utils/repositories.py),
+      the remaining collections (auth tokens, rollups, outbox, migrations)
+      in mongomock-motor (pip install mongomock-motor). It measures
+      application overhead; Mongo latency is not simulated.
+    - --db mongo seeds MONGODB_URL/<--database> and drops that database
+      first. The name must contain "loadtest" so a real database is never
+      wiped.
+    - Rate limits are disabled (pass --rate-limits to keep them) and the
+      "petai" logger is raised to WARNING (--log-requests keeps request
+      logs), so the numbers show request handling, not 429s or log output.
+    - CATALOG_FILE is off unless --catalog-file is given, so a run never
+      rewrites the host's shared catalog file.
+    - One process, one event loop: throughput is per worker (per core).
+      requests_per_cpu_second divides by the CPU time the process used.
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import argparse                     # Command-line options
+import asyncio
+import csv
+import importlib
+import json
+import logging
+import os
+import platform
+import random
+import subprocess                   # git commit for the report
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from bson import ObjectId
+
+import import_products               # clean_row: same documents as a real import
+from utils.allergens import check_product
+from utils.spending_rollups import apply_purchase
+
+logger = logging.getLogger("petai")
+
+DEFAULT_MIX = "guest=60,browse=15,dashboard=20,purchase=5"
+
+BREED_SIZES = ["small", "medium", "large"]
+AGE_GROUPS = [("puppy", 25), ("adult", 55), ("senior", 20)]
+ACTIVITY_LEVELS = [("low", 25), ("medium", 50), ("high", 25)]
+WEIGHT_GOALS = [("maintenance", 60), ("weight-loss", 30), ("muscle-gain", 10)]
+
+COMMON_ALLERGIES = ["chicken", "beef", "grain", "fish", "dairy", "egg", "lamb", "corn", "wheat", "soy"]
+
+
+# ============================================
+# In-Process ASGI Client
+# ============================================
+
+class AsgiClient:
+    """
+    Calls an ASGI app directly (same path as bench_middleware.py).
+
+    Args:
+        app: The ASGI application
+        client_host: Remote address put in the scope (one per virtual user)
+    """
+
+    def __init__(self, app, client_host: str = "127.0.0.1"):
+        self.app = app
+        self.client_host = client_host
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[Dict] = None,
+        body=None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Dict[str, str], object]:
+        """Returns (status, response headers, parsed JSON body or None)."""
+        raw_body = json.dumps(body).encode() if body is not None else b""
+        header_list = [(b"host", b"loadtest"), (b"user-agent", b"bowlwise-load-test")]
+        if body is not None:
+            header_list.append((b"content-type", b"application/json"))
+            header_list.append((b"content-length", str(len(raw_body)).encode()))
+        for name, value in (headers or {}).items():
+            header_list.append((name.lower().encode(), value.encode()))
+        query = urlencode({k: v for k, v in (params or {}).items() if v is not None}, doseq=True)
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "root_path": "", "query_string": query.encode(), "headers": header_list,
+            "client": (self.client_host, 50000), "server": ("loadtest", 80),
+        }
+        sent = False
+        status = 0
+        response_headers: Dict[str, str] = {}
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": raw_body, "more_body": False}
+            await asyncio.Event().wait()    # Nothing more to send: wait like an idle client
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.update((k.decode().lower(), v.decode()) for k, v in message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        data = b"".join(chunks)
+        parsed = None
+        if data and response_headers.get("content-type", "").startswith("application/json"):
+            parsed = json.loads(data)
+        return status, response_headers, parsed
+
+
+# ============================================
+# Results
+# ============================================
+
+class Recorder:
+    """
+    Per-route latency samples and status counts.
+
+    Samples before measure_from (warm-up) are dropped. The switch is made
+    by the samples themselves: with an in-memory database requests never
+    yield to the event loop, so a timer task would not run before the end.
+    """
+
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.cpu_from: Optional[float] = None
+        self.samples: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.errors: Dict[str, int] = {}
+        self.sessions: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}      # "scenario: exception" → count
+
+    @property
+    def recording(self) -> bool:
+        if self.cpu_from is None:
+            if time.perf_counter() < self.measure_from:
+                return False
+            self.cpu_from = time.process_time()
+        return True
+
+    def add(self, route: str, status: int, ms: float, error: bool):
+        if not self.recording:
+            return
+        self.samples.setdefault(route, []).append(ms)
+        codes = self.statuses.setdefault(route, {})
+        codes[str(status)] = codes.get(str(status), 0) + 1
+        if error:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def session(self, scenario: str, failure: Optional[str] = None):
+        if not self.recording:
+            return
+        self.sessions[scenario] = self.sessions.get(scenario, 0) + 1
+        if failure:
+            self.failures[failure] = self.failures.get(failure, 0) + 1
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def build_report(recorder: Recorder, seconds: float, cpu_seconds: float, meta: Dict) -> Dict:
+    routes = {}
+    total = errors = 0
+    for route, samples in sorted(recorder.samples.items()):
+        samples = sorted(samples)
+        route_errors = recorder.errors.get(route, 0)
+        total += len(samples)
+        errors += route_errors
+        routes[route] = {
+            "count": len(samples),
+            "errors": route_errors,
+            "error_rate": round(route_errors / len(samples), 4),
+            "statuses": dict(sorted(recorder.statuses[route].items())),
+            "throughput_rps": round(len(samples) / seconds, 2),
+            "mean_ms": round(sum(samples) / len(samples), 2),
+            "p50_ms": round(percentile(samples, 0.50), 2),
+            "p95_ms": round(percentile(samples, 0.95), 2),
+            "p99_ms": round(percentile(samples, 0.99), 2),
+            "max_ms": round(samples[-1], 2),
+        }
+    return {
+        "meta": meta,
+        "summary": {
+            "duration_s": round(seconds, 2),
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(total / seconds, 2) if seconds else 0.0,
+            "cpu_seconds": round(cpu_seconds, 2),
+            "requests_per_cpu_second": round(total / cpu_seconds, 2) if cpu_seconds else 0.0,
+            "sessions": dict(sorted(recorder.sessions.items())),
+            "session_failures": dict(sorted(recorder.failures.items())),
+        },
+        "routes": routes,
+    }
+
+
+# ============================================
+# Seed Data
+# ============================================
+
+def _weighted(rng: random.Random, choices: List[Tuple[str, int]]) -> str:
+    return rng.choices([c for c, _ in choices], weights=[w for _, w in choices])[0]
+
+
+def random_pet_profile(rng: random.Random) -> Dict:
+    """A wizard submission: mostly no allergies, some one or two."""
+    roll = rng.random()
+    allergy_count = 0 if roll < 0.6 else 1 if roll < 0.85 else 2
+    return {
+        "name": rng.choice(["Rex", "Luna", "Milo", "Bella", "Max", "Daisy"]),
+        "breedSize": rng.choice(BREED_SIZES),
+        "ageGroup": _weighted(rng, AGE_GROUPS),
+        "activityLevel": _weighted(rng, ACTIVITY_LEVELS),
+        "weightGoal": _weighted(rng, WEIGHT_GOALS),
+        "allergies": rng.sample(COMMON_ALLERGIES, allergy_count),
+    }
+
+
+class SeedData:
+    """What the scenarios pick from: product ids and seeded accounts."""
+
+    def __init__(self):
+        self.product_ids: List[str] = []
+        self.brands: List[str] = []
+        # [{"user_id", "token", "pets": [public_id, ...]}]
+        self.accounts: List[Dict] = []
+
+
+async def seed(app_module, users: int, pets_per_user: int, purchases_per_pet: int, rng: random.Random) -> SeedData:
+    """Insert products, users, claimed pets and purchase history through the app's repositories."""
+    data = SeedData()
+    now = datetime.utcnow()
+
+    with open("product_data.csv", encoding="utf-8") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("id", "").strip()]
+    products = []
+    for row in rows:
+        doc = import_products.clean_row(row)
+        check_product(doc)
+        products.append(doc)
+    await app_module.repositories.products.create_many(products)
+    await app_module.database["catalog_meta"].update_one(
+        {"_id": "products"}, {"$set": {"version": 1, "updated_at": now}}, upsert=True,
+    )
+    data.product_ids = [doc["_id"] for doc in products]
+    data.brands = sorted({doc["brand"] for doc in products if doc.get("brand")})
+    by_id = {doc["_id"]: doc for doc in products}
+
+    user_docs, pet_docs, purchase_docs = [], [], []
+    for i in range(users):
+        user_id = ObjectId()
+        email = f"loadtest+{i}@example.com"
+        user_docs.append({
+            "_id": user_id, "email": email, "email_verified": True, "name": None,
+            "created_at": now, "updated_at": now, "last_login_at": now, "auth_method": "magic_link",
+            "preferences": {"notifications_enabled": True, "email_reminders": False},
+        })
+        account = {"user_id": str(user_id), "token": app_module.create_jwt(str(user_id), email), "pets": []}
+        for _ in range(pets_per_user):
+            public_id = str(uuid.uuid4())
+            pet_docs.append({
+                **random_pet_profile(rng), "screen_width": None,
+                "public_id": public_id, "session_token": str(uuid.uuid4()),
+                "created_at": now, "updated_at": now, "last_accessed_at": now,
+                "user_agent": "bowlwise-load-test", "ip_hash": "", "referrer": "",
+                "user_id": str(user_id), "claimed_at": now,
+            })
+            account["pets"].append(public_id)
+            purchase_docs.extend(_purchase_history(by_id, rng, str(user_id), public_id, purchases_per_pet, now))
+        data.accounts.append(account)
+
+    await app_module.repositories.users.create_many(user_docs)
+    await app_module.repositories.pets.create_many(pet_docs)
+    await app_module.repositories.purchases.create_many(purchase_docs)
+    for purchase in purchase_docs:
+        await apply_purchase(app_module.spending_rollups_collection, purchase)
+    return data
+
+
+def _purchase_history(products: Dict, rng: random.Random, user_id: str, pet_id: str, count: int, now: datetime) -> List[Dict]:
+    """One bag a month going back `count` months; the newest is active."""
+    history = []
+    for months_ago in range(count, 0, -1):
+        product = products[rng.choice(list(products))]
+        purchased_at = now - timedelta(days=30 * months_ago - rng.randint(0, 10))
+        bag_size_kg = product.get("size_kg") or 10
+        cups_per_day = rng.choice([1.0, 2.0, 3.0, 4.5])
+        active = months_ago == 1
+        history.append({
+            "user_id": user_id, "pet_id": pet_id, "product_id": product["_id"],
+            "product_snapshot": {"brand": product.get("brand", ""), "line": product.get("line", ""),
+                                 "price": product.get("price"), "size_kg": product.get("size_kg")},
+            "bag_size_kg": bag_size_kg, "cups_per_day": cups_per_day, "purchased_at": purchased_at,
+            "estimated_depletion_at": purchased_at + timedelta(days=30),
+            "status": "active" if active else "completed",
+            "completed_at": None if active else purchased_at + timedelta(days=30),
+            "cost": product.get("price"), "notes": None, "match_score": None, "created_at": purchased_at,
+        })
+    return history
+
+
+# ============================================
+# Scenarios
+# ============================================
+
+class Session:
+    """One virtual user's client; every call is recorded under its route template."""
+
+    def __init__(self, client: AsgiClient, recorder: Recorder, rng: random.Random, data: SeedData):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.data = data
+
+    async def call(self, method: str, route: str, path: str, ok=(200, 201, 202, 304), **kwargs):
+        start = time.perf_counter()
+        status, headers, body = await self.client.request(method, path, **kwargs)
+        self.recorder.add(f"{method} {route}", status, (time.perf_counter() - start) * 1000, status not in ok)
+        return status, headers, body
+
+    async def recommendations(self, pet_id: str, etag: Optional[str] = None):
+        headers = {"If-None-Match": etag} if etag else None
+        return await self.call("GET", "/api/recommendations/{pet_id}", f"/api/recommendations/{pet_id}", headers=headers)
+
+
+def _top_products(body, n: int) -> List[Dict]:
+    return [r["product"] for r in (body or {}).get("recommendations", [])[:n]]
+
+
+async def guest_flow(s: Session):
+    status, _, pet = await s.call("POST", "/api/pets", "/api/pets", body=random_pet_profile(s.rng))
+    if status != 201:
+        return
+    pet_id, token = pet["id"], pet["session_token"]
+    _, headers, body = await s.recommendations(pet_id)
+    for product in _top_products(body, s.rng.randint(1, 3)):
+        await s.call("GET", "/api/products/{product_id}", f"/api/products/{product['id']}")
+
+    roll = s.rng.random()
+    if roll < 0.3:
+        # Back to the wizard: add an allergy, see the new list
+        profile = {k: pet[k] for k in ("name", "breedSize", "ageGroup", "activityLevel", "weightGoal")}
+        profile["allergies"] = sorted(set(pet.get("allergies") or []) | {s.rng.choice(COMMON_ALLERGIES)})
+        await s.call("PUT", "/api/pets/{pet_id}", f"/api/pets/{pet_id}", body=profile,
+                     headers={"X-Session-Token": token})
+        await s.recommendations(pet_id)
+    elif roll < 0.5:
+        # Returning visitor: the browser revalidates the cached list
+        await s.recommendations(pet_id, etag=headers.get("etag"))
+
+
+async def browse_flow(s: Session):
+    params = {"limit": 50}
+    if s.rng.random() < 0.5:
+        params["brand"] = s.rng.choice(s.data.brands)
+    if s.rng.random() < 0.3:
+        params["grain_free"] = "true"
+    _, headers, body = await s.call("GET", "/api/products", "/api/products", params=params)
+    if headers.get("x-next-cursor") and s.rng.random() < 0.5:
+        _, _, body = await s.call("GET", "/api/products", "/api/products",
+                                  params={**params, "cursor": headers["x-next-cursor"]})
+    if body:
+        product = s.rng.choice(body)
+        await s.call("GET", "/api/products/{product_id}", f"/api/products/{product['id']}")
+
+
+async def dashboard_flow(s: Session):
+    account = s.rng.choice(s.data.accounts)
+    auth = {"Authorization": f"Bearer {account['token']}"}
+    await s.call("GET", "/api/auth/me", "/api/auth/me", headers=auth)
+    await s.call("GET", "/api/dashboard", "/api/dashboard", headers=auth)
+    pet_id = s.rng.choice(account["pets"])
+    await s.call("GET", "/api/purchases", "/api/purchases", params={"pet_id": pet_id}, headers=auth)
+    await s.call("GET", "/api/spending/trend", "/api/spending/trend", params={"pet_id": pet_id}, headers=auth)
+
+
+async def purchase_flow(s: Session):
+    account = s.rng.choice(s.data.accounts)
+    auth = {"Authorization": f"Bearer {account['token']}"}
+    pet_id = s.rng.choice(account["pets"])
+    _, _, body = await s.recommendations(pet_id)
+    top = _top_products(body, 5)
+    product_id = s.rng.choice(top)["id"] if top else s.rng.choice(s.data.product_ids)
+    await s.call("POST", "/api/purchases", "/api/purchases", headers=auth, body={
+        "pet_id": pet_id, "product_id": product_id, "cups_per_day": s.rng.choice([1.5, 2.0, 3.0]),
+    })
+    await s.call("GET", "/api/dashboard", "/api/dashboard", headers=auth)
+
+
+SCENARIOS = {
+    "guest": guest_flow,
+    "browse": browse_flow,
+    "dashboard": dashboard_flow,
+    "purchase": purchase_flow,
+}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'guest=6,dashboard=3' → {"guest": 6.0, "dashboard": 3.0}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}' (choose from: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise SystemExit("--mix needs at least one scenario with a positive weight")
+    return mix
+
+
+# ============================================
+# Driver
+# ============================================
+
+async def virtual_user(index: int, app, recorder: Recorder, data: SeedData, mix: Dict[str, float], seed: int, stop_at: float):
+    rng = random.Random(seed * 1000 + index)
+    session = Session(AsgiClient(app, client_host=f"10.0.{index // 250}.{index % 250 + 1}"), recorder, rng, data)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < stop_at:
+        scenario = rng.choices(names, weights=weights)[0]
+        try:
+            await SCENARIOS[scenario](session)
+            recorder.session(scenario)
+        except Exception as e:
+            recorder.session(scenario, failure=f"{scenario}: {type(e).__name__}")
+
+
+@asynccontextmanager
+async def seeded_app(args):
+    """
+    Import main.py, seed the database and run the app's lifespan.
+
+    Yields (main module, SeedData) once the app reports ready. Call
+    prepare_environment(args) first.
+    """
+    app_module = importlib.import_module("main")
+    if not args.rate_limits:
+        app_module.limiter.enabled = False
+
+    if args.db == "mongo":
+        await app_module.client.drop_database(args.database)
+    rng = random.Random(args.seed)
+    print(f"Seeding {args.db} database: {args.users} users × {args.pets_per_user} pets "
+          f"× {args.purchases_per_pet} purchases + product_data.csv ...")
+    data = await seed(app_module, args.users, args.pets_per_user, args.purchases_per_pet, rng)
+
+    async with app_module.lifespan(app_module.app):
+        while not app_module.readiness.ready:
+            await asyncio.sleep(0.05)
+        if not args.log_requests:
+            logger.setLevel(logging.WARNING)
+        try:
+            yield app_module, data
+        finally:
+            logger.setLevel(logging.INFO)
+
+    if args.db == "mongo" and not args.keep:
+        await app_module.client.drop_database(args.database)
+
+
+def base_meta(args, data: SeedData) -> Dict:
+    """Report metadata shared by load_test.py and replay_traffic.py."""
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "db": args.db,
+        "seed": args.seed,
+        "users": args.users,
+        "pets_per_user": args.pets_per_user,
+        "purchases_per_pet": args.purchases_per_pet,
+        "catalog_file": bool(args.catalog_file),
+        "storage": os.environ.get("STORAGE_BACKEND", "mongo"),
+    }
+
+
+async def run(args) -> Dict:
+    async with seeded_app(args) as (app_module, data):
+        mix = parse_mix(args.mix)
+        print(f"Running {args.concurrency} virtual users for {args.warmup:g}s warm-up + {args.duration:g}s ({args.mix})")
+        recorder = Recorder(measure_from=time.perf_counter() + args.warmup)
+        stop_at = recorder.measure_from + args.duration
+        await asyncio.gather(*(
+            virtual_user(i, app_module.app, recorder, data, mix, args.seed, stop_at)
+            for i in range(args.concurrency)
+        ))
+        seconds = time.perf_counter() - recorder.measure_from
+        cpu_seconds = time.process_time() - (recorder.cpu_from or time.process_time())
+
+    meta = {
+        **base_meta(args, data),
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "warmup_s": args.warmup,
+    }
+    return build_report(recorder, seconds, cpu_seconds, meta)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def use_in_memory_mongo():
+    """Swap Motor's client for mongomock-motor before main.py creates its client."""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--db memory needs mongomock-motor: pip install mongomock-motor (or use --db mongo)")
+    import motor.motor_asyncio
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+
+def add_app_arguments(parser: argparse.ArgumentParser):
+    """Database, seed and app options shared with replay_traffic.py."""
+    parser.add_argument("--db", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--database", default="petai_loadtest", help="Database for --db mongo (dropped first)")
+    parser.add_argument("--keep", action="store_true", help="Keep the --db mongo database after the run")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--pets-per-user", type=int, default=2)
+    parser.add_argument("--purchases-per-pet", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--catalog-file", default="", help="Use a mmap'd catalog file at this path")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep per-client rate limits on")
+    parser.add_argument("--log-requests", action="store_true", help="Keep per-request log lines")
+
+
+def prepare_environment(args):
+    """Settings main.py reads at import time (call before seeded_app)."""
+    os.environ["CATALOG_FILE"] = args.catalog_file
+    os.environ["CAPTURE_SAMPLE_RATE"] = "0"     # Never capture synthetic traffic
+    if args.db == "mongo":
+        if "loadtest" not in args.database:
+            raise SystemExit("--database must contain 'loadtest' (it is dropped before seeding)")
+        os.environ["DATABASE_NAME"] = args.database
+        os.environ["STORAGE_BACKEND"] = "mongo"
+    else:
+        os.environ["STORAGE_BACKEND"] = "memory"
+        use_in_memory_mongo()
+
+
+# ============================================
+# Output
+# ============================================
+
+def print_report(report: Dict, baseline: Optional[Dict]):
+    summary = report["summary"]
+    print(f"\n{summary['requests']} requests in {summary['duration_s']}s: "
+          f"{summary['throughput_rps']} req/s, {summary['requests_per_cpu_second']} req/CPU-s, "
+          f"error rate {summary['error_rate']:.2%}")
+    if summary["session_failures"]:
+        print(f"Session failures: {summary['session_failures']}")
+
+    old_routes = (baseline or {}).get("routes", {})
+    header = f"{'route':<38} {'count':>7} {'err':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    if baseline:
+        header += f" {'Δp50':>7} {'Δp95':>7} {'Δp99':>7}"
+    print("\n" + header)
+    for route, r in report["routes"].items():
+        line = f"{route:<38} {r['count']:>7} {r['errors']:>5} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+        old = old_routes.get(route)
+        if old:
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                change = (r[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                line += f" {change:>+6.0f}%"
+        print(line)
+    if baseline:
+        old_rps = baseline["summary"]["throughput_rps"]
+        if old_rps:
+            print(f"\nThroughput vs baseline ({baseline['meta'].get('commit')}): "
+                  f"{(summary['throughput_rps'] - old_rps) / old_rps * 100:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load test against a seeded database")
+    add_app_arguments(parser)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds run before measuring")
+    parser.add_argument("--output", default="loadtest_report.json")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    args = parser.parse_args()
+    parse_mix(args.mix)    # Fail on a bad --mix before seeding
+
+    prepare_environment(args)
+    report = asyncio.run(run(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nReport: {args.output}")
+    sys.exit(1 if report["summary"]["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
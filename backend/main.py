@@ -8,20 +8,21 @@ Sections (in order):
   1. Imports & Environment
   2. Logging
   3. MongoDB Connection & Collections
-  4. Auth Configuration (JWT, Magic Link, Resend)
+  4. Auth Configuration (JWT, Magic Link, email outbox, reminders)
   5. Application Lifespan (startup indexes, shutdown)
   6. FastAPI App, CORS, Middleware, Exception Handlers
   7. Pydantic Models (request/response schemas)
   8. Helper Functions (MongoDB doc → API response converters)
   9. JWT & Auth Utilities
-  10. Magic Link Email
+  10. Magic Link Email (queued in the outbox)
   11. Pet CRUD Endpoints
-  12. Auth Endpoints (magic link, verify, profile, delete account)
+  12. Auth Endpoints (magic link, verify, profile, delete account + deletion status)
   13. Pet Claim Endpoint
   14. Purchase Endpoints
-  15. Product Endpoints (read-only)
-  16. Scoring Engine (6-factor algorithm, max 100 pts)
-  17. Recommendation Endpoint
+  15. Dashboard + Spending Endpoints (one aggregation; monthly spending rollups)
+  16. Product Endpoints (read-only)
+  17. Scoring Engine (6-factor algorithm, max 100 pts)
+  18. Recommendation Endpoint
 
 Run:
   Dev:  uvicorn main:app --reload --port 8000
@@ -37,34 +38,82 @@ load_dotenv()
 
 from fastapi import FastAPI, HTTPException, Header, Query, Request, Depends  # Web framework and HTTP error handling
 from fastapi.middleware.cors import CORSMiddleware   # Allow cross-origin requests (frontend → backend)
-from fastapi.responses import JSONResponse           # Custom error responses
+from fastapi.responses import JSONResponse, Response  # Custom error responses, header access
 from motor.motor_asyncio import AsyncIOMotorClient   # Async MongoDB driver (non-blocking DB calls)
-from pydantic import BaseModel, EmailStr, Field, field_validator  # Data validation and schema definition
+from pydantic import BaseModel, EmailStr, Field, ValidationError, field_validator  # Data validation and schema definition
 from typing import List, Optional                    # Type hints for better code clarity
-from bson import ObjectId                            # MongoDB's unique ID type
 from contextlib import asynccontextmanager           # For lifespan management
+import asyncio                                       # Offload profile file I/O to a thread
 import os                                            # Access environment variables
-import re                                            # Regex sanitization for query filters
+import math                                          # Retry-After rounding
+import time                                          # Scoring duration for /metrics
 import hashlib                                       # SHA-256 hashing for magic link tokens
 import uuid                                          # Random UUIDs for pet public IDs and session tokens
-import time                                          # For request duration tracking
 from datetime import datetime, timedelta              # Timestamps and expiry calculations
 import logging                                       # Structured logging
-from slowapi import Limiter                          # Rate limiting
-from slowapi.util import get_remote_address          # Get client IP for rate limiting
-from slowapi.errors import RateLimitExceeded         # 429 error type
-import jwt                                           # JWT token creation and verification
-import resend                                        # Magic link email delivery
+from utils.instrumentation import instrument_collection, timed_stage  # Per-request DB round-trip + stage timing
+from utils.log_pipeline import configure_logging     # Queue-based JSON logging
+from utils.request_middleware import RequestMiddleware  # Pure-ASGI timing/logging/headers/metrics
+from utils.profiling import ProfilingMiddleware, create_profiler  # Opt-in slow-request profiler
+from utils.traffic_capture import CaptureMiddleware, create_traffic_capture, note_pet  # Opt-in anonymized traffic capture
+from utils.startup import Readiness, run_migrations, wait_for_migrations  # Recorded, concurrent migrations + readiness
+from utils.catalog_version import CatalogVersion  # Cached catalog version for ETags
+from utils.single_flight import SingleFlight  # Coalesce concurrent identical work
+from utils.repositories import (                    # Pets/products/users/purchases: Mongo or in-memory
+    PRODUCT_CURSOR_TYPES,
+    PRODUCT_LIST_SORT,
+    PURCHASE_CURSOR_TYPES,
+    PURCHASE_HISTORY_SORT,
+    create_repositories,
+)
+from utils.fast_json import (                        # Splice cached JSON fragments into responses
+    encode,
+    json_array,
+    json_bytes_response,
+    json_object_ending_with,
+    json_object_with,
+)
+from utils.product_catalog import ProductCatalog    # Validated + pre-encoded products per catalog version
+from utils.catalog_file import catalog_file_path     # Shared mmap'd columnar catalog (CATALOG_FILE)
+from utils.http_cache import is_not_modified, make_etag, not_modified, set_validators  # Conditional GET
+from utils.pagination import (                      # Opaque keyset cursors for paged lists
+    InvalidCursor,
+    cursor_values,
+    decode_cursor,
+    encode_cursor,
+)
+from utils.spending_rollups import (                # Monthly spending totals maintained with $inc
+    apply_kg_delta,
+    apply_purchase,
+    recent_month_keys,
+    remove_purchase,
+)
+from utils.email_delivery import create_email_sender  # Resend batch API, SMTP or local file sink
+from utils.email_outbox import EmailOutbox          # Queued email + background delivery workers
+from utils.reminders import REMINDER_FIELDS, ReminderScheduler  # Background reorder reminders
+from utils.pet_retention import PetRetention          # Guest pet compaction
+from utils.account_deletion import AccountDeletionWorker  # Background cascade for deleted accounts
+from utils.allergens import AllergyCheck          # Pet allergies vs import-time allergen terms
+from utils.metrics import (                         # Prometheus counters/histograms for /metrics
+    ALLERGY_FILTERED,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    PRODUCTS_SCORED,
+    SCORING_SECONDS,
+    render as render_metrics,
+)
+from utils.rate_limit import (                      # Per-client limits: token bucket or shared sliding window
+    RateLimiter,
+    RateLimitExceeded,
+    create_rate_limit_backend,
+)
 
 # ============================================
 # Logging Configuration
 # ============================================
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)-8s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+# JSON lines written by a background listener thread; sampled, deduplicated and
+# rate limited per message type (see utils/log_pipeline.py, LOG_* env vars)
+configure_logging()
 logger = logging.getLogger("petai")
 
 # ============================================
@@ -76,10 +125,38 @@ DATABASE_NAME = os.getenv("DATABASE_NAME", "petai")
 
 client = AsyncIOMotorClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
 database = client[DATABASE_NAME]
-pets_collection = database["pets"]
-products_collection = database["products"]
-users_collection = database["users"]
-purchases_collection = database["purchases"]
+# Collections are wrapped so every operation is counted and timed per request
+# (surfaced in the Server-Timing header and the request log line)
+pets_collection = instrument_collection(database["pets"])
+products_collection = instrument_collection(database["products"])
+users_collection = instrument_collection(database["users"])
+purchases_collection = instrument_collection(database["purchases"])
+spending_rollups_collection = instrument_collection(database["spending_rollups"])
+# Magic link token hashes (unique) with a TTL on expires_at — auth state stays off users
+auth_tokens_collection = instrument_collection(database["auth_tokens"])
+
+# Handlers read and write pets/products/users/purchases through repositories:
+# the collections above (STORAGE_BACKEND=mongo, default) or process memory
+# (STORAGE_BACKEND=memory, benchmarks and profiling). Only those four move:
+# auth_tokens, spending_rollups, email_outbox, catalog_meta, _migrations and
+# account_deletions always use the database, and background workers and
+# migrations keep using the collections directly (so they never see
+# in-memory data). See "Limitation" in utils/repositories.py.
+repositories = create_repositories({
+    "pets": pets_collection,
+    "products": products_collection,
+    "users": users_collection,
+    "purchases": purchases_collection,
+    "spending_rollups": spending_rollups_collection,
+})
+
+# Catalog version (bumped by import_products.py / ScraperPipeline) drives product ETags.
+# Cached in memory and re-read at most every CATALOG_VERSION_TTL_SECONDS.
+catalog_version = CatalogVersion(
+    instrument_collection(database["catalog_meta"]),
+    repositories.products,
+    ttl_seconds=float(os.getenv("CATALOG_VERSION_TTL_SECONDS", "30")),
+)
 
 # ============================================
 # Auth Configuration
@@ -92,10 +169,76 @@ JWT_SECRET = JWT_SECRET or "dev-secret-change-in-production"
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRY_DAYS = 30
 MAGIC_LINK_EXPIRY_MINUTES = 15
+# A consumed link keeps working this long (StrictMode double-mount, retries, double-clicks)
+MAGIC_LINK_REUSE_GRACE_SECONDS = 60
 MAGIC_LINK_BASE_URL = os.getenv("MAGIC_LINK_BASE_URL", "http://localhost:5173")
-RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
-if RESEND_API_KEY:
-    resend.api_key = RESEND_API_KEY
+# New accounts start opted out of reminder email; the Account page toggles it
+DEFAULT_USER_PREFERENCES = {"notifications_enabled": True, "email_reminders": False}
+
+# All email goes through the outbox: handlers enqueue, background workers
+# deliver via the provider (Resend, or EMAIL_PROVIDER=file|smtp for a local
+# sink; with neither configured, mail is dropped outside production and
+# startup fails in it). Retries, backoff and dead-letter live in
+# utils/email_outbox.py.
+email_outbox_collection = instrument_collection(database["email_outbox"])
+email_outbox = EmailOutbox(
+    email_outbox_collection,
+    create_email_sender(),
+    workers=int(os.getenv("EMAIL_OUTBOX_WORKERS", "2")),
+    max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", "5")),
+)
+
+# Reorder reminders: sweep active purchases depleting within REMINDER_LEAD_DAYS.
+# REMINDER_SWEEP_SECONDS=0 disables the scheduler (e.g. on extra API replicas).
+REMINDER_SWEEP_SECONDS = float(os.getenv("REMINDER_SWEEP_SECONDS", "900"))
+reminder_scheduler = ReminderScheduler(
+    purchases_collection,
+    users_collection,
+    pets_collection,
+    email_outbox,
+    base_url=MAGIC_LINK_BASE_URL,
+    lead_days=float(os.getenv("REMINDER_LEAD_DAYS", "3")),
+    interval_seconds=REMINDER_SWEEP_SECONDS,
+)
+
+# Guest pet retention: unclaimed pets not opened for PET_RETENTION_DAYS are
+# removed in throttled batches (PET_RETENTION_MODE=archive copies them to
+# pets_archive first). PET_RETENTION_DAYS=0 disables compaction.
+PET_RETENTION_DAYS = float(os.getenv("PET_RETENTION_DAYS", "90"))
+pets_archive_collection = (
+    instrument_collection(database["pets_archive"]) if os.getenv("PET_RETENTION_MODE") == "archive" else None
+)
+pet_retention = PetRetention(
+    pets_collection,
+    archive=pets_archive_collection,
+    max_age_days=PET_RETENTION_DAYS or 90,
+)
+
+# Account deletion: DELETE /api/auth/me queues a job and tombstones the user
+# immediately; this worker deletes the rest in throttled batches.
+account_deletions = AccountDeletionWorker(
+    {
+        "account_deletions": instrument_collection(database["account_deletions"]),
+        "users": users_collection,
+        "purchases": purchases_collection,
+        "spending_rollups": spending_rollups_collection,
+        "auth_tokens": auth_tokens_collection,
+        "pets": pets_collection,
+        "pets_archive": pets_archive_collection,     # None unless PET_RETENTION_MODE=archive
+        "email_outbox": email_outbox_collection,
+    },
+    batch_size=int(os.getenv("ACCOUNT_DELETION_BATCH_SIZE", "500")),
+    pause_seconds=float(os.getenv("ACCOUNT_DELETION_PAUSE_SECONDS", "0.1")),
+)
+
+# Startup steps that must finish before /health/ready passes
+readiness = Readiness()
+
+# Slow-request profiler (None unless PROFILE_SAMPLE_RATE / PROFILE_SLOW_MS is set)
+profiler = create_profiler()
+
+# Anonymized request capture for replay_traffic.py (None unless CAPTURE_SAMPLE_RATE is set)
+traffic_capture = create_traffic_capture()
 
 # ============================================
 # Application Lifespan (startup + shutdown)
@@ -106,27 +249,57 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown logic."""
     # --- Startup ---
     logger.info("BowlWise API starting up...")
-    logger.info("MongoDB client initialized (database: %s)", DATABASE_NAME)
-
-    # Create database indexes for query performance
-    await products_collection.create_index([("format", 1), ("life_stage", 1)])
-    await products_collection.create_index("brand")
-    await products_collection.create_index("life_stage")
-    await products_collection.create_index("breed_size")
-    await pets_collection.create_index("public_id", unique=True)
-    # Users collection indexes
-    await users_collection.create_index("email", unique=True)
-    await users_collection.create_index("magic_link_token")
-    # Purchases collection indexes
-    await purchases_collection.create_index([("user_id", 1), ("status", 1)])
-    await purchases_collection.create_index([("user_id", 1), ("pet_id", 1), ("purchased_at", -1)])
-    logger.info("Database indexes ensured")
+    logger.info("MongoDB client initialized (database: %s, storage: %s)", DATABASE_NAME, repositories.backend)
+
+    # startup_ms in /health counts from here, not from module import
+    readiness.start()
+
+    # Indexes + backfills, applied once per database and recorded in _migrations
+    # (see utils/startup.py). Already-applied migrations cost a single query.
+    readiness.mark("migrations")
+    migrations = await run_migrations(database)
+    logger.info(
+        "Migrations: %d applied, %d already done, %d running elsewhere",
+        len(migrations["applied"]), migrations["skipped"], len(migrations["running_elsewhere"]),
+    )
+    if migrations["running_elsewhere"]:
+        # Another instance is applying them: not ready until they are recorded
+        readiness.warm_up("migrations", lambda: wait_for_migrations(database, migrations["running_elsewhere"]))
+    else:
+        readiness.done("migrations")
+
+    # Catalog loads in the background; /health/ready reports when it is warm
+    readiness.warm_up("catalog", product_catalog.get)
+
+    email_outbox.start()
+    logger.info("Email outbox started (%s)", email_outbox.provider)
+
+    if REMINDER_SWEEP_SECONDS > 0:
+        reminder_scheduler.start()
+        logger.info("Reminder scheduler started (every %.0fs)", REMINDER_SWEEP_SECONDS)
+    if PET_RETENTION_DAYS > 0:
+        pet_retention.start()
+        logger.info("Guest pet compaction started (unclaimed pets idle > %.0f days)", PET_RETENTION_DAYS)
+    account_deletions.start()
+    if profiler:
+        profiler.start()
+    if traffic_capture:
+        traffic_capture.start()
 
     logger.info("Ready to accept requests!")
     yield
 
     # --- Shutdown ---
     logger.info("Shutting down BowlWise API...")
+    await readiness.stop()
+    await reminder_scheduler.stop()
+    await pet_retention.stop()
+    await account_deletions.stop()
+    await email_outbox.stop()
+    if profiler:
+        profiler.stop()
+    if traffic_capture:
+        traffic_capture.stop()
     client.close()
     logger.info("MongoDB connection closed")
 
@@ -134,7 +307,8 @@ async def lifespan(app: FastAPI):
 # FastAPI Application Setup
 # ============================================
 
-limiter = Limiter(key_func=get_remote_address, default_limits=["60/minute"])
+# RATE_LIMIT_BACKEND=memory (per process) | mongo | redis (shared across workers)
+limiter = RateLimiter(create_rate_limit_backend(database))
 
 app = FastAPI(
     title="BowlWise API",
@@ -145,7 +319,6 @@ app = FastAPI(
     redoc_url=None if os.getenv("ENV") == "production" else "/redoc",
     openapi_url=None if os.getenv("ENV") == "production" else "/openapi.json",
 )
-app.state.limiter = limiter
 
 # ============================================
 # CORS Configuration
@@ -163,41 +336,30 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization", "Accept", "X-Session-Token"],
+    expose_headers=["Server-Timing", "X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
 # ============================================
-# Request Logging Middleware
+# Request Middleware (timing, logging, security headers, metrics)
 # ============================================
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log every request with method, path, status, and duration."""
-    start = time.time()
-    response = await call_next(request)
-    duration_ms = (time.time() - start) * 1000
-    logger.info(
-        "%s %s → %d (%.0fms)",
-        request.method,
-        request.url.path,
-        response.status_code,
-        duration_ms,
-    )
-    return response
-
-# ============================================
-# Security Headers Middleware
-# ============================================
-
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    """Add security headers to every response."""
-    response = await call_next(request)
-    response.headers["Strict-Transport-Security"] = "max-age=63072000; includeSubDomains"
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    return response
+SECURITY_HEADERS = {
+    "Strict-Transport-Security": "max-age=63072000; includeSubDomains",
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+}
+
+# Pure ASGI (utils/request_middleware.py): binds per-request timings, adds
+# Server-Timing + security headers to the response start, logs each request
+# with DB/stage timings and records /metrics latency. Added after CORS so it
+# wraps it (preflight responses get the headers too).
+if profiler:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+if traffic_capture:
+    app.add_middleware(CaptureMiddleware, capture=traffic_capture)
+app.add_middleware(RequestMiddleware, security_headers=SECURITY_HEADERS)
 
 # ============================================
 # Global Exception Handler
@@ -206,7 +368,11 @@ async def add_security_headers(request: Request, call_next):
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     """Return 429 with clear JSON message when rate limit is hit."""
-    return JSONResponse(status_code=429, content={"detail": f"Rate limit exceeded: {exc.detail}"})
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"Rate limit exceeded: {exc.detail}"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -306,6 +472,12 @@ class MagicLinkRequest(BaseModel):
     email: EmailStr
 
 
+class PreferencesUpdate(BaseModel):
+    """Schema for changing notification preferences. Only provided fields are updated."""
+    notifications_enabled: Optional[bool] = None
+    email_reminders: Optional[bool] = None
+
+
 class PurchaseCreate(BaseModel):
     """Schema for logging a food purchase."""
     pet_id: str
@@ -510,9 +682,44 @@ def product_helper(product) -> dict:
     }
 
 
+def encode_product(product) -> bytes:
+    """
+    Validate a MongoDB product document against ProductResponse once and
+    return its JSON bytes. Called by ProductCatalog when a catalog version
+    loads, so list and recommendation responses reuse the encoded bytes
+    instead of re-validating every product on every request.
+
+    Invalid documents are logged and encoded unvalidated, so one bad row
+    never takes the catalog (and recommendations) down.
+    """
+    data = product_helper(product)
+    try:
+        return ProductResponse.model_validate(data).model_dump_json().encode()
+    except ValidationError as e:
+        logger.warning("Product '%s' failed ProductResponse validation: %s", data["id"], e)
+        return encode(data)
+
+
+# Whole catalog reloaded only when the catalog version changes. By default each
+# worker keeps a private in-memory copy; with CATALOG_FILE set (opt-in), products
+# live in a memory-mapped columnar file shared by every worker on the host
+# (written by import_products.py / ScraperPipeline, or rebuilt here when stale).
+product_catalog = ProductCatalog(
+    repositories.products,
+    catalog_version,
+    encode_product,
+    catalog_file=catalog_file_path(),
+)
+
+# Product reads that miss the snapshot (imported within the version TTL, or
+# unknown IDs) — concurrent lookups of one ID share a single query. Callers
+# only read the shared doc.
+product_lookups = SingleFlight("product_lookup")
+
+
 def user_helper(user_doc) -> dict:
     """Convert a MongoDB user document to API response format.
-    Excludes internal fields: magic_link_token, magic_link_expiry, _id."""
+    Excludes internal fields (_id; legacy magic_link_* token fields)."""
     return {
         "id": str(user_doc["_id"]),
         "email": user_doc.get("email", ""),
@@ -520,7 +727,7 @@ def user_helper(user_doc) -> dict:
         "name": user_doc.get("name"),
         "created_at": user_doc.get("created_at", "").isoformat() if user_doc.get("created_at") else None,
         "last_login_at": user_doc.get("last_login_at", "").isoformat() if user_doc.get("last_login_at") else None,
-        "preferences": user_doc.get("preferences", {"notifications_enabled": True, "email_reminders": False}),
+        "preferences": {**DEFAULT_USER_PREFERENCES, **(user_doc.get("preferences") or {})},
     }
 
 
@@ -577,6 +784,7 @@ def calculate_depletion(product: dict, bag_size_kg: float, cups_per_day: float,
 
 def create_jwt(user_id: str, email: str) -> str:
     """Create a JWT token with user_id, email, and 30-day expiry."""
+    import jwt  # Deferred: only auth paths need PyJWT, keeps it off the cold-start path
     payload = {
         "user_id": user_id,
         "email": email,
@@ -594,6 +802,8 @@ async def get_current_user(
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header")
 
+    import jwt  # Deferred (see create_jwt)
+
     token = authorization[7:]  # Strip "Bearer "
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
@@ -602,8 +812,9 @@ async def get_current_user(
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = await users_collection.find_one({"_id": ObjectId(payload["user_id"])})
-    if not user:
+    user = await repositories.users.get(payload["user_id"])
+    # Tombstoned accounts stop authenticating before their data is gone
+    if not user or user.get("deleted_at"):
         raise HTTPException(status_code=401, detail="User not found")
 
     return user
@@ -613,8 +824,8 @@ async def get_current_user(
 # Magic Link Email
 # ============================================
 
-async def send_magic_link_email(email: str, token: str):
-    """Send a magic link email using Resend. Token is the raw (unhashed) value."""
+def magic_link_email(email: str, token: str) -> dict:
+    """Build the magic link message for the outbox. Token is the raw (unhashed) value."""
     verify_url = f"{MAGIC_LINK_BASE_URL}/auth/verify/{token}"
     logger.info("Magic link generated for %s...%s (token: ...%s)", email[:3], email.split('@')[1], token[-4:])
 
@@ -628,21 +839,12 @@ async def send_magic_link_email(email: str, token: str):
     </div>
     """
 
-    if not RESEND_API_KEY:
-        logger.warning("RESEND_API_KEY not set — magic link not sent (token: ...%s)", token[-4:])
-        return
-
-    try:
-        resend.Emails.send({
-            "from": "BowlWise <onboarding@resend.dev>",
-            "to": [email],
-            "subject": "Sign in to BowlWise",
-            "html": html_body,
-        })
-        logger.info("Magic link email sent to %s...%s", email[:3], email.split('@')[1])
-    except Exception as e:
-        logger.error("Failed to send magic link email to %s...%s: %s", email[:3], email.split('@')[1], e, exc_info=True)
-        raise HTTPException(status_code=500, detail="Failed to send email")
+    return {
+        "to": email,
+        "subject": "Sign in to BowlWise",
+        "html": html_body,
+        "tag": "magic_link",
+    }
 
 
 # ============================================
@@ -673,10 +875,76 @@ async def health_check():
     return {
         "status": "healthy" if db_status == "connected" else "unhealthy",
         "database": db_status,
+        "ready": readiness.ready,
+        "startup_ms": readiness.status(),
         "version": "2.0.0",
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+@limiter.exempt
+async def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint (this worker's counters; no I/O).
+
+    When METRICS_TOKEN is set, the scraper must send it as a Bearer token.
+    """
+    token = os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+def require_admin_token(authorization: Optional[str] = Header(None)):
+    """Dependency for operator endpoints: Bearer PROFILE_ADMIN_TOKEN (404 when unset)."""
+    token = os.getenv("PROFILE_ADMIN_TOKEN")
+    if not token or profiler is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    if authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.get("/admin/profiles", include_in_schema=False, dependencies=[Depends(require_admin_token)])
+@limiter.exempt
+async def list_profiles():
+    """Stored request profiles (newest first) with route and timing metadata."""
+    return {"profiles": await asyncio.to_thread(profiler.store.list)}
+
+
+@app.get("/admin/profiles/{profile_id}", include_in_schema=False, dependencies=[Depends(require_admin_token)])
+@limiter.exempt
+async def download_profile(profile_id: str):
+    """One profile as collapsed stacks (flamegraph.pl / speedscope input)."""
+    folded = await asyncio.to_thread(profiler.store.read, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(
+        content=folded,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'},
+    )
+
+
+@app.get("/health/live")
+@limiter.exempt
+async def liveness_check():
+    """Liveness: the process is up and serving. No I/O — never restart on a slow DB."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+@limiter.exempt
+async def readiness_check():
+    """Readiness: migrations applied, catalog warm and MongoDB reachable. 503 until then."""
+    steps = readiness.status()
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "steps": steps})
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        return JSONResponse(status_code=503, content={"status": "database unavailable", "steps": steps})
+    return {"status": "ready", "steps": steps}
+
+
 # ============================================
 # Pet CRUD Endpoints
 # ============================================
@@ -700,6 +968,7 @@ async def create_pet(request: Request, pet: PetCreate):
         # Submission tracking metadata (internal analytics, not returned to frontend)
         pet_dict["created_at"] = datetime.utcnow()
         pet_dict["updated_at"] = datetime.utcnow()
+        pet_dict["last_accessed_at"] = pet_dict["created_at"]   # Guest pet retention
         pet_dict["user_agent"] = request.headers.get("user-agent", "")
         raw_ip = request.headers.get("x-forwarded-for", request.client.host if request.client else "")
         raw_ip = raw_ip.split(",")[0].strip() if raw_ip else ""
@@ -707,8 +976,8 @@ async def create_pet(request: Request, pet: PetCreate):
         pet_dict["referrer"] = request.headers.get("referer", "")
         pet_dict["user_id"] = None       # Null for anonymous pets, set on claim
         pet_dict["claimed_at"] = None     # Set when pet is linked to a user account
-        result = await pets_collection.insert_one(pet_dict)
-        created_pet = await pets_collection.find_one({"_id": result.inserted_id})
+        created_pet = await repositories.pets.create(pet_dict)
+        note_pet(request, pet_dict, pet_dict["public_id"])
 
         if created_pet:
             return pet_helper(created_pet, include_token=True)
@@ -736,13 +1005,14 @@ async def get_pet_by_id(
     - Status: 200 OK, 404 if not found, 403 if token mismatch
     """
     try:
-        pet = await pets_collection.find_one({"public_id": pet_id})
+        pet = await repositories.pets.get(pet_id)
         if not pet:
             raise HTTPException(status_code=404, detail="Pet not found")
 
         if pet.get("session_token") != x_session_token:
             raise HTTPException(status_code=403, detail="Forbidden")
 
+        await repositories.pets.touch(pet)
         return pet_helper(pet)
 
     except HTTPException:
@@ -770,7 +1040,7 @@ async def update_pet(
     - Status: 200 OK, 404 if not found, 403 if token mismatch
     """
     try:
-        existing_pet = await pets_collection.find_one({"public_id": pet_id})
+        existing_pet = await repositories.pets.get(pet_id)
         if not existing_pet:
             raise HTTPException(status_code=404, detail="Pet not found")
 
@@ -779,12 +1049,8 @@ async def update_pet(
 
         pet_dict = pet.model_dump()
         pet_dict["updated_at"] = datetime.utcnow()
-        await pets_collection.update_one(
-            {"public_id": pet_id},
-            {"$set": pet_dict}
-        )
-
-        updated_pet = await pets_collection.find_one({"public_id": pet_id})
+        note_pet(request, pet_dict)
+        updated_pet = await repositories.pets.update(pet_id, pet_dict)
         if updated_pet:
             return pet_helper(updated_pet)
         else:
@@ -813,14 +1079,14 @@ async def delete_pet(
     - Status: 200 OK, 404 if not found, 403 if token mismatch
     """
     try:
-        existing_pet = await pets_collection.find_one({"public_id": pet_id})
+        existing_pet = await repositories.pets.get(pet_id)
         if not existing_pet:
             raise HTTPException(status_code=404, detail="Pet not found")
 
         if existing_pet.get("session_token") != x_session_token:
             raise HTTPException(status_code=403, detail="Forbidden")
 
-        await pets_collection.delete_one({"public_id": pet_id})
+        await repositories.pets.delete(pet_id)
         return {"message": "Pet deleted successfully", "id": pet_id}
 
     except HTTPException:
@@ -847,32 +1113,33 @@ async def request_magic_link(request: Request, body: MagicLinkRequest):
         hashed_token = hashlib.sha256(raw_token.encode()).hexdigest()
         expiry = now + timedelta(minutes=MAGIC_LINK_EXPIRY_MINUTES)
 
-        # Find or create user — store hashed token, send raw token in email
-        user = await users_collection.find_one({"email": email})
-        if user:
-            await users_collection.update_one(
-                {"email": email},
-                {"$set": {
-                    "magic_link_token": hashed_token,
-                    "magic_link_expiry": expiry,
-                    "updated_at": now,
-                }}
-            )
-        else:
-            await users_collection.insert_one({
-                "email": email,
-                "email_verified": False,
-                "name": None,
-                "created_at": now,
-                "updated_at": now,
-                "last_login_at": None,
-                "auth_method": "magic_link",
-                "magic_link_token": hashed_token,
-                "magic_link_expiry": expiry,
-                "preferences": {"notifications_enabled": True, "email_reminders": False},
-            })
+        # Find or create user in one round trip
+        user = await repositories.users.find_or_create(email, {
+            "email_verified": False,
+            "name": None,
+            "created_at": now,
+            "updated_at": now,
+            "last_login_at": None,
+            "auth_method": "magic_link",
+            "preferences": dict(DEFAULT_USER_PREFERENCES),
+        })
+        user_id = str(user["_id"])
 
-        await send_magic_link_email(email, raw_token)
+        # Only the newest link is valid: drop the user's unused tokens, then
+        # store the hash (raw token goes only into the email)
+        await auth_tokens_collection.delete_many({"user_id": user_id, "consumed_at": None})
+        await auth_tokens_collection.insert_one({
+            "token_hash": hashed_token,
+            "user_id": user_id,
+            "purpose": "magic_link",
+            "created_at": now,
+            "expires_at": expiry,
+            "consumed_at": None,
+        })
+
+        # Queued, not sent inline — delivery happens in the outbox workers.
+        # Expires with the link so a delayed retry never mails a dead token.
+        await email_outbox.enqueue({**magic_link_email(email, raw_token), "user_id": user_id}, expires_at=expiry)
         return {"message": "If this email is registered, you'll receive a sign-in link shortly."}
 
     except HTTPException:
@@ -892,16 +1159,28 @@ async def verify_magic_link(
     """Verify a magic link token. Returns JWT + user. Optionally claims a pet."""
     try:
         hashed_token = hashlib.sha256(token.encode()).hexdigest()
-        user = await users_collection.find_one({"magic_link_token": hashed_token})
+        now = datetime.utcnow()
 
-        if not user:
+        # Consume atomically: only one request can flip consumed_at. The TTL
+        # index on expires_at then removes the token after the reuse grace.
+        auth_token = await auth_tokens_collection.find_one_and_update(
+            {"token_hash": hashed_token, "consumed_at": None, "expires_at": {"$gt": now}},
+            {"$set": {
+                "consumed_at": now,
+                "expires_at": now + timedelta(seconds=MAGIC_LINK_REUSE_GRACE_SECONDS),
+            }},
+        )
+
+        if not auth_token:
             # Idempotent grace window: token was already consumed but the same
-            # token is retried within 60s (React StrictMode double-mount,
-            # network retries, double-clicks). Look up by consumed_token field.
-            recently_verified = await users_collection.find_one({
-                "consumed_magic_token": hashed_token,
-                "last_login_at": {"$gte": datetime.utcnow() - timedelta(seconds=60)},
+            # token is retried shortly after (React StrictMode double-mount,
+            # network retries, double-clicks).
+            consumed = await auth_tokens_collection.find_one({
+                "token_hash": hashed_token,
+                "consumed_at": {"$gte": now - timedelta(seconds=MAGIC_LINK_REUSE_GRACE_SECONDS)},
             })
+            recently_verified = consumed and await repositories.users.get(consumed["user_id"])
+            recently_verified = recently_verified if recently_verified and "deleted_at" not in recently_verified else None
             if recently_verified:
                 logger.info("Idempotent verify hit for user %s", str(recently_verified["_id"]))
                 user_id = str(recently_verified["_id"])
@@ -912,46 +1191,27 @@ async def verify_magic_link(
                 }
             raise HTTPException(status_code=400, detail="Invalid or expired link")
 
-        # Check expiry
-        expiry = user.get("magic_link_expiry")
-        if not expiry or datetime.utcnow() > expiry:
-            raise HTTPException(status_code=400, detail="Invalid or expired link")
-
-        now = datetime.utcnow()
-        user_id = str(user["_id"])
+        user_id = auth_token["user_id"]
 
-        # Update user: verify email, clear token, record consumed hash for idempotency
-        await users_collection.update_one(
-            {"_id": user["_id"]},
-            {"$set": {
-                "email_verified": True,
-                "magic_link_token": None,
-                "magic_link_expiry": None,
-                "consumed_magic_token": hashed_token,
-                "last_login_at": now,
-                "updated_at": now,
-            }}
-        )
+        # Verify email and record the login (also drops pre-auth_tokens token fields)
+        # Links issued before an account deletion die with the tombstone
+        user = await repositories.users.record_login(user_id, now)
+        if not user:
+            raise HTTPException(status_code=400, detail="Invalid or expired link")
 
         # If session_token provided, claim the pet during verification
         if session_token:
-            pet = await pets_collection.find_one({"session_token": session_token})
+            pet = await repositories.pets.get_by_session_token(session_token)
             if pet and not pet.get("user_id"):
-                await pets_collection.update_one(
-                    {"_id": pet["_id"]},
-                    {"$set": {"user_id": user_id, "claimed_at": now}}
-                )
+                await repositories.pets.update(pet["public_id"], {"user_id": user_id, "claimed_at": now})
                 logger.info("Pet %s auto-claimed by user %s during verification", pet.get("public_id"), user_id)
 
         # Create JWT
         jwt_token = create_jwt(user_id, user["email"])
 
-        # Re-fetch updated user
-        updated_user = await users_collection.find_one({"_id": user["_id"]})
-
         return {
             "access_token": jwt_token,
-            "user": user_helper(updated_user),
+            "user": user_helper(user),
         }
 
     except HTTPException:
@@ -968,9 +1228,7 @@ async def get_current_user_profile(user: dict = Depends(get_current_user)):
         user_id = str(user["_id"])
 
         # Fetch user's pets
-        pets = []
-        async for pet in pets_collection.find({"user_id": user_id}):
-            pets.append(pet_helper(pet))
+        pets = [pet_helper(pet) for pet in await repositories.pets.list_for_user(user_id)]
 
         return {
             "user": user_helper(user),
@@ -984,24 +1242,66 @@ async def get_current_user_profile(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="Failed to fetch profile")
 
 
-@app.delete("/api/auth/me")
+@app.put("/api/auth/me/preferences")
+@limiter.limit("10/minute")
+async def update_preferences(
+    request: Request,
+    body: PreferencesUpdate,
+    user: dict = Depends(get_current_user),
+):
+    """Update notification preferences (e.g. opt in to reorder reminder email)."""
+    try:
+        user_id = str(user["_id"])
+        changes = body.model_dump(exclude_none=True)
+        preferences = {**DEFAULT_USER_PREFERENCES, **(user.get("preferences") or {}), **changes}
+
+        # Purchases skipped while opted out get reminded on the next sweep.
+        # Released before saving: if the save fails, the sweep just skips them again.
+        if changes.get("email_reminders"):
+            released = await reminder_scheduler.release_skipped(user_id)
+            if released:
+                logger.info("Reminders enabled: user=%s, released=%d", user_id, released)
+
+        updated = await repositories.users.set_preferences(user_id, preferences, datetime.utcnow())
+        if not updated:
+            raise HTTPException(status_code=401, detail="User not found")
+
+        return {"user": user_helper(updated)}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error updating preferences for user %s: %s", str(user.get("_id")), e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to update preferences")
+
+
+@app.delete("/api/auth/me", status_code=202)
 @limiter.limit("5/minute")
 async def delete_account(request: Request, user: dict = Depends(get_current_user)):
-    """Delete the authenticated user's account, purchases, and pets. PIPEDA compliance."""
+    """Delete the authenticated user's account, purchases, and pets. PIPEDA compliance.
+
+    The user is tombstoned right away (email scrubbed, every token rejected);
+    purchases, rollups, auth tokens, pets and finally the user document are
+    removed by the background worker. Poll /api/auth/deletions/{deletion_id}.
+    """
     try:
         user_id = str(user["_id"])
 
-        # Delete all user's purchases
-        del_purchases = await purchases_collection.delete_many({"user_id": user_id})
-        # Delete all user's claimed pets
-        del_pets = await pets_collection.delete_many({"user_id": user_id})
-        # Delete the user document
-        await users_collection.delete_one({"_id": user["_id"]})
+        # Job first (held), then the tombstone: a failure in between never
+        # leaves a tombstoned account without a job to finish the cascade
+        deletion_id = await account_deletions.enqueue(user_id)
+
+        # Tombstone: auth fails from now on and the email is free for a new signup
+        await repositories.users.tombstone(user_id, datetime.utcnow())
+        await account_deletions.release(deletion_id)
 
-        logger.info("Account deleted: user=%s, purchases=%d, pets=%d",
-                     user_id, del_purchases.deleted_count, del_pets.deleted_count)
+        logger.info("Account deletion queued: user=%s, deletion=%s", user_id, deletion_id)
 
-        return {"message": "Account deleted successfully"}
+        return {
+            "message": "Account deletion started",
+            "deletion_id": deletion_id,
+            "status_url": f"/api/auth/deletions/{deletion_id}",
+        }
 
     except HTTPException:
         raise
@@ -1010,6 +1310,21 @@ async def delete_account(request: Request, user: dict = Depends(get_current_user
         raise HTTPException(status_code=500, detail="Failed to delete account")
 
 
+@app.get("/api/auth/deletions/{deletion_id}")
+async def get_account_deletion(deletion_id: str):
+    """Progress of an account deletion.
+
+    Unauthenticated: the account can no longer sign in, so the random
+    deletion_id (a uuid4 returned only to the deleting user) is the only
+    capability. Anyone holding it can read the job, so the response must
+    never carry user_id, email or other account data — status() returns
+    job state only (status, step, progress counts, timestamps)."""
+    status = await account_deletions.status(deletion_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Deletion not found")
+    return status
+
+
 # ============================================
 # Pet Claim Endpoint
 # ============================================
@@ -1025,7 +1340,7 @@ async def claim_pet(
 ):
     """Claim an anonymous pet by verifying session_token. Links pet to authenticated user."""
     try:
-        pet = await pets_collection.find_one({"public_id": pet_id})
+        pet = await repositories.pets.get(pet_id)
         if not pet:
             raise HTTPException(status_code=404, detail="Pet not found")
 
@@ -1044,12 +1359,7 @@ async def claim_pet(
 
         # Claim the pet
         now = datetime.utcnow()
-        await pets_collection.update_one(
-            {"public_id": pet_id},
-            {"$set": {"user_id": user_id, "claimed_at": now}}
-        )
-
-        updated_pet = await pets_collection.find_one({"public_id": pet_id})
+        updated_pet = await repositories.pets.update(pet_id, {"user_id": user_id, "claimed_at": now})
         return {"message": "Pet claimed successfully", "pet": pet_helper(updated_pet)}
 
     except HTTPException:
@@ -1077,22 +1387,19 @@ async def create_purchase(
         now = datetime.utcnow()
 
         # Verify pet belongs to user
-        pet = await pets_collection.find_one({"public_id": body.pet_id})
+        pet = await repositories.pets.get(body.pet_id)
         if not pet:
             raise HTTPException(status_code=404, detail="Pet not found")
         if pet.get("user_id") != user_id:
             raise HTTPException(status_code=403, detail="Pet does not belong to you")
 
         # Look up product for snapshot + depletion calc
-        product = await products_collection.find_one({"_id": body.product_id})
+        product = await product_lookups.do(body.product_id, repositories.products.get, body.product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
         # Auto-complete any existing active purchase for this pet
-        await purchases_collection.update_many(
-            {"user_id": user_id, "pet_id": body.pet_id, "status": "active"},
-            {"$set": {"status": "switched", "completed_at": now}}
-        )
+        await repositories.purchases.close_active(user_id, body.pet_id, "switched", now)
 
         # Build purchase document
         bag_size_kg = body.bag_size_kg or product.get("size_kg") or 0
@@ -1126,8 +1433,8 @@ async def create_purchase(
             "created_at": now,
         }
 
-        result = await purchases_collection.insert_one(purchase_doc)
-        created = await purchases_collection.find_one({"_id": result.inserted_id})
+        created = await repositories.purchases.create(purchase_doc)
+        await apply_purchase(spending_rollups_collection, purchase_doc)
         return purchase_helper(created)
 
     except HTTPException:
@@ -1141,21 +1448,42 @@ async def create_purchase(
 async def get_purchases(
     pet_id: str = Query(..., description="Pet public_id (required)"),
     status: Optional[str] = Query(None, description="Filter by status: active, completed, switched"),
+    before: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    limit: int = Query(20, ge=1, le=100, description="Page size"),
     user: dict = Depends(get_current_user),
 ):
-    """Get purchases for the current user, filtered by pet_id."""
+    """
+    Get purchases for the current user, filtered by pet_id, newest first.
+
+    Paged by keyset: pass the previous response's next_cursor as `before`
+    to get the next (older) page. next_cursor is null on the last page.
+
+    Response:
+    {"purchases": [...], "next_cursor": "..." | null}
+    """
     try:
         user_id = str(user["_id"])
-        query = {"user_id": user_id, "pet_id": pet_id}
-        if status:
-            query["status"] = status
-
-        purchases = []
-        async for doc in purchases_collection.find(query).sort("purchased_at", -1):
-            purchases.append(purchase_helper(doc))
+        last_values = None
+        if before:
+            try:
+                last_values = decode_cursor(before, PURCHASE_CURSOR_TYPES)
+            except InvalidCursor:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        # Fetch one extra to know whether another page exists
+        docs = await repositories.purchases.history(user_id, pet_id, status=status, before=last_values, limit=limit + 1)
+        page = docs[:limit]
+        next_cursor = None
+        if len(docs) > limit:
+            next_cursor = encode_cursor(cursor_values(page[-1], PURCHASE_HISTORY_SORT))
 
-        return {"purchases": purchases}
+        return {
+            "purchases": [purchase_helper(doc) for doc in page],
+            "next_cursor": next_cursor,
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Error fetching purchases: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to fetch purchases")
@@ -1170,14 +1498,16 @@ async def delete_purchase(
 ):
     """Delete a purchase. Only the owner can delete."""
     try:
-        purchase = await purchases_collection.find_one({"_id": ObjectId(purchase_id)})
+        purchase = await repositories.purchases.get(purchase_id)
         if not purchase:
             raise HTTPException(status_code=404, detail="Purchase not found")
 
         if purchase.get("user_id") != str(user["_id"]):
             raise HTTPException(status_code=403, detail="Forbidden")
 
-        await purchases_collection.delete_one({"_id": ObjectId(purchase_id)})
+        deleted = await repositories.purchases.delete(purchase_id)
+        if deleted and purchase.get("purchased_at"):
+            await remove_purchase(spending_rollups_collection, repositories.purchases, purchase)
         return {"message": "Purchase deleted successfully", "id": purchase_id}
 
     except HTTPException:
@@ -1197,7 +1527,7 @@ async def update_purchase(
 ):
     """Edit a purchase's bag_size_kg and/or cups_per_day. Recalculates depletion."""
     try:
-        purchase = await purchases_collection.find_one({"_id": ObjectId(purchase_id)})
+        purchase = await repositories.purchases.get(purchase_id)
         if not purchase:
             raise HTTPException(status_code=404, detail="Purchase not found")
 
@@ -1225,12 +1555,12 @@ async def update_purchase(
         depletion_at = calculate_depletion(snapshot, bag_size_kg, cups_per_day, purchased_at)
         update_fields["estimated_depletion_at"] = depletion_at
 
-        await purchases_collection.update_one(
-            {"_id": ObjectId(purchase_id)},
-            {"$set": update_fields}
-        )
+        # New depletion date → new reminder
+        updated = await repositories.purchases.update(purchase_id, update_fields, unset=REMINDER_FIELDS)
+        if "bag_size_kg" in update_fields and purchase.get("purchased_at"):
+            kg_delta = bag_size_kg - (purchase.get("bag_size_kg") or 0)
+            await apply_kg_delta(spending_rollups_collection, purchase, kg_delta)
 
-        updated = await purchases_collection.find_one({"_id": ObjectId(purchase_id)})
         return purchase_helper(updated)
 
     except HTTPException:
@@ -1249,7 +1579,7 @@ async def extend_purchase(
 ):
     """Extend an active purchase's depletion date by 7 days."""
     try:
-        purchase = await purchases_collection.find_one({"_id": ObjectId(purchase_id)})
+        purchase = await repositories.purchases.get(purchase_id)
         if not purchase:
             raise HTTPException(status_code=404, detail="Purchase not found")
 
@@ -1264,12 +1594,9 @@ async def extend_purchase(
             raise HTTPException(status_code=400, detail="No depletion date to extend")
 
         new_depletion = depletion + timedelta(days=7)
-        await purchases_collection.update_one(
-            {"_id": ObjectId(purchase_id)},
-            {"$set": {"estimated_depletion_at": new_depletion}}
+        updated = await repositories.purchases.update(
+            purchase_id, {"estimated_depletion_at": new_depletion}, unset=REMINDER_FIELDS,
         )
-
-        updated = await purchases_collection.find_one({"_id": ObjectId(purchase_id)})
         return purchase_helper(updated)
 
     except HTTPException:
@@ -1279,6 +1606,137 @@ async def extend_purchase(
         raise HTTPException(status_code=500, detail="Failed to extend purchase")
 
 
+# ============================================
+# Dashboard + Spending Endpoints
+# ============================================
+
+# Purchases returned per pet in the dashboard's history list (first page of
+# GET /api/purchases; purchases_next_cursor continues from there)
+DASHBOARD_HISTORY_LIMIT = 20
+
+
+def spending_summary(totals: Optional[dict]) -> dict:
+    """
+    Build the spending summary from a pet's summed spending rollups.
+
+    avg_per_month spreads total cost over the months between the first and
+    last purchase (minimum 1 month) — same rule the dashboard used client-side.
+    """
+    if not totals:
+        return {"total": 0.0, "bags": 0, "kg": 0.0, "avg_per_month": None,
+                "first_purchased_at": None, "last_purchased_at": None}
+
+    first = totals.get("first_purchased_at")
+    last = totals.get("last_purchased_at")
+    total = totals.get("total_cost") or 0.0
+    months = max(1.0, (last - first).total_seconds() / (60 * 60 * 24 * 30)) if first and last else 1.0
+    return {
+        "total": round(total, 2),
+        "bags": totals.get("bags", 0),
+        "kg": round(totals.get("kg") or 0.0, 2),
+        "avg_per_month": round(total / months, 2) if totals.get("bags", 0) >= 2 else None,
+        "first_purchased_at": first.isoformat() if first else None,
+        "last_purchased_at": last.isoformat() if last else None,
+    }
+
+
+@app.get("/api/dashboard")
+async def get_dashboard(user: dict = Depends(get_current_user)):
+    """
+    Everything the dashboard needs in one response: user profile, claimed
+    pets, and per pet the active purchase, recent purchase history and
+    spending totals.
+
+    Built by PetRepository.dashboard(): on Mongo a single aggregation —
+    pets → $lookup purchases → $facet (active / history), then $lookup
+    spending_rollups for totals (one rollup per month, not every purchase).
+
+    Response:
+    {
+        "user": {...},
+        "pets": [
+            {
+                ...pet fields,
+                "active_purchase": {...} | null,
+                "purchases": [... newest first, up to 20 ...],
+                "purchases_next_cursor": "..." | null,  // pass as ?before= to /api/purchases
+                "spending": {"total", "bags", "kg", "avg_per_month", "first_purchased_at", "last_purchased_at"}
+            }
+        ]
+    }
+    """
+    try:
+        user_id = str(user["_id"])
+
+        pets = []
+        for pet in await repositories.pets.dashboard(user_id, DASHBOARD_HISTORY_LIMIT):
+            pet_data = pet_helper(pet)
+            pet_data["active_purchase"] = purchase_helper(pet["active"]) if pet["active"] else None
+            history = pet["history"]
+            pet_data["purchases"] = [purchase_helper(doc) for doc in history[:DASHBOARD_HISTORY_LIMIT]]
+            pet_data["purchases_next_cursor"] = (
+                encode_cursor(cursor_values(history[DASHBOARD_HISTORY_LIMIT - 1], PURCHASE_HISTORY_SORT))
+                if len(history) > DASHBOARD_HISTORY_LIMIT else None
+            )
+            pet_data["spending"] = spending_summary(pet["totals"])
+            pets.append(pet_data)
+
+        return {
+            "user": user_helper(user),
+            "pets": pets,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error building dashboard: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to load dashboard")
+
+
+@app.get("/api/spending/trend")
+async def get_spending_trend(
+    pet_id: str = Query(..., description="Pet public_id (required)"),
+    months: int = Query(12, ge=1, le=36, description="Number of months, ending with the current month"),
+    user: dict = Depends(get_current_user),
+):
+    """
+    Monthly spending for one pet, read from spending_rollups (one document
+    per month with purchases). Months without purchases are filled with zeros
+    so the series is continuous.
+
+    Response:
+    {
+        "pet_id": "...",
+        "months": [{"month": "2026-03", "total": 115.99, "bags": 1, "kg": 11.34}, ...]  // oldest first
+    }
+    """
+    try:
+        user_id = str(user["_id"])
+        keys = recent_month_keys(months)
+
+        rollups = {}
+        async for doc in spending_rollups_collection.find(
+            {"user_id": user_id, "pet_id": pet_id, "month": {"$gte": keys[0]}}
+        ).sort("month", 1):
+            rollups[doc["month"]] = doc
+
+        series = []
+        for key in keys:
+            doc = rollups.get(key, {})
+            series.append({
+                "month": key,
+                "total": round(doc.get("total_cost") or 0.0, 2),
+                "bags": doc.get("bags", 0),
+                "kg": round(doc.get("kg") or 0.0, 2),
+            })
+
+        return {"pet_id": pet_id, "months": series}
+
+    except Exception as e:
+        logger.error("Error fetching spending trend: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to fetch spending trend")
+
+
 # ============================================
 # Product Endpoints (read-only)
 # ============================================
@@ -1286,59 +1744,94 @@ async def extend_purchase(
 
 @app.get("/api/products", response_model=List[ProductResponse])
 async def get_all_products(
+    request: Request,
+    response: Response,
     life_stage: Optional[str] = None,
     breed_size: Optional[str] = None,
     grain_free: Optional[bool] = None,
     brand: Optional[str] = None,
-    limit: int = Query(default=100, ge=1, le=200)
+    limit: int = Query(default=100, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header"),
 ):
     """
-    Get all products with optional filtering.
+    Get all products with optional filtering, one page at a time.
 
     Query Parameters (all optional):
     - life_stage: "puppy", "adult", "senior", or "all"
     - breed_size: "small", "medium", "large", or "all"
     - grain_free: true or false
-    - brand: Brand name (case-insensitive partial match)
-    - limit: Max products to return (default 100)
+    - brand: Brand name prefix (case-insensitive, e.g. "ori" matches "Orijen")
+    - limit: Max products per page (default 100)
+    - cursor: Continue after the previous page (from X-Next-Cursor)
 
     Example: GET /api/products?life_stage=adult&grain_free=true&limit=10
 
-    The query is built dynamically based on which parameters are provided.
+    Results are sorted by (brand_key, _id). When more products remain, the
+    response carries an X-Next-Cursor header; pass it back as ?cursor= to
+    fetch the next page. The last page has no X-Next-Cursor header.
+
+    Conditional GET: the ETag depends only on the catalog version and the
+    query string, so a matching If-None-Match returns 304 without querying
+    products.
     """
     try:
-        # Build MongoDB query dynamically
-        query = {}
+        version, last_modified = await catalog_version.get()
+        etag = make_etag("products", version, str(request.query_params))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        set_validators(response, etag, last_modified)
+
+        filters = {}
 
         if life_stage:
-            query["life_stage"] = life_stage.lower()
+            filters["life_stage"] = life_stage.lower()
 
         if breed_size:
-            query["breed_size"] = breed_size.lower()
+            filters["breed_size"] = breed_size.lower()
 
         # Note: Must check 'is not None' for booleans (False is a valid filter!)
         if grain_free is not None:
-            query["grain_free"] = grain_free
+            filters["grain_free"] = grain_free
 
         if brand:
-            # $regex with $options:"i" = case-insensitive partial match
-            # "orijen" matches "Orijen", "ORIJEN", etc.
-            query["brand"] = {"$regex": re.escape(brand), "$options": "i"}
-
-        # Execute query with limit
-        products = []
-        async for product in products_collection.find(query).limit(limit):
-            products.append(product_helper(product))
-
-        return products
+            # Prefix of the lowercase brand_key ("ori" → Orijen) — an index range
+            filters["brand_prefix"] = brand.strip().lower()
+
+        last_values = None
+        if cursor:
+            try:
+                last_values = decode_cursor(cursor, PRODUCT_CURSOR_TYPES)
+            except InvalidCursor:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        # Fetch one extra key to know whether another page exists.
+        # Only the sort keys are read — bodies come from the in-memory catalog.
+        keys = await repositories.products.page_keys(filters, last_values, limit + 1)
+        if len(keys) > limit:
+            keys = keys[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(cursor_values(keys[-1], PRODUCT_LIST_SORT))
+
+        # Assemble the body from pre-validated, pre-encoded product fragments
+        snapshot = await product_catalog.get()
+        fragments = [snapshot.fragments.get(key["_id"]) for key in keys]
+        if None in fragments:
+            # Products written after the snapshot was built (within the version TTL)
+            missing_ids = [key["_id"] for key, fragment in zip(keys, fragments) if fragment is None]
+            fresh = {doc["_id"]: product_catalog.encode(doc)
+                     for doc in await repositories.products.get_many(missing_ids)}
+            fragments = [fragment or fresh.get(key["_id"]) for key, fragment in zip(keys, fragments)]
+
+        return json_bytes_response(json_array(f for f in fragments if f), headers=response.headers)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Error retrieving products: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to retrieve products")
 
 
 @app.get("/api/products/{product_id}", response_model=ProductResponse)
-async def get_product_by_id(product_id: str):
+async def get_product_by_id(request: Request, response: Response, product_id: str):
     """
     Get a specific product by ID.
 
@@ -1348,15 +1841,30 @@ async def get_product_by_id(product_id: str):
 
     Note: Product IDs are strings like "Orijen-Large-Breed-Adult", not ObjectIds.
     This is because products are imported with custom IDs, not auto-generated.
+
+    Conditional GET: ETag is derived from the catalog version + product ID,
+    so a matching If-None-Match returns 304 without reading the product.
     """
     try:
-        # Products use string IDs (not ObjectId), so query directly
-        product = await products_collection.find_one({"_id": product_id})
-
-        if product:
-            return product_helper(product)
-        else:
-            raise HTTPException(status_code=404, detail="Product not found")
+        version, last_modified = await catalog_version.get()
+        etag = make_etag("product", version, product_id)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        # Serve the pre-encoded fragment from the in-memory catalog
+        snapshot = await product_catalog.get()
+        fragment = snapshot.fragments.get(product_id)
+
+        if fragment is None:
+            # Not in the snapshot — may have been imported within the version TTL.
+            # Products use string IDs (not ObjectId), so query directly
+            product = await product_lookups.do(product_id, repositories.products.get, product_id)
+            if not product:
+                raise HTTPException(status_code=404, detail="Product not found")
+            fragment = product_catalog.encode(product)
+
+        set_validators(response, etag, last_modified)
+        return json_bytes_response(fragment, headers=response.headers)
 
     except HTTPException:
         raise
@@ -1389,6 +1897,10 @@ async def get_product_by_id(product_id: str):
 #   - Product contains pet's allergens → score = 0
 #   - Kibble size incompatible with dog size → score = 0
 
+# Part of the recommendation ETag — bump whenever scoring rules or the
+# response shape change, so clients holding old results revalidate.
+SCORING_VERSION = 1
+
 
 class RecommendationResponse(BaseModel):
     """
@@ -2012,9 +2524,102 @@ def score_product_for_pet(product: dict, pet_profile: dict, price_percentiles: d
 # Recommendation API Endpoint
 # ----------------------------------------------
 
+# Concurrent requests with the same scoring key share one build_recommendations() run
+recommendation_flights = SingleFlight("recommendations")
+
+
+async def build_recommendations(pet_profile: dict) -> bytes:
+    """
+    Score the catalog for a pet profile and encode the response body.
+
+    The body depends only on the profile, the catalog snapshot and the
+    scoring rules, so get_recommendations() runs it through
+    recommendation_flights and identical concurrent requests share it.
+    """
+    # Step 2: Select candidate products with hard filters
+    # Runs against the in-memory catalog (reloaded only when the catalog version changes):
+    #   - Only dry food (wet food not yet supported)
+    #   - Life stage must match pet's age OR be "all life stages"
+    pet_age = pet_profile["ageGroup"].lower()
+    with timed_stage("catalog_fetch"):
+        snapshot = await product_catalog.get()
+        all_products = snapshot.recommendation_candidates(pet_age)
+
+    # Handle case where no products match basic criteria
+    if not all_products:
+        return encode({
+            "pet": pet_profile,
+            "recommendations": [],
+            "message": "No products found matching basic criteria"
+        })
+
+    # Step 3: Compute price percentiles for percentile-based scoring
+    prices = sorted([p.get("price_per_kg") for p in all_products
+                     if p.get("price_per_kg") and p["price_per_kg"] > 0])
+    if prices:
+        price_percentiles = {
+            "p25": prices[len(prices) // 4],
+            "p50": prices[len(prices) // 2],
+            "p75": prices[3 * len(prices) // 4],
+        }
+    else:
+        price_percentiles = None
+
+    # Step 4: Score each product using our scoring algorithm
+    scored_products = []
+    allergy_filtered = 0
+    allergy_check = AllergyCheck(pet_profile.get("allergies", []))
+
+    scoring_started = time.perf_counter()
+    with timed_stage("scoring"):
+        for product in all_products:
+            # Secondary allergen safety net: allergens found in the ingredients
+            # at import time (allergen_terms), even if missing from allergen_tags.
+            # Missing tags are reported by the import scripts (allergen_report.json).
+            if allergy_check and allergy_check.matches(product):
+                allergy_filtered += 1
+                continue
+
+            score, reasons = score_product_for_pet(product, pet_profile, price_percentiles)
+
+            # Only include products with score >= 50 (decent match)
+            # Response dicts are built after sorting, only for the top 40
+            if score >= 50:
+                scored_products.append((product, score, reasons))
+
+        # Step 5: Sort by score (highest first) and limit to top 40
+        # Sort key is the rounded score so ties order exactly as the response shows them
+        # reverse=True means descending order (highest first)
+        scored_products.sort(key=lambda x: round(x[1], 1), reverse=True)
+    SCORING_SECONDS.observe(time.perf_counter() - scoring_started)
+    PRODUCTS_SCORED.inc(amount=len(all_products) - allergy_filtered)
+    ALLERGY_FILTERED.inc(amount=allergy_filtered)
+
+    # Step 6: Serialize the top 40 (frontend displays 20, filters reveal more)
+    # Product JSON comes pre-encoded from the catalog snapshot; only the
+    # per-pet wrapper (score, reasons) is encoded per scoring run.
+    with timed_stage("serialization"):
+        top_recommendations = json_array(
+            json_object_with("product", snapshot.fragments[str(product["_id"])], {
+                "score": round(score, 1),           # Round to 1 decimal
+                "match_percentage": int(score),      # Integer for display
+                "reasons": reasons[:3],              # Show top 3 reasons only
+                "allergy_safe": True,                # Always True — disqualified products get score 0
+            })
+            for product, score, reasons in scored_products[:40]
+        )
+        body = json_object_ending_with({
+            "pet": pet_profile,
+            "total_products": len(all_products),         # Total products before filtering
+            "allergy_filtered": allergy_filtered,         # Products removed due to allergies
+            "total_matches": len(scored_products),        # How many products scored 50+
+        }, "recommendations", top_recommendations)       # Top 40 products
+    return body
+
+
 @app.get("/api/recommendations/{pet_id}")
 @limiter.limit("20/minute")
-async def get_recommendations(request: Request, pet_id: str):
+async def get_recommendations(request: Request, response: Response, pet_id: str):
     """
     Get personalized dog food recommendations for a specific pet.
 
@@ -2039,12 +2644,28 @@ async def get_recommendations(request: Request, pet_id: str):
             ...
         ]
     }
+
+    Conditional GET: the ETag combines the catalog version, the pet's
+    updated_at and SCORING_VERSION. A matching If-None-Match returns 304
+    after the pet lookup, skipping the catalog query and scoring.
     """
     try:
         # Step 1: Fetch pet profile by public UUID
-        pet = await pets_collection.find_one({"public_id": pet_id})
+        with timed_stage("pet_fetch"):
+            pet = await repositories.pets.get(pet_id)
         if not pet:
             raise HTTPException(status_code=404, detail="Pet not found")
+        await repositories.pets.touch(pet)
+        note_pet(request, pet)
+
+        # Results depend only on the catalog, the pet profile and the scoring rules
+        version, catalog_modified = await catalog_version.get()
+        pet_modified = pet.get("updated_at") or pet.get("created_at")
+        last_modified = max(catalog_modified, pet_modified) if pet_modified else catalog_modified
+        etag = make_etag("recommendations", version, pet_id, pet_modified, SCORING_VERSION)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        set_validators(response, etag, last_modified)
 
         # Build pet profile dict for scoring functions
         pet_profile = {
@@ -2056,95 +2677,14 @@ async def get_recommendations(request: Request, pet_id: str):
             "allergies": pet.get("allergies", [])
         }
 
-        # Step 2: Query products with database-level hard filters
-        # These filters run in MongoDB (fast) before we score in Python
-        query = {
-            "format": "dry",  # Only dry food (wet food not yet supported)
-        }
-
-        # Life stage must match pet's age OR be "all life stages"
-        # MongoDB $or operator: matches if ANY condition is true
-        pet_age = pet_profile["ageGroup"].lower()
-        query["$or"] = [
-            {"life_stage": pet_age},      # e.g., "puppy", "adult", "senior"
-            {"life_stage": "all"}          # Products for all life stages
-        ]
-
-        # Fetch all matching products
-        all_products = []
-        async for product in products_collection.find(query):
-            all_products.append(product)
-
-        # Handle case where no products match basic criteria
-        if not all_products:
-            return {
-                "pet": pet_profile,
-                "recommendations": [],
-                "message": "No products found matching basic criteria"
-            }
-
-        # Step 3: Compute price percentiles for percentile-based scoring
-        prices = sorted([p.get("price_per_kg") for p in all_products
-                         if p.get("price_per_kg") and p["price_per_kg"] > 0])
-        if prices:
-            price_percentiles = {
-                "p25": prices[len(prices) // 4],
-                "p50": prices[len(prices) // 2],
-                "p75": prices[3 * len(prices) // 4],
-            }
-        else:
-            price_percentiles = None
-
-        # Step 4: Score each product using our scoring algorithm
-        scored_products = []
-        allergy_filtered = 0
-        pet_allergies = [a.lower().strip() for a in pet_profile.get("allergies", [])]
-
-        for product in all_products:
-            # Secondary allergen safety net: scan raw ingredients text
-            # Catches allergens missing from allergen_tags (data quality issue)
-            if pet_allergies:
-                ingredients_lower = product.get("ingredients", "").lower()
-                allergen_tags_lower = product.get("allergen_tags", "").lower()
-                found_allergen = None
-                for allergen in pet_allergies:
-                    if allergen in ingredients_lower:
-                        found_allergen = allergen
-                        if allergen not in allergen_tags_lower:
-                            logger.warning(
-                                "Data quality: '%s' found in ingredients but not in allergen_tags for product '%s'",
-                                allergen, product.get("_id", "unknown")
-                            )
-                        break
-                if found_allergen:
-                    allergy_filtered += 1
-                    continue
-
-            score, reasons = score_product_for_pet(product, pet_profile, price_percentiles)
-
-            # Only include products with score >= 50 (decent match)
-            if score >= 50:
-                scored_products.append({
-                    "product": product_helper(product),
-                    "score": round(score, 1),           # Round to 1 decimal
-                    "match_percentage": int(score),      # Integer for display
-                    "reasons": reasons[:3],              # Show top 3 reasons only
-                    "allergy_safe": True,                # Always True — disqualified products get score 0
-                })
-
-        # Step 5: Sort by score (highest first) and limit to top 40
-        # lambda x: x["score"] means "sort by the 'score' field"
-        # reverse=True means descending order (highest first)
-        scored_products.sort(key=lambda x: x["score"], reverse=True)
-        top_recommendations = scored_products[:40]  # Send up to 40 (frontend displays 20, filters reveal more)
-
-        return {
-            "pet": pet_profile,
-            "total_products": len(all_products),         # Total products before filtering
-            "allergy_filtered": allergy_filtered,         # Products removed due to allergies
-            "total_matches": len(scored_products),        # How many products scored 50+
-            "recommendations": top_recommendations        # Top 40 products
-        }
+        # Steps 2-6: pets with the same profile get byte-identical bodies, so
+        # concurrent requests for one profile (e.g. after a marketing email)
+        # share a single scoring run
+        body = await recommendation_flights.do(
+            make_etag("scoring", version, SCORING_VERSION, encode(pet_profile)),
+            build_recommendations, pet_profile,
+        )
+        return json_bytes_response(body, headers=response.headers)
 
     except HTTPException:
         raise
@@ -0,0 +1,155 @@
+"""
+BowlWise - Spending Rollup Rebuild Script
+
+Recomputes the spending_rollups collection (monthly totals per user/pet)
+from scratch out of the purchases collection. The API keeps rollups up to
+date incrementally; this script is the backfill and the cross-check.
+
+Data Flow:
+    purchases → ROLLUP_PIPELINE ($group by user/pet/month) → compare with spending_rollups
+        → rebuild: upsert changed buckets, delete buckets with no purchases
+        → verify:  report drift only, write nothing
+
+How to run:
+    cd backend
+    python rebuild_rollups.py              # rebuild (backfill / repair)
+    python rebuild_rollups.py --verify     # report drift, exit 1 if any
+
+When to run:
+    - Once after deploying rollups, to backfill existing purchases
+    - In a periodic check (--verify) to confirm incremental updates hold
+
+Note: Uses PyMongo (sync) like import_products.py — this is a script, not
+the web server. A rebuild racing with live purchase writes can be off by
+those writes; re-run --verify afterwards if the API was busy.
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import os                           # Access environment variables
+import sys                          # Exit code for CI / cron
+from datetime import datetime       # updated_at stamp on rebuilt buckets
+from pymongo import MongoClient, ReplaceOne  # Sync MongoDB driver (not Motor - this is a script)
+
+from utils.index_registry import INDEXES
+from utils.spending_rollups import ROLLUP_PIPELINE
+
+
+# ============================================
+# Configuration
+# ============================================
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "petai")
+
+# Money and kg are floats summed in different orders; ignore rounding noise
+TOLERANCE = 0.005
+COMPARED_FIELDS = ("total_cost", "bags", "kg", "first_purchased_at", "last_purchased_at")
+
+
+# ============================================
+# Comparison
+# ============================================
+
+def bucket_key(doc):
+    """(user_id, pet_id, month) identifying one rollup bucket."""
+    return doc["user_id"], doc["pet_id"], doc["month"]
+
+
+def differs(expected, actual) -> bool:
+    """True when a stored rollup does not match the recomputed one."""
+    for field in COMPARED_FIELDS:
+        a, b = expected.get(field), actual.get(field)
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+            if abs(a - b) > TOLERANCE:
+                return True
+        elif isinstance(a, datetime) and isinstance(b, datetime):
+            # Mongo stores milliseconds; compare at that resolution
+            if abs((a - b).total_seconds()) >= 0.001:
+                return True
+        elif a != b:
+            return True
+    return False
+
+
+def diff_rollups(db):
+    """
+    Recompute rollups and compare them with what is stored.
+
+    Returns:
+        (expected, changed, stale)
+        - expected: {key: recomputed doc}
+        - changed: keys missing or different in spending_rollups
+        - stale: keys stored in spending_rollups with no purchases behind them
+    """
+    expected = {bucket_key(doc): doc for doc in db["purchases"].aggregate(ROLLUP_PIPELINE)}
+    stored = {bucket_key(doc): doc for doc in db["spending_rollups"].find({})}
+
+    changed = [key for key, doc in expected.items() if key not in stored or differs(doc, stored[key])]
+    stale = [key for key in stored if key not in expected]
+    return expected, changed, stale
+
+
+# ============================================
+# Rebuild
+# ============================================
+
+def rebuild(db, expected, changed, stale):
+    """Upsert changed buckets and delete stale ones."""
+    rollups = db["spending_rollups"]
+    for spec in INDEXES["spending_rollups"]:
+        rollups.create_index(spec.keys, **spec.options)
+
+    now = datetime.utcnow()
+    ops = []
+    for key in changed:
+        user_id, pet_id, month = key
+        ops.append(ReplaceOne(
+            {"user_id": user_id, "pet_id": pet_id, "month": month},
+            {**expected[key], "updated_at": now},
+            upsert=True,
+        ))
+    if ops:
+        rollups.bulk_write(ops, ordered=False)
+
+    for user_id, pet_id, month in stale:
+        rollups.delete_one({"user_id": user_id, "pet_id": pet_id, "month": month})
+
+
+# ============================================
+# Main
+# ============================================
+
+def main():
+    """Rebuild rollups (or only report drift with --verify)."""
+    verify_only = "--verify" in sys.argv
+
+    print("=" * 60)
+    print("BowlWise - Spending Rollups " + ("Verify" if verify_only else "Rebuild"))
+    print("=" * 60)
+    print()
+
+    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
+    db = client[DATABASE_NAME]
+
+    expected, changed, stale = diff_rollups(db)
+    print(f"Buckets from purchases: {len(expected)}")
+    print(f"Missing or different:   {len(changed)}")
+    print(f"Stale (no purchases):   {len(stale)}")
+
+    for key in (changed + stale)[:20]:
+        print(f"  ✗ {key[0]} / {key[1]} / {key[2]}")
+
+    if verify_only:
+        client.close()
+        sys.exit(1 if changed or stale else 0)
+
+    rebuild(db, expected, changed, stale)
+    print(f"\n✅ Rebuilt {len(changed)} buckets, removed {len(stale)}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
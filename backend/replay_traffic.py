@@ -0,0 +1,373 @@
+"""
+BowlWise - Traffic Replay
+
+Re-issues requests recorded by the traffic capture middleware
+(utils/traffic_capture.py) against a local build, in-process, at the
+original pace or faster, and compares the replayed latency distribution
+with the captured one per route. Optimizations of the recommendation path
+are then measured against the real mix: hot profiles, multi-allergy pets,
+bursts.
+
+Data Flow:
+    captures/capture-*.ndjson* → records sorted by time
+        → seeded_app (load_test.py: products, users, pets, purchases)
+        → pets referenced before the capture started are created up front
+          from their captured signature (not timed)
+        → each record at t0 + (t - first t) / speed → request through the app
+            pet key → replay pet (created by a captured POST /api/pets,
+                      or up front), auth key → seeded account
+        → per route: captured vs replayed p50/p95/p99, errors, status mismatches
+        → replay_report.json
+
+How to run:
+    cd backend
+    python replay_traffic.py captures/capture-*.ndjson*                 # original pace
+    python replay_traffic.py captures/*.ndjson* --speed 10              # 10× faster
+    python replay_traffic.py captures/*.ndjson* --speed 0 --max-in-flight 32   # back to back
+    python replay_traffic.py captures/*.ndjson* --db mongo --database petai_loadtest
+
+Notes:
+    - Takes the database/seed options of load_test.py (--db memory: in-memory
+      storage, needs mongomock-motor for the other collections).
+    - Request bodies are never captured: pets are re-created from their
+      signature, purchases are logged for the mapped account's pet with a
+      random product, product list cursors are dropped (first page).
+    - Routes that would change what later records expect (DELETE, claim,
+      magic links, account deletion) are skipped and counted.
+    - Captured latencies come from production (real Mongo, real network
+      to Mongo); compare replays of the same capture between commits for
+      like-for-like numbers.
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import argparse                     # Command-line options
+import asyncio
+import glob
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+from load_test import (
+    AsgiClient,
+    Recorder,
+    SeedData,
+    add_app_arguments,
+    base_meta,
+    build_report,
+    percentile,
+    prepare_environment,
+    random_pet_profile,
+    seeded_app,
+)
+
+PET_ROUTES = {
+    "GET /api/pets/{pet_id}",
+    "PUT /api/pets/{pet_id}",
+    "GET /api/recommendations/{pet_id}",
+}
+
+
+# ============================================
+# Capture Files
+# ============================================
+
+def load_records(patterns: List[str], limit: Optional[int] = None) -> List[Dict]:
+    """Records from every matching file, oldest first (unreadable lines skipped)."""
+    records = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and "t" in record and "route" in record:
+                        records.append(record)
+    records.sort(key=lambda r: r["t"])
+    return records[:limit] if limit else records
+
+
+def route_key(record: Dict) -> str:
+    return f"{record['method']} {record['route']}"
+
+
+# ============================================
+# Replay
+# ============================================
+
+class Replayer:
+    """
+    Maps captured (anonymized) identities onto replay data and issues requests.
+
+    Args:
+        client: In-process ASGI client
+        data: Seeded accounts and products
+        recorder: Replayed latencies
+        rng: For choices the capture does not record (products to buy)
+    """
+
+    def __init__(self, client: AsgiClient, data: SeedData, recorder: Recorder, rng: random.Random):
+        self.client = client
+        self.data = data
+        self.recorder = recorder
+        self.rng = rng
+        self.pets: Dict[str, asyncio.Future] = {}       # pet key → {"id", "token", "etag"}
+        self.accounts: Dict[str, Dict] = {}             # auth key → seeded account
+        self.account_pets: Dict[str, str] = {}          # pet key (query) → seeded pet id
+        self.skipped: Dict[str, int] = {}
+        self.mismatches: Dict[str, int] = {}
+        self.max_lag_ms = 0.0
+
+    # --- Identities ---
+
+    async def create_pet(self, key: str, signature: Optional[Dict]):
+        """Create a replay pet up front (not timed)."""
+        future = self.pets[key] = asyncio.get_running_loop().create_future()
+        status, _, pet = await self.client.request("POST", "/api/pets", body=self.pet_body(signature))
+        future.set_result({"id": pet["id"], "token": pet["session_token"], "etag": None} if status == 201 else None)
+
+    def pet_body(self, signature: Optional[Dict]) -> Dict:
+        if not signature:
+            return random_pet_profile(self.rng)
+        return {"name": "Replay", **signature}
+
+    def account(self, auth_key: Optional[str]) -> Dict:
+        if auth_key not in self.accounts:
+            self.accounts[auth_key] = self.data.accounts[len(self.accounts) % len(self.data.accounts)]
+        return self.accounts[auth_key]
+
+    def account_pet(self, account: Dict, pet_key: Optional[str]) -> str:
+        if pet_key not in self.account_pets:
+            self.account_pets[pet_key] = self.rng.choice(account["pets"])
+        return self.account_pets[pet_key]
+
+    async def prepare(self, records: List[Dict]):
+        """Create every pet whose first record is not its captured creation."""
+        seen = set()
+        for record in records:
+            key = record.get("params", {}).get("pet_id")
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            if route_key(record) == "POST /api/pets":
+                self.pets[key] = asyncio.get_running_loop().create_future()
+            elif route_key(record) in PET_ROUTES:
+                await self.create_pet(key, record.get("pet"))
+
+    # --- Requests ---
+
+    def build(self, record: Dict):
+        """(method, path, kwargs) for a record, or None to skip it."""
+        method, route = record["method"], record["route"]
+        key = route_key(record)
+        query = {k: v for k, v in record.get("query", {}).items() if v != "~" and k != "pet_id"}
+
+        if key == "POST /api/pets":
+            return method, "/api/pets", {"body": self.pet_body(record.get("pet"))}
+        if key in PET_ROUTES:
+            return method, route, {}                    # Pet resolved in issue()
+        if key == "GET /api/products/{product_id}":
+            return method, f"/api/products/{record['params'].get('product_id', '')}", {}
+        if key == "GET /api/products":
+            return method, "/api/products", {"params": query}
+        if record["route"] in ("/api/auth/me", "/api/dashboard", "/api/purchases", "/api/spending/trend"):
+            if method != "GET" and key != "POST /api/purchases":
+                return None
+            account = self.account(record.get("auth"))
+            kwargs = {"headers": {"Authorization": f"Bearer {account['token']}"}, "params": query}
+            if "pet_id" in record.get("query", {}):
+                kwargs["params"]["pet_id"] = self.account_pet(account, record["query"]["pet_id"])
+            if key == "POST /api/purchases":
+                kwargs["body"] = {
+                    "pet_id": self.rng.choice(account["pets"]),
+                    "product_id": self.rng.choice(self.data.product_ids),
+                    "cups_per_day": 2.0,
+                }
+            return method, record["route"], kwargs
+        return None
+
+    async def issue(self, record: Dict, request):
+        method, path, kwargs = request
+        key = route_key(record)
+        headers = dict(kwargs.pop("headers", None) or {})
+        pet = None
+        pet_key = record.get("params", {}).get("pet_id")
+
+        if key in PET_ROUTES:
+            future = self.pets.get(pet_key)
+            pet = await future if future is not None else None
+            if pet is None:
+                self.skipped[key] = self.skipped.get(key, 0) + 1
+                return
+            path = path.replace("{pet_id}", pet["id"])
+            headers["X-Session-Token"] = pet["token"]
+            if key == "PUT /api/pets/{pet_id}":
+                kwargs["body"] = self.pet_body(record.get("pet"))
+            if record.get("conditional") and pet["etag"]:
+                headers["If-None-Match"] = pet["etag"]
+
+        start = time.perf_counter()
+        status, response_headers, body = await self.client.request(method, path, headers=headers, **kwargs)
+        ms = (time.perf_counter() - start) * 1000
+
+        captured = record.get("status", 200)
+        error = status >= 500 or (captured < 400 <= status)
+        self.recorder.add(key, status, ms, error)
+        if status // 100 != captured // 100:
+            self.mismatches[key] = self.mismatches.get(key, 0) + 1
+
+        if key == "POST /api/pets" and pet_key in self.pets and not self.pets[pet_key].done():
+            self.pets[pet_key].set_result(
+                {"id": body["id"], "token": body["session_token"], "etag": None} if status == 201 else None
+            )
+        if pet is not None and response_headers.get("etag"):
+            pet["etag"] = response_headers["etag"]
+
+    async def run(self, records: List[Dict], speed: float, max_in_flight: int):
+        """Issue every record at its (scaled) offset; at most max_in_flight at once."""
+        slots = asyncio.Semaphore(max_in_flight)
+        tasks = []
+        first = records[0]["t"]
+        start = time.perf_counter()
+
+        async def one(record, request):
+            try:
+                await self.issue(record, request)
+            finally:
+                slots.release()
+
+        for record in records:
+            request = self.build(record)
+            if request is None:
+                key = route_key(record)
+                self.skipped[key] = self.skipped.get(key, 0) + 1
+                continue
+            if speed > 0:
+                due = start + (record["t"] - first) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    self.max_lag_ms = max(self.max_lag_ms, -delay * 1000)
+            await slots.acquire()
+            tasks.append(asyncio.create_task(one(record, request)))
+        await asyncio.gather(*tasks)
+
+
+# ============================================
+# Report
+# ============================================
+
+def latency_stats(values: List[float]) -> Dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50), 2),
+        "p95_ms": round(percentile(values, 0.95), 2),
+        "p99_ms": round(percentile(values, 0.99), 2),
+    }
+
+
+def build_replay_report(records: List[Dict], replayer: Replayer, seconds: float, cpu_seconds: float, meta: Dict) -> Dict:
+    report = build_report(replayer.recorder, seconds, cpu_seconds, meta)
+    captured: Dict[str, List[float]] = {}
+    for record in records:
+        captured.setdefault(route_key(record), []).append(record.get("ms", 0.0))
+
+    routes = {}
+    for key in sorted(set(captured) | set(report["routes"])):
+        entry = {"captured": latency_stats(captured.get(key, []))}
+        if key in report["routes"]:
+            entry["replayed"] = report["routes"][key]
+            entry["status_mismatches"] = replayer.mismatches.get(key, 0)
+        if key in replayer.skipped:
+            entry["skipped"] = replayer.skipped[key]
+        routes[key] = entry
+    report["routes"] = routes
+
+    span = records[-1]["t"] - records[0]["t"] if records else 0
+    report["summary"].update({
+        "records": len(records),
+        "skipped": sum(replayer.skipped.values()),
+        "captured_span_s": round(span, 2),
+        "max_schedule_lag_ms": round(replayer.max_lag_ms, 2),
+    })
+    return report
+
+
+def print_replay_report(report: Dict):
+    summary = report["summary"]
+    print(f"\nReplayed {summary['requests']} of {summary['records']} records in {summary['duration_s']}s "
+          f"(captured span {summary['captured_span_s']}s, speed {report['meta']['speed']:g}): "
+          f"{summary['throughput_rps']} req/s, error rate {summary['error_rate']:.2%}, "
+          f"{summary['skipped']} skipped")
+    if summary["max_schedule_lag_ms"] > 100:
+        print(f"Replay fell behind schedule by up to {summary['max_schedule_lag_ms']:.0f}ms "
+              f"(lower --speed or raise --max-in-flight)")
+
+    print(f"\n{'route':<38} {'count':>6} {'captured p50/p95/p99 ms':>26} {'replayed p50/p95/p99 ms':>26} {'err':>4}")
+    for route, entry in report["routes"].items():
+        c = entry["captured"]
+        r = entry.get("replayed")
+        captured = f"{c['p50_ms']:.1f}/{c['p95_ms']:.1f}/{c['p99_ms']:.1f}"
+        replayed = f"{r['p50_ms']:.1f}/{r['p95_ms']:.1f}/{r['p99_ms']:.1f}" if r else "skipped"
+        errors = r["errors"] if r else 0
+        print(f"{route:<38} {c['count']:>6} {captured:>26} {replayed:>26} {errors:>4}")
+
+
+# ============================================
+# Main
+# ============================================
+
+async def run(args, records: List[Dict]) -> Dict:
+    async with seeded_app(args) as (app_module, data):
+        replayer = Replayer(AsgiClient(app_module.app), data, Recorder(measure_from=0), random.Random(args.seed))
+        print(f"Preparing pets for {len(records)} records ...")
+        await replayer.prepare(records)
+        print(f"Replaying at speed {args.speed:g} (max {args.max_in_flight} in flight) ...")
+        start, cpu_from = time.perf_counter(), time.process_time()
+        await replayer.run(records, args.speed, args.max_in_flight)
+        seconds = time.perf_counter() - start
+        cpu_seconds = time.process_time() - cpu_from
+
+    meta = {
+        **base_meta(args, data),
+        "captures": args.captures,
+        "speed": args.speed,
+        "max_in_flight": args.max_in_flight,
+    }
+    return build_replay_report(records, replayer, seconds, cpu_seconds, meta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a local build")
+    parser.add_argument("captures", nargs="+", help="Capture files or globs (captures/capture-*.ndjson*)")
+    add_app_arguments(parser)
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = original pace, 10 = 10× faster, 0 = no waiting")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Concurrent requests at most")
+    parser.add_argument("--limit", type=int, help="Replay only the first N records")
+    parser.add_argument("--output", default="replay_report.json")
+    args = parser.parse_args()
+
+    records = load_records(args.captures, args.limit)
+    if not records:
+        raise SystemExit("No capture records found")
+
+    prepare_environment(args)
+    report = asyncio.run(run(args, records))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print_replay_report(report)
+    print(f"\nReport: {args.output}")
+    sys.exit(1 if report["summary"]["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
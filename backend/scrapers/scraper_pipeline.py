@@ -17,6 +17,9 @@ from dotenv import load_dotenv
 
 from scrapers.orijen_scraper import OrijenScraper
 from utils.data_normalizer import ProductNormalizer, ProductValidator
+from utils.catalog_version import bump_catalog_version
+from utils.catalog_file import export_catalog_file
+from utils.allergens import run_allergen_check
 
 
 class ScraperPipeline:
@@ -89,7 +92,14 @@ class ScraperPipeline:
 
         print(f"\n✓ Normalized {len(normalized_products)} products")
         print(f"  Skipped: {skipped}")
-        print(f"  Warnings: {warnings_count}\n")
+        print(f"  Warnings: {warnings_count}")
+
+        # Derive allergens from ingredients (scraped products carry no allergen_tags)
+        if normalized_products:
+            allergen_summary = run_allergen_check(normalized_products)
+            print(f"  Allergen check: {allergen_summary['flagged']} product(s) with untagged allergens "
+                  f"(see {allergen_summary['report']})")
+        print()
 
         # Save to file
         if save_to_file and normalized_products:
@@ -142,10 +152,15 @@ class ScraperPipeline:
 
         if operations:
             result = self.collection.bulk_write(operations)
+            version = bump_catalog_version(self.db)
+            catalog_bytes = export_catalog_file(self.db, version)
             print(f"✓ MongoDB operations:")
             print(f"  Inserted: {result.upserted_count}")
             print(f"  Modified: {result.modified_count}")
             print(f"  Total: {len(operations)}")
+            print(f"  Catalog version: {version}")
+            if catalog_bytes is not None:
+                print(f"  Catalog file: {catalog_bytes:,} bytes")
 
     def get_stats(self):
         """Get statistics about stored products"""
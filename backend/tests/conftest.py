@@ -0,0 +1,12 @@
+"""
+Shared pytest setup for the backend unit tests.
+
+Run from backend/:
+    python -m pytest
+"""
+
+import sys
+from pathlib import Path
+
+# Tests import utils.* the same way main.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,123 @@
+"""Account deletion cascade (utils/account_deletion.py): held jobs, batches, resume, public status."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from utils.account_deletion import CASCADE, AccountDeletionWorker
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class Account:
+    """One user with data in every cascade collection, and a worker over them."""
+
+    def __init__(self, tombstoned: bool = True, **options):
+        database = mongomock_motor.AsyncMongoMockClient()["test"]
+        self.database = database
+        self.collections = {name: database[name] for name in ["account_deletions", "users", *CASCADE]}
+        self.worker = AccountDeletionWorker(self.collections, batch_size=2, pause_seconds=0, **options)
+        self.tombstoned = tombstoned
+        self.user_id = str(ObjectId())
+
+    async def seed(self):
+        user = {"_id": ObjectId(self.user_id), "email": "gone@example.com"}
+        if self.tombstoned:
+            user["deleted_at"] = datetime.utcnow()
+        await self.collections["users"].insert_one(user)
+        for name in CASCADE:
+            await self.collections[name].insert_many(
+                [{"user_id": self.user_id} for _ in range(3)] + [{"user_id": "someone-else"}]
+            )
+
+    async def remaining(self) -> dict:
+        return {name: await self.collections[name].count_documents({"user_id": self.user_id}) for name in CASCADE}
+
+
+def run(scenario, **options):
+    async def main():
+        account = Account(**options)
+        await account.seed()
+        return await scenario(account)
+    return asyncio.run(main())
+
+
+def test_held_job_waits_for_release_then_deletes_everything():
+    async def scenario(account):
+        job_id = await account.worker.enqueue(account.user_id)
+        held = await account.worker.run_next()
+        await account.worker.release(job_id)
+        ran = await account.worker.run_next()
+        user = await account.collections["users"].find_one({"_id": ObjectId(account.user_id)})
+        others = await account.collections["pets"].count_documents({"user_id": "someone-else"})
+        return held, ran, await account.remaining(), user, others, await account.worker.status(job_id)
+
+    held, ran, remaining, user, others, status = run(scenario)
+    assert held is False and ran is True
+    assert set(remaining.values()) == {0}
+    assert user is None
+    assert others == 1
+    assert status["status"] == "completed" and status["step"] is None and status["completed_at"]
+    assert status["progress"] == {name: 3 for name in CASCADE}
+
+
+def test_status_is_job_state_only():
+    async def scenario(account):
+        job_id = await account.worker.enqueue(account.user_id)
+        return await account.worker.status(job_id), await account.worker.status("no-such-job")
+
+    status, missing = run(scenario)
+    assert set(status) == {"deletion_id", "status", "step", "progress", "created_at", "completed_at"}
+    assert missing is None
+
+
+def test_resumed_job_does_not_double_count_progress():
+    async def scenario(account):
+        job_id = await account.worker.enqueue(account.user_id)
+        # A previous run deleted the queued mail and one purchase batch, then its worker died
+        await account.collections["email_outbox"].delete_many({"user_id": account.user_id})
+        purchases = account.collections["purchases"]
+        batch = await purchases.find({"user_id": account.user_id}).limit(2).to_list(2)
+        await purchases.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        await account.collections["account_deletions"].update_one({"_id": job_id}, {"$set": {
+            "status": "running", "step": "purchases", "progress": {"email_outbox": 3, "purchases": 2},
+            "lease_until": datetime.utcnow() - timedelta(seconds=1),
+        }})
+        await account.worker.run_next()
+        return await account.worker.status(job_id), await account.remaining()
+
+    status, remaining = run(scenario)
+    assert status["status"] == "completed"
+    assert status["progress"] == {name: 3 for name in CASCADE}
+    assert set(remaining.values()) == {0}
+
+
+def test_job_of_a_live_account_is_cancelled():
+    # The request died between enqueue and tombstone; the held job becomes
+    # due after its lease and must not delete a working account
+    async def scenario(account):
+        job_id = await account.worker.enqueue(account.user_id)
+        await asyncio.sleep(0.02)
+        await account.worker.run_next()
+        user = await account.collections["users"].find_one({"_id": ObjectId(account.user_id)})
+        return await account.worker.status(job_id), await account.remaining(), user
+
+    status, remaining, user = run(scenario, tombstoned=False, lease_seconds=0.01)
+    assert status["status"] == "cancelled"
+    assert set(remaining.values()) == {3}
+    assert user is not None
+
+
+def test_steps_without_a_collection_are_skipped():
+    async def scenario(account):
+        del account.collections["pets_archive"]
+        worker = AccountDeletionWorker(account.collections, pause_seconds=0)
+        job_id = await worker.enqueue(account.user_id)
+        await worker.release(job_id)
+        await worker.run_next()
+        return await worker.status(job_id), await account.database["pets_archive"].count_documents({})
+
+    status, archived = run(scenario)
+    assert "pets_archive" not in status["progress"] and archived == 4
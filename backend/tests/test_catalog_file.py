@@ -0,0 +1,95 @@
+"""Columnar catalog file (utils/catalog_file.py): round trip, lookups, atomic replace, bad files."""
+
+import os
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from utils.catalog_file import CatalogFileError, MappedCatalog, catalog_file_path, write_catalog_file
+
+OID = ObjectId()
+UPDATED = datetime(2026, 2, 1, 9, 30)
+
+DOCS = [
+    {"_id": "b-2", "brand": "Orijen", "price": 89.99, "size_kg": 11, "grain_free": True,
+     "allergen_terms": ["chicken", "fish"], "updated_at": UPDATED, "owner": OID},
+    {"_id": "a-1", "brand": "Acana", "price": None, "size_kg": 6, "grain_free": False,
+     "allergen_terms": ["chicken", "fish"], "nutrients": {"protein_pct": 38}},
+    {"_id": "c-3", "brand": "Orijen", "price": 54.5, "grain_free": None, "allergen_terms": []},
+]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "catalog.bwcat"
+    write_catalog_file(str(path), DOCS, "v7")
+    return MappedCatalog.open(str(path))
+
+
+def test_round_trip(catalog):
+    assert catalog.version == "v7" and len(catalog) == 3
+    by_id = {row["_id"]: row.to_dict() for row in catalog}
+    expected = {doc["_id"]: doc for doc in DOCS}
+    assert by_id == expected
+    assert [row["_id"] for row in catalog] == ["a-1", "b-2", "c-3"]    # Sorted by _id
+
+
+def test_types_and_missing_fields(catalog):
+    row = catalog.find("b-2")
+    assert row["owner"] == OID and row["updated_at"] == UPDATED
+    assert row["grain_free"] is True and row["size_kg"] == 11
+    missing = catalog.find("c-3")
+    assert "size_kg" not in missing and missing.get("size_kg", "-") == "-"
+    assert missing["grain_free"] is None
+    with pytest.raises(KeyError):
+        missing["nutrients"]
+    assert catalog.find("a-1")["price"] is None
+
+
+def test_find_unknown_id(catalog):
+    assert catalog.find("zzz") is None
+    assert catalog.find("") is None
+
+
+def test_json_cells_are_decoded_once_per_distinct_value(catalog, monkeypatch):
+    first = catalog.find("a-1")["allergen_terms"]
+    calls = []
+    monkeypatch.setattr("utils.catalog_file.json.loads", lambda text: calls.append(text))
+    again = catalog.find("a-1")["allergen_terms"]
+    shared = catalog.find("b-2")["allergen_terms"]       # Same list, same string id
+    assert again is first and shared is first
+    assert calls == []
+
+
+def test_replacing_the_file_leaves_open_readers_on_their_version(tmp_path):
+    path = str(tmp_path / "catalog.bwcat")
+    write_catalog_file(path, DOCS, "v1")
+    old = MappedCatalog.open(path)
+    write_catalog_file(path, DOCS[:1], "v2")
+    new = MappedCatalog.open(path)
+    assert (old.version, len(old), old.find("a-1")["brand"]) == ("v1", 3, "Acana")
+    assert (new.version, len(new)) == ("v2", 1)
+    assert [name for name in os.listdir(tmp_path)] == ["catalog.bwcat"]     # No temp files left
+
+
+@pytest.mark.parametrize("content", [b"", b"BWCAT", b"NOTACATALOG-FILE-AT-ALL"])
+def test_rejects_files_that_are_not_catalogs(tmp_path, content):
+    path = tmp_path / "bad.bwcat"
+    path.write_bytes(content)
+    with pytest.raises(CatalogFileError):
+        MappedCatalog.open(str(path))
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(CatalogFileError):
+        MappedCatalog.open(str(tmp_path / "absent.bwcat"))
+
+
+def test_catalog_file_path(monkeypatch):
+    monkeypatch.delenv("CATALOG_FILE", raising=False)
+    assert catalog_file_path() is None
+    monkeypatch.setenv("CATALOG_FILE", "data/catalog.bwcat")
+    assert catalog_file_path().endswith(os.path.join("backend", "data", "catalog.bwcat"))
+    monkeypatch.setenv("CATALOG_FILE", "/srv/catalog.bwcat")
+    assert catalog_file_path() == "/srv/catalog.bwcat"
@@ -0,0 +1,60 @@
+"""Email providers (utils/email_delivery.py): factory selection and the local sinks."""
+
+import asyncio
+import json
+import logging
+
+import pytest
+
+from utils.email_delivery import DropSender, FileSink, SmtpSender, create_email_sender
+
+
+@pytest.fixture
+def email_env(monkeypatch):
+    for name in ("RESEND_API_KEY", "EMAIL_PROVIDER", "ENV", "EMAIL_SINK_PATH"):
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+def message(to: str = "a@example.com") -> dict:
+    return {"to": to, "subject": "Sign in", "html": "<a href='/auth/verify/secret'>Sign in</a>", "tag": "magic_link"}
+
+
+def test_unconfigured_provider_drops_mail_outside_production(email_env, tmp_path, caplog):
+    email_env.chdir(tmp_path)
+    sender = create_email_sender()
+    assert isinstance(sender, DropSender)
+    with caplog.at_level(logging.WARNING, logger="petai"):
+        asyncio.run(sender.send_batch([message(), message("b@example.com")]))
+    assert "dropped 2 message(s) (magic_link)" in caplog.text
+    assert list(tmp_path.iterdir()) == []           # Nothing written to disk
+
+
+def test_unconfigured_provider_fails_in_production(email_env):
+    email_env.setenv("ENV", "production")
+    with pytest.raises(RuntimeError, match="RESEND_API_KEY"):
+        create_email_sender()
+
+
+def test_file_sink_only_when_asked_for(email_env, tmp_path):
+    path = tmp_path / "sink.ndjson"
+    email_env.setenv("EMAIL_PROVIDER", "file")
+    email_env.setenv("EMAIL_SINK_PATH", str(path))
+    sender = create_email_sender()
+    assert isinstance(sender, FileSink)
+
+    asyncio.run(sender.send_batch([message(), message("b@example.com")]))
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [m["to"] for m in lines] == ["a@example.com", "b@example.com"]
+    assert all(m["sent_at"] for m in lines)
+    assert len(sender.sent) == 2
+
+
+def test_explicit_providers(email_env):
+    assert isinstance(create_email_sender("none"), DropSender)
+    email_env.setenv("EMAIL_PROVIDER", "smtp")
+    assert isinstance(create_email_sender(), SmtpSender)
+    with pytest.raises(RuntimeError, match="requires RESEND_API_KEY"):
+        create_email_sender("resend")
+    with pytest.raises(RuntimeError, match="Unknown EMAIL_PROVIDER"):
+        create_email_sender("pigeon")
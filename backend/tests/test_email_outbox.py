@@ -0,0 +1,201 @@
+"""Email outbox (utils/email_outbox.py) against an in-memory MongoDB: retries, batches, dead letters."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.email_outbox import EmailOutbox
+from utils.metrics import EMAIL_OUTBOX_MESSAGES
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class FakeSender:
+    """Provider stand-in: records batches; fail_for addresses (or every call while failing) raise."""
+
+    name = "fake"
+    max_batch = 10
+
+    def __init__(self, failing: bool = False, fail_for=()):
+        self.failing = failing
+        self.fail_for = set(fail_for)
+        self.batches = []
+
+    async def send_batch(self, messages):
+        self.batches.append([m["to"] for m in messages])
+        if self.failing or any(m["to"] in self.fail_for for m in messages):
+            raise RuntimeError("provider rejected batch")
+
+
+def message(to: str) -> dict:
+    return {"to": to, "subject": "Your sign-in link", "html": "<p>hi</p>", "tag": "magic_link"}
+
+
+def run(scenario):
+    collection = mongomock_motor.AsyncMongoMockClient()["test"]["email_outbox"]
+    return asyncio.run(scenario(collection))
+
+
+async def docs_by_address(collection) -> dict:
+    return {doc["to"]: doc async for doc in collection.find({})}
+
+
+async def make_due(collection):
+    """Skip the backoff wait: every retrying message becomes due now."""
+    await collection.update_many({"status": "pending"}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+
+
+def test_enqueue_stores_pending_message():
+    async def scenario(collection):
+        outbox = EmailOutbox(collection, FakeSender())
+        await outbox.enqueue({**message("a@example.com"), "user_id": "u1"})
+        return await docs_by_address(collection)
+
+    doc = run(scenario)["a@example.com"]
+    assert doc["status"] == "pending" and doc["attempts"] == 0
+    assert doc["user_id"] == "u1" and doc["tag"] == "magic_link"
+    assert doc["html"] == "<p>hi</p>"
+
+
+def test_due_messages_are_sent_in_one_batch():
+    async def scenario(collection):
+        sender = FakeSender()
+        outbox = EmailOutbox(collection, sender)
+        await outbox.send_batch([message("a@example.com"), message("b@example.com")])
+        claimed = await outbox.deliver_due()
+        return claimed, sender.batches, await docs_by_address(collection)
+
+    claimed, batches, docs = run(scenario)
+    assert claimed == 2
+    assert [sorted(b) for b in batches] == [["a@example.com", "b@example.com"]]
+    for doc in docs.values():
+        assert doc["status"] == "sent" and doc["sent_at"] and doc["purge_at"] > doc["sent_at"]
+        assert "claim_id" not in doc
+        assert "html" not in doc                    # Links are not kept once sent
+
+
+def test_failure_schedules_a_retry_with_backoff():
+    async def scenario(collection):
+        outbox = EmailOutbox(collection, FakeSender(failing=True), base_backoff_seconds=60)
+        await outbox.enqueue(message("a@example.com"))
+        before = datetime.utcnow()
+        await outbox.deliver_due()
+        again = await outbox.deliver_due()          # Not due until the backoff passes
+        return before, again, (await docs_by_address(collection))["a@example.com"]
+
+    before, again, doc = run(scenario)
+    assert again == 0
+    assert doc["status"] == "pending" and doc["attempts"] == 1
+    assert doc["last_error"] == "provider rejected batch"
+    assert doc["html"] == "<p>hi</p>"               # Still needed for the retry
+    # 60s * 2^0 with ±20% jitter
+    assert before + timedelta(seconds=47) <= doc["next_attempt_at"] <= before + timedelta(seconds=73)
+
+
+def test_backoff_doubles_per_attempt_up_to_the_cap():
+    async def scenario(collection):
+        outbox = EmailOutbox(
+            collection, FakeSender(failing=True), max_attempts=10,
+            base_backoff_seconds=10, max_backoff_seconds=30,
+        )
+        await outbox.enqueue(message("a@example.com"))
+        delays = []
+        for _ in range(4):
+            await make_due(collection)
+            start = datetime.utcnow()
+            await outbox.deliver_due()
+            doc = await collection.find_one({})
+            delays.append((doc["next_attempt_at"] - start).total_seconds())
+        return delays
+
+    delays = run(scenario)
+    for delay, expected in zip(delays, [10, 20, 30, 30]):
+        assert expected * 0.8 - 1 <= delay <= expected * 1.2 + 1
+
+
+def test_retry_succeeds_after_transient_failure():
+    async def scenario(collection):
+        sender = FakeSender(failing=True)
+        outbox = EmailOutbox(collection, sender)
+        await outbox.enqueue(message("a@example.com"))
+        await outbox.deliver_due()
+        sender.failing = False
+        await make_due(collection)
+        await outbox.deliver_due()
+        return len(sender.batches), (await docs_by_address(collection))["a@example.com"]
+
+    calls, doc = run(scenario)
+    assert calls == 2
+    assert doc["status"] == "sent" and doc["attempts"] == 1
+
+
+def test_message_is_dead_lettered_after_max_attempts():
+    async def scenario(collection):
+        sender = FakeSender(failing=True)
+        outbox = EmailOutbox(collection, sender, max_attempts=3)
+        await outbox.enqueue(message("a@example.com"))
+        dead_before = EMAIL_OUTBOX_MESSAGES._values.get(("dead_lettered",), 0)
+        for _ in range(5):
+            await make_due(collection)
+            await outbox.deliver_due()
+        dead_after = EMAIL_OUTBOX_MESSAGES._values.get(("dead_lettered",), 0)
+        return len(sender.batches), dead_after - dead_before, (await docs_by_address(collection))["a@example.com"]
+
+    calls, dead_lettered, doc = run(scenario)
+    assert calls == 3                               # Dead messages are never retried
+    assert dead_lettered == 1
+    assert doc["status"] == "dead" and doc["attempts"] == 3
+    assert doc["last_error"] == "provider rejected batch" and doc["purge_at"]
+    assert "html" not in doc and doc["subject"] == "Your sign-in link"
+
+
+def test_failed_message_is_retried_alone():
+    # One bad address must not keep failing the whole batch
+    async def scenario(collection):
+        sender = FakeSender(fail_for={"bad@example.com"})
+        outbox = EmailOutbox(collection, sender)
+        await outbox.send_batch([message("a@example.com"), message("bad@example.com"), message("b@example.com")])
+        await outbox.deliver_due()
+        await make_due(collection)
+        await outbox.deliver_due()
+        return sender.batches, await docs_by_address(collection)
+
+    batches, docs = run(scenario)
+    assert len(batches[0]) == 3
+    assert sorted(map(tuple, batches[1:])) == [("a@example.com",), ("b@example.com",), ("bad@example.com",)]
+    assert docs["a@example.com"]["status"] == docs["b@example.com"]["status"] == "sent"
+    assert docs["bad@example.com"]["status"] == "pending" and docs["bad@example.com"]["attempts"] == 2
+
+
+def test_expired_message_is_dropped_not_sent():
+    async def scenario(collection):
+        sender = FakeSender()
+        outbox = EmailOutbox(collection, sender)
+        await outbox.enqueue(message("late@example.com"), expires_at=datetime.utcnow() - timedelta(seconds=1))
+        claimed = await outbox.deliver_due()
+        return claimed, sender.batches, (await docs_by_address(collection))["late@example.com"]
+
+    claimed, batches, doc = run(scenario)
+    assert claimed == 1 and batches == []
+    assert doc["status"] == "expired" and "html" not in doc
+
+
+def test_abandoned_claim_is_redelivered_after_the_lease():
+    async def scenario(collection):
+        sender = FakeSender()
+        outbox = EmailOutbox(collection, sender, lease_seconds=120)
+        await outbox.enqueue(message("a@example.com"))
+        # A worker claimed the message and died before sending it
+        await collection.update_many({}, {"$set": {
+            "status": "sending", "claim_id": "dead-worker",
+            "next_attempt_at": datetime.utcnow() + timedelta(seconds=120),
+        }})
+        during_lease = await outbox.deliver_due()
+        await collection.update_many({}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+        after_lease = await outbox.deliver_due()
+        return during_lease, after_lease, (await docs_by_address(collection))["a@example.com"]
+
+    during_lease, after_lease, doc = run(scenario)
+    assert during_lease == 0 and after_lease == 1
+    assert doc["status"] == "sent"
@@ -0,0 +1,117 @@
+"""Conditional GET helpers (utils/http_cache.py): ETags, If-None-Match, If-Modified-Since."""
+
+from datetime import datetime, timedelta, timezone
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from utils.http_cache import CACHE_CONTROL, http_date, is_not_modified, make_etag, not_modified, set_validators
+
+LAST_MODIFIED = datetime(2026, 3, 1, 12, 0, 0, 500000)   # Naive UTC, sub-second
+
+
+def request_with(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+# --- make_etag ---
+
+def test_etag_is_quoted_and_deterministic():
+    etag = make_etag("products", 7, "life_stage=adult")
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("products", 7, "life_stage=adult")
+
+
+def test_etag_changes_with_any_input():
+    base = make_etag("products", 7, "life_stage=adult")
+    assert make_etag("products", 8, "life_stage=adult") != base
+    assert make_etag("products", 7, "life_stage=puppy") != base
+
+
+def test_etag_parts_do_not_run_together():
+    assert make_etag("ab", "c") != make_etag("a", "bc")
+
+
+# --- If-None-Match ---
+
+def test_matching_etag_is_not_modified():
+    etag = make_etag("x")
+    assert is_not_modified(request_with(if_none_match=etag), etag)
+
+
+def test_weak_and_listed_etags_match():
+    etag = make_etag("x")
+    assert is_not_modified(request_with(if_none_match=f'"other", W/{etag}'), etag)
+
+
+def test_star_matches_any_etag():
+    assert is_not_modified(request_with(if_none_match="*"), make_etag("x"))
+
+
+def test_different_etag_is_modified():
+    assert not is_not_modified(request_with(if_none_match=make_etag("old")), make_etag("new"))
+
+
+def test_no_conditional_headers_is_modified():
+    assert not is_not_modified(request_with(), make_etag("x"), LAST_MODIFIED)
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    # A stale ETag means modified, even when the date alone says fresh
+    request = request_with(
+        if_none_match=make_etag("old"),
+        if_modified_since=http_date(LAST_MODIFIED + timedelta(days=1)),
+    )
+    assert not is_not_modified(request, make_etag("new"), LAST_MODIFIED)
+
+
+# --- If-Modified-Since ---
+
+def test_same_second_is_not_modified():
+    # HTTP dates have one-second resolution; the sub-second part must not count
+    request = request_with(if_modified_since=http_date(LAST_MODIFIED))
+    assert is_not_modified(request, make_etag("x"), LAST_MODIFIED)
+
+
+def test_newer_resource_is_modified():
+    request = request_with(if_modified_since=http_date(LAST_MODIFIED - timedelta(seconds=1)))
+    assert not is_not_modified(request, make_etag("x"), LAST_MODIFIED)
+
+
+def test_aware_last_modified_is_compared_in_utc():
+    aware = LAST_MODIFIED.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=-5)))
+    request = request_with(if_modified_since=http_date(LAST_MODIFIED))
+    assert is_not_modified(request, make_etag("x"), aware)
+
+
+def test_unparseable_date_is_modified():
+    request = request_with(if_modified_since="yesterday-ish")
+    assert not is_not_modified(request, make_etag("x"), LAST_MODIFIED)
+
+
+def test_if_modified_since_without_last_modified_is_modified():
+    request = request_with(if_modified_since=http_date(LAST_MODIFIED))
+    assert not is_not_modified(request, make_etag("x"))
+
+
+# --- Responses ---
+
+def test_http_date_is_gmt():
+    assert http_date(datetime(2026, 3, 1, 12, 0, 0)) == "Sun, 01 Mar 2026 12:00:00 GMT"
+
+
+def test_set_validators_headers():
+    response = Response()
+    set_validators(response, make_etag("x"), LAST_MODIFIED)
+    assert response.headers["ETag"] == make_etag("x")
+    assert response.headers["Cache-Control"] == CACHE_CONTROL
+    assert response.headers["Last-Modified"] == http_date(LAST_MODIFIED)
+
+
+def test_not_modified_is_bodiless_304_with_validators():
+    response = not_modified(make_etag("x"))
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == make_etag("x")
+    assert "Last-Modified" not in response.headers
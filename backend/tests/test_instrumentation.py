@@ -0,0 +1,100 @@
+"""Per-request DB accounting (utils/instrumentation.py): timings, stages, Server-Timing, the collection proxy."""
+
+import asyncio
+import contextvars
+
+import pytest
+
+from utils.instrumentation import (
+    RequestTimings, current_timings, instrument_collection, log_fields, server_timing_header,
+    start_request, timed_stage,
+)
+
+
+def in_fresh_context(fn):
+    """Run fn in its own context, like one request (the contextvar never leaks between tests)."""
+    return contextvars.copy_context().run(fn)
+
+
+# --- RequestTimings ---
+
+def test_record_db_totals_and_per_collection():
+    timings = RequestTimings()
+    timings.record_db("pets", 1.5)
+    timings.record_db("pets", 0.5)
+    timings.record_db("products", 2.0, ops=3)
+    assert timings.db_ops == 5
+    assert timings.db_ms == pytest.approx(4.0)
+    assert timings.collections == {"pets": {"ops": 2, "ms": 2.0}, "products": {"ops": 3, "ms": 2.0}}
+
+
+def test_server_timing_header_format():
+    timings = RequestTimings()
+    timings.record_db("pets", 4.21)
+    timings.record_stage("scoring", 6.04)
+    assert server_timing_header(timings, 14.94) == 'db;dur=4.2;desc="1 ops", scoring;dur=6.0, total;dur=14.9'
+
+
+def test_log_fields_format():
+    timings = RequestTimings()
+    timings.record_db("pets", 1.1)
+    timings.record_stage("scoring", 6.0)
+    assert log_fields(timings) == "db_ops=1 db_ms=1.1 pets=1/1.1 stage.scoring=6.0"
+
+
+# --- Context ---
+
+def test_no_request_outside_start_request():
+    assert in_fresh_context(current_timings) is None
+
+
+def test_timed_stage_records_inside_a_request():
+    def request():
+        timings = start_request()
+        with timed_stage("scoring"):
+            pass
+        return timings, current_timings()
+
+    timings, current = in_fresh_context(request)
+    assert current is timings
+    assert [name for name, _ in timings.stages] == ["scoring"]
+
+
+def test_timed_stage_is_a_no_op_outside_a_request():
+    def background():
+        with timed_stage("scoring"):
+            return "ran"
+
+    assert in_fresh_context(background) == "ran"
+
+
+def test_timed_stage_records_when_the_block_raises():
+    def request():
+        timings = start_request()
+        with pytest.raises(ValueError):
+            with timed_stage("scoring"):
+                raise ValueError
+        return timings
+
+    assert len(in_fresh_context(request).stages) == 1
+
+
+# --- InstrumentedCollection ---
+
+def test_collection_operations_and_cursors_are_counted():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def request():
+        timings = start_request()
+        pets = instrument_collection(mongomock_motor.AsyncMongoMockClient()["test"]["pets"])
+        await pets.insert_one({"public_id": "a"})
+        await pets.find_one({"public_id": "a"})
+        docs = [doc async for doc in pets.find({}).sort("public_id", 1)]
+        listed = await pets.find({}).limit(5).to_list(None)
+        return timings, docs, listed, pets.name
+
+    timings, docs, listed, name = in_fresh_context(lambda: asyncio.run(request()))
+    assert len(docs) == len(listed) == 1
+    assert name == "pets"                                # Non-operation attributes pass through
+    assert timings.db_ops == 4                           # insert, find_one, two cursors (one op each)
+    assert timings.collections["pets"]["ops"] == 4
@@ -0,0 +1,98 @@
+"""Keyset cursors (utils/pagination.py): round trips, hostile input, range filters."""
+
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from utils.pagination import InvalidCursor, cursor_values, decode_cursor, encode_cursor, keyset_filter
+
+PURCHASE_TYPES = [(datetime, type(None)), (ObjectId,)]
+PRODUCT_TYPES = [(str, type(None)), (str,)]
+
+
+def raw_cursor(text: str) -> str:
+    """A cursor a client could hand-craft: any JSON, base64url without padding."""
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def test_round_trip_keeps_datetime_and_object_id():
+    values = [datetime(2026, 3, 1, 12, 30, 0, 123000), ObjectId()]
+    assert decode_cursor(encode_cursor(values), PURCHASE_TYPES) == values
+
+
+def test_round_trip_allows_null_sort_key():
+    values = [None, "Orijen-Original-Adult"]
+    assert decode_cursor(encode_cursor(values), PRODUCT_TYPES) == values
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor(["orijen", "Orijen-Original-Adult"])
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !!",
+    raw_cursor("not json"),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),                # Not UTF-8
+    raw_cursor('{"a": 1}'),                                  # Not a list
+    raw_cursor('["orijen"]'),                                # Too few keys
+    raw_cursor('["orijen", "x", "y"]'),                      # Too many keys
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, PRODUCT_TYPES)
+
+
+@pytest.mark.parametrize("values", [
+    [{"$ne": None}, "x"],                                    # Operator dict, not a value
+    ["orijen", {"$gt": ""}],
+    [1, "x"],                                                # Wrong type
+    [True, "x"],                                             # bool is not a sort key
+    [["nested"], "x"],
+])
+def test_value_of_wrong_type_is_rejected(values):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor(json.dumps(values)), PRODUCT_TYPES)
+
+
+@pytest.mark.parametrize("text", [
+    '[{"$date": "2026-01-01T00:00:00Z"}, {"$oid": "not-an-object-id"}]',   # InvalidId
+    '[{"$numberDecimal": "abc"}, {"$oid": "000000000000000000000000"}]',    # Bad decimal
+    '[{"$binary": 5}, {"$oid": "000000000000000000000000"}]',               # TypeError
+    '["2026-01-01", {"$oid": "000000000000000000000000"}]',                  # String, not a date
+])
+def test_bad_extended_json_is_rejected(text):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor(text), PURCHASE_TYPES)
+
+
+def test_invalid_cursor_is_a_value_error():
+    # Handlers that already catch ValueError keep answering 400
+    assert issubclass(InvalidCursor, ValueError)
+
+
+def test_cursor_values_follow_sort_order():
+    doc = {"_id": "b", "brand_key": "a", "name": "ignored"}
+    assert cursor_values(doc, [("brand_key", 1), ("_id", 1)]) == ["a", "b"]
+
+
+def test_keyset_filter_single_field():
+    assert keyset_filter([("_id", 1)], ["x"]) == {"_id": {"$gt": "x"}}
+
+
+def test_keyset_filter_ascending():
+    assert keyset_filter([("brand_key", 1), ("_id", 1)], ["orijen", "O-1"]) == {"$or": [
+        {"brand_key": {"$gt": "orijen"}},
+        {"brand_key": "orijen", "_id": {"$gt": "O-1"}},
+    ]}
+
+
+def test_keyset_filter_descending():
+    when, oid = datetime(2026, 1, 1), ObjectId()
+    assert keyset_filter([("purchased_at", -1), ("_id", -1)], [when, oid]) == {"$or": [
+        {"purchased_at": {"$lt": when}},
+        {"purchased_at": when, "_id": {"$lt": oid}},
+    ]}
@@ -0,0 +1,91 @@
+"""Guest pet retention (utils/pet_retention.py): throttled access tracking and batched compaction."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.pet_retention import PetRetention, touch_due, touch_pet
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+NOW = datetime(2026, 6, 1, 12)
+
+
+class Archive:
+    """pets_archive stand-in: mongomock's bulk_write rejects ReplaceOne from current pymongo."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            await self.collection.replace_one(request._filter, request._doc, upsert=request._upsert)
+
+    def find(self, *args):
+        return self.collection.find(*args)
+
+
+def run(scenario):
+    database = mongomock_motor.AsyncMongoMockClient()["test"]
+    return asyncio.run(scenario(database["pets"], Archive(database["pets_archive"])))
+
+
+async def seed(pets):
+    """Unclaimed pets aged 1..5 and 200..204 days, plus an old claimed pet."""
+    await pets.insert_many(
+        [{"_id": f"new-{d}", "user_id": None, "last_accessed_at": NOW - timedelta(days=d)} for d in range(1, 6)]
+        + [{"_id": f"old-{d}", "user_id": None, "last_accessed_at": NOW - timedelta(days=200 + d)} for d in range(5)]
+        + [{"_id": "claimed", "user_id": "u1", "last_accessed_at": NOW - timedelta(days=400)}]
+    )
+
+
+def test_touch_due():
+    assert touch_due({}, NOW)
+    assert not touch_due({"last_accessed_at": NOW - timedelta(hours=1)}, NOW)
+    assert touch_due({"last_accessed_at": NOW - timedelta(hours=12)}, NOW)
+
+
+def test_touch_pet_writes_only_when_due():
+    async def scenario(pets, _):
+        await pets.insert_one({"_id": "p", "last_accessed_at": NOW - timedelta(hours=1)})
+        await touch_pet(pets, await pets.find_one({"_id": "p"}), now=NOW)
+        recent = (await pets.find_one({"_id": "p"}))["last_accessed_at"]
+        await touch_pet(pets, await pets.find_one({"_id": "p"}), now=NOW + timedelta(days=1))
+        return recent, (await pets.find_one({"_id": "p"}))["last_accessed_at"]
+
+    recent, later = run(scenario)
+    assert recent == NOW - timedelta(hours=1)
+    assert later == NOW + timedelta(days=1)
+
+
+def test_compact_deletes_old_unclaimed_pets_in_batches():
+    async def scenario(pets, _):
+        await seed(pets)
+        stats = await PetRetention(pets, max_age_days=90, batch_size=2, pause_seconds=0).compact(NOW)
+        return stats, sorted([doc["_id"] async for doc in pets.find({})])
+
+    stats, remaining = run(scenario)
+    assert stats == {"expired": 5, "archived": 0, "deleted": 5}
+    assert remaining == ["claimed", "new-1", "new-2", "new-3", "new-4", "new-5"]
+
+
+def test_compact_archives_before_deleting():
+    async def scenario(pets, archive):
+        await seed(pets)
+        stats = await PetRetention(pets, archive, max_age_days=90, pause_seconds=0).compact(NOW)
+        return stats, [doc async for doc in archive.find({})], await pets.count_documents({})
+
+    stats, archived, remaining = run(scenario)
+    assert stats == {"expired": 5, "archived": 5, "deleted": 5}
+    assert sorted(doc["_id"] for doc in archived) == [f"old-{d}" for d in range(5)]
+    assert all(doc["archived_at"] and "last_accessed_at" in doc for doc in archived)
+    assert remaining == 6
+
+
+def test_nothing_expired():
+    async def scenario(pets, _):
+        await seed(pets)
+        return await PetRetention(pets, max_age_days=1000).compact(NOW)
+
+    assert run(scenario) == {"expired": 0, "archived": 0, "deleted": 0}
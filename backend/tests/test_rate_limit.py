@@ -0,0 +1,173 @@
+"""Rate limiting (utils/rate_limit.py): token buckets, sliding-window retry math, the limiter."""
+
+import asyncio
+
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import (
+    RateLimiter, RateLimitExceeded, TokenBucketBackend, _sliding_retry_after, parse_rate,
+)
+
+
+class FakeClock:
+    """Stands in for the time module inside utils.rate_limit."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", fake)
+    return fake
+
+
+def hit(backend, key="k", limit=5, period=60):
+    return asyncio.run(backend.hit(key, limit, period))
+
+
+# --- parse_rate ---
+
+@pytest.mark.parametrize("rate, expected", [
+    ("5/minute", (5, 60)),
+    ("20 per minute", (20, 60)),
+    ("3/seconds", (3, 1)),
+    ("100/day", (100, 86400)),
+])
+def test_parse_rate(rate, expected):
+    assert parse_rate(rate) == expected
+
+
+def test_parse_rate_rejects_unknown_period():
+    with pytest.raises(ValueError):
+        parse_rate("5/fortnight")
+
+
+# --- TokenBucketBackend ---
+
+def test_bucket_allows_a_burst_of_limit(clock):
+    backend = TokenBucketBackend()
+    assert [hit(backend)[0] for _ in range(5)] == [True] * 5
+    allowed, retry_after = hit(backend)
+    assert not allowed
+    assert retry_after == pytest.approx(12.0)   # 5/minute refills one token every 12s
+
+
+def test_bucket_refills_continuously(clock):
+    backend = TokenBucketBackend()
+    for _ in range(5):
+        hit(backend)
+    clock.now += 6
+    allowed, retry_after = hit(backend)
+    assert not allowed and retry_after == pytest.approx(6.0)
+    clock.now += 6
+    assert hit(backend) == (True, 0.0)
+
+
+def test_bucket_never_exceeds_capacity(clock):
+    backend = TokenBucketBackend()
+    hit(backend)
+    clock.now += 3600       # Idle for an hour: full again, but not above limit
+    assert [hit(backend)[0] for _ in range(6)] == [True] * 5 + [False]
+
+
+def test_rejected_hits_do_not_extend_the_wait(clock):
+    backend = TokenBucketBackend()
+    for _ in range(5):
+        hit(backend)
+    for _ in range(10):
+        hit(backend)
+    clock.now += 12
+    assert hit(backend)[0]
+
+
+def test_keys_have_separate_buckets(clock):
+    backend = TokenBucketBackend()
+    for _ in range(5):
+        hit(backend, key="a")
+    assert not hit(backend, key="a")[0]
+    assert hit(backend, key="b")[0]
+
+
+def test_prune_drops_only_full_buckets(clock):
+    backend = TokenBucketBackend(max_keys=2)
+    hit(backend, key="old")
+    clock.now += 61
+    hit(backend, key="recent")
+    hit(backend, key="new")          # Over max_keys: "old" has refilled and is dropped
+    assert set(backend._buckets) == {"recent", "new"}
+
+
+# --- _sliding_retry_after ---
+
+def test_retry_after_full_current_window_waits_for_next_window():
+    # 5 requests already in this window (limit 5), 40% through a 60s window
+    assert _sliding_retry_after(0, 5, 5, 0.4, 60) == pytest.approx(36.0)
+
+
+def test_retry_after_without_previous_window_is_zero():
+    assert _sliding_retry_after(0, 2, 5, 0.5, 60) == 0.0
+
+
+def test_retry_after_waits_for_previous_window_to_decay():
+    # previous 10 weighted by (1 - elapsed); current 2 → one more fits once
+    # 10 * weight + 3 <= 5, i.e. weight <= 0.2, i.e. elapsed >= 0.8
+    assert _sliding_retry_after(10, 2, 5, 0.5, 60) == pytest.approx(18.0)
+
+
+def test_retry_after_never_negative():
+    assert _sliding_retry_after(10, 2, 5, 0.9, 60) == 0.0
+
+
+@pytest.mark.parametrize("previous, current, elapsed", [(10, 2, 0.5), (4, 3, 0.1), (7, 0, 0.25)])
+def test_retry_after_is_when_the_estimate_fits(previous, current, elapsed):
+    limit, period = 5, 60
+    wait = _sliding_retry_after(previous, current, limit, elapsed, period)
+    later = elapsed + wait / period
+    assert previous * (1 - later) + current + 1 <= limit + 1e-9
+    if wait > 0:
+        earlier = later - 1 / period
+        assert previous * (1 - earlier) + current + 1 > limit
+
+
+# --- RateLimiter ---
+
+def test_limiter_raises_with_retry_after(clock):
+    limiter = RateLimiter(TokenBucketBackend())
+    for _ in range(2):
+        asyncio.run(limiter.check("create_pet:1.2.3.4", 2, 60, "2/minute"))
+    with pytest.raises(RateLimitExceeded) as exc:
+        asyncio.run(limiter.check("create_pet:1.2.3.4", 2, 60, "2/minute"))
+    assert exc.value.detail == "2 per 1 minute"
+    assert exc.value.retry_after == pytest.approx(30.0)
+
+
+def test_limiter_fails_open_when_backend_errors():
+    class Broken:
+        name = "broken"
+
+        async def hit(self, key, limit, period):
+            raise ConnectionError("store down")
+
+    asyncio.run(RateLimiter(Broken()).check("k", 1, 60))   # No exception
+
+
+def test_disabled_limiter_never_checks():
+    class Refuses:
+        name = "refuses"
+
+        async def hit(self, key, limit, period):
+            return False, 1.0
+
+    asyncio.run(RateLimiter(Refuses(), enabled=False).check("k", 1, 60))
@@ -0,0 +1,152 @@
+"""Reorder reminders (utils/reminders.py): due-soon sweep, idempotent claims, opt-in, retries."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from utils.reminders import REMINDER_FIELDS, ReminderScheduler, build_reminder_email
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+NOW = datetime(2026, 3, 10, 12)
+
+
+class FakeSender:
+    max_batch = 2
+
+    def __init__(self, failing: bool = False):
+        self.failing = failing
+        self.sent = []
+
+    async def send_batch(self, messages):
+        if self.failing:
+            raise RuntimeError("outbox unavailable")
+        self.sent.extend(messages)
+
+
+class Store:
+    """A database with one opted-in and one opted-out owner, and a scheduler over it."""
+
+    def __init__(self, sender=None, **options):
+        database = mongomock_motor.AsyncMongoMockClient()["test"]
+        self.purchases, self.users, self.pets = database["purchases"], database["users"], database["pets"]
+        self.sender = sender or FakeSender()
+        self.scheduler = ReminderScheduler(
+            self.purchases, self.users, self.pets, self.sender, base_url="https://bowlwise.test", **options,
+        )
+        self.opted_in, self.opted_out = str(ObjectId()), str(ObjectId())
+
+    async def seed(self):
+        await self.users.insert_many([
+            {"_id": ObjectId(self.opted_in), "email": "in@example.com", "preferences": {"email_reminders": True}},
+            {"_id": ObjectId(self.opted_out), "email": "out@example.com", "preferences": {"email_reminders": False}},
+        ])
+        await self.pets.insert_one({"public_id": "pet-1", "name": "Biscuit"})
+
+    async def purchase(self, days_left: float, user_id=None, **fields) -> ObjectId:
+        result = await self.purchases.insert_one({
+            "user_id": user_id or self.opted_in, "pet_id": "pet-1", "status": "active",
+            "estimated_depletion_at": NOW + timedelta(days=days_left),
+            "product_snapshot": {"brand": "Orijen", "line": "Original"}, **fields,
+        })
+        return result.inserted_id
+
+    async def state(self, purchase_id) -> dict:
+        return await self.purchases.find_one({"_id": purchase_id})
+
+
+def run(scenario, **options):
+    async def main():
+        store = Store(**options)
+        await store.seed()
+        return await scenario(store)
+    return asyncio.run(main())
+
+
+def test_reminds_purchases_in_the_window_once():
+    async def scenario(store):
+        due = await store.purchase(2)
+        overdue = await store.purchase(-1)                 # Within grace_days
+        await store.purchase(10)                           # Too early
+        await store.purchase(-5)                           # Too late
+        await store.purchase(1, status="finished")
+        first = await store.scheduler.sweep(NOW)
+        second = await store.scheduler.sweep(NOW)
+        return first, second, [m["to"] for m in store.sender.sent], await store.state(due), await store.state(overdue)
+
+    first, second, recipients, due, overdue = run(scenario)
+    assert first == {"scanned": 2, "claimed": 2, "sent": 2, "skipped": 0, "failed": 0}
+    assert recipients == ["in@example.com", "in@example.com"]
+    assert due["reminder_state"] == overdue["reminder_state"] == "sent"
+    # Handled reminders are outside the scanned range, not filtered after reading
+    assert second["scanned"] == 0
+
+
+def test_opted_out_owner_is_skipped_then_released():
+    async def scenario(store):
+        purchase_id = await store.purchase(2, user_id=store.opted_out)
+        skipped = await store.scheduler.sweep(NOW)
+        await store.users.update_one({"_id": ObjectId(store.opted_out)}, {"$set": {"preferences.email_reminders": True}})
+        released = await store.scheduler.release_skipped(store.opted_out)
+        reminded = await store.scheduler.sweep(NOW)
+        return skipped, released, reminded, await store.state(purchase_id)
+
+    skipped, released, reminded, purchase = run(scenario)
+    assert skipped["skipped"] == 1 and skipped["sent"] == 0
+    assert released == 1
+    assert reminded["sent"] == 1
+    assert purchase["reminder_state"] == "sent"
+
+
+def test_live_claims_are_left_alone_and_stale_claims_taken_over():
+    async def scenario(store):
+        live = await store.purchase(2, reminder_state="claimed", reminder_claim_id="other",
+                                    reminder_claimed_at=NOW - timedelta(seconds=30))
+        stale = await store.purchase(2, reminder_state="claimed", reminder_claim_id="dead",
+                                     reminder_claimed_at=NOW - timedelta(hours=1))
+        stats = await store.scheduler.sweep(NOW)
+        return stats, await store.state(live), await store.state(stale)
+
+    stats, live, stale = run(scenario)
+    assert stats["claimed"] == stats["sent"] == 1
+    assert live["reminder_claim_id"] == "other" and live["reminder_state"] == "claimed"
+    assert stale["reminder_state"] == "sent"
+
+
+def test_failed_send_releases_the_claim_for_the_next_sweep():
+    async def scenario(store):
+        purchase_id = await store.purchase(2)
+        failed = await store.scheduler.sweep(NOW)
+        released = await store.state(purchase_id)
+        store.sender.failing = False
+        retried = await store.scheduler.sweep(NOW)
+        return failed, released, retried
+
+    failed, released, retried = run(scenario, sender=FakeSender(failing=True))
+    assert failed["failed"] == 1 and failed["sent"] == 0
+    assert not any(field in released for field in REMINDER_FIELDS)
+    assert retried["sent"] == 1
+
+
+def test_pages_through_more_than_one_batch():
+    async def scenario(store):
+        for day in range(7):
+            await store.purchase(day * 0.25)
+        return await store.scheduler.sweep(NOW)
+
+    stats = run(scenario, batch_size=3)
+    assert stats["scanned"] == stats["sent"] == 7
+
+
+def test_reminder_email_content():
+    purchase = {
+        "estimated_depletion_at": NOW + timedelta(days=3, hours=1),
+        "product_snapshot": {"brand": "Orijen", "line": "<Original>", "source_url": "https://shop.test/o"},
+    }
+    message = build_reminder_email("a@example.com", "Biscuit", purchase, "https://bowlwise.test", NOW)
+    assert message["subject"] == "Biscuit's food runs out in about 3 days"
+    assert "&lt;Original&gt;" in message["html"] and "<Original>" not in message["html"]
+    assert "https://shop.test/o" in message["html"]
+    assert message["tag"] == "reorder_reminder"
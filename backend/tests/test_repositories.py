@@ -0,0 +1,165 @@
+"""Storage repositories (utils/repositories.py): the memory backend behaves like the Mongo one."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from utils.repositories import LEGACY_USER_FIELDS, create_repositories
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+T0 = datetime(2026, 1, 1, 12)
+BACKENDS = ["memory", "mongo"]
+
+
+def run(backend: str, scenario):
+    async def main():
+        database = mongomock_motor.AsyncMongoMockClient()["test"]
+        await database["pets"].create_index("public_id", unique=True)
+        await database["users"].create_index("email", unique=True)
+        names = ["pets", "products", "users", "purchases", "spending_rollups"]
+        repositories = create_repositories({name: database[name] for name in names}, backend)
+        return await scenario(repositories, database)
+    return asyncio.run(main())
+
+
+def product(_id: str, brand_key: str, **fields) -> dict:
+    return {"_id": _id, "brand_key": brand_key, "life_stage": "adult", "grain_free": False, **fields}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_pets_crud_and_unique_public_id(backend):
+    async def scenario(repositories, _):
+        pets = repositories.pets
+        created = await pets.create({"public_id": "p1", "name": "Biscuit", "user_id": "u1", "session_token": "s1"})
+        with pytest.raises(DuplicateKeyError):
+            await pets.create({"public_id": "p1", "name": "Copy"})
+        updated = await pets.update("p1", {"name": "Biscuit II"})
+        by_token = await pets.get_by_session_token("s1")
+        listed = await pets.list_for_user("u1")
+        deleted, again = await pets.delete("p1"), await pets.delete("p1")
+        return created, updated, by_token, listed, deleted, again, await pets.get("p1")
+
+    created, updated, by_token, listed, deleted, again, gone = run(backend, scenario)
+    assert isinstance(created["_id"], ObjectId) and created["name"] == "Biscuit"
+    assert updated["name"] == by_token["name"] == "Biscuit II"
+    assert [pet["public_id"] for pet in listed] == ["p1"]
+    assert (deleted, again, gone) == (True, False, None)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_product_pages_follow_brand_order_filters_and_cursor(backend):
+    async def scenario(repositories, _):
+        products = repositories.products
+        await products.create_many([
+            product("o-2", "orijen"), product("a-1", "acana"), product("o-1", "orijen"),
+            product("o-3", "orijen", life_stage="puppy"), product("og-1", "ogo"), product("x-1", "xtra"),
+        ])
+        first = await products.page_keys({}, None, 2)
+        second = await products.page_keys({}, [first[-1]["brand_key"], first[-1]["_id"]], 2)
+        prefix = await products.page_keys({"brand_prefix": "ori", "life_stage": "adult"}, None, 10)
+        with pytest.raises(BulkWriteError):
+            await products.create_many([product("x-2", "xtra"), product("a-1", "acana")])
+        return first, second, prefix, await products.count(), await products.get_many(["x-1", "nope", "a-1"])
+
+    first, second, prefix, count, many = run(backend, scenario)
+    assert [p["_id"] for p in first] == ["a-1", "og-1"]
+    assert [p["_id"] for p in second] == ["o-1", "o-2"]
+    assert [p["_id"] for p in prefix] == ["o-1", "o-2"]
+    assert count == 7                      # x-2 went in before the duplicate stopped the insert
+    assert sorted(p["_id"] for p in many) == ["a-1", "x-1"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_users_login_preferences_and_tombstone(backend):
+    async def scenario(repositories, _):
+        users = repositories.users
+        user = await users.find_or_create("a@example.com", {"name": "A", "magic_link_token": "old"})
+        same = await users.find_or_create("a@example.com", {"name": "ignored"})
+        user_id = str(user["_id"])
+        logged_in = await users.record_login(user_id, T0)
+        preferences = await users.set_preferences(user_id, {"email_reminders": True}, T0)
+        await users.tombstone(user_id, T0)
+        return user, same, logged_in, preferences, await users.record_login(user_id, T0), await users.get(user_id)
+
+    user, same, logged_in, preferences, after_tombstone, tombstoned = run(backend, scenario)
+    assert same["_id"] == user["_id"] and same["name"] == "A"
+    assert logged_in["email_verified"] is True and not any(f in logged_in for f in LEGACY_USER_FIELDS)
+    assert preferences["preferences"] == {"email_reminders": True}
+    assert after_tombstone is None
+    assert tombstoned["email"] == f"deleted:{user['_id']}" and "preferences" not in tombstoned
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_purchase_history_order_cursor_and_close(backend):
+    async def scenario(repositories, _):
+        purchases = repositories.purchases
+        ids = []
+        for day in range(5):
+            doc = await purchases.create({"user_id": "u1", "pet_id": "p1", "status": "finished",
+                                          "purchased_at": T0 + timedelta(days=day)})
+            ids.append(doc["_id"])
+        await purchases.create({"user_id": "u1", "pet_id": "p1", "status": "active", "purchased_at": T0 + timedelta(days=9)})
+        await purchases.create({"user_id": "u1", "pet_id": "other", "status": "active", "purchased_at": T0})
+
+        first = await purchases.history("u1", "p1", limit=3)
+        rest = await purchases.history("u1", "p1", before=[first[-1]["purchased_at"], first[-1]["_id"]], limit=10)
+        active = await purchases.history("u1", "p1", status="active")
+        closed = await purchases.close_active("u1", "p1", "replaced", T0)
+        await purchases.update(str(ids[0]), {"purchased_at": T0 + timedelta(days=20)})
+        dates = await purchases.purchase_dates("u1", "p1", T0, T0 + timedelta(days=10))
+        newest = await purchases.history("u1", "p1", limit=1)
+        return first, rest, active, closed, dates, newest, ids
+
+    first, rest, active, closed, dates, newest, ids = run(backend, scenario)
+    assert [p["purchased_at"].day for p in first] == [10, 5, 4]
+    assert [p["purchased_at"].day for p in rest] == [3, 2, 1]
+    assert [p["status"] for p in active] == ["active"]
+    assert closed == 1
+    assert dates == [T0 + timedelta(days=d) for d in (1, 2, 3, 4, 9)]
+    assert newest[0]["_id"] == ids[0]      # Moved to the top of the history after its update
+
+
+def test_memory_backend_copies_documents_and_rounds_datetimes():
+    async def scenario(repositories, _):
+        pet = await repositories.pets.create({"public_id": "p1", "tags": ["a"],
+                                              "created_at": datetime(2026, 1, 1, 0, 0, 0, 123456)})
+        pet["tags"].append("mutated")
+        return await repositories.pets.get("p1")
+
+    stored = run("memory", scenario)
+    assert stored["tags"] == ["a"]
+    assert stored["created_at"].microsecond == 123000          # BSON keeps milliseconds
+
+
+def test_memory_dashboard_combines_pets_purchases_and_database_rollups():
+    async def scenario(repositories, database):
+        await repositories.pets.create({"public_id": "p1", "user_id": "u1"})
+        await repositories.pets.create({"public_id": "p2", "user_id": "u1"})
+        for day, status in [(0, "finished"), (1, "finished"), (2, "active")]:
+            await repositories.purchases.create({"user_id": "u1", "pet_id": "p1", "status": status,
+                                                 "purchased_at": T0 + timedelta(days=day)})
+        # Rollups stay in the database even with the memory backend
+        await database["spending_rollups"].insert_many([
+            {"user_id": "u1", "pet_id": "p1", "month": "2026-01", "total_cost": 80, "bags": 2, "kg": 20,
+             "first_purchased_at": T0, "last_purchased_at": T0 + timedelta(days=1)},
+            {"user_id": "u1", "pet_id": "p1", "month": "2026-02", "total_cost": 45.5, "bags": 1, "kg": 11,
+             "first_purchased_at": T0 + timedelta(days=40), "last_purchased_at": T0 + timedelta(days=40)},
+        ])
+        return {pet["public_id"]: pet for pet in await repositories.pets.dashboard("u1", history_limit=1)}
+
+    dashboard = run("memory", scenario)
+    p1, p2 = dashboard["p1"], dashboard["p2"]
+    assert p1["active"]["status"] == "active"
+    assert len(p1["history"]) == 2                              # history_limit + 1 (has-more probe)
+    assert p1["totals"]["total_cost"] == 125.5 and p1["totals"]["bags"] == 3
+    assert p1["totals"]["first_purchased_at"] == T0
+    assert p2["active"] is None and p2["history"] == [] and p2["totals"] is None
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="STORAGE_BACKEND"):
+        create_repositories({}, "sqlite")
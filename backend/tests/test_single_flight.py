@@ -0,0 +1,121 @@
+"""Request coalescing (utils/single_flight.py): sharing, forgetting, errors, cancellation."""
+
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+class Work:
+    """Counts runs; each run blocks until release() so callers overlap."""
+
+    def __init__(self, result="body", error=None):
+        self.runs = 0
+        self.result = result
+        self.error = error
+        self.gate = asyncio.Event()
+
+    async def __call__(self, *args):
+        self.runs += 1
+        await self.gate.wait()
+        if self.error:
+            raise self.error
+        return (self.result, args)
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        group, work = SingleFlight("test"), Work()
+        callers = [asyncio.ensure_future(group.do("key", work, "profile")) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert group.in_flight() == {"key": 5}
+        work.gate.set()
+        results = await asyncio.gather(*callers)
+        return work.runs, results, group.in_flight()
+
+    runs, results, in_flight = asyncio.run(scenario())
+    assert runs == 1
+    assert results == [("body", ("profile",))] * 5
+    assert in_flight == {}
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        group, work = SingleFlight("test"), Work()
+        work.gate.set()
+        await asyncio.gather(group.do("a", work), group.do("b", work))
+        return work.runs
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_key_is_forgotten_once_done():
+    # Coalescing only, no caching: a later call runs the work again
+    async def scenario():
+        group, work = SingleFlight("test"), Work()
+        work.gate.set()
+        await group.do("key", work)
+        await group.do("key", work)
+        return work.runs
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_error_reaches_every_waiter_and_is_recorded():
+    async def scenario():
+        group, work = SingleFlight("test"), Work(error=RuntimeError("catalog down"))
+        callers = [asyncio.ensure_future(group.do("key", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        work.gate.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        return work.runs, results, group.errors()
+
+    runs, results, errors = asyncio.run(scenario())
+    assert runs == 1
+    assert all(isinstance(r, RuntimeError) and str(r) == "catalog down" for r in results)
+    assert errors == {"key": 1}
+
+
+def test_key_runs_again_after_an_error():
+    async def scenario():
+        group, work = SingleFlight("test"), Work(error=ValueError("bad"))
+        work.gate.set()
+        with pytest.raises(ValueError):
+            await group.do("key", work)
+        work.error = None
+        return await group.do("key", work), group.errors()
+
+    result, errors = asyncio.run(scenario())
+    assert result == ("body", ())
+    assert errors == {"key": 1}     # Failures are history, not a circuit breaker
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    async def scenario():
+        group, work = SingleFlight("test"), Work()
+        leader = asyncio.ensure_future(group.do("key", work))
+        follower = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()                 # e.g. client disconnected
+        await asyncio.sleep(0)
+        work.gate.set()
+        return await follower, leader.cancelled(), work.runs
+
+    result, leader_cancelled, runs = asyncio.run(scenario())
+    assert result == ("body", ())
+    assert leader_cancelled and runs == 1
+
+
+def test_failed_keys_are_bounded(monkeypatch):
+    monkeypatch.setattr("utils.single_flight.MAX_ERROR_KEYS", 3)
+
+    async def scenario():
+        group, work = SingleFlight("test"), Work(error=KeyError("missing"))
+        work.gate.set()
+        for key in range(5):
+            with pytest.raises(KeyError):
+                await group.do(key, work)
+        return group.errors()
+
+    assert asyncio.run(scenario()) == {2: 1, 3: 1, 4: 1}   # Oldest keys dropped first
@@ -0,0 +1,138 @@
+"""Monthly spending rollups (utils/spending_rollups.py): incremental upkeep matches a full rebuild."""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from utils.spending_rollups import (
+    ROLLUP_PIPELINE, apply_kg_delta, apply_purchase, month_bounds, month_key, recent_month_keys,
+    remove_purchase,
+)
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class PurchaseDates:
+    """The one PurchaseRepository method remove_purchase needs, over a Motor collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def purchase_dates(self, user_id, pet_id, start, end):
+        cursor = self.collection.find(
+            {"user_id": user_id, "pet_id": pet_id, "purchased_at": {"$gte": start, "$lt": end}},
+        ).sort("purchased_at", 1)
+        return [doc["purchased_at"] async for doc in cursor]
+
+
+def purchase(day: int, cost=50.0, kg=10.0, month=3, pet_id="pet-1") -> dict:
+    return {"user_id": "u1", "pet_id": pet_id, "purchased_at": datetime(2026, month, day, 9), "cost": cost, "bag_size_kg": kg}
+
+
+def run(scenario):
+    database = mongomock_motor.AsyncMongoMockClient()["test"]
+    return asyncio.run(scenario(database["spending_rollups"], database["purchases"]))
+
+
+async def log(rollups, purchases, doc):
+    """What create_purchase does: store the purchase, then bump its bucket."""
+    await purchases.insert_one(doc)
+    await apply_purchase(rollups, doc)
+    return doc
+
+
+async def rollups_by_month(rollups) -> dict:
+    return {doc["month"]: doc async for doc in rollups.find({}, {"_id": 0, "updated_at": 0})}
+
+
+# --- Helpers ---
+
+def test_month_key_and_bounds():
+    assert month_key(datetime(2026, 3, 31, 23, 59)) == "2026-03"
+    assert month_bounds("2026-03") == (datetime(2026, 3, 1), datetime(2026, 4, 1))
+    assert month_bounds("2026-12") == (datetime(2026, 12, 1), datetime(2027, 1, 1))
+
+
+def test_recent_month_keys_cross_the_year():
+    assert recent_month_keys(3, now=datetime(2026, 2, 15)) == ["2025-12", "2026-01", "2026-02"]
+
+
+# --- Incremental upkeep ---
+
+def test_purchases_in_one_month_share_a_bucket():
+    async def scenario(rollups, purchases):
+        await log(rollups, purchases, purchase(10, cost=40.0, kg=5.0))
+        await log(rollups, purchases, purchase(2, cost=60.0, kg=10.0))
+        await log(rollups, purchases, purchase(5, month=4))
+        return await rollups_by_month(rollups)
+
+    months = run(scenario)
+    assert set(months) == {"2026-03", "2026-04"}
+    march = months["2026-03"]
+    assert (march["total_cost"], march["bags"], march["kg"]) == (100.0, 2, 15.0)
+    assert march["first_purchased_at"] == datetime(2026, 3, 2, 9)
+    assert march["last_purchased_at"] == datetime(2026, 3, 10, 9)
+
+
+def test_missing_cost_and_size_count_as_zero():
+    async def scenario(rollups, purchases):
+        await log(rollups, purchases, purchase(1, cost=None, kg=None))
+        return (await rollups_by_month(rollups))["2026-03"]
+
+    bucket = run(scenario)
+    assert (bucket["total_cost"], bucket["bags"], bucket["kg"]) == (0, 1, 0)
+
+
+def test_kg_delta_adjusts_the_bucket():
+    async def scenario(rollups, purchases):
+        doc = await log(rollups, purchases, purchase(1, kg=10.0))
+        await apply_kg_delta(rollups, doc, 2.5)
+        await apply_kg_delta(rollups, doc, 0)          # No-op
+        return (await rollups_by_month(rollups))["2026-03"]["kg"]
+
+    assert run(scenario) == 12.5
+
+
+def test_removing_a_purchase_rereads_first_and_last_dates():
+    async def scenario(rollups, purchases):
+        first = await log(rollups, purchases, purchase(2, cost=10.0))
+        await log(rollups, purchases, purchase(15, cost=20.0))
+        await log(rollups, purchases, purchase(28, cost=30.0))
+        await purchases.delete_one({"_id": first["_id"]})
+        await remove_purchase(rollups, PurchaseDates(purchases), first)
+        return (await rollups_by_month(rollups))["2026-03"]
+
+    bucket = run(scenario)
+    assert (bucket["total_cost"], bucket["bags"]) == (50.0, 2)
+    assert bucket["first_purchased_at"] == datetime(2026, 3, 15, 9)
+    assert bucket["last_purchased_at"] == datetime(2026, 3, 28, 9)
+
+
+def test_removing_the_last_purchase_drops_the_bucket():
+    async def scenario(rollups, purchases):
+        doc = await log(rollups, purchases, purchase(2))
+        await purchases.delete_one({"_id": doc["_id"]})
+        await remove_purchase(rollups, PurchaseDates(purchases), doc)
+        await remove_purchase(rollups, PurchaseDates(purchases), doc)   # Already gone: no-op
+        return await rollups_by_month(rollups)
+
+    assert run(scenario) == {}
+
+
+def test_incremental_rollups_match_a_full_rebuild():
+    async def scenario(rollups, purchases):
+        docs = [
+            await log(rollups, purchases, purchase(day, cost=10.0 * day, kg=day, month=month, pet_id=pet))
+            for month in (1, 2) for day in (3, 9, 20) for pet in ("pet-1", "pet-2")
+        ]
+        for doc in docs[::4]:
+            await purchases.delete_one({"_id": doc["_id"]})
+            await remove_purchase(rollups, PurchaseDates(purchases), doc)
+        incremental = [doc async for doc in rollups.find({}, {"_id": 0, "updated_at": 0})]
+        rebuilt = await purchases.aggregate(ROLLUP_PIPELINE).to_list(None)
+        return incremental, rebuilt
+
+    incremental, rebuilt = run(scenario)
+    key = lambda doc: (doc["pet_id"], doc["month"])                    # noqa: E731
+    assert sorted(incremental, key=key) == sorted(rebuilt, key=key)
@@ -0,0 +1,159 @@
+"""Startup (utils/startup.py): recorded migrations, concurrent-boot claims, readiness."""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.startup import MIGRATIONS_COLLECTION, Migration, Readiness, run_migrations, wait_for_migrations
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class Recorder:
+    """Migrations that record each apply; fail_times makes the first attempts raise."""
+
+    def __init__(self):
+        self.applied = []
+
+    def migration(self, id: str, fail_times: int = 0) -> Migration:
+        failures = [fail_times]
+
+        async def apply(database):
+            if failures[0]:
+                failures[0] -= 1
+                raise RuntimeError(f"{id} failed")
+            self.applied.append(id)
+            return id.upper()
+
+        return Migration(id, f"test {id}", apply)
+
+
+def run(scenario):
+    database = mongomock_motor.AsyncMongoMockClient()["test"]
+    return asyncio.run(scenario(database, database[MIGRATIONS_COLLECTION]))
+
+
+def test_migrations_apply_once_and_are_recorded():
+    async def scenario(database, records):
+        recorder = Recorder()
+        migrations = [recorder.migration("0001"), recorder.migration("0002")]
+        first = await run_migrations(database, migrations)
+        second = await run_migrations(database, migrations)
+        return recorder.applied, first, second, await records.find_one({"_id": "0001"})
+
+    applied, first, second, record = run(scenario)
+    assert sorted(applied) == ["0001", "0002"]
+    assert sorted(first["applied"]) == ["0001", "0002"] and first["running_elsewhere"] == []
+    assert second == {"applied": [], "skipped": 2, "running_elsewhere": []}
+    assert record["status"] == "applied" and record["result"] == "0001" and record["applied_at"]
+
+
+def test_failed_migration_releases_its_claim_for_the_next_boot():
+    async def scenario(database, records):
+        recorder = Recorder()
+        migrations = [recorder.migration("ok"), recorder.migration("flaky", fail_times=1)]
+        with pytest.raises(RuntimeError, match="flaky failed"):
+            await run_migrations(database, migrations)
+        after_failure = await records.find_one({"_id": "flaky"})
+        retried = await run_migrations(database, migrations)
+        return after_failure, retried
+
+    after_failure, retried = run(scenario)
+    assert after_failure is None
+    assert retried["applied"] == ["flaky"] and retried["skipped"] == 1
+
+
+def test_migration_claimed_by_another_instance_is_not_applied_twice():
+    async def scenario(database, records):
+        recorder = Recorder()
+        await records.insert_one({"_id": "0001", "status": "running", "started_at": datetime.utcnow()})
+        result = await run_migrations(database, [recorder.migration("0001")])
+        return result, recorder.applied
+
+    result, applied = run(scenario)
+    assert result == {"applied": [], "skipped": 0, "running_elsewhere": ["0001"]}
+    assert applied == []
+
+
+def test_wait_for_migrations_returns_once_applied_elsewhere():
+    async def scenario(database, records):
+        recorder = Recorder()
+        await records.insert_one({"_id": "0001", "status": "running", "started_at": datetime.utcnow()})
+
+        async def other_instance():
+            await asyncio.sleep(0.02)
+            await records.update_one({"_id": "0001"}, {"$set": {"status": "applied"}})
+
+        await asyncio.gather(
+            other_instance(),
+            wait_for_migrations(database, ["0001"], [recorder.migration("0001")], poll_seconds=0.01),
+        )
+        return recorder.applied
+
+    assert run(scenario) == []
+
+
+def test_wait_for_migrations_takes_over_stale_and_released_claims():
+    async def scenario(database, records):
+        recorder = Recorder()
+        # A crashed instance left one claim running; another failed and released its claim
+        await records.insert_one({"_id": "stale", "status": "running",
+                                  "started_at": datetime.utcnow() - timedelta(hours=1)})
+        migrations = [recorder.migration("stale"), recorder.migration("released")]
+        await asyncio.wait_for(
+            wait_for_migrations(database, ["stale", "released"], migrations,
+                                stale_after=timedelta(minutes=10), poll_seconds=0.01),
+            timeout=5,
+        )
+        statuses = {doc["_id"]: doc["status"] async for doc in records.find({})}
+        return sorted(recorder.applied), statuses
+
+    applied, statuses = run(scenario)
+    assert applied == ["released", "stale"]
+    assert statuses == {"stale": "applied", "released": "applied"}
+
+
+def test_readiness_steps():
+    readiness = Readiness()
+    assert not readiness.ready                      # Nothing registered yet
+    readiness.start()
+    readiness.mark("migrations")
+    assert not readiness.ready and readiness.status() == {"migrations": None}
+    readiness.done("migrations")
+    assert readiness.ready and readiness.status()["migrations"] >= 0
+    readiness.reset()
+    assert not readiness.ready and readiness.status() == {}
+
+
+def test_readiness_times_steps_from_start_not_construction():
+    readiness = Readiness()
+    time.sleep(0.05)                                # Slow imports / module setup
+    readiness.start()
+    readiness.mark("migrations")
+    readiness.done("migrations")
+    assert readiness.status()["migrations"] < 50
+
+
+def test_warm_up_retries_until_it_succeeds():
+    async def scenario():
+        readiness = Readiness()
+        readiness.start()
+        attempts = []
+
+        async def load():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RuntimeError("catalog unavailable")
+
+        readiness.warm_up("catalog", load, max_backoff_seconds=0)
+        pending = readiness.ready
+        for _ in range(20):
+            await asyncio.sleep(0)
+        await readiness.stop()
+        return pending, readiness.ready, len(attempts)
+
+    pending, ready, attempts = asyncio.run(scenario())
+    assert pending is False
+    assert ready is True and attempts == 3
@@ -3,5 +3,6 @@ Utility functions for data processing
 """
 
 from .data_normalizer import ProductNormalizer, ProductValidator
+from .instrumentation import instrument_collection, timed_stage
 
-__all__ = ['ProductNormalizer', 'ProductValidator']
+__all__ = ['ProductNormalizer', 'ProductValidator', 'instrument_collection', 'timed_stage']
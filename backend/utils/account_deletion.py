@@ -0,0 +1,266 @@
+"""
+BowlWise - Account Deletion Cascade
+
+Deletes everything that belongs to an account in the background, in
+bounded batches, after the request has already tombstoned the user.
+
+Data Flow:
+    DELETE /api/auth/me → enqueue held job → tombstone user (auth fails at once)
+        → release job
+    AccountDeletionWorker → claim job (lease) → for each step in CASCADE:
+        find batch of ids → delete_many($in) → record progress → pause
+    → delete the user document → job status "completed"
+
+How it works:
+    - The job is written before the user is tombstoned, held by its lease,
+      and released once the tombstone is in place. If the request fails in
+      between, the held job still becomes due when the lease runs out: a
+      tombstoned user is deleted as usual, a user who was never tombstoned
+      gets the job cancelled. Either way no tombstoned account is left
+      without a job.
+    - Jobs live in the account_deletions collection, keyed by a random id
+      that is returned to the client for the status endpoint (the user can
+      no longer authenticate once tombstoned).
+    - A worker claims one job at a time with find_one_and_update, setting
+      lease_until. Jobs whose lease expired (worker crashed, process
+      restarted) are claimed again and resume: each step just deletes
+      whatever still matches, so re-running a step is harmless.
+    - Every batch deletes at most batch_size documents, then sleeps
+      pause_seconds, so a heavy account never hammers the primary.
+    - Progress ({collection: deleted_count}) and the current step are
+      stored on the job after every batch ($inc, so a resumed job keeps
+      counting from where the crashed run left off).
+    - status() is served without authentication (the user is gone), keyed
+      only by the random job id: it returns job state only, never user_id.
+    - Outbox messages are matched by the user_id they were queued with, so
+      pending mail to the old address is dropped before it goes out (sent
+      ones are removed too rather than waiting for their TTL).
+
+Job document:
+    {
+        "_id": "3f2c…",            # returned as deletion_id
+        "user_id": "...",
+        "status": "pending" | "running" | "completed" | "cancelled",
+        "step": "purchases",          # None once completed
+        "progress": {"purchases": 120, ...},
+        "created_at", "updated_at", "completed_at", "lease_until",
+        "purge_at"                    # completed/cancelled jobs only; TTL index removes them
+    }
+
+Usage:
+    worker = AccountDeletionWorker({"account_deletions": ..., "users": ..., "pets": ..., ...})
+    worker.start()                          # in lifespan startup
+    deletion_id = await worker.enqueue(user_id)   # held
+    ...tombstone the user...
+    await worker.release(deletion_id)
+    await worker.status(deletion_id)        # GET /api/auth/deletions/{deletion_id}
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from bson import ObjectId
+
+logger = logging.getLogger("petai")
+
+# Deletion order: queued email first (stop mailing the old address), then
+# dependent data, the user document last. pets_archive only runs when the
+# worker is given that collection (PET_RETENTION_MODE=archive).
+CASCADE = ["email_outbox", "purchases", "spending_rollups", "auth_tokens", "pets", "pets_archive"]
+
+
+# ============================================
+# Worker
+# ============================================
+
+class AccountDeletionWorker:
+    """
+    Background cascade for tombstoned accounts.
+
+    Args:
+        collections: {name: Motor collection} for "account_deletions",
+            "users" and the CASCADE steps to run; steps without a
+            collection (e.g. "pets_archive" when archiving is off) are skipped
+        batch_size: Documents deleted per batch
+        pause_seconds: Sleep between batches (throttle)
+        poll_seconds: Idle poll interval (enqueue wakes the worker sooner)
+        lease_seconds: How long a claimed job is reserved before another
+            worker may resume it
+        job_retention: How long completed jobs stay queryable (TTL on purge_at)
+    """
+
+    def __init__(
+        self,
+        collections: Dict,
+        *,
+        batch_size: int = 500,
+        pause_seconds: float = 0.1,
+        poll_seconds: float = 30,
+        lease_seconds: float = 300,
+        job_retention: timedelta = timedelta(days=30),
+    ):
+        self._jobs = collections["account_deletions"]
+        self._collections = collections
+        self._steps = [step for step in CASCADE if collections.get(step) is not None]
+        self._batch_size = batch_size
+        self._pause = pause_seconds
+        self._poll = poll_seconds
+        self._lease = timedelta(seconds=lease_seconds)
+        self._job_retention = job_retention
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    # --- Jobs ---
+
+    async def enqueue(self, user_id: str) -> str:
+        """
+        Create a held deletion job for a user about to be tombstoned; returns
+        the job id. The job is only picked up after release() (or, if the
+        caller died first, once its lease runs out), and the worker cancels it
+        if the user was never tombstoned.
+        """
+        now = datetime.utcnow()
+        job_id = uuid.uuid4().hex
+        await self._jobs.insert_one({
+            "_id": job_id,
+            "user_id": user_id,
+            "status": "pending",
+            "step": self._steps[0],
+            "progress": {},
+            "created_at": now,
+            "updated_at": now,
+            "lease_until": now + self._lease,     # Held until release()
+        })
+        return job_id
+
+    async def release(self, job_id: str):
+        """Make a held job due now (call once the user is tombstoned)."""
+        await self._jobs.update_one(
+            {"_id": job_id, "status": "pending"},
+            {"$set": {"lease_until": datetime.utcnow()}},
+        )
+        self._wake.set()
+
+    async def status(self, job_id: str) -> Optional[Dict]:
+        """Public view of a job: job state only, never user_id (the id is the only capability)."""
+        job = await self._jobs.find_one(
+            {"_id": job_id}, {"status": 1, "step": 1, "progress": 1, "created_at": 1, "completed_at": 1},
+        )
+        if not job:
+            return None
+        return {
+            "deletion_id": job["_id"],
+            "status": job["status"],
+            "step": job.get("step"),
+            "progress": job.get("progress", {}),
+            "created_at": job["created_at"].isoformat(),
+            "completed_at": job["completed_at"].isoformat() if job.get("completed_at") else None,
+        }
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start the background loop (no-op if already running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="account-deletion")
+
+    async def stop(self):
+        """Cancel the loop; an interrupted job resumes after its lease."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                worked = await self.run_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Account deletion worker error: %s", e, exc_info=True)
+                worked = False
+            if not worked:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._poll)
+                except asyncio.TimeoutError:
+                    pass
+
+    # --- Cascade ---
+
+    async def run_next(self) -> bool:
+        """Claim and finish one job. Returns False when nothing was due."""
+        now = datetime.utcnow()
+        job = await self._jobs.find_one_and_update(
+            {"status": {"$in": ["pending", "running"]}, "lease_until": {"$lte": now}},
+            {"$set": {"status": "running", "lease_until": now + self._lease, "updated_at": now}},
+            sort=[("lease_until", 1)],
+            return_document=True,
+        )
+        if not job:
+            return False
+
+        user_id = job["user_id"]
+        user = await self._collections["users"].find_one({"_id": ObjectId(user_id)}, {"deleted_at": 1})
+        if user is not None and "deleted_at" not in user:
+            # The request failed between enqueue and tombstone: the account is live
+            await self._jobs.update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "cancelled", "step": None, "updated_at": now,
+                          "purge_at": now + self._job_retention}},
+            )
+            logger.warning("Account deletion %s cancelled: user %s was never tombstoned", job["_id"], user_id)
+            return True
+
+        # Steps already finished before a restart match nothing and cost one
+        # query. _delete_step adds to the stored progress; this run's counts
+        # are only for the log
+        deleted = {}
+        for step in self._steps:
+            deleted[step] = await self._delete_step(job["_id"], step, {"user_id": user_id})
+
+        # Only ever removes a tombstoned user
+        await self._collections["users"].delete_one({"_id": ObjectId(user_id), "deleted_at": {"$exists": True}})
+        done = datetime.utcnow()
+        await self._jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "completed", "step": None, "completed_at": done, "updated_at": done,
+                      "purge_at": done + self._job_retention}},
+        )
+        logger.info("Account deletion %s completed%s: deleted %s", job["_id"], " (resumed)" if job.get("progress") else "",
+                    " ".join(f"{k}={v}" for k, v in deleted.items()))
+        return True
+
+    async def _delete_step(self, job_id: str, step: str, query: Dict) -> int:
+        collection = self._collections[step]
+        await self._jobs.update_one({"_id": job_id}, {"$set": {"step": step}})
+        deleted = 0
+        while True:
+            batch = await collection.find(query, {"_id": 1}).limit(self._batch_size).to_list(self._batch_size)
+            if not batch:
+                return deleted
+            result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+            deleted += result.deleted_count
+            now = datetime.utcnow()
+            await self._jobs.update_one(
+                {"_id": job_id},
+                {
+                    "$inc": {f"progress.{step}": result.deleted_count},
+                    # Still working: keep the lease ahead of us
+                    "$set": {"lease_until": now + self._lease, "updated_at": now},
+                },
+            )
+            if len(batch) < self._batch_size:
+                return deleted
+            await asyncio.sleep(self._pause)
@@ -0,0 +1,300 @@
+"""
+BowlWise - Allergen Lexicon + Import-Time Data-Quality Check
+
+Finds allergens in a product's ingredient list once, when products are
+imported, instead of substring-scanning every product's ingredients on
+every recommendation request.
+
+Data Flow:
+    import_products.py / ScraperPipeline
+        → run_allergen_check(docs)
+            → per product: split ingredients → match lexicon terms
+            → doc["allergens"]      = allergen_tags ∪ categories found
+            → doc["allergen_terms"] = allergens ∪ specific terms found
+                                      ∪ lexicon words anywhere in the text
+            → findings (allergens found but missing from allergen_tags)
+        → allergen_report.json
+    get_recommendations → AllergyCheck(pet allergies).matches(product)
+
+How it works:
+    - LEXICON maps each allergen category (the values used in
+      allergen_tags) to the ingredient words that mean it: "fish" ←
+      salmon, herring, pollock, whitefish, ... A word may belong to several
+      categories ("poultry").
+    - Categories (allergens, the data-quality report) come from terms
+      matched on word boundaries with an optional plural ("lentils",
+      "eggs"), per ingredient entry (split on commas and brackets).
+    - allergen_terms also records every lexicon word that occurs anywhere
+      in the ingredient text, like the old per-request substring scan did:
+      "fish" inside "shellfish" or "fishmeal", "egg" inside "eggshell
+      membrane". Only the reviewed false positives in NOT_ALLERGENS
+      ("milk thistle") and SUBSTRING_EXCEPTIONS ("oat" in goat, "pea" in
+      pears, "rice" in licorice) are skipped — this is a safety check, so
+      the matcher may only ever drop hits a person has confirmed wrong.
+    - A pet allergy that is a lexicon word is matched against the
+      product's allergen_terms, including every lexicon word containing it
+      ("pea" also matches chickpea, "bean" fava bean): "fish" matches any
+      fish, "salmon" only salmon, plus anything tagged in allergen_tags.
+      Allergies the lexicon does not know (free text like "chicken fat")
+      still fall back to a substring scan.
+    - Products imported before this check (no allergen_terms) are scanned
+      the old way until the 0003 migration has backfilled them.
+
+Usage:
+    summary = run_allergen_check(docs)                # import scripts
+    check = AllergyCheck(pet["allergies"])            # once per request
+    if check and check.matches(product): ...          # allergen found
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+# ============================================
+# Lexicon
+# ============================================
+
+# category → ingredient words (the category name itself always matches)
+LEXICON: Dict[str, List[str]] = {
+    "chicken": ["chicken", "poultry"],
+    "turkey": ["turkey", "poultry"],
+    "duck": ["duck", "poultry"],
+    "quail": ["quail"],
+    "fish": [
+        "fish", "salmon", "herring", "pollock", "sardine", "mackerel", "hake", "pilchard",
+        "flounder", "rockfish", "whitefish", "trout", "cod", "sole", "arctic char",
+        "blue whiting", "whiting", "tuna", "anchovy", "anchovies", "menhaden", "haddock",
+        "capelin", "redfish", "monkfish", "plaice", "perch", "pike", "walleye",
+    ],
+    "shellfish": ["shellfish", "mussel", "green lipped mussel", "shrimp", "crab", "krill", "lobster", "clam", "oyster"],
+    "egg": ["egg"],
+    "beef": ["beef", "bison"],
+    "lamb": ["lamb", "mutton"],
+    "pork": ["pork", "boar", "wild boar", "ham"],
+    "venison": ["venison", "deer", "elk"],
+    "goat": ["goat"],
+    "rabbit": ["rabbit"],
+    "kangaroo": ["kangaroo"],
+    "dairy": ["dairy", "milk", "skim milk", "cheese", "cottage cheese", "whey", "yogurt", "casein", "lactose"],
+    "grain": [
+        "grain", "wheat", "gluten", "barley", "oat", "oatmeal", "oat groats", "rye", "rice",
+        "brown rice", "millet", "sorghum", "corn", "maize", "spelt", "quinoa",
+    ],
+    "legumes": ["legume", "pea", "lentil", "chickpea", "bean", "fava bean", "peanut"],
+    "soy": ["soy", "soybean", "soya", "tofu"],
+    "sunflower": ["sunflower"],
+    "insect": ["insect", "black soldier fly", "cricket", "mealworm"],
+}
+
+# Ingredient names that contain a lexicon word but are not that allergen
+NOT_ALLERGENS = ["milk thistle"]
+
+# lexicon word → words it occurs inside without meaning it. Reviewed cases
+# only: every entry removes a hit the old substring scan made.
+SUBSTRING_EXCEPTIONS: Dict[str, List[str]] = {
+    "oat": ["goat"],
+    "pea": ["pear"],            # pear, pears, pearled
+    "rice": ["licorice"],
+}
+
+# word → categories it implies
+_TERM_CATEGORIES: Dict[str, FrozenSet[str]] = {}
+for _category, _words in LEXICON.items():
+    for _word in [_category] + _words:
+        _TERM_CATEGORIES[_word] = _TERM_CATEGORIES.get(_word, frozenset()) | {_category}
+
+# word → every lexicon word containing it ("pea" → pea, chickpea, peanut).
+# Category names are left out unless the word belongs to that category:
+# they stand for everything in it ("shellfish" ← mussel), and a "fish"
+# allergy should not reject mussels. An ingredient that literally says
+# "shellfish" still matches "fish": allergen_terms holds every lexicon word
+# found inside the text (contained_terms).
+_CONTAINING: Dict[str, FrozenSet[str]] = {
+    _word: frozenset(
+        t for t in _TERM_CATEGORIES
+        if _word in t and (t == _word or t not in LEXICON or _word in LEXICON[t])
+    )
+    for _word in _TERM_CATEGORIES
+}
+
+# Every word the lexicon knows (categories and synonyms)
+TERMS: FrozenSet[str] = frozenset(_TERM_CATEGORIES)
+
+# Longest first so "blue whiting" wins over "whiting"
+_TERM_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(t) for t in sorted(_TERM_CATEGORIES, key=len, reverse=True)) + r")(?:e?s)?\b"
+)
+_ENTRY_SPLIT = re.compile(r"[,;()\[\]]")
+_NOT_ALLERGEN_PATTERN = re.compile(r"\b(" + "|".join(re.escape(t) for t in NOT_ALLERGENS) + r")\b")
+# Whole words starting with an exception ("pear" → pears, pearled)
+_EXCEPTION_PATTERNS = {
+    term: re.compile(r"\b(" + "|".join(re.escape(w) for w in words) + r")\w*")
+    for term, words in SUBSTRING_EXCEPTIONS.items()
+}
+
+
+def normalize_term(term: str) -> str:
+    """Lowercase, trimmed, singular when the singular is a lexicon word ("eggs" → "egg")."""
+    term = " ".join(term.lower().split())
+    if term not in _TERM_CATEGORIES:
+        for suffix in ("es", "s"):
+            if term.endswith(suffix) and term[:-len(suffix)] in _TERM_CATEGORIES:
+                return term[:-len(suffix)]
+    return term
+
+
+def parse_tags(allergen_tags) -> List[str]:
+    """allergen_tags as a normalized list ("chicken, Eggs" → ["chicken", "egg"])."""
+    if isinstance(allergen_tags, str):
+        allergen_tags = allergen_tags.split(",")
+    return [normalize_term(t) for t in allergen_tags or [] if t and t.strip()]
+
+
+def find_allergens(ingredients: str) -> Dict[str, List[str]]:
+    """Lexicon terms in an ingredient list: {term: [ingredient entries containing it]}."""
+    found: Dict[str, List[str]] = {}
+    for entry in _ENTRY_SPLIT.split((ingredients or "").lower()):
+        entry = entry.strip()
+        if not entry:
+            continue
+        for term in _TERM_PATTERN.findall(_NOT_ALLERGEN_PATTERN.sub("", entry)):
+            entries = found.setdefault(term, [])
+            if entry not in entries:
+                entries.append(entry)
+    return found
+
+
+def contained_terms(ingredients: str) -> List[str]:
+    """Lexicon words occurring anywhere in an ingredient list, inside other words too."""
+    text = _NOT_ALLERGEN_PATTERN.sub(" ", (ingredients or "").lower())
+    found = []
+    for term in TERMS:
+        if term not in text:
+            continue
+        pattern = _EXCEPTION_PATTERNS.get(term)
+        if pattern is None or term in pattern.sub(" ", text):
+            found.append(term)
+    return sorted(found)
+
+
+# ============================================
+# Import-Time Check
+# ============================================
+
+def check_product(doc: Dict) -> Optional[Dict]:
+    """
+    Derive allergens / allergen_terms for one product (mutates doc).
+
+    Returns:
+        A report finding when allergen_tags is missing a category found in
+        the ingredients or holds a tag the lexicon does not know, else None
+    """
+    tags = parse_tags(doc.get("allergen_tags"))
+    found = find_allergens(doc.get("ingredients", ""))
+
+    categories: Dict[str, List[str]] = {}
+    for term, entries in found.items():
+        for category in _TERM_CATEGORIES[term]:
+            categories.setdefault(category, []).extend(e for e in entries if e not in categories.get(category, []))
+
+    allergens = sorted(set(tags) | set(categories))
+    doc["allergens"] = allergens
+    doc["allergen_terms"] = sorted(set(allergens) | set(found) | set(contained_terms(doc.get("ingredients", ""))))
+
+    missing = {c: entries for c, entries in sorted(categories.items()) if c not in tags}
+    unknown_tags = sorted(t for t in set(tags) if t not in _TERM_CATEGORIES)
+    if not missing and not unknown_tags:
+        return None
+    return {
+        "product_id": str(doc.get("_id") or doc.get("name", "")),
+        "allergen_tags": tags,
+        "missing_tags": missing,
+        "unknown_tags": unknown_tags,
+    }
+
+
+def allergen_report_path() -> str:
+    """Where import scripts write the report (ALLERGEN_REPORT, default allergen_report.json)."""
+    return os.getenv("ALLERGEN_REPORT", "allergen_report.json")
+
+
+def run_allergen_check(docs: Iterable[Dict], report_path: Optional[str] = None) -> Dict:
+    """
+    Check every product, store allergens / allergen_terms on the docs and
+    write the data-quality report.
+
+    Returns:
+        {"checked": n, "flagged": n, "missing_tags": n, "report": path}
+    """
+    docs = list(docs)
+    findings = [f for f in (check_product(doc) for doc in docs) if f]
+    report_path = report_path or allergen_report_path()
+    summary = {
+        "checked": len(docs),
+        "flagged": len(findings),
+        "missing_tags": sum(len(f["missing_tags"]) for f in findings),
+        "report": report_path,
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": datetime.utcnow().isoformat(), **summary, "findings": findings}, f, indent=2)
+    return summary
+
+
+# ============================================
+# Request-Time Check
+# ============================================
+
+class AllergyCheck:
+    """
+    A pet's allergies, resolved against the lexicon once per request.
+
+    Args:
+        allergies: The pet's allergy strings (free text)
+    """
+
+    __slots__ = ("terms", "unlisted", "raw")
+
+    def __init__(self, allergies: Iterable[str]):
+        terms = set()
+        self.unlisted: List[str] = []
+        self.raw: List[str] = []
+        for allergy in allergies or []:
+            raw = allergy.lower().strip()
+            if not raw:
+                continue
+            self.raw.append(raw)
+            term = normalize_term(raw)
+            categories = _TERM_CATEGORIES.get(term)
+            if categories is None:
+                self.unlisted.append(raw)
+                continue
+            terms |= _CONTAINING[term]
+            if term not in LEXICON:
+                # A word naming several categories covers all of them ("poultry")
+                terms |= categories if len(categories) > 1 else set()
+        self.terms = frozenset(terms)
+
+    def __bool__(self) -> bool:
+        return bool(self.raw)
+
+    def matches(self, product) -> Optional[str]:
+        """The first of the pet's allergens this product contains, or None."""
+        product_terms = product.get("allergen_terms")
+        if product_terms is None:
+            # Not checked at import yet: scan the ingredients like before
+            ingredients = (product.get("ingredients") or "").lower()
+            return next((a for a in self.raw if a in ingredients), None)
+
+        for term in product_terms:
+            if term in self.terms:
+                return term
+        if self.unlisted:
+            ingredients = (product.get("ingredients") or "").lower()
+            return next((a for a in self.unlisted if a in ingredients), None)
+        return None
@@ -0,0 +1,402 @@
+"""
+BowlWise - Shared Columnar Catalog File
+
+A compact, read-only, memory-mapped copy of the product catalog. Every API
+worker on a host maps the same file, so the OS keeps one physical copy in
+the page cache no matter how many workers run, and per-worker memory no
+longer grows with the catalog.
+
+Data Flow:
+    import_products.py / ScraperPipeline → bump_catalog_version()
+        → write_catalog_file(path, products, "v<n>")   (tmp file + os.replace)
+    API → ProductCatalog → MappedCatalog.open(path) → rows read on demand
+
+File layout (native byte order — the file is built and read on one host):
+    magic "BWCAT\\0\\1\\0" | u32 header length | u32 reserved
+    header JSON: catalog version, row count, column directory, string table
+    columns (8-byte aligned, offsets relative to the end of the header):
+        numeric columns  — float64 / int64 per row (NaN = null for floats)
+        string columns   — u32 index per row into the string table
+        presence         — one byte per row, only for fields some rows lack
+    string table — u64 offsets (count + 1) followed by the UTF-8 blob;
+        identical strings (brands, formats, life stages) are stored once
+
+How it works:
+    - Rows are sorted by _id, so by-id lookups are a binary search over the
+      _id column; nothing is indexed into Python dicts per worker.
+    - CatalogRow is a dict-like view (get / [] / in) that decodes a field
+      from the mapping when it is read. Scoring only touches the fields it
+      needs.
+    - JSON cells (lists such as allergen_terms, nested objects) are parsed
+      once per worker and kept by string id: identical values share one
+      string-table entry, so the cache holds each distinct list once and
+      the allergen check on every recommendation request parses nothing.
+      Decoded values are shared between rows and reads — treat them as
+      read-only.
+    - Writers build the file under a unique temporary name and os.replace()
+      it into place. Readers that already mapped the old file keep their
+      (unlinked) copy until their snapshot is dropped; new readers see the
+      new version — no reader ever sees a half-written file.
+    - Opt-in: only used when CATALOG_FILE is set (catalog_file_path()).
+      Relative paths resolve against backend/, so every worker and import
+      script uses the same file wherever it was started from.
+
+Usage:
+    export_catalog_file(db, version)                  # import scripts (sync PyMongo)
+    write_catalog_file("catalog.bwcat", docs, "v12")
+    catalog = MappedCatalog.open("catalog.bwcat")
+    catalog.version, len(catalog)
+    row = catalog.find("Orijen-Original-Adult")      # CatalogRow or None
+    row.get("price_per_kg")
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import uuid
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from bson import ObjectId
+
+from utils.catalog_version import version_tag
+
+MAGIC = b"BWCAT\x00\x01\x00"
+PREAMBLE = struct.Struct("=8sII")      # magic, header length, reserved
+
+# Column kinds: numeric ones are stored as fixed-width arrays, the rest as string ids
+NUMERIC_KINDS = {"float": "d", "int": "q", "bool": "q"}
+NULL_STRING = 0xFFFFFFFF
+INT_NULL = -(2 ** 63)
+
+_MISSING = object()
+
+
+class CatalogFileError(Exception):
+    """Raised when a catalog file is missing, truncated or not a catalog file."""
+
+
+# Relative CATALOG_FILE paths resolve here (backend/), not against the CWD, so
+# API workers and import scripts started from anywhere agree on one file
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def catalog_file_path() -> Optional[str]:
+    """
+    Configured catalog file as an absolute path, or None when CATALOG_FILE
+    is unset/empty (the default: each worker keeps its own in-memory catalog).
+    Point it at a writable, host-local directory shared by the workers.
+    """
+    path = os.getenv("CATALOG_FILE", "").strip()
+    if not path:
+        return None
+    return os.path.join(BASE_DIR, path) if not os.path.isabs(path) else path
+
+
+# ============================================
+# Writer
+# ============================================
+
+def _column_kind(values: List) -> str:
+    present = [v for v in values if v is not None]
+    if not present:
+        return "str"
+    if all(isinstance(v, bool) for v in present):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "float"
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    if all(isinstance(v, ObjectId) for v in present):
+        return "oid"
+    if all(isinstance(v, datetime) for v in present):
+        return "datetime"
+    return "json"
+
+
+def _to_text(kind: str, value) -> str:
+    if kind == "datetime":
+        return value.isoformat()
+    if kind == "json":
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _align(buffer: bytearray):
+    buffer.extend(b"\x00" * (-len(buffer) % 8))
+
+
+def write_catalog_file(path: str, docs: List[Dict], version: str) -> int:
+    """
+    Write docs as a columnar catalog file and atomically move it into place.
+
+    Args:
+        path: Destination file
+        docs: Product documents (any order; stored sorted by _id)
+        version: Catalog version string the API compares against (e.g. "v12")
+
+    Returns:
+        Size of the written file in bytes
+    """
+    docs = sorted(docs, key=lambda d: str(d["_id"]))
+    fields = sorted({key for doc in docs for key in doc}, key=lambda k: (k != "_id", k))
+
+    strings: Dict[str, int] = {}
+    data = bytearray()
+    columns = []
+
+    for field in fields:
+        values = [doc.get(field, _MISSING) for doc in docs]
+        kind = _column_kind([v for v in values if v is not _MISSING])
+        column = {"name": field, "kind": kind, "offset": len(data)}
+
+        if kind in NUMERIC_KINDS:
+            if kind == "float":
+                cells = [math.nan if v is None or v is _MISSING else float(v) for v in values]
+            else:
+                cells = [INT_NULL if v is None or v is _MISSING else int(v) for v in values]
+            data.extend(array(NUMERIC_KINDS[kind], cells).tobytes())
+        else:
+            ids = []
+            for v in values:
+                if v is None or v is _MISSING:
+                    ids.append(NULL_STRING)
+                else:
+                    ids.append(strings.setdefault(_to_text(kind, v), len(strings)))
+            data.extend(array("I", ids).tobytes())
+        _align(data)
+
+        if any(v is _MISSING for v in values):
+            column["present_offset"] = len(data)
+            data.extend(bytes(0 if v is _MISSING else 1 for v in values))
+            _align(data)
+        columns.append(column)
+
+    # String table: offsets (count + 1) then the UTF-8 blob
+    encoded = [s.encode("utf-8") for s in strings]      # dict order == string id order
+    offsets, position = [], 0
+    for blob in encoded:
+        offsets.append(position)
+        position += len(blob)
+    offsets.append(position)
+    string_table = {"offsets": len(data), "count": len(encoded)}
+    data.extend(array("Q", offsets).tobytes())
+    string_table["data"] = len(data)
+    data.extend(b"".join(encoded))
+
+    header = json.dumps({
+        "catalog_version": version,
+        "rows": len(docs),
+        "created_at": datetime.utcnow().isoformat(),
+        "columns": columns,
+        "strings": string_table,
+    }).encode("utf-8")
+    header += b" " * (-(PREAMBLE.size + len(header)) % 8)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, len(header), 0))
+            f.write(header)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return PREAMBLE.size + len(header) + len(data)
+
+
+def export_catalog_file(db, version: int, path: Optional[str] = None) -> Optional[int]:
+    """
+    Write the products collection as the catalog file for a catalog_meta
+    version (call right after bump_catalog_version). Returns the file size,
+    or None when the catalog file is disabled.
+
+    Args:
+        db: PyMongo database handle
+        version: Number returned by bump_catalog_version()
+    """
+    path = path or catalog_file_path()
+    if not path:
+        return None
+    return write_catalog_file(path, list(db["products"].find({})), version_tag(version))
+
+
+# ============================================
+# Reader
+# ============================================
+
+class CatalogRow:
+    """Read-only dict-like view of one product row."""
+
+    __slots__ = ("_catalog", "_index")
+
+    def __init__(self, catalog: "MappedCatalog", index: int):
+        self._catalog = catalog
+        self._index = index
+
+    def get(self, key: str, default=None):
+        value = self._catalog.value(key, self._index)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: str):
+        value = self._catalog.value(key, self._index)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self._catalog.value(key, self._index) is not _MISSING
+
+    def keys(self) -> List[str]:
+        return [name for name in self._catalog.columns if name in self]
+
+    def to_dict(self) -> Dict:
+        """Materialize the row (e.g. for encoding a response)."""
+        return {name: self[name] for name in self.keys()}
+
+
+class _Column:
+    __slots__ = ("kind", "cells", "present")
+
+    def __init__(self, kind: str, cells: memoryview, present: Optional[memoryview]):
+        self.kind = kind
+        self.cells = cells
+        self.present = present
+
+
+class MappedCatalog:
+    """
+    A catalog file mapped read-only into memory.
+
+    Only the small header (column directory) is parsed into Python objects;
+    cell values are decoded from the mapping on access. JSON cells are
+    parsed on first access and cached by string id for the life of the
+    mapping (one entry per distinct value; the values must not be mutated).
+    """
+
+    def __init__(self, mapped: mmap.mmap, header: Dict, data_start: int):
+        self._mmap = mapped
+        self.version: str = header["catalog_version"]
+        self.rows: int = header["rows"]
+        view = memoryview(mapped)
+        n = self.rows
+
+        self.columns: Dict[str, _Column] = {}
+        for column in header["columns"]:
+            start = data_start + column["offset"]
+            kind = column["kind"]
+            code = NUMERIC_KINDS.get(kind, "I")
+            width = struct.calcsize(code)
+            cells = view[start:start + n * width].cast(code)
+            present = None
+            if "present_offset" in column:
+                p = data_start + column["present_offset"]
+                present = view[p:p + n]
+            self.columns[column["name"]] = _Column(kind, cells, present)
+
+        table = header["strings"]
+        offsets_start = data_start + table["offsets"]
+        self._string_offsets = view[offsets_start:offsets_start + (table["count"] + 1) * 8].cast("Q")
+        self._string_data = data_start + table["data"]
+
+        if "_id" not in self.columns:
+            raise CatalogFileError("Catalog file has no _id column")
+        self._ids = _IdColumn(self)
+        self._json: Dict[int, object] = {}     # string id → decoded JSON value
+
+    @classmethod
+    def open(cls, path: str) -> "MappedCatalog":
+        """Map a catalog file read-only. Raises CatalogFileError if it is not one."""
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise CatalogFileError(f"Cannot map {path}: {e}") from e
+
+        if len(mapped) < PREAMBLE.size:
+            raise CatalogFileError(f"{path} is truncated")
+        magic, header_length, _ = PREAMBLE.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            raise CatalogFileError(f"{path} is not a catalog file")
+        try:
+            header = json.loads(mapped[PREAMBLE.size:PREAMBLE.size + header_length])
+        except ValueError as e:
+            raise CatalogFileError(f"{path} has a corrupt header") from e
+        return cls(mapped, header, PREAMBLE.size + header_length)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __iter__(self) -> Iterator[CatalogRow]:
+        return (CatalogRow(self, i) for i in range(self.rows))
+
+    def row(self, index: int) -> CatalogRow:
+        return CatalogRow(self, index)
+
+    def find(self, product_id: str) -> Optional[CatalogRow]:
+        """Row for a product id (binary search on the sorted _id column)."""
+        index = bisect.bisect_left(self._ids, str(product_id))
+        if index < self.rows and self._ids[index] == str(product_id):
+            return CatalogRow(self, index)
+        return None
+
+    def string(self, string_id: int) -> str:
+        start = self._string_data + self._string_offsets[string_id]
+        end = self._string_data + self._string_offsets[string_id + 1]
+        return str(self._mmap[start:end], "utf-8")
+
+    def value(self, name: str, index: int):
+        """Decode one cell (_MISSING if the row has no such field)."""
+        column = self.columns.get(name)
+        if column is None or (column.present is not None and not column.present[index]):
+            return _MISSING
+        cell = column.cells[index]
+        kind = column.kind
+        if kind == "float":
+            return None if math.isnan(cell) else cell
+        if kind in ("int", "bool"):
+            if cell == INT_NULL:
+                return None
+            return bool(cell) if kind == "bool" else cell
+        if cell == NULL_STRING:
+            return None
+        if kind == "json":
+            decoded = self._json.get(cell, _MISSING)
+            if decoded is _MISSING:
+                decoded = self._json[cell] = json.loads(self.string(cell))
+            return decoded
+        text = self.string(cell)
+        if kind == "str":
+            return text
+        if kind == "oid":
+            return ObjectId(text)
+        return datetime.fromisoformat(text)
+
+
+class _IdColumn:
+    """Sequence of row ids as strings, for bisect."""
+
+    __slots__ = ("_catalog",)
+
+    def __init__(self, catalog: MappedCatalog):
+        self._catalog = catalog
+
+    def __len__(self) -> int:
+        return self._catalog.rows
+
+    def __getitem__(self, index: int) -> str:
+        return str(self._catalog.value("_id", index))
@@ -0,0 +1,133 @@
+"""
+BowlWise - Catalog Version
+
+Tracks a version number for the product catalog so the API can answer
+conditional GETs (ETag / If-None-Match) without re-reading products.
+
+Data Flow:
+    import_products.py / ScraperPipeline → bump_catalog_version() → catalog_meta
+    API → CatalogVersion.get() (cached in memory, refreshed every ttl seconds)
+
+How it works:
+    - Writers call bump_catalog_version(db) after changing products. It
+      increments a counter on the single {"_id": "products"} document in the
+      catalog_meta collection and stamps updated_at.
+    - The API keeps the last-read version in memory and re-reads the
+      document at most once per ttl_seconds, so most requests never touch
+      Mongo to learn the version. An import becomes visible within ttl_seconds.
+      When the TTL expires under load, concurrent requests share one re-read
+      (single-flight, see single_flight.py).
+    - Databases imported before catalog_meta existed have no document; the
+      reader then derives a version from the product count and newest
+      imported_at, which also changes whenever an import runs.
+
+Usage:
+    # Scripts (sync PyMongo)
+    from utils.catalog_version import bump_catalog_version
+    bump_catalog_version(db)
+
+    # API (Motor)
+    catalog_version = CatalogVersion(database["catalog_meta"], repositories.products)
+    version, last_modified = await catalog_version.get()
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from utils.metrics import CACHE_REQUESTS
+from utils.single_flight import SingleFlight
+
+CATALOG_META_ID = "products"
+
+
+def version_tag(number: int) -> str:
+    """Version string the API uses for a catalog_meta counter value (ETags, catalog file)."""
+    return f"v{number}"
+
+
+# ============================================
+# Writer (sync — used by import scripts)
+# ============================================
+
+def bump_catalog_version(db) -> int:
+    """
+    Increment the catalog version after products change.
+
+    Args:
+        db: PyMongo database handle
+
+    Returns:
+        The new version number
+    """
+    doc = db["catalog_meta"].find_one_and_update(
+        {"_id": CATALOG_META_ID},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=True,
+    )
+    return doc["version"]
+
+
+# ============================================
+# Reader (async — used by the API)
+# ============================================
+
+class CatalogVersion:
+    """
+    In-memory cache of the catalog version with a refresh TTL.
+
+    Args:
+        meta_collection: Motor collection holding the catalog_meta document
+        products: ProductRepository (fallback when no meta doc exists)
+        ttl_seconds: How long a read version is trusted before re-reading
+    """
+
+    def __init__(self, meta_collection, products, ttl_seconds: float = 30.0):
+        self._meta = meta_collection
+        self._products = products
+        self._ttl = ttl_seconds
+        self._version: Optional[str] = None
+        self._last_modified: Optional[datetime] = None
+        self._expires_at = 0.0
+        self._refreshes = SingleFlight("catalog_version")
+
+    async def get(self) -> Tuple[str, datetime]:
+        """Return (version, last_modified), refreshing from Mongo if the TTL expired."""
+        if self._version is not None and time.monotonic() < self._expires_at:
+            CACHE_REQUESTS.inc("catalog_version", "hit")
+            return self._version, self._last_modified
+
+        CACHE_REQUESTS.inc("catalog_version", "miss")
+        # Requests arriving while the version is being re-read share that read
+        await self._refreshes.do(CATALOG_META_ID, self._refresh)
+        return self._version, self._last_modified
+
+    def invalidate(self):
+        """Force the next get() to re-read the version."""
+        self._expires_at = 0.0
+
+    async def _refresh(self):
+        meta = await self._meta.find_one({"_id": CATALOG_META_ID})
+        if meta:
+            version = version_tag(meta.get("version", 0))
+            last_modified = meta.get("updated_at")
+        else:
+            # Legacy databases: derive a version from the data itself
+            count = await self._products.count()
+            imported_at = await self._products.newest_imported_at() or ""
+            version = f"d{count}-{imported_at}"
+            try:
+                last_modified = datetime.fromisoformat(imported_at)
+            except ValueError:
+                last_modified = None
+
+        # Keep Last-Modified stable while the version is unchanged
+        if version != self._version or self._last_modified is None:
+            self._last_modified = last_modified or datetime.utcnow()
+        self._version = version
+        self._expires_at = time.monotonic() + self._ttl
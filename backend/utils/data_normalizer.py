@@ -71,6 +71,10 @@ class ProductNormalizer:
             'last_updated': scraped_data.get('scraped_at', ''),
         }
 
+        # Normalized lowercase keys (API brand filter + catalog paging use these)
+        product['brand_key'] = product['brand'].strip().lower()
+        product['line_key'] = product['line'].strip().lower()
+
         # Nutritional data
         product['protein_pct'] = scraped_data.get('protein_pct')
         product['fat_pct'] = scraped_data.get('fat_pct')
@@ -0,0 +1,207 @@
+"""
+BowlWise - Email Delivery Providers
+
+Batched email senders behind one small interface, so background jobs can
+hand over many messages per provider call and tests/local dev can swap the
+real provider for a file sink.
+
+Providers:
+    - ResendSender: Resend batch API (up to 100 messages per call). The
+      Resend SDK is synchronous, so calls run in a worker thread and never
+      block the event loop.
+    - FileSink: appends each message as one JSON line to a local file and
+      keeps the last messages in memory. No network; only used when
+      EMAIL_PROVIDER=file is set explicitly (the file holds live sign-in
+      links).
+    - SmtpSender: plain SMTP (one connection per batch), for a local sink
+      such as MailHog/Mailpit (EMAIL_PROVIDER=smtp, default localhost:1025).
+    - DropSender: logs and discards every message. Used when nothing is
+      configured outside production (EMAIL_PROVIDER=none selects it
+      explicitly); with ENV=production an unconfigured provider is a
+      startup error instead.
+
+Message format (plain dict):
+    {"to": "someone@example.com", "subject": "...", "html": "...", "tag": "reorder_reminder"}
+
+Usage:
+    from utils.email_delivery import create_email_sender
+    sender = create_email_sender()
+    await sender.send_batch([message, ...])
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("petai")
+
+EMAIL_FROM = os.getenv("EMAIL_FROM", "BowlWise <onboarding@resend.dev>")
+RESEND_BATCH_LIMIT = 100    # Resend's per-request maximum
+
+
+class EmailDeliveryError(Exception):
+    """Raised when a provider rejects or fails to deliver a batch."""
+
+
+# ============================================
+# Resend (production)
+# ============================================
+
+class ResendSender:
+    """Deliver messages through Resend's batch endpoint."""
+
+    name = "resend"
+    max_batch = RESEND_BATCH_LIMIT
+
+    def __init__(self, api_key: str, sender: str = EMAIL_FROM):
+        import resend
+        resend.api_key = api_key
+        self._resend = resend
+        self._from = sender
+
+    async def send_batch(self, messages: List[Dict]):
+        """Send up to max_batch messages in one provider call."""
+        payload = [
+            {"from": self._from, "to": [m["to"]], "subject": m["subject"], "html": m["html"]}
+            for m in messages
+        ]
+        try:
+            await asyncio.to_thread(self._resend.Batch.send, payload)
+        except Exception as e:
+            raise EmailDeliveryError(str(e)) from e
+
+
+# ============================================
+# File Sink (local dev / tests)
+# ============================================
+
+class FileSink:
+    """
+    Write messages to an NDJSON file instead of sending them.
+
+    Args:
+        path: File to append to (None = memory only)
+        keep: How many recent messages to keep in `sent` for inspection
+    """
+
+    name = "file"
+    max_batch = RESEND_BATCH_LIMIT
+
+    def __init__(self, path: Optional[str] = None, keep: int = 1000):
+        self.path = path
+        self.sent = deque(maxlen=keep)
+
+    async def send_batch(self, messages: List[Dict]):
+        """Record the batch (appended to the file in one write)."""
+        stamped = [{**m, "sent_at": datetime.utcnow().isoformat()} for m in messages]
+        self.sent.extend(stamped)
+        if self.path:
+            lines = "".join(json.dumps(m, default=str) + "\n" for m in stamped)
+            await asyncio.to_thread(self._append, lines)
+
+    def _append(self, lines: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+# ============================================
+# SMTP (local sink / self-hosted relay)
+# ============================================
+
+class SmtpSender:
+    """Deliver messages over SMTP, one connection per batch (run in a thread)."""
+
+    name = "smtp"
+    max_batch = 50
+
+    def __init__(self, host: str = "localhost", port: int = 1025, sender: str = EMAIL_FROM):
+        self._host = host
+        self._port = port
+        self._from = sender
+
+    async def send_batch(self, messages: List[Dict]):
+        """Send the batch over a single SMTP connection."""
+        import smtplib  # Deferred like the Resend SDK: only this provider needs it
+
+        try:
+            await asyncio.to_thread(self._send, messages)
+        except (OSError, smtplib.SMTPException) as e:
+            raise EmailDeliveryError(str(e)) from e
+
+    def _send(self, messages: List[Dict]):
+        import smtplib
+
+        with smtplib.SMTP(self._host, self._port, timeout=10) as smtp:
+            for m in messages:
+                msg = EmailMessage()
+                msg["From"] = self._from
+                msg["To"] = m["to"]
+                msg["Subject"] = m["subject"]
+                msg.set_content(m["html"], subtype="html")
+                smtp.send_message(msg)
+
+
+# ============================================
+# Drop (email not configured)
+# ============================================
+
+class DropSender:
+    """Discard messages with a warning, so an unconfigured dev setup never writes links to disk."""
+
+    name = "none"
+    max_batch = RESEND_BATCH_LIMIT
+
+    async def send_batch(self, messages: List[Dict]):
+        """Log and drop the batch."""
+        tags = sorted({m.get("tag") or "untagged" for m in messages})
+        logger.warning("Email not configured — dropped %d message(s) (%s)", len(messages), ", ".join(tags))
+
+
+# ============================================
+# Factory
+# ============================================
+
+def create_email_sender(provider: Optional[str] = None):
+    """
+    Build the configured sender.
+
+    EMAIL_PROVIDER=resend (default when RESEND_API_KEY is set), file, smtp
+    or none. File sink path comes from EMAIL_SINK_PATH (default:
+    email_sink.ndjson); SMTP target from SMTP_HOST / SMTP_PORT (default
+    localhost:1025).
+
+    Raises:
+        RuntimeError: Unknown provider, resend without RESEND_API_KEY, or no
+            provider at all with ENV=production
+    """
+    api_key = os.getenv("RESEND_API_KEY", "")
+    provider = (provider or os.getenv("EMAIL_PROVIDER") or ("resend" if api_key else "")).lower()
+
+    if not provider:
+        if os.getenv("ENV") == "production":
+            raise RuntimeError("RESEND_API_KEY (or EMAIL_PROVIDER) must be set in production")
+        logger.warning("Email provider: none (no RESEND_API_KEY / EMAIL_PROVIDER) — emails are dropped")
+        return DropSender()
+    if provider == "none":
+        return DropSender()
+
+    if provider == "resend":
+        if not api_key:
+            raise RuntimeError("EMAIL_PROVIDER=resend requires RESEND_API_KEY")
+        return ResendSender(api_key)
+    if provider == "file":
+        path = os.getenv("EMAIL_SINK_PATH", "email_sink.ndjson")
+        logger.info("Email provider: file sink (%s) — emails are not sent", path)
+        return FileSink(path)
+    if provider == "smtp":
+        return SmtpSender(os.getenv("SMTP_HOST", "localhost"), int(os.getenv("SMTP_PORT", "1025")))
+    raise RuntimeError(f"Unknown EMAIL_PROVIDER: {provider}")
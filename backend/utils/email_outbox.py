@@ -0,0 +1,271 @@
+"""
+BowlWise - Email Outbox
+
+Durable, non-blocking email delivery. Request handlers enqueue a message
+document and return; a pool of async workers delivers queued messages in
+the background through the configured provider (utils/email_delivery.py).
+
+Data Flow:
+    request_magic_link / ReminderScheduler → enqueue() → email_outbox collection
+    workers → claim due batch → sender.send_batch() → sent | retry (backoff) | dead
+
+How it works:
+    - Each message is a document with status "pending" and next_attempt_at.
+      Workers pick due messages off the (status, next_attempt_at) index,
+      claim them with one update_many stamped with a claim id (status
+      "sending", next_attempt_at pushed out by a lease), then send the
+      claimed batch. A worker that dies mid-send leaves its batch to be
+      picked up again once the lease runs out.
+    - Failures retry with exponential backoff plus jitter
+      (base * 2^(attempts-1), capped). After max_attempts the message is
+      dead-lettered (status "dead", last_error kept for inspection).
+      Messages that failed in a batch are retried one per provider call,
+      so a single bad address cannot sink its neighbours.
+    - Messages can carry expires_at (magic links: 15 minutes). Expired
+      messages are dropped instead of sent late.
+    - The body (html, which holds sign-in links) is only kept while a
+      message can still be delivered: sent, expired and dead-lettered
+      documents drop it and keep to/subject/tag/last_error for inspection.
+      Finished documents get purge_at; a TTL index removes them (sent after
+      a day, dead/expired after a week).
+    - enqueue() wakes an idle worker immediately; otherwise workers poll.
+
+Metrics (GET /metrics, utils/metrics.py):
+    EMAIL_OUTBOX_MESSAGES by outcome (sent / failed / dead_lettered /
+    expired), EMAIL_OUTBOX_QUEUE (queued / dead; refreshed at most every
+    few seconds by the workers) and EMAIL_DELIVERY_SECONDS (enqueue →
+    provider accepted).
+
+Usage:
+    outbox = EmailOutbox(database["email_outbox"], create_email_sender())
+    outbox.start()                       # in lifespan startup
+    await outbox.enqueue({"to": ..., "subject": ..., "html": ..., "tag": "magic_link", "user_id": ...})
+    await outbox.stop()                  # in lifespan shutdown
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from utils.metrics import EMAIL_DELIVERY_SECONDS, EMAIL_OUTBOX_MESSAGES, EMAIL_OUTBOX_QUEUE
+
+logger = logging.getLogger("petai")
+
+ACTIVE_STATUSES = ["pending", "sending"]
+
+
+class EmailOutbox:
+    """
+    Queue + background delivery workers.
+
+    Args:
+        collection: Motor collection holding outbox documents
+        sender: Provider with async send_batch(messages) and max_batch
+        workers: Number of concurrent delivery workers
+        max_attempts: Attempts before a message is dead-lettered
+        base_backoff_seconds / max_backoff_seconds: Retry delay bounds
+        lease_seconds: How long a claimed batch is reserved for its worker
+        poll_seconds: Idle poll interval (enqueue wakes workers sooner)
+    """
+
+    # Used as a sender by ReminderScheduler: one insert_many per chunk
+    max_batch = 1000
+
+    def __init__(
+        self,
+        collection,
+        sender,
+        *,
+        workers: int = 2,
+        max_attempts: int = 5,
+        base_backoff_seconds: float = 5,
+        max_backoff_seconds: float = 900,
+        lease_seconds: float = 120,
+        poll_seconds: float = 2,
+        sent_retention: timedelta = timedelta(days=1),
+        dead_retention: timedelta = timedelta(days=7),
+    ):
+        self._collection = collection
+        self._sender = sender
+        self._workers = workers
+        self._max_attempts = max_attempts
+        self._base_backoff = base_backoff_seconds
+        self._max_backoff = max_backoff_seconds
+        self._lease = timedelta(seconds=lease_seconds)
+        self._poll = poll_seconds
+        self._sent_retention = sent_retention
+        self._dead_retention = dead_retention
+        self.provider = getattr(sender, "name", type(sender).__name__)
+
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+
+        self._depth_checked_at = 0.0
+
+    # --- Enqueue ---
+
+    async def enqueue(self, message: Dict, expires_at: Optional[datetime] = None):
+        """Queue one message; returns its outbox id. Never touches the provider."""
+        result = await self._collection.insert_one(self._new_doc(message, expires_at))
+        self._wake.set()
+        return result.inserted_id
+
+    async def send_batch(self, messages: List[Dict]):
+        """Queue many messages with one insert (sender interface for background jobs)."""
+        if messages:
+            await self._collection.insert_many([self._new_doc(m, None) for m in messages], ordered=False)
+            self._wake.set()
+
+    @staticmethod
+    def _new_doc(message: Dict, expires_at: Optional[datetime]) -> Dict:
+        now = datetime.utcnow()
+        return {
+            "to": message["to"],
+            "subject": message["subject"],
+            "html": message["html"],
+            "tag": message.get("tag"),
+            "user_id": message.get("user_id"),   # Account deletion drops a user's mail
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "expires_at": expires_at,
+        }
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start the worker pool (no-op if already running)."""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"email-outbox-{i}")
+            for i in range(self._workers)
+        ]
+
+    async def stop(self):
+        """Cancel workers; in-flight batches are re-delivered after their lease."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            try:
+                delivered = await self.deliver_due()
+                await self._refresh_depth()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Email outbox worker error: %s", e, exc_info=True)
+                delivered = 0
+            if not delivered:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._poll)
+                except asyncio.TimeoutError:
+                    pass
+
+    # --- Delivery ---
+
+    async def deliver_due(self) -> int:
+        """Claim and deliver one batch of due messages. Returns how many were claimed."""
+        now = datetime.utcnow()
+        due = {"status": {"$in": ACTIVE_STATUSES}, "next_attempt_at": {"$lte": now}}
+        candidates = await self._collection.find(due, {"_id": 1}).sort("next_attempt_at", 1) \
+            .limit(self._sender.max_batch).to_list(self._sender.max_batch)
+        if not candidates:
+            return 0
+
+        claim_id = uuid.uuid4().hex
+        ids = [doc["_id"] for doc in candidates]
+        await self._collection.update_many(
+            {**due, "_id": {"$in": ids}},
+            {"$set": {"status": "sending", "claim_id": claim_id, "next_attempt_at": now + self._lease}},
+        )
+        claimed = await self._collection.find({"_id": {"$in": ids}, "claim_id": claim_id}).to_list(None)
+        if not claimed:
+            return 0
+
+        expired = [doc for doc in claimed if doc.get("expires_at") and doc["expires_at"] <= now]
+        if expired:
+            await self._finish(expired, "expired", now + self._dead_retention)
+            EMAIL_OUTBOX_MESSAGES.inc("expired", amount=len(expired))
+
+        live = [doc for doc in claimed if not (doc.get("expires_at") and doc["expires_at"] <= now)]
+        # Messages that already failed in a batch go out alone
+        groups = [[doc] for doc in live if doc.get("attempts", 0) > 0]
+        fresh = [doc for doc in live if doc.get("attempts", 0) == 0]
+        if fresh:
+            groups.append(fresh)
+
+        for group in groups:
+            await self._deliver(group)
+        return len(claimed)
+
+    async def _deliver(self, docs: List[Dict]):
+        messages = [{"to": d["to"], "subject": d["subject"], "html": d["html"], "tag": d.get("tag")} for d in docs]
+        try:
+            await self._sender.send_batch(messages)
+        except Exception as e:
+            await self._record_failure(docs, str(e)[:500])
+            return
+
+        now = datetime.utcnow()
+        await self._finish(docs, "sent", now + self._sent_retention, {"sent_at": now})
+        EMAIL_OUTBOX_MESSAGES.inc("sent", amount=len(docs))
+        for doc in docs:
+            EMAIL_DELIVERY_SECONDS.observe((now - doc["created_at"]).total_seconds())
+
+    async def _record_failure(self, docs: List[Dict], error: str):
+        now = datetime.utcnow()
+        EMAIL_OUTBOX_MESSAGES.inc("failed", amount=len(docs))
+        # Docs in a batch usually share an attempt count — one update per distinct count
+        by_attempts: Dict[int, List] = {}
+        for doc in docs:
+            by_attempts.setdefault(doc.get("attempts", 0) + 1, []).append(doc["_id"])
+
+        for attempts, ids in by_attempts.items():
+            if attempts >= self._max_attempts:
+                update = {"status": "dead", "attempts": attempts, "last_error": error,
+                          "purge_at": now + self._dead_retention}
+                unset = {"claim_id": "", "html": ""}
+                EMAIL_OUTBOX_MESSAGES.inc("dead_lettered", amount=len(ids))
+                logger.error("Email outbox: %d message(s) dead-lettered after %d attempts: %s",
+                             len(ids), attempts, error)
+            else:
+                delay = min(self._max_backoff, self._base_backoff * 2 ** (attempts - 1))
+                delay *= random.uniform(0.8, 1.2)
+                update = {"status": "pending", "attempts": attempts, "last_error": error,
+                          "next_attempt_at": now + timedelta(seconds=delay)}
+                unset = {"claim_id": ""}
+                logger.warning("Email outbox: %d message(s) failed (attempt %d), retry in %.0fs: %s",
+                               len(ids), attempts, delay, error)
+            await self._collection.update_many({"_id": {"$in": ids}}, {"$set": update, "$unset": unset})
+
+    async def _finish(self, docs: List[Dict], status: str, purge_at: datetime, extra: Optional[Dict] = None):
+        # Drop the body: it is never sent again and may hold a live link
+        await self._collection.update_many(
+            {"_id": {"$in": [d["_id"] for d in docs]}},
+            {"$set": {"status": status, "purge_at": purge_at, **(extra or {})}, "$unset": {"claim_id": "", "html": ""}},
+        )
+
+    # --- Metrics ---
+
+    async def _refresh_depth(self, every_seconds: float = 10):
+        if time.monotonic() - self._depth_checked_at < every_seconds:
+            return
+        self._depth_checked_at = time.monotonic()
+        queued = await self._collection.count_documents({"status": {"$in": ACTIVE_STATUSES}})
+        dead = await self._collection.count_documents({"status": "dead"})
+        EMAIL_OUTBOX_QUEUE.set("queued", value=queued)
+        EMAIL_OUTBOX_QUEUE.set("dead", value=dead)
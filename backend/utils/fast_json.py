@@ -0,0 +1,93 @@
+"""
+BowlWise - Fast JSON Assembly
+
+Build JSON response bodies from pre-encoded fragments instead of running
+every item back through Pydantic validation and the default encoder.
+
+How it works:
+    - Product fragments are encoded once per catalog version (see
+      product_catalog.py) and stored as bytes.
+    - List responses are b"[" + b",".join(fragments) + b"]".
+    - Wrapper objects (recommendation score/reasons, top-level counts) are
+      encoded with pydantic_core.to_json (Rust encoder, already installed
+      with Pydantic) and spliced around the cached fragments.
+    - The result is returned as a plain Response, so FastAPI skips
+      response_model validation and jsonable_encoder entirely.
+
+Usage:
+    from utils.fast_json import json_array, json_object_with, json_bytes_response
+
+    body = json_array(fragments)
+    return json_bytes_response(body, headers=response.headers)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from pydantic_core import to_json
+from starlette.responses import Response
+
+
+# ============================================
+# Fragment Assembly
+# ============================================
+
+def encode(value: Any) -> bytes:
+    """Encode a plain Python value (dict/list/str/number/datetime) to compact JSON bytes."""
+    return to_json(value)
+
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    """Join pre-encoded JSON values into a JSON array."""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def json_object_with(first_key: str, first_fragment: bytes, rest: Dict[str, Any]) -> bytes:
+    """
+    Encode an object whose first member is an already-encoded fragment.
+
+    Example:
+        json_object_with("product", b'{"id":"x"}', {"score": 91.5})
+        → b'{"product":{"id":"x"},"score":91.5}'
+    """
+    head = b'{"' + first_key.encode() + b'":' + first_fragment
+    if not rest:
+        return head + b"}"
+    return head + b"," + encode(rest)[1:]
+
+
+def json_object_ending_with(head: Dict[str, Any], last_key: str, last_fragment: bytes) -> bytes:
+    """
+    Encode an object whose last member is an already-encoded fragment.
+
+    Example:
+        json_object_ending_with({"total": 2}, "items", b'[1,2]')
+        → b'{"total":2,"items":[1,2]}'
+    """
+    tail = b'"' + last_key.encode() + b'":' + last_fragment + b"}"
+    if not head:
+        return b"{" + tail
+    return encode(head)[:-1] + b"," + tail
+
+
+# ============================================
+# Response
+# ============================================
+
+def json_bytes_response(body: bytes, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    Wrap pre-encoded JSON bytes in a Response.
+
+    Pass the injected `response.headers` so headers set earlier in the
+    handler (ETag, X-Next-Cursor, ...) are kept — FastAPI does not merge
+    them into a Response returned directly.
+    """
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers={k: v for k, v in headers.items() if k.lower() not in ("content-length", "content-type")} if headers else None,
+    )
@@ -0,0 +1,118 @@
+"""
+BowlWise - HTTP Conditional Requests
+
+Strong ETags and If-None-Match / If-Modified-Since handling so clients
+that already hold the current representation get a bodiless 304.
+
+How it works:
+    - make_etag() hashes the inputs that fully determine a response
+      (catalog version, query params, pet updated_at, ...) into a quoted
+      strong validator. Equal inputs always give the same ETag, on every
+      worker, without rendering the body.
+    - is_not_modified() follows RFC 9110: If-None-Match wins when present;
+      otherwise If-Modified-Since is compared at one-second resolution.
+    - Responses use Cache-Control: no-cache, so browsers keep the body but
+      revalidate every time — a fresh catalog is never hidden by caching.
+
+Usage:
+    from utils.http_cache import make_etag, is_not_modified, not_modified, set_validators
+
+    etag = make_etag("products", version, str(request.query_params))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from utils.metrics import CACHE_REQUESTS
+
+CACHE_CONTROL = "no-cache"
+
+
+# ============================================
+# Validators
+# ============================================
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values that determine a response body."""
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def http_date(dt: datetime) -> str:
+    """Format a naive-UTC (or aware) datetime as an HTTP-date."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+# ============================================
+# Request Evaluation
+# ============================================
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison per RFC 9110 §13.1.2 (If-None-Match ignores the W/ prefix)."""
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """True when the client's cached copy (per its conditional headers) is still current."""
+    fresh = _client_copy_is_fresh(request, etag, last_modified)
+    CACHE_REQUESTS.inc("http_conditional", "hit" if fresh else "miss")
+    return fresh
+
+
+def _client_copy_is_fresh(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+        return modified.replace(microsecond=0) <= since
+    return False
+
+
+# ============================================
+# Response Helpers
+# ============================================
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None):
+    """Attach ETag / Last-Modified / Cache-Control to a full (200) response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Build a bodiless 304 carrying the same validators as the 200 would."""
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,430 @@
+"""
+BowlWise - Index Registry
+
+Single source of truth for every MongoDB index the API relies on and every
+query shape main.py issues. Index creation at startup and the explain-plan
+audit (audit_indexes.py) are both driven from this file, so adding a query
+without a supporting index shows up as a failed audit instead of a slow
+collection scan in production.
+
+Data Flow:
+    INDEXES      → ensure_indexes() (run as a startup migration, see utils/startup.py)
+    QUERY_SHAPES → audit_indexes.py → explain() → fail on COLLSCAN
+                   (aggregations: the outer pipeline and every $lookup
+                   sub-pipeline are explained separately)
+    SUPERSEDED_INDEXES → drop_superseded_indexes() (startup migration)
+
+Adding a new query to main.py:
+    1. Add a QueryShape below with realistic sample values
+    2. If it needs a new index, add an IndexSpec to INDEXES
+    3. Run: python audit_indexes.py
+
+Replacing an index:
+    Add the old key list to SUPERSEDED_INDEXES and a migration that calls
+    drop_superseded_indexes() (utils/startup.py) — ensure_indexes() only
+    ever creates, so without it the old index keeps costing every write.
+
+Usage:
+    from utils.index_registry import ensure_indexes
+    await ensure_indexes(database)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from utils.repositories import dashboard_pipeline
+
+
+# ============================================
+# Registry Types
+# ============================================
+
+class IndexSpec:
+    """
+    One index on one collection.
+
+    Args:
+        keys: List of (field, direction) tuples, e.g. [("user_id", 1), ("purchased_at", -1)]
+        options: Extra create_index options (unique, sparse, name, ...)
+    """
+
+    def __init__(self, keys: List[Tuple[str, int]], **options):
+        self.keys = keys
+        self.options = options
+
+    def __repr__(self):
+        return f"IndexSpec({self.keys}, {self.options})"
+
+
+class QueryShape:
+    """
+    One query shape issued by the API.
+
+    Args:
+        name: Short identifier used in audit output
+        collection: Collection name ("pets", "products", "users", "purchases", ...)
+        filter: Query filter with realistic sample values (types matter for the planner)
+        sort: Optional list of (field, direction) tuples
+        used_by: Endpoint/function(s) that issue this query
+        allow_collscan: True for intentional full scans (e.g. unfiltered catalog listing)
+        pipeline: Aggregation pipeline; when set, filter/sort are ignored and
+            the pipeline is explained instead
+        lookup_vars: Sample values for the `let` variables of the pipeline's
+            $lookup stages (each sub-pipeline is explained with them bound)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        collection: str,
+        filter: Dict,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        used_by: str = "",
+        allow_collscan: bool = False,
+        pipeline: Optional[List[Dict]] = None,
+        lookup_vars: Optional[Dict] = None,
+    ):
+        self.name = name
+        self.collection = collection
+        self.filter = filter
+        self.sort = sort
+        self.used_by = used_by
+        self.allow_collscan = allow_collscan
+        self.pipeline = pipeline
+        self.lookup_vars = lookup_vars or {}
+
+
+# ============================================
+# Index Definitions (created at startup)
+# ============================================
+
+INDEXES: Dict[str, List[IndexSpec]] = {
+    "products": [
+        IndexSpec([("brand_key", 1), ("_id", 1)]),   # Brand prefix filter + keyset paging
+        IndexSpec([("life_stage", 1)]),
+        IndexSpec([("breed_size", 1)]),
+    ],
+    "pets": [
+        IndexSpec([("public_id", 1)], unique=True),
+        IndexSpec([("session_token", 1)]),     # verify_magic_link auto-claim
+        IndexSpec([("user_id", 1)]),           # /api/auth/me, delete_account
+        # Guest pet compaction: unclaimed (user_id null) by last access
+        IndexSpec([("user_id", 1), ("last_accessed_at", 1)]),
+    ],
+    "users": [
+        IndexSpec([("email", 1)], unique=True),
+    ],
+    "auth_tokens": [
+        IndexSpec([("token_hash", 1)], unique=True),               # Verify: one indexed lookup
+        IndexSpec([("expires_at", 1)], expireAfterSeconds=0),     # TTL: expired / consumed tokens
+        IndexSpec([("user_id", 1)]),                               # Revoke a user's unused links
+    ],
+    "purchases": [
+        IndexSpec([("user_id", 1), ("status", 1)]),
+        # Purchase history pages (purchased_at, _id) — _id makes the keyset order total
+        IndexSpec([("user_id", 1), ("pet_id", 1), ("purchased_at", -1), ("_id", -1)]),
+        # A pet's purchases by status in history order: dashboard active lookup,
+        # close_active, get_purchases?status=
+        IndexSpec([("user_id", 1), ("pet_id", 1), ("status", 1), ("purchased_at", -1), ("_id", -1)]),
+        # Reminder sweep: range scan over active, not yet reminded purchases
+        # by depletion date (sent / skipped reminders sit outside the range)
+        IndexSpec([("status", 1), ("reminder_state", 1), ("estimated_depletion_at", 1), ("_id", 1)]),
+    ],
+    "pets_archive": [
+        IndexSpec([("user_id", 1)]),                               # Account deletion cascade
+    ],
+    "email_outbox": [
+        IndexSpec([("status", 1), ("next_attempt_at", 1)]),       # Workers: due messages
+        IndexSpec([("purge_at", 1)], expireAfterSeconds=0),       # TTL: finished messages
+        IndexSpec([("user_id", 1)]),                               # Account deletion cascade
+    ],
+    "spending_rollups": [
+        IndexSpec([("user_id", 1), ("pet_id", 1), ("month", 1)], unique=True),  # One bucket per pet-month
+    ],
+    "rate_limits": [
+        IndexSpec([("expires_at", 1)], expireAfterSeconds=0),     # TTL: past sliding windows
+    ],
+    "account_deletions": [
+        IndexSpec([("status", 1), ("lease_until", 1)]),          # Worker: next due / abandoned job
+        IndexSpec([("purge_at", 1)], expireAfterSeconds=0),       # TTL: completed jobs
+    ],
+}
+
+
+async def ensure_indexes(database) -> int:
+    """
+    Create every index in INDEXES (no-op for indexes that already exist).
+    All create_index calls are issued concurrently.
+
+    Args:
+        database: Motor database handle
+
+    Returns:
+        Number of index specs ensured
+    """
+    await asyncio.gather(*(
+        database[collection_name].create_index(spec.keys, **spec.options)
+        for collection_name, specs in INDEXES.items()
+        for spec in specs
+    ))
+    return sum(len(specs) for specs in INDEXES.values())
+
+
+# ============================================
+# Superseded Indexes (dropped by a startup migration)
+# ============================================
+
+# Indexes earlier releases created that nothing queries any more. Each one
+# still costs a key write on every insert/update and RAM for its pages.
+SUPERSEDED_INDEXES: Dict[str, List[List[Tuple[str, int]]]] = {
+    "products": [
+        [("brand", 1)],                                    # → (brand_key, _id)
+        [("format", 1), ("life_stage", 1)],                # Format is filtered in memory (ProductCatalog)
+    ],
+    "users": [
+        [("magic_link_token", 1)],                         # Tokens moved to auth_tokens
+        [("consumed_magic_token", 1)],
+    ],
+    "purchases": [
+        [("user_id", 1), ("pet_id", 1), ("purchased_at", -1)],  # → (..., purchased_at, _id)
+        [("status", 1), ("estimated_depletion_at", 1), ("_id", 1)],  # → (status, reminder_state, ...)
+    ],
+}
+
+
+async def drop_superseded_indexes(database) -> List[str]:
+    """
+    Drop every index in SUPERSEDED_INDEXES that exists, matched by key
+    pattern (whatever it was named). Missing indexes and collections are
+    skipped.
+
+    Returns:
+        "collection.index_name" of each index dropped
+    """
+    dropped = []
+    for collection_name, key_lists in SUPERSEDED_INDEXES.items():
+        collection = database[collection_name]
+        async for index in collection.list_indexes():
+            if list(index["key"].items()) not in key_lists:
+                continue
+            try:
+                await collection.drop_index(index["name"])
+            except OperationFailure as e:
+                if e.code != 27:    # IndexNotFound: another instance dropped it first
+                    raise
+                continue
+            dropped.append(f"{collection_name}.{index['name']}")
+    return dropped
+
+
+# ============================================
+# Query Shapes (every query main.py issues)
+# ============================================
+
+# Sample values only need the right type — the planner picks indexes by
+# field and operator, not by value.
+_SAMPLE_OID = ObjectId()
+_SAMPLE_UUID = "00000000-0000-4000-8000-000000000000"
+_SAMPLE_HASH = "0" * 64
+_SAMPLE_NOW = datetime(2026, 1, 1)
+_PRODUCT_LIST_SORT = [("brand_key", 1), ("_id", 1)]   # Mirrors PRODUCT_LIST_SORT in utils/repositories.py
+_PURCHASE_HISTORY_SORT = [("purchased_at", -1), ("_id", -1)]   # Mirrors PURCHASE_HISTORY_SORT (repositories.py)
+_REMINDER_SCAN_SORT = [("estimated_depletion_at", 1), ("_id", 1)]   # Mirrors REMINDER_SCAN_SORT (reminders.py)
+_SAMPLE_DUE = {"$gte": _SAMPLE_NOW, "$lte": _SAMPLE_NOW + timedelta(days=5)}
+
+QUERY_SHAPES: List[QueryShape] = [
+    # --- pets ---
+    QueryShape(
+        "pet_by_public_id", "pets", {"public_id": _SAMPLE_UUID},
+        used_by="get_pet_by_id, update_pet, delete_pet, claim_pet, create_purchase, get_recommendations",
+    ),
+    QueryShape(
+        "pet_by_session_token", "pets", {"session_token": _SAMPLE_UUID},
+        used_by="verify_magic_link",
+    ),
+    QueryShape(
+        "pets_by_user", "pets", {"user_id": str(_SAMPLE_OID)},
+        used_by="get_current_user_profile, AccountDeletionWorker",
+    ),
+    QueryShape("pet_by_id", "pets", {"_id": _SAMPLE_OID}, used_by="create_pet, touch_pet"),
+    QueryShape(
+        "pets_expired_guests", "pets", {"user_id": None, "last_accessed_at": {"$lt": _SAMPLE_NOW}},
+        sort=[("last_accessed_at", 1)], used_by="PetRetention.compact",
+    ),
+
+    # --- users ---
+    QueryShape("user_by_id", "users", {"_id": _SAMPLE_OID}, used_by="get_current_user, verify_magic_link"),
+    QueryShape("user_by_email", "users", {"email": "someone@example.com"}, used_by="request_magic_link (upsert)"),
+
+    # --- auth_tokens ---
+    QueryShape(
+        "auth_token_unconsumed", "auth_tokens",
+        {"token_hash": _SAMPLE_HASH, "consumed_at": None, "expires_at": {"$gt": _SAMPLE_NOW}},
+        used_by="verify_magic_link (atomic consume)",
+    ),
+    QueryShape(
+        "auth_token_recently_consumed", "auth_tokens",
+        {"token_hash": _SAMPLE_HASH, "consumed_at": {"$gte": _SAMPLE_NOW - timedelta(seconds=60)}},
+        used_by="verify_magic_link (idempotent retry)",
+    ),
+    QueryShape(
+        "auth_tokens_unused_by_user", "auth_tokens", {"user_id": str(_SAMPLE_OID), "consumed_at": None},
+        used_by="request_magic_link (revoke older links)",
+    ),
+    QueryShape("auth_tokens_by_user", "auth_tokens", {"user_id": str(_SAMPLE_OID)}, used_by="AccountDeletionWorker"),
+
+    # --- purchases ---
+    QueryShape("purchase_by_id", "purchases", {"_id": _SAMPLE_OID}, used_by="update/delete/extend purchase"),
+    QueryShape(
+        "purchases_by_pet", "purchases", {"user_id": str(_SAMPLE_OID), "pet_id": _SAMPLE_UUID},
+        sort=_PURCHASE_HISTORY_SORT,
+        used_by="get_purchases (first page)",
+    ),
+    QueryShape(
+        "purchases_page_before_cursor", "purchases",
+        {"$and": [
+            {"user_id": str(_SAMPLE_OID), "pet_id": _SAMPLE_UUID},
+            {"$or": [
+                {"purchased_at": {"$lt": _SAMPLE_NOW}},
+                {"purchased_at": _SAMPLE_NOW, "_id": {"$lt": _SAMPLE_OID}},
+            ]},
+        ]},
+        sort=_PURCHASE_HISTORY_SORT, used_by="get_purchases (?before=)",
+    ),
+    QueryShape(
+        "purchases_by_pet_status", "purchases",
+        {"user_id": str(_SAMPLE_OID), "pet_id": _SAMPLE_UUID, "status": "active"},
+        sort=_PURCHASE_HISTORY_SORT,
+        used_by="get_purchases (status filter), create_purchase (auto-complete active)",
+    ),
+    QueryShape("purchases_by_user", "purchases", {"user_id": str(_SAMPLE_OID)}, used_by="AccountDeletionWorker"),
+    QueryShape(
+        "purchases_skipped_reminders", "purchases",
+        {"user_id": str(_SAMPLE_OID), "status": "active", "reminder_state": "skipped"},
+        used_by="update_preferences (ReminderScheduler.release_skipped)",
+    ),
+    QueryShape(
+        "purchases_by_pet_month", "purchases",
+        {"user_id": str(_SAMPLE_OID), "pet_id": _SAMPLE_UUID,
+         "purchased_at": {"$gte": _SAMPLE_NOW, "$lt": _SAMPLE_NOW + timedelta(days=31)}},
+        sort=[("purchased_at", 1)],
+        used_by="remove_purchase (rollup first/last dates)",
+    ),
+    QueryShape(
+        "purchases_due_soon", "purchases",
+        {"status": "active", "reminder_state": None, "estimated_depletion_at": _SAMPLE_DUE},
+        sort=_REMINDER_SCAN_SORT, used_by="ReminderScheduler.sweep (first page)",
+    ),
+    QueryShape(
+        "purchases_due_soon_after_cursor", "purchases",
+        {"$and": [
+            {"status": "active", "reminder_state": None, "estimated_depletion_at": _SAMPLE_DUE},
+            {"$or": [
+                {"estimated_depletion_at": {"$gt": _SAMPLE_NOW}},
+                {"estimated_depletion_at": _SAMPLE_NOW, "_id": {"$gt": _SAMPLE_OID}},
+            ]},
+        ]},
+        sort=_REMINDER_SCAN_SORT, used_by="ReminderScheduler.sweep (next pages)",
+    ),
+    QueryShape(
+        "purchases_due_soon_stale_claims", "purchases",
+        {"status": "active", "reminder_state": "claimed", "estimated_depletion_at": _SAMPLE_DUE,
+         "reminder_claimed_at": {"$lt": _SAMPLE_NOW}},
+        sort=_REMINDER_SCAN_SORT, used_by="ReminderScheduler.sweep (abandoned claims)",
+    ),
+    QueryShape(
+        "purchases_by_ids", "purchases", {"_id": {"$in": [_SAMPLE_OID]}, "reminder_claim_id": "0" * 32},
+        used_by="ReminderScheduler (claim / mark sent)",
+    ),
+    QueryShape("users_by_ids", "users", {"_id": {"$in": [_SAMPLE_OID]}}, used_by="ReminderScheduler"),
+    QueryShape("pets_by_public_ids", "pets", {"public_id": {"$in": [_SAMPLE_UUID]}}, used_by="ReminderScheduler"),
+
+    # --- email_outbox ---
+    QueryShape(
+        "outbox_due", "email_outbox",
+        {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": _SAMPLE_NOW}},
+        sort=[("next_attempt_at", 1)], used_by="EmailOutbox.deliver_due",
+    ),
+    QueryShape(
+        "outbox_claimed", "email_outbox", {"_id": {"$in": [_SAMPLE_OID]}, "claim_id": "0" * 32},
+        used_by="EmailOutbox.deliver_due",
+    ),
+    QueryShape("outbox_depth", "email_outbox", {"status": {"$in": ["pending", "sending"]}}, used_by="EmailOutbox metrics"),
+    QueryShape("outbox_dead", "email_outbox", {"status": "dead"}, used_by="EmailOutbox metrics"),
+    QueryShape("pets_archive_by_user", "pets_archive", {"user_id": str(_SAMPLE_OID)}, used_by="AccountDeletionWorker"),
+    QueryShape("outbox_by_user", "email_outbox", {"user_id": str(_SAMPLE_OID)}, used_by="AccountDeletionWorker"),
+
+    # --- spending_rollups ---
+    QueryShape(
+        "rollup_bucket", "spending_rollups",
+        {"user_id": str(_SAMPLE_OID), "pet_id": _SAMPLE_UUID, "month": "2026-01"},
+        used_by="create/update/delete_purchase ($inc)",
+    ),
+    QueryShape(
+        "rollups_trend", "spending_rollups",
+        {"user_id": str(_SAMPLE_OID), "pet_id": _SAMPLE_UUID, "month": {"$gte": "2025-02"}},
+        sort=[("month", 1)], used_by="get_spending_trend",
+    ),
+    QueryShape("rollups_by_user", "spending_rollups", {"user_id": str(_SAMPLE_OID)}, used_by="AccountDeletionWorker"),
+
+    # --- rate_limits ---
+    QueryShape("rate_limit_window", "rate_limits", {"_id": "create_pet:127.0.0.1|60|29000000"}, used_by="MongoSlidingWindowBackend"),
+
+    # --- account_deletions ---
+    QueryShape(
+        "account_deletion_due", "account_deletions",
+        {"status": {"$in": ["pending", "running"]}, "lease_until": {"$lte": _SAMPLE_NOW}},
+        sort=[("lease_until", 1)], used_by="AccountDeletionWorker.run_next",
+    ),
+    QueryShape("account_deletion_by_id", "account_deletions", {"_id": "3f2c9a"}, used_by="get_account_deletion"),
+
+    # --- products ---
+    QueryShape("product_by_id", "products", {"_id": "Orijen-Original-Adult"}, used_by="get_product_by_id, create_purchase"),
+    QueryShape(
+        "catalog_load", "products", {}, sort=[("_id", 1)],
+        used_by="ProductCatalog._load (once per catalog version; feeds get_recommendations)",
+    ),
+    QueryShape(
+        "products_by_life_stage", "products", {"life_stage": "adult"},
+        sort=_PRODUCT_LIST_SORT, used_by="get_all_products",
+    ),
+    QueryShape(
+        "products_by_breed_size", "products", {"breed_size": "large"},
+        sort=_PRODUCT_LIST_SORT, used_by="get_all_products",
+    ),
+    QueryShape(
+        "products_by_grain_free", "products", {"grain_free": True},
+        sort=_PRODUCT_LIST_SORT, used_by="get_all_products",
+    ),
+    QueryShape(
+        "products_by_brand_prefix", "products", {"brand_key": {"$regex": "^ori"}},
+        sort=_PRODUCT_LIST_SORT, used_by="get_all_products",
+    ),
+    QueryShape(
+        "products_page_after_cursor", "products",
+        {"$or": [{"brand_key": {"$gt": "orijen"}}, {"brand_key": "orijen", "_id": {"$gt": "Orijen-Original-Adult"}}]},
+        sort=_PRODUCT_LIST_SORT, used_by="get_all_products (?cursor=)",
+    ),
+    QueryShape("catalog_meta_by_id", "catalog_meta", {"_id": "products"}, used_by="CatalogVersion.get"),
+    QueryShape(
+        "products_newest_import", "products", {}, sort=[("imported_at", -1)],
+        used_by="CatalogVersion.get (legacy fallback, no catalog_meta doc)",
+        allow_collscan=True,   # Runs at most once per TTL and only until the next import
+    ),
+    QueryShape("products_unfiltered", "products", {}, sort=_PRODUCT_LIST_SORT, used_by="get_all_products (no filters)"),
+
+    # --- aggregations ---
+    QueryShape(
+        "dashboard", "pets", {}, used_by="get_dashboard (MongoPetRepository.dashboard)",
+        pipeline=dashboard_pipeline(str(_SAMPLE_OID), 10),
+        lookup_vars={"pet_id": _SAMPLE_UUID},
+    ),
+]
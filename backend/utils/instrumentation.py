@@ -0,0 +1,274 @@
+"""
+BowlWise - Request Instrumentation
+
+Per-request accounting of MongoDB round-trips and named handler stages.
+Lets us see whether a slow request was slow because of Mongo, scoring,
+or serialization without attaching a profiler.
+
+Data Flow:
+    Middleware → start_request() → contextvar holds RequestTimings
+    Handler    → InstrumentedCollection / timed_stage() record into it
+    Middleware → server_timing_header() + log_fields() on the way out
+
+How it works:
+    - A RequestTimings object is stored in a contextvar for the lifetime of
+      one request. Starlette copies the context into the endpoint task, so
+      the handler mutates the same object the middleware created.
+    - InstrumentedCollection wraps a Motor collection. Every awaited
+      operation (find_one, insert_one, update_many, ...) is counted and timed.
+      Cursors returned by find()/aggregate() are timed while iterated.
+    - timed_stage("scoring") times a block of handler code.
+    - Outside a request (startup, background workers) nothing is recorded
+      per request; every operation still feeds the process-wide
+      /metrics counters (utils/metrics.py).
+
+Usage:
+    from utils.instrumentation import instrument_collection, timed_stage
+
+    pets_collection = instrument_collection(database["pets"])
+
+    with timed_stage("pet_fetch"):
+        pet = await pets_collection.find_one({"public_id": pet_id})
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import MONGO_OPERATION_SECONDS, MONGO_OPERATIONS
+
+
+# ============================================
+# Per-Request Timing Record
+# ============================================
+
+class RequestTimings:
+    """
+    Mutable timing record for a single request.
+
+    - db_ops / db_ms: total MongoDB operations and time spent awaiting them
+    - collections: per-collection {"ops": int, "ms": float}
+    - stages: ordered list of (stage_name, duration_ms)
+    """
+
+    __slots__ = ("started", "db_ops", "db_ms", "collections", "stages")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_ops = 0
+        self.db_ms = 0.0
+        self.collections: Dict[str, Dict[str, float]] = {}
+        self.stages: List[Tuple[str, float]] = []
+
+    def record_db(self, collection: str, duration_ms: float, ops: int = 1):
+        """Add one (or more) MongoDB operations to the totals."""
+        self.db_ops += ops
+        self.db_ms += duration_ms
+        entry = self.collections.get(collection)
+        if entry is None:
+            entry = self.collections[collection] = {"ops": 0, "ms": 0.0}
+        entry["ops"] += ops
+        entry["ms"] += duration_ms
+
+    def record_stage(self, name: str, duration_ms: float):
+        """Record a named handler stage (e.g. "scoring")."""
+        self.stages.append((name, duration_ms))
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the request started."""
+        return (time.perf_counter() - self.started) * 1000
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    """Create a fresh RequestTimings and bind it to the current context."""
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Return the RequestTimings for the active request, or None outside a request."""
+    return _current_timings.get()
+
+
+@contextmanager
+def timed_stage(name: str):
+    """Time a block of handler code as a named stage. No-op outside a request."""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.record_stage(name, (time.perf_counter() - start) * 1000)
+
+
+# ============================================
+# Output Formatting
+# ============================================
+
+def server_timing_header(timings: RequestTimings, total_ms: float) -> str:
+    """
+    Format timings as a Server-Timing header value.
+
+    Example:
+        db;dur=4.2;desc="3 ops", pet_fetch;dur=1.1, scoring;dur=6.0, total;dur=14.9
+    """
+    parts = [f'db;dur={timings.db_ms:.1f};desc="{timings.db_ops} ops"']
+    for name, duration_ms in timings.stages:
+        parts.append(f"{name};dur={duration_ms:.1f}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+def log_fields(timings: RequestTimings) -> str:
+    """
+    Format timings as space-separated key=value pairs for the request log line.
+
+    Example:
+        db_ops=3 db_ms=4.2 pets=1/1.1 products=1/2.9 stage.scoring=6.0
+    """
+    fields = [f"db_ops={timings.db_ops}", f"db_ms={timings.db_ms:.1f}"]
+    for collection, entry in timings.collections.items():
+        fields.append(f"{collection}={entry['ops']}/{entry['ms']:.1f}")
+    for name, duration_ms in timings.stages:
+        fields.append(f"stage.{name}={duration_ms:.1f}")
+    return " ".join(fields)
+
+
+# ============================================
+# Motor Collection Wrapper
+# ============================================
+
+# Collection methods that issue exactly one awaited round-trip
+_TIMED_METHODS = frozenset({
+    "find_one", "insert_one", "insert_many", "replace_one",
+    "update_one", "update_many", "delete_one", "delete_many",
+    "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+    "count_documents", "estimated_document_count", "distinct", "bulk_write",
+    "create_index", "create_indexes",
+})
+
+# Collection methods that return a cursor (timed while iterated)
+_CURSOR_METHODS = frozenset({"find", "aggregate"})
+
+
+class InstrumentedCursor:
+    """
+    Wraps a Motor cursor so iteration time is charged to the request.
+
+    Chaining methods (sort, limit, skip, ...) return the wrapper so
+    `collection.find(q).sort(...).limit(n)` keeps working unchanged.
+    The cursor is counted as one operation when it is first iterated; its
+    total iteration time is one /metrics observation once it is exhausted.
+    """
+
+    def __init__(self, cursor, collection_name: str):
+        self._cursor = cursor
+        self._collection_name = collection_name
+        self._counted = False
+        self._elapsed = 0.0
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        if name == "to_list":
+            async def timed_to_list(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await attr(*args, **kwargs)
+                finally:
+                    self._record((time.perf_counter() - start) * 1000)
+                    self._observe()
+            return timed_to_list
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return chained
+
+    def _record(self, duration_ms: float):
+        self._elapsed += duration_ms
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.record_db(self._collection_name, duration_ms, ops=0 if self._counted else 1)
+        if not self._counted:
+            MONGO_OPERATIONS.inc(self._collection_name)
+            self._counted = True
+
+    def _observe(self):
+        MONGO_OPERATION_SECONDS.observe(self._elapsed / 1000, self._collection_name)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.__anext__()
+        except StopAsyncIteration:
+            self._record((time.perf_counter() - start) * 1000)
+            self._observe()
+            raise
+        else:
+            self._record((time.perf_counter() - start) * 1000)
+
+
+class InstrumentedCollection:
+    """
+    Transparent proxy around a Motor collection that records every
+    operation into the active request's RequestTimings.
+
+    Anything not listed in _TIMED_METHODS / _CURSOR_METHODS is passed
+    straight through (name, database, index_information, ...).
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._name = collection.name
+
+    @property
+    def unwrapped(self):
+        """The underlying Motor collection (for code that needs the raw driver object)."""
+        return self._collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+
+        if name in _TIMED_METHODS:
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await attr(*args, **kwargs)
+                finally:
+                    duration = time.perf_counter() - start
+                    MONGO_OPERATIONS.inc(self._name)
+                    MONGO_OPERATION_SECONDS.observe(duration, self._name)
+                    timings = _current_timings.get()
+                    if timings is not None:
+                        timings.record_db(self._name, duration * 1000)
+            return timed
+
+        if name in _CURSOR_METHODS:
+            def cursor(*args, **kwargs):
+                return InstrumentedCursor(attr(*args, **kwargs), self._name)
+            return cursor
+
+        return attr
+
+
+def instrument_collection(collection) -> InstrumentedCollection:
+    """Wrap a Motor collection with per-request accounting."""
+    return InstrumentedCollection(collection)
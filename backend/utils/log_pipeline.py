@@ -0,0 +1,234 @@
+"""
+BowlWise - Structured Logging Pipeline
+
+Moves log output off the event loop: handlers on the request path only
+filter a record and put it on a bounded in-memory queue; a listener thread
+formats (JSON by default) and writes it.
+
+Data Flow:
+    logger.info(...) on the event loop
+        → LogThrottle (sample → dedup → rate limit, per message type)
+        → BoundedQueueHandler → queue (put_nowait; full → dropped + counted)
+    QueueListener thread → JsonFormatter → stderr
+
+How it works:
+    - Message type: the record's log_type extra when given
+      (logger.info(..., extra={"log_type": "request"})), otherwise its
+      format string — "Data quality: '%s' found in …" is one type no matter
+      which product it names.
+    - Sampling (LOG_SAMPLE_RATES="request=0.1"): keep that fraction of a
+      type. Never applied to WARNING and above.
+    - Dedup (LOG_DEDUP_SECONDS): a WARNING+ message identical to one
+      already written in the window is dropped; the next copy written
+      after the window carries "repeated": n.
+    - Rate limit (LOG_RATE_LIMIT per type per second, token bucket with a
+      burst of the same size): excess records are dropped; the next record
+      of that type carries "suppressed": n.
+    - The queue is bounded (LOG_QUEUE_SIZE). When the listener falls behind,
+      records are dropped rather than blocking the caller — a log burst
+      can't stall request handling. Every outcome is counted in
+      bowlwise_log_records_total on /metrics.
+    - LOG_FORMAT=text keeps the classic one-line format for local runs.
+
+Usage:
+    configure_logging()        # once, at import time of main.py
+    logger.info("Payment done", extra={"log_type": "payment", "amount": 12})
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from utils.metrics import LOG_RECORDS
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)-8s | %(message)s"
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "log_type"}
+
+
+# ============================================
+# Filtering (runs on the calling thread)
+# ============================================
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            rates[name.strip()] = float(value)
+    return rates
+
+
+class LogThrottle(logging.Filter):
+    """
+    Per-type sampling, deduplication and rate limiting.
+
+    Args:
+        sample_rates: {log type: fraction kept} (INFO/DEBUG only)
+        dedup_seconds: Window for dropping identical WARNING+ messages (0 = off)
+        rate_per_second: Records per type per second (0 = unlimited)
+        max_keys: Dedup entries kept before expired ones are pruned
+    """
+
+    def __init__(
+        self,
+        sample_rates: Optional[Dict[str, float]] = None,
+        dedup_seconds: float = 60,
+        rate_per_second: float = 100,
+        max_keys: int = 10000,
+    ):
+        super().__init__()
+        self._sample_rates = sample_rates or {}
+        self._dedup_seconds = dedup_seconds
+        self._rate = rate_per_second
+        self._max_keys = max_keys
+        self._seen: Dict[tuple, list] = {}       # (type, message) → [window start, repeats]
+        self._buckets: Dict[str, list] = {}      # type → [tokens, updated, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        log_type = getattr(record, "log_type", None) or str(record.msg)
+
+        if record.levelno < logging.WARNING:
+            rate = self._sample_rates.get(log_type)
+            if rate is not None and random.random() >= rate:
+                LOG_RECORDS.inc("sampled_out")
+                return False
+
+        now = time.monotonic()
+        with self._lock:
+            if self._dedup_seconds > 0 and record.levelno >= logging.WARNING:
+                key = (log_type, record.getMessage())
+                entry = self._seen.get(key)
+                if entry is not None and now - entry[0] < self._dedup_seconds:
+                    entry[1] += 1
+                    LOG_RECORDS.inc("deduplicated")
+                    return False
+                if entry is not None and entry[1]:
+                    record.repeated = entry[1]
+                if len(self._seen) >= self._max_keys:
+                    self._seen = {k: e for k, e in self._seen.items() if now - e[0] < self._dedup_seconds}
+                self._seen[key] = [now, 0]
+
+            if self._rate > 0:
+                bucket = self._buckets.get(log_type)
+                if bucket is None:
+                    bucket = self._buckets[log_type] = [self._rate, now, 0]
+                else:
+                    bucket[0] = min(self._rate, bucket[0] + (now - bucket[1]) * self._rate)
+                    bucket[1] = now
+                if bucket[0] < 1:
+                    bucket[2] += 1
+                    LOG_RECORDS.inc("rate_limited")
+                    return False
+                bucket[0] -= 1
+                if bucket[2]:
+                    record.suppressed, bucket[2] = bucket[2], 0
+
+        return True
+
+
+# ============================================
+# Queue Handler (never blocks)
+# ============================================
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args now (they may be mutated later); leave formatting to the listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            LOG_RECORDS.inc("queued")
+        except queue.Full:
+            LOG_RECORDS.inc("dropped")
+
+
+# ============================================
+# Output Formatting (listener thread)
+# ============================================
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, type, extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "log_type", None):
+            entry["type"] = record.log_type
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+# ============================================
+# Setup
+# ============================================
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through the throttled queue pipeline (idempotent).
+
+    Reads LOG_FORMAT (json | text), LOG_QUEUE_SIZE, LOG_RATE_LIMIT,
+    LOG_DEDUP_SECONDS and LOG_SAMPLE_RATES.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt="%Y-%m-%d %H:%M:%S"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    handler = BoundedQueueHandler(log_queue)
+    handler.addFilter(LogThrottle(
+        sample_rates=_parse_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+        dedup_seconds=float(os.getenv("LOG_DEDUP_SECONDS", "60")),
+        rate_per_second=float(os.getenv("LOG_RATE_LIMIT", "100")),
+    ))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is queued when the process exits (after lifespan shutdown logs)
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,247 @@
+"""
+BowlWise - Metrics (Prometheus text format)
+
+Process-wide counters, gauges and histograms rendered by GET /metrics in
+the Prometheus text exposition format, so latency and cache behaviour can
+be graphed instead of grepped out of request logs.
+
+Data Flow:
+    request middleware  → HTTP_REQUESTS_IN_FLIGHT, HTTP_REQUEST_SECONDS
+    InstrumentedCollection → MONGO_OPERATIONS, MONGO_OPERATION_SECONDS
+    get_recommendations → SCORING_SECONDS, PRODUCTS_SCORED, ALLERGY_FILTERED
+    catalog / ETag caches → CACHE_REQUESTS (hit | miss)
+    log pipeline        → LOG_RECORDS (queued | dropped | sampled_out | ...)
+    traffic capture     → TRAFFIC_CAPTURE_RECORDS (written | dropped)
+    single-flight groups → SINGLE_FLIGHT_CALLS (leader | shared), SINGLE_FLIGHT_ERRORS,
+                           SINGLE_FLIGHT_IN_FLIGHT
+    email outbox        → EMAIL_OUTBOX_MESSAGES (sent | failed | dead_lettered | expired),
+                           EMAIL_OUTBOX_QUEUE (queued | dead), EMAIL_DELIVERY_SECONDS
+    rate limiter        → RATE_LIMIT_CHECKS (allowed | rejected | error), RATE_LIMIT_CHECK_SECONDS
+    GET /metrics        → render()
+
+How it works:
+    - Every value lives in a plain dict keyed by the label values. All
+      recording happens on the event loop thread, so updates need no locks:
+      a counter increment is a dict lookup and an add; a histogram
+      observation adds a bisect over ~12 bucket bounds.
+      (LOG_RECORDS is also bumped from worker threads that log; a lost
+      increment under a rare race is accepted over taking a lock.)
+    - Histograms store per-bucket (non-cumulative) counts; render() turns
+      them into the cumulative _bucket series Prometheus expects.
+    - Label values must come from small, fixed sets (route templates, not
+      raw paths; collection names; "hit"/"miss").
+    - Values are per process. With several uvicorn workers, scrape each
+      worker (or run one worker per container); every sample carries a
+      pid label so series from different workers never collide.
+
+Usage:
+    from utils.metrics import CACHE_REQUESTS, render
+    CACHE_REQUESTS.inc("catalog_version", "hit")
+    body = render()
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import bisect
+import math
+import os
+from typing import Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; suits API requests and Mongo round-trips (1ms .. 10s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+# Seconds; in-process checks that should stay well under a millisecond
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+# Seconds from enqueue to delivery (outbox poll interval .. retries over hours)
+DELIVERY_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 3600, 21600, 86400)
+
+
+# ============================================
+# Metric Types
+# ============================================
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def _label_text(self, values: Tuple, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        pairs.append(f'pid="{os.getpid()}"')
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._label_text(k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (e.g. requests in flight)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) - amount
+
+    def set(self, *label_values, value: float):
+        self._values[label_values] = value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._label_text(k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self._bounds = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}     # labels → [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self._bounds) + 1) + [0.0]
+        series[bisect.bisect_left(self._bounds, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self._bounds + (math.inf,), series):
+                cumulative += count
+                le = 'le="' + _number(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+# ============================================
+# Registry
+# ============================================
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================
+# BowlWise Metrics
+# ============================================
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "bowlwise_http_request_duration_seconds", "Request latency by route template",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "bowlwise_http_requests_in_flight", "Requests currently being handled", ("method",),
+)
+MONGO_OPERATIONS = Counter(
+    "bowlwise_mongo_operations_total", "MongoDB operations issued", ("collection",),
+)
+MONGO_OPERATION_SECONDS = Histogram(
+    "bowlwise_mongo_operation_duration_seconds", "MongoDB operation latency (cursors: total iteration time)",
+    ("collection",),
+)
+SCORING_SECONDS = Histogram(
+    "bowlwise_recommendation_scoring_seconds", "Time spent scoring products for one recommendation request",
+)
+PRODUCTS_SCORED = Counter(
+    "bowlwise_recommendation_products_scored_total", "Products run through the scoring engine",
+)
+ALLERGY_FILTERED = Counter(
+    "bowlwise_recommendation_allergy_filtered_total", "Products removed by the allergen filter",
+)
+CACHE_REQUESTS = Counter(
+    "bowlwise_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"),
+)
+LOG_RECORDS = Counter(
+    "bowlwise_log_records_total", "Log records by pipeline outcome", ("outcome",),
+)
+TRAFFIC_CAPTURE_RECORDS = Counter(
+    "bowlwise_traffic_capture_records_total", "Captured request records by outcome", ("outcome",),
+)
+SINGLE_FLIGHT_CALLS = Counter(
+    "bowlwise_single_flight_calls_total", "Coalesced calls by group and role (leader ran the work, shared waited on it)",
+    ("group", "role"),
+)
+SINGLE_FLIGHT_ERRORS = Counter(
+    "bowlwise_single_flight_errors_total", "Coalesced computations that raised (each failure reaches all its waiters)",
+    ("group",),
+)
+SINGLE_FLIGHT_IN_FLIGHT = Gauge(
+    "bowlwise_single_flight_in_flight", "Coalesced computations currently running", ("group",),
+)
+EMAIL_OUTBOX_MESSAGES = Counter(
+    "bowlwise_email_outbox_messages_total", "Outbox messages by delivery outcome (failed counts each failed attempt)",
+    ("outcome",),
+)
+EMAIL_OUTBOX_QUEUE = Gauge(
+    "bowlwise_email_outbox_queue", "Outbox messages waiting to be sent (queued) or dead-lettered (dead)", ("state",),
+)
+EMAIL_DELIVERY_SECONDS = Histogram(
+    "bowlwise_email_delivery_seconds", "Time from enqueue to successful delivery", buckets=DELIVERY_BUCKETS,
+)
+RATE_LIMIT_CHECKS = Counter(
+    "bowlwise_rate_limit_checks_total", "Rate limit checks by backend and outcome (error: backend failed, allowed)",
+    ("backend", "outcome"),
+)
+RATE_LIMIT_CHECK_SECONDS = Histogram(
+    "bowlwise_rate_limit_check_duration_seconds", "Rate limit backend latency per check", ("backend",),
+    buckets=FAST_BUCKETS,
+)
@@ -0,0 +1,108 @@
+"""
+BowlWise - Keyset Pagination
+
+Opaque cursors and range filters for paging over a stable sort without
+skip/offset. Each page is an index range scan that starts right after the
+last document of the previous page, so page N costs the same as page 1.
+
+How it works:
+    - The sort must end in a unique field (usually _id) so it is total.
+    - The cursor is the sort-key values of the last document on the page,
+      serialized with bson.json_util (handles datetime/ObjectId) and
+      base64url-encoded so clients treat it as an opaque string.
+    - Cursors come from clients, so decode_cursor() checks every value
+      against the types its sort field can hold: an extended-JSON operator
+      dict ({"$ne": null}) or a bad $oid/$numberDecimal is an InvalidCursor
+      (400), never a query fragment or a 500.
+    - keyset_filter() turns those values into an $or range condition:
+        sort [(a, 1), (_id, 1)], last (A, X) →
+        {"$or": [{a: {"$gt": A}}, {a: A, _id: {"$gt": X}}]}
+
+Usage:
+    from utils.pagination import encode_cursor, decode_cursor, keyset_filter
+
+    sort = [("brand_key", 1), ("_id", 1)]
+    if cursor:
+        last = decode_cursor(cursor, [(str, type(None)), (str,)])
+        query = {"$and": [query, keyset_filter(sort, last)]}
+    docs = await collection.find(query).sort(sort).limit(limit + 1).to_list(limit + 1)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import base64
+from typing import Any, Dict, List, Sequence, Tuple
+
+from bson import json_util
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client-supplied cursor cannot be decoded."""
+
+
+# ============================================
+# Cursor Encoding
+# ============================================
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode sort-key values of the last document as an opaque URL-safe string."""
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, field_types: Sequence[Tuple[type, ...]]) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Args:
+        cursor: Client-supplied cursor string
+        field_types: Allowed value types for each sort field, in sort order
+            (e.g. [(datetime, type(None)), (ObjectId,)])
+
+    Raises:
+        InvalidCursor: if the cursor is malformed, has the wrong number of
+            keys, or holds a value its sort field cannot have
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        # binascii/JSON/UTF-8 errors, but also bad extended JSON: InvalidId ($oid),
+        # InvalidOperation ($numberDecimal), TypeError ($binary), ...
+        raise InvalidCursor("Malformed cursor") from e
+
+    if not isinstance(values, list) or len(values) != len(field_types):
+        raise InvalidCursor("Malformed cursor")
+    for value, types in zip(values, field_types):
+        # bool is an int subclass; a sort key is never a bool unless listed
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+            raise InvalidCursor("Malformed cursor")
+    return values
+
+
+def cursor_values(doc: Dict, sort: List[Tuple[str, int]]) -> List[Any]:
+    """Pull the sort-key values out of a raw MongoDB document."""
+    return [doc.get(field) for field, _ in sort]
+
+
+# ============================================
+# Range Filter
+# ============================================
+
+def keyset_filter(sort: List[Tuple[str, int]], last_values: List[Any]) -> Dict:
+    """
+    Build the filter that selects documents strictly after last_values
+    in the given sort order.
+
+    Args:
+        sort: [(field, 1 | -1), ...] — must end in a unique field
+        last_values: Sort-key values of the last document already returned
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {sort[j][0]: last_values[j] for j in range(i)}
+        branch[field] = {"$gt" if direction == 1 else "$lt": last_values[i]}
+        branches.append(branch)
+    return branches[0] if len(branches) == 1 else {"$or": branches}
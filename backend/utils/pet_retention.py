@@ -0,0 +1,163 @@
+"""
+BowlWise - Guest Pet Retention
+
+Keeps the pets collection from filling up with abandoned guest profiles.
+Every anonymous visit creates a pet that is never claimed; this module
+tracks when each pet was last used and periodically removes unclaimed pets
+nobody has opened in a long time.
+
+Data Flow:
+    get_pet_by_id / get_recommendations → touch_pet() → last_accessed_at (throttled)
+    lifespan → PetRetention.start() → every interval:
+        pets (user_id = null, last_accessed_at < cutoff) on (user_id, last_accessed_at)
+            → batches of batch_size → [archive to pets_archive] → delete
+
+How it works:
+    - touch_pet() writes last_accessed_at at most once per touch_interval
+      per pet, using the document the handler already fetched — most reads
+      cost no write at all.
+    - compact() pages through expired guest pets by index, deleting (or
+      archiving, then deleting) batch_size documents at a time with a short
+      pause between batches so the primary is never flooded. The delete
+      re-checks user_id/last_accessed_at, so a pet claimed or opened
+      mid-sweep is kept.
+    - Claimed pets (user_id set) are never touched by compaction.
+
+Usage:
+    await touch_pet(pets_collection, pet)
+    retention = PetRetention(pets_collection, max_age_days=90)
+    retention.start()                 # in lifespan startup
+    stats = await retention.compact() # one pass → {"expired": n, "archived": n, "deleted": n}
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger("petai")
+
+DEFAULT_TOUCH_INTERVAL = timedelta(hours=12)
+
+
+# ============================================
+# Access Tracking
+# ============================================
+
+def touch_due(pet: Dict, now: datetime, interval: timedelta = DEFAULT_TOUCH_INTERVAL) -> bool:
+    """True when the pet's last_accessed_at is missing or older than interval."""
+    last = pet.get("last_accessed_at")
+    return last is None or now - last >= interval
+
+
+async def touch_pet(pets, pet: Dict, now: Optional[datetime] = None, interval: timedelta = DEFAULT_TOUCH_INTERVAL):
+    """Record that a pet was used, skipping the write if it was recorded recently."""
+    now = now or datetime.utcnow()
+    if not touch_due(pet, now, interval):
+        return
+    await pets.update_one({"_id": pet["_id"]}, {"$set": {"last_accessed_at": now}})
+
+
+# ============================================
+# Compaction
+# ============================================
+
+class PetRetention:
+    """
+    Background compaction of unclaimed guest pets.
+
+    Args:
+        pets: Motor pets collection
+        archive: Optional Motor collection; when set, expired pets are
+            copied there before being deleted
+        max_age_days: Unclaimed pets not accessed for this long are removed
+        batch_size: Pets removed per batch
+        pause_seconds: Sleep between batches (throttle)
+        interval_seconds: Pause between compaction runs
+    """
+
+    def __init__(
+        self,
+        pets,
+        archive=None,
+        *,
+        max_age_days: float = 90,
+        batch_size: int = 500,
+        pause_seconds: float = 0.2,
+        interval_seconds: float = 6 * 3600,
+    ):
+        self._pets = pets
+        self._archive = archive
+        self._max_age = timedelta(days=max_age_days)
+        self._batch_size = batch_size
+        self._pause = pause_seconds
+        self._interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background loop (no-op if already running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="pet-retention")
+
+    async def stop(self):
+        """Cancel the background loop and wait for it to exit."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                stats = await self.compact()
+                if stats["expired"]:
+                    logger.info("Guest pet compaction: %s", " ".join(f"{k}={v}" for k, v in stats.items()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Guest pet compaction failed: %s", e, exc_info=True)
+            await asyncio.sleep(self._interval)
+
+    async def compact(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Remove every unclaimed pet not accessed since now - max_age.
+
+        Returns:
+            Counts: expired (found), archived, deleted
+        """
+        now = now or datetime.utcnow()
+        expired = {"user_id": None, "last_accessed_at": {"$lt": now - self._max_age}}
+        stats = {"expired": 0, "archived": 0, "deleted": 0}
+
+        while True:
+            batch = await self._pets.find(expired, {"_id": 1} if self._archive is None else None) \
+                .sort("last_accessed_at", 1).limit(self._batch_size).to_list(self._batch_size)
+            if not batch:
+                break
+            stats["expired"] += len(batch)
+
+            if self._archive is not None:
+                archived_at = datetime.utcnow()
+                await self._archive.bulk_write(
+                    [ReplaceOne({"_id": doc["_id"]}, {**doc, "archived_at": archived_at}, upsert=True) for doc in batch],
+                    ordered=False,
+                )
+                stats["archived"] += len(batch)
+
+            # Same condition again: keep pets claimed or opened since the read
+            result = await self._pets.delete_many({**expired, "_id": {"$in": [doc["_id"] for doc in batch]}})
+            stats["deleted"] += result.deleted_count
+
+            if len(batch) < self._batch_size:
+                break
+            await asyncio.sleep(self._pause)
+        return stats
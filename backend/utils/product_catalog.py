@@ -0,0 +1,248 @@
+"""
+BowlWise - In-Memory Product Catalog
+
+Holds the whole product catalog in memory, validated and JSON-encoded once
+per catalog version, so hot endpoints stop re-reading and re-serializing
+the same ~150 documents on every request.
+
+Data Flow:
+    CatalogVersion.get() → version changed? → load all products (ProductRepository)
+        → encode_product(doc) (product_helper + ProductResponse validation) once
+        → CatalogSnapshot (docs, by_id, fragments)
+
+    With a catalog file (CATALOG_FILE, see catalog_file.py):
+    CatalogVersion.get() → version changed? → map the file if it holds this
+        version (else load from Mongo, write the file, map it)
+        → MappedCatalogSnapshot (rows read from the shared mapping,
+          fragments encoded on first use, bounded LRU per worker)
+
+How it works:
+    - get() compares the cached snapshot's version with the current catalog
+      version (itself cached with a TTL). Same version → return the snapshot
+      with no I/O. New version → reload through a single-flight group
+      (single_flight.py) so concurrent requests share one load instead of
+      each querying Mongo; a request that disconnects mid-load does not
+      cancel it for the others.
+    - Each product's response JSON is stored as bytes in snapshot.fragments;
+      endpoints splice those bytes into list/recommendation bodies
+      (see fast_json.py).
+    - Snapshots are immutable once built; a reload swaps in a new object, so
+      requests already holding the old snapshot finish consistently.
+    - The mapped variant keeps product data out of the Python heap: every
+      worker on the host shares the file's pages, so adding workers or
+      products does not multiply memory. The only per-worker state is the
+      fragment LRU and small per-life-stage candidate lists.
+
+Usage:
+    catalog = ProductCatalog(repositories.products, catalog_version, encode_product)
+    snapshot = await catalog.get()
+    fragment = snapshot.fragments[product_id]
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from utils.catalog_file import CatalogFileError, MappedCatalog, write_catalog_file
+from utils.metrics import CACHE_REQUESTS
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger("petai")
+
+
+# ============================================
+# Snapshot
+# ============================================
+
+class CatalogSnapshot:
+    """
+    Immutable view of the catalog at one version.
+
+    - version: catalog version string this snapshot was built from
+    - docs: raw MongoDB product documents, sorted by _id
+    - by_id: {product_id: raw doc}
+    - fragments: {product_id: validated ProductResponse JSON bytes}
+    """
+
+    __slots__ = ("version", "docs", "by_id", "fragments")
+
+    def __init__(self, version: str, docs: List[Dict], fragments: Dict[str, bytes]):
+        self.version = version
+        self.docs = docs
+        self.by_id = {str(doc["_id"]): doc for doc in docs}
+        self.fragments = fragments
+
+    def recommendation_candidates(self, age_group: str) -> List[Dict]:
+        """
+        Products passing the recommendation pre-filter: dry food for the
+        pet's life stage or "all" life stages (same rule as the old Mongo query).
+        """
+        return [
+            doc for doc in self.docs
+            if doc.get("format") == "dry" and doc.get("life_stage") in (age_group, "all")
+        ]
+
+
+class _FragmentCache:
+    """Product id → encoded fragment for a mapped snapshot, encoded on first use (LRU)."""
+
+    def __init__(self, catalog: MappedCatalog, encode: Callable[[Dict], bytes], max_entries: int):
+        self._catalog = catalog
+        self._encode = encode
+        self._max = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, product_id, default=None) -> Optional[bytes]:
+        key = str(product_id)
+        fragment = self._entries.get(key)
+        if fragment is not None:
+            self._entries.move_to_end(key)
+            CACHE_REQUESTS.inc("catalog_fragment", "hit")
+            return fragment
+        CACHE_REQUESTS.inc("catalog_fragment", "miss")
+        row = self._catalog.find(key)
+        if row is None:
+            return default
+        fragment = self._encode(row.to_dict())
+        self._entries[key] = fragment
+        if len(self._entries) > self._max:
+            self._entries.popitem(last=False)
+        return fragment
+
+    def __getitem__(self, product_id) -> bytes:
+        fragment = self.get(product_id)
+        if fragment is None:
+            raise KeyError(product_id)
+        return fragment
+
+
+class MappedCatalogSnapshot:
+    """
+    Snapshot backed by a memory-mapped catalog file (same interface as
+    CatalogSnapshot for the endpoints: version, fragments, recommendation_candidates).
+    """
+
+    def __init__(self, catalog: MappedCatalog, encode: Callable[[Dict], bytes], fragment_cache_size: int):
+        self.version = catalog.version
+        self.catalog = catalog
+        self.fragments = _FragmentCache(catalog, encode, fragment_cache_size)
+        self._candidates: Dict[str, array] = {}
+
+    def recommendation_candidates(self, age_group: str) -> List:
+        """Same pre-filter as CatalogSnapshot; row numbers are cached per life stage."""
+        indexes = self._candidates.get(age_group)
+        if indexes is None:
+            indexes = array("I", (
+                i for i, row in enumerate(self.catalog)
+                if row.get("format") == "dry" and row.get("life_stage") in (age_group, "all")
+            ))
+            self._candidates[age_group] = indexes
+        return [self.catalog.row(i) for i in indexes]
+
+
+# ============================================
+# Catalog Loader
+# ============================================
+
+class ProductCatalog:
+    """
+    Versioned in-memory catalog.
+
+    Args:
+        products: ProductRepository
+        catalog_version: CatalogVersion instance (utils/catalog_version.py)
+        encode_product: doc → JSON bytes; expected to validate the doc
+            against the response model (runs once per product per version)
+        catalog_file: Path of the shared columnar catalog file; None keeps
+            the whole catalog in this process's memory
+        fragment_cache_size: Encoded fragments kept per worker (file mode)
+    """
+
+    def __init__(
+        self,
+        products,
+        catalog_version,
+        encode_product: Callable[[Dict], bytes],
+        catalog_file: Optional[str] = None,
+        fragment_cache_size: int = 2048,
+    ):
+        self._products = products
+        self._version = catalog_version
+        self._encode = encode_product
+        self._file = catalog_file
+        self._fragment_cache_size = fragment_cache_size
+        self._snapshot = None
+        self._lock = asyncio.Lock()
+        self._loads = SingleFlight("catalog_load")
+
+    @property
+    def loaded(self) -> bool:
+        """True once a snapshot has been built."""
+        return self._snapshot is not None
+
+    async def get(self):
+        """Return the snapshot for the current catalog version, loading it if needed."""
+        version, _ = await self._version.get()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            CACHE_REQUESTS.inc("catalog_snapshot", "hit")
+            return snapshot
+
+        CACHE_REQUESTS.inc("catalog_snapshot", "miss")
+        # Requests arriving during a reload share it instead of queueing for their own
+        return await self._loads.do(version, self._reload, version)
+
+    async def _reload(self, version: str):
+        async with self._lock:
+            # Loads for different versions run one at a time; one may have
+            # finished this version while we waited
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = await self._load(version)
+                self._snapshot = snapshot
+        return snapshot
+
+    def encode(self, doc: Dict) -> bytes:
+        """Encode a single product outside the snapshot (e.g. imported after it was built)."""
+        return self._encode(doc)
+
+    async def _load(self, version: str):
+        if self._file:
+            try:
+                return await self._load_mapped(version)
+            except (CatalogFileError, OSError) as e:
+                logger.warning("Catalog file %s unusable, keeping catalog in memory: %s", self._file, e)
+
+        docs = await self._products.all()
+        fragments = {str(doc["_id"]): self._encode(doc) for doc in docs}
+        logger.info("Product catalog loaded: %d products (version %s)", len(docs), version)
+        return CatalogSnapshot(version, docs, fragments)
+
+    async def _load_mapped(self, version: str) -> MappedCatalogSnapshot:
+        catalog = await self._map_file()
+        if catalog is not None and catalog.version != version:
+            # The file may be newer than our cached version: re-read it once
+            self._version.invalidate()
+            version, _ = await self._version.get()
+        if catalog is None or catalog.version != version:
+            # Missing or stale (import ran on another host): rebuild it from Mongo
+            docs = await self._products.all()
+            size = await asyncio.to_thread(write_catalog_file, self._file, docs, version)
+            logger.info("Catalog file %s rebuilt: %d products, %d bytes", self._file, len(docs), size)
+            catalog = await self._map_file()
+            if catalog is None:
+                raise CatalogFileError(f"{self._file} disappeared after writing")
+        logger.info("Product catalog mapped: %d products (version %s)", len(catalog), catalog.version)
+        return MappedCatalogSnapshot(catalog, self._encode, self._fragment_cache_size)
+
+    async def _map_file(self) -> Optional[MappedCatalog]:
+        try:
+            return await asyncio.to_thread(MappedCatalog.open, self._file)
+        except CatalogFileError:
+            return None
@@ -0,0 +1,335 @@
+"""
+BowlWise - Slow-Request Profiler
+
+Opt-in statistical profiler for production: captures a profile for a
+random fraction of requests and/or every request slower than a threshold,
+and keeps the most recent ones on disk for download.
+
+Data Flow:
+    ProfilingMiddleware → profiler.begin(frame)     (request registered)
+    sampler thread, every interval_ms:
+        loop thread's stack → which registered request is on it?
+            → that request: +1 for the collapsed stack above its middleware frame
+            → every other active request: +1 "[awaiting]" (off-CPU / waiting on I/O)
+    response sent → profiler.end() → keep if sampled or duration ≥ slow_ms
+        → ProfileStore.save()  (<id>.folded + <id>.json, oldest beyond max deleted)
+    GET /admin/profiles[/{id}] → list metadata / download collapsed stacks
+
+How it works:
+    - The API is one event loop thread; a request only runs code while its
+      task is on that thread's stack. Each profiled request registers the
+      frame of its ProfilingMiddleware call, so a sample belongs to the
+      request whose frame appears in the stack — no per-call tracing hooks,
+      the profiled code runs at full speed.
+    - The sampler needs the GIL to read the stack, so while the loop runs
+      pure Python it gets a sample at most every sys.getswitchinterval()
+      (5ms by default) — a 20ms request yields a handful of samples. Slow
+      requests, the ones worth profiling, get proportionally more.
+    - Output is the "collapsed stacks" format (frame;frame;frame count per
+      line): feed it to flamegraph.pl, speedscope or inferno as is.
+    - Disabled (both PROFILE_SAMPLE_RATE and PROFILE_SLOW_MS unset): no
+      middleware is installed and no thread is started — zero overhead.
+    - Rate-only mode registers just the sampled requests. With a slow
+      threshold every matching request is registered (slowness is only
+      known at the end); unsampled fast ones are discarded.
+    - The ring buffer is shared by all workers writing to the same
+      directory; file names start with a millisecond timestamp so sorting
+      by name is sorting by age.
+
+Usage:
+    profiler = create_profiler()              # None when disabled
+    if profiler:
+        app.add_middleware(ProfilingMiddleware, profiler=profiler)
+        profiler.start()                      # lifespan
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("petai")
+
+_PROFILE_ID = re.compile(r"^\d{13}-[0-9a-f]{8}$")
+AWAITING = "[awaiting]"
+
+
+# ============================================
+# Ring Buffer Storage
+# ============================================
+
+class ProfileStore:
+    """
+    Bounded on-disk store: <id>.folded (collapsed stacks) + <id>.json (metadata).
+
+    Args:
+        directory: Created on first save
+        max_profiles: Oldest profiles beyond this count are deleted
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 100):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def save(self, meta: Dict, stacks: Dict[str, int]) -> str:
+        """Write one profile (blocking — call via asyncio.to_thread). Returns its id."""
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        meta = {"id": profile_id, **meta}
+        with open(self._path(profile_id, "folded"), "w", encoding="utf-8") as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        # Metadata last: a profile is listed only once both files exist
+        with open(self._path(profile_id, "json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self._prune()
+        return profile_id
+
+    def list(self) -> List[Dict]:
+        """Metadata of stored profiles, newest first."""
+        profiles = []
+        for profile_id in self._ids(reverse=True):
+            try:
+                with open(self._path(profile_id, "json"), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue    # Pruned by another worker meanwhile
+        return profiles
+
+    def read(self, profile_id: str) -> Optional[str]:
+        """Collapsed stacks of one profile, or None if unknown."""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, "folded"), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def _ids(self, reverse: bool = False) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        ids = [name[:-5] for name in names if name.endswith(".json") and _PROFILE_ID.match(name[:-5])]
+        return sorted(ids, reverse=reverse)
+
+    def _prune(self):
+        ids = self._ids()
+        for profile_id in ids[:max(0, len(ids) - self.max_profiles)]:
+            for extension in ("json", "folded"):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except OSError:
+                    pass
+
+
+# ============================================
+# Sampler
+# ============================================
+
+class _ActiveProfile:
+    __slots__ = ("label", "stacks", "samples")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack and attributes samples to
+    registered requests.
+
+    Args:
+        store: ProfileStore for kept profiles
+        sample_rate: Fraction of matching requests profiled regardless of duration
+        slow_ms: Keep every matching request at least this slow (0 = off)
+        interval_ms: Sampling interval
+        path_prefixes: Only requests whose path starts with one of these
+    """
+
+    def __init__(
+        self,
+        store: ProfileStore,
+        *,
+        sample_rate: float = 0.0,
+        slow_ms: float = 0.0,
+        interval_ms: float = 5.0,
+        path_prefixes: Tuple[str, ...] = ("/api/",),
+    ):
+        self.store = store
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.interval = interval_ms / 1000
+        self.path_prefixes = path_prefixes
+        self._active: Dict[object, _ActiveProfile] = {}     # middleware frame → profile
+        self._lock = threading.Lock()
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start the sampler thread (call from the event loop thread)."""
+        if self._thread is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Request profiler on: sample_rate=%s slow_ms=%s interval_ms=%s dir=%s",
+            self.sample_rate, self.slow_ms, self.interval * 1000, self.store.directory,
+        )
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    # --- Requests ---
+
+    def wants(self, path: str) -> Optional[bool]:
+        """None: don't profile; else whether the request was picked by sample_rate."""
+        if not path.startswith(self.path_prefixes) or self._thread is None:
+            return None
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if sampled or self.slow_ms > 0:
+            return sampled
+        return None
+
+    def begin(self, frame, label: str):
+        with self._lock:
+            self._active[frame] = _ActiveProfile(label)
+
+    def end(self, frame) -> _ActiveProfile:
+        with self._lock:
+            return self._active.pop(frame)
+
+    # --- Sampling ---
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self._active:
+                self._sample()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = []
+        owner = None
+        with self._lock:
+            while frame is not None:
+                owner = self._active.get(frame)
+                if owner is not None:
+                    break
+                stack.append(frame)
+                frame = frame.f_back
+            for profile in self._active.values():
+                if profile is owner:
+                    key = ";".join([profile.label] + [_frame_label(f) for f in reversed(stack)])
+                else:
+                    key = f"{profile.label};{AWAITING}"
+                profile.stacks[key] = profile.stacks.get(key, 0) + 1
+                profile.samples += 1
+
+
+# ============================================
+# Middleware
+# ============================================
+
+class ProfilingMiddleware:
+    """Pure-ASGI layer that registers requests with a SamplingProfiler."""
+
+    def __init__(self, app, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        sampled = self.profiler.wants(scope["path"]) if scope["type"] == "http" else None
+        if sampled is None:
+            await self.app(scope, receive, send)
+            return
+
+        frame = sys._getframe()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        self.profiler.begin(frame, f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            profile = self.profiler.end(frame)
+            duration_ms = (time.perf_counter() - start) * 1000
+
+        slow = self.profiler.slow_ms > 0 and duration_ms >= self.profiler.slow_ms
+        if not (sampled or slow) or not profile.samples:
+            return
+        route = scope.get("route")
+        meta = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "status": status,
+            "duration_ms": round(duration_ms, 1),
+            "started_at": started_at.isoformat(),
+            "reason": "slow" if slow else "sampled",
+            "samples": profile.samples,
+            "interval_ms": self.profiler.interval * 1000,
+            "pid": os.getpid(),
+        }
+        try:
+            await asyncio.to_thread(self.profiler.store.save, meta, profile.stacks)
+        except OSError as e:
+            logger.warning("Could not store request profile: %s", e)
+
+
+def create_profiler() -> Optional[SamplingProfiler]:
+    """
+    Profiler from the environment, or None when profiling is off.
+
+    PROFILE_SAMPLE_RATE (fraction), PROFILE_SLOW_MS, PROFILE_INTERVAL_MS,
+    PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_PATHS (comma-separated prefixes).
+    """
+    sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE") or 0)
+    slow_ms = float(os.getenv("PROFILE_SLOW_MS") or 0)
+    if sample_rate <= 0 and slow_ms <= 0:
+        return None
+    prefixes = tuple(p.strip() for p in os.getenv("PROFILE_PATHS", "/api/").split(",") if p.strip())
+    return SamplingProfiler(
+        ProfileStore(os.getenv("PROFILE_DIR", "profiles"), int(os.getenv("PROFILE_MAX_FILES", "100"))),
+        sample_rate=sample_rate,
+        slow_ms=slow_ms,
+        interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+        path_prefixes=prefixes,
+    )
@@ -0,0 +1,298 @@
+"""
+BowlWise - Rate Limiting
+
+Per-client, per-endpoint request limits behind a pluggable backend, so the
+limits hold whether the API runs as one process or several workers.
+
+Data Flow:
+    @limiter.limit("5/minute") → RateLimiter.check(key, limit)
+        → backend.hit() → allowed | RateLimitExceeded (429 + Retry-After)
+
+Backends (RATE_LIMIT_BACKEND):
+    - memory (default): in-process token buckets. One dict lookup and a bit
+      of float math per check, no I/O. Limits are per process, so only
+      accurate with a single worker.
+    - mongo: sliding-window counters in the rate_limits collection, shared
+      by every worker connected to the same database. One atomic $inc on
+      the current window plus a read of the previous window (issued
+      concurrently, so one round trip of latency). Window documents expire
+      via a TTL index.
+    - redis: the same sliding-window counter as one Lua script (single
+      atomic round trip). Needs the redis package and RATE_LIMIT_REDIS_URL.
+
+How it works:
+    - Token bucket: capacity = limit, refilled continuously at limit/period.
+      "5/minute" allows a burst of 5, then one request every 12 seconds.
+    - Sliding window counter: the estimate is
+      previous_window_count * (1 - elapsed_fraction) + current_window_count.
+      A request over the limit is rejected and its increment rolled back,
+      so rejected requests do not extend the lockout.
+    - A backend error fails open (request allowed, warning logged) —
+      an unavailable limiter store must not take the API down.
+    - Every check is timed into RATE_LIMIT_CHECK_SECONDS and counted in
+      RATE_LIMIT_CHECKS by outcome (GET /metrics), and shows up as a
+      "ratelimit" Server-Timing stage.
+
+Usage:
+    limiter = RateLimiter(create_rate_limit_backend(database))
+
+    @app.post("/api/things")
+    @limiter.limit("5/minute")
+    async def create_thing(request: Request): ...
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from utils.instrumentation import timed_stage
+from utils.metrics import RATE_LIMIT_CHECK_SECONDS, RATE_LIMIT_CHECKS
+
+logger = logging.getLogger("petai")
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimitExceeded(Exception):
+    """Raised by a limited endpoint when the client is over its limit."""
+
+    def __init__(self, limit: str, retry_after: float):
+        super().__init__(limit)
+        self.detail = limit
+        self.retry_after = retry_after
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Parse "5/minute" (or "5 per minute") into (count, period_seconds)."""
+    count, _, unit = rate.replace(" per ", "/").partition("/")
+    unit = unit.strip().rstrip("s")
+    if unit not in PERIODS:
+        raise ValueError(f"Unknown rate limit period: {rate!r}")
+    return int(count), PERIODS[unit]
+
+
+def client_address(request: Request) -> str:
+    """Client IP used as the rate limit key."""
+    return request.client.host if request.client else "127.0.0.1"
+
+
+# ============================================
+# Backends
+# ============================================
+# hit(key, limit, period) → (allowed, retry_after_seconds)
+
+class TokenBucketBackend:
+    """
+    In-process token buckets (single worker).
+
+    Args:
+        max_keys: When exceeded, buckets that have fully refilled are dropped
+    """
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 10000):
+        self._buckets: Dict[str, List[float]] = {}   # key → [tokens, updated_at, period]
+        self._max_keys = max_keys
+
+    async def hit(self, key: str, limit: int, period: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        rate = limit / period
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self._max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = [float(limit), now, period]
+        else:
+            bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0.0
+        return False, (1 - bucket[0]) / rate
+
+    def _prune(self, now: float):
+        # A bucket untouched for a whole period is full again: same as absent
+        self._buckets = {k: b for k, b in self._buckets.items() if now - b[1] < b[2]}
+
+
+class MongoSlidingWindowBackend:
+    """Sliding-window counters in a shared MongoDB collection (multi-worker)."""
+
+    name = "mongo"
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    async def hit(self, key: str, limit: int, period: int) -> Tuple[bool, float]:
+        now = time.time()
+        window = int(now // period)
+        elapsed = (now % period) / period
+        current_id = f"{key}|{period}|{window}"
+
+        current, previous = await asyncio.gather(
+            self._increment(current_id, datetime.utcfromtimestamp((window + 2) * period)),
+            self._collection.find_one({"_id": f"{key}|{period}|{window - 1}"}),
+        )
+        previous_count = previous["count"] if previous else 0
+        if previous_count * (1 - elapsed) + current["count"] <= limit:
+            return True, 0.0
+
+        await self._collection.update_one({"_id": current_id}, {"$inc": {"count": -1}})
+        return False, _sliding_retry_after(previous_count, current["count"] - 1, limit, elapsed, period)
+
+    async def _increment(self, window_id: str, expires_at: datetime) -> Dict:
+        update = {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": expires_at}}
+        try:
+            return await self._collection.find_one_and_update(
+                {"_id": window_id}, update, upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Lost the race to create the window document: it exists now
+            return await self._collection.find_one_and_update(
+                {"_id": window_id}, update, return_document=ReturnDocument.AFTER,
+            )
+
+
+# KEYS: current window, previous window. ARGV: limit, ttl_ms, previous weight
+_SLIDING_WINDOW_LUA = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then redis.call('PEXPIRE', KEYS[1], ARGV[2]) end
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[3]) + current > tonumber(ARGV[1]) then
+    redis.call('DECR', KEYS[1])
+    return {0, previous, current - 1}
+end
+return {1, previous, current}
+"""
+
+
+class RedisSlidingWindowBackend:
+    """Sliding-window counters in Redis, one atomic Lua call per check."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package (pip install redis)") from e
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_SLIDING_WINDOW_LUA)
+
+    async def hit(self, key: str, limit: int, period: int) -> Tuple[bool, float]:
+        now = time.time()
+        window = int(now // period)
+        elapsed = (now % period) / period
+        allowed, previous, current = await self._script(
+            keys=[f"rl:{key}|{period}|{window}", f"rl:{key}|{period}|{window - 1}"],
+            args=[limit, period * 2000, 1 - elapsed],
+        )
+        if allowed:
+            return True, 0.0
+        return False, _sliding_retry_after(int(previous), int(current), limit, elapsed, period)
+
+
+def _sliding_retry_after(previous: int, current: int, limit: int, elapsed: float, period: int) -> float:
+    """Seconds until the weighted previous window has decayed enough for one more request."""
+    if current + 1 > limit:
+        return (1 - elapsed) * period          # Current window alone is full: wait for the next one
+    if previous == 0:
+        return 0.0
+    needed_weight = (limit - current - 1) / previous
+    return max(0.0, (1 - needed_weight - elapsed) * period)
+
+
+def create_rate_limit_backend(database=None, backend: Optional[str] = None):
+    """
+    Build the configured backend.
+
+    RATE_LIMIT_BACKEND=memory (default), mongo (rate_limits collection in
+    `database`) or redis (RATE_LIMIT_REDIS_URL, default redis://localhost:6379/0).
+    """
+    backend = (backend or os.getenv("RATE_LIMIT_BACKEND") or "memory").lower()
+    if backend == "memory":
+        return TokenBucketBackend()
+    if backend == "mongo":
+        if database is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=mongo needs a database")
+        return MongoSlidingWindowBackend(database["rate_limits"])
+    if backend == "redis":
+        return RedisSlidingWindowBackend(os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+
+# ============================================
+# Limiter (endpoint decorators)
+# ============================================
+
+class RateLimiter:
+    """
+    Endpoint decorators over a backend.
+
+    Args:
+        backend: Object with async hit(key, limit, period)
+        key_func: Request → client key (default: client IP)
+        enabled: False turns every check into a no-op (tests, load runs)
+    """
+
+    def __init__(self, backend, key_func: Callable[[Request], str] = client_address, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self._key_func = key_func
+
+    def limit(self, rate: str):
+        """Decorate an endpoint that takes a `request: Request` argument."""
+        count, period = parse_rate(rate)
+
+        def decorator(func):
+            scope = func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs.get("request") or next((a for a in args if isinstance(a, Request)), None)
+                if request is None:
+                    raise RuntimeError(f"{scope} is rate limited but has no `request: Request` parameter")
+                await self.check(f"{scope}:{self._key_func(request)}", count, period, rate)
+                return await func(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def exempt(func):
+        """Mark an endpoint as never limited (documentation only)."""
+        return func
+
+    async def check(self, key: str, count: int, period: int, rate: str = ""):
+        """Count one hit for key; raise RateLimitExceeded if over the limit."""
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+        try:
+            with timed_stage("ratelimit"):
+                allowed, retry_after = await self.backend.hit(key, count, period)
+        except Exception as e:
+            RATE_LIMIT_CHECKS.inc(self.backend.name, "error")
+            logger.warning("Rate limit backend %s failed, allowing request: %s", self.backend.name, e)
+            return
+        finally:
+            RATE_LIMIT_CHECK_SECONDS.observe(time.perf_counter() - start, self.backend.name)
+
+        if not allowed:
+            RATE_LIMIT_CHECKS.inc(self.backend.name, "rejected")
+            raise RateLimitExceeded(rate.replace("/", " per 1 "), retry_after)
+        RATE_LIMIT_CHECKS.inc(self.backend.name, "allowed")
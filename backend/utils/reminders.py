@@ -0,0 +1,287 @@
+"""
+BowlWise - Reorder Reminder Scheduler
+
+Background task that finds active purchases about to run out and emails
+the owner a reorder reminder — once per purchase, even with several API
+workers running the same scheduler.
+
+Data Flow:
+    lifespan → ReminderScheduler.start() → every interval:
+        purchases (status="active", claimable, estimated_depletion_at in window)
+            → keyset-paged range scans on (status, reminder_state, estimated_depletion_at, _id):
+              reminder_state null (never reminded), then "claimed" (stale claims)
+            → claim batch (update_many, only unclaimed or stale claims)
+            → users/pets for the batch ($in, one query each)
+            → email sender (batched; the outbox in main.py) → mark sent / release claim
+
+How it works:
+    - The sweep never queries per user: it walks index ranges (purchases
+      depleting between now - grace_days and now + lead_days) in pages of
+      batch_size, so memory stays bounded however many purchases are active.
+      reminder_state is part of the index prefix, so purchases already
+      reminded ("sent") or skipped are never read: a sweep costs the number
+      of due purchases, not the number of reminders handled so far.
+    - Claiming is idempotent. A page's candidates are claimed with a single
+      update_many that only matches purchases with no reminder_state (or a
+      claim older than claim_ttl_seconds, i.e. a worker that died mid-send),
+      stamped with this sweep's claim id. Only documents carrying that id are
+      sent, so two workers never email the same purchase.
+    - Delivery failures release the claim so the next sweep retries.
+      Users without preferences.email_reminders are marked "skipped", which
+      is not final: turning reminders on (PUT /api/auth/me/preferences)
+      calls release_skipped(), and the next sweep reminds those purchases
+      if they are still in the window.
+    - Editing or extending a purchase clears reminder_state (see main.py),
+      so the new depletion date gets its own reminder.
+
+Purchase fields written:
+    reminder_state: "claimed" | "sent" | "skipped"
+    reminder_claim_id, reminder_claimed_at, reminder_sent_at
+
+Usage:
+    scheduler = ReminderScheduler(purchases, users, pets, email_sender, base_url=...)
+    scheduler.start()          # in lifespan startup
+    await scheduler.stop()     # in lifespan shutdown
+    stats = await scheduler.sweep()   # one pass (tests / manual runs)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from html import escape
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+
+from utils.pagination import cursor_values, keyset_filter
+
+logger = logging.getLogger("petai")
+
+# Range scan order — matches the (status, reminder_state, estimated_depletion_at, _id) index
+REMINDER_SCAN_SORT = [("estimated_depletion_at", 1), ("_id", 1)]
+
+# Fields cleared when a purchase's depletion date changes
+REMINDER_FIELDS = ("reminder_state", "reminder_claim_id", "reminder_claimed_at", "reminder_sent_at")
+
+
+# ============================================
+# Email Content
+# ============================================
+
+def build_reminder_email(email: str, pet_name: str, purchase: Dict, base_url: str, now: datetime) -> Dict:
+    """Build the reorder reminder message for one purchase."""
+    snapshot = purchase.get("product_snapshot") or {}
+    product = escape(f"{snapshot.get('brand', '')} {snapshot.get('line', '')}".strip() or "your dog's food")
+    pet = escape(pet_name or "your dog")
+    days_left = max(0, (purchase["estimated_depletion_at"] - now).days)
+    when = "today" if days_left == 0 else f"in about {days_left} day{'s' if days_left != 1 else ''}"
+    reorder_url = snapshot.get("source_url") or f"{base_url}/dashboard"
+
+    html_body = f"""
+    <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; max-width: 480px; margin: 0 auto; padding: 40px 20px;">
+        <h2 style="color: #1a1a2e; margin-bottom: 24px;">Time to reorder for {pet}</h2>
+        <p style="color: #444; font-size: 16px; line-height: 1.5;">{pet}'s bag of {product} runs out {when}.</p>
+        <a href="{escape(reorder_url)}" style="display: inline-block; background: #2563eb; color: white; padding: 14px 32px; border-radius: 8px; text-decoration: none; font-weight: 600; font-size: 16px; margin: 24px 0;">Reorder</a>
+        <p style="color: #888; font-size: 14px; margin-top: 32px;">Still have some left? Update the bag on your <a href="{base_url}/dashboard">dashboard</a>.</p>
+    </div>
+    """
+    return {
+        "to": email,
+        "subject": f"{pet_name or 'Your dog'}'s food runs out {when}",
+        "html": html_body,
+        "tag": "reorder_reminder",
+    }
+
+
+# ============================================
+# Scheduler
+# ============================================
+
+class ReminderScheduler:
+    """
+    Periodic due-soon scan + idempotent claim + batched send.
+
+    Args:
+        purchases, users, pets: Motor collections
+        sender: Email sender with async send_batch(messages) and max_batch
+        base_url: Frontend URL for links in the email
+        lead_days: Remind this many days before estimated depletion
+        grace_days: Still remind purchases that depleted up to this long ago
+        interval_seconds: Pause between sweeps
+        batch_size: Purchases read/claimed per page
+        claim_ttl_seconds: Claims older than this are considered abandoned
+    """
+
+    def __init__(
+        self,
+        purchases,
+        users,
+        pets,
+        sender,
+        *,
+        base_url: str,
+        lead_days: float = 3,
+        grace_days: float = 2,
+        interval_seconds: float = 900,
+        batch_size: int = 500,
+        claim_ttl_seconds: float = 600,
+    ):
+        self._purchases = purchases
+        self._users = users
+        self._pets = pets
+        self._sender = sender
+        self._base_url = base_url
+        self._lead = timedelta(days=lead_days)
+        self._grace = timedelta(days=grace_days)
+        self._interval = interval_seconds
+        self._batch_size = batch_size
+        self._claim_ttl = timedelta(seconds=claim_ttl_seconds)
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start the background loop (no-op if already running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="reminder-scheduler")
+
+    async def stop(self):
+        """Cancel the background loop and wait for it to exit."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                stats = await self.sweep()
+                if stats["claimed"]:
+                    logger.info("Reminder sweep: %s", " ".join(f"{k}={v}" for k, v in stats.items()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Reminder sweep failed: %s", e, exc_info=True)
+            await asyncio.sleep(self._interval)
+
+    # --- Sweep ---
+
+    async def sweep(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Run one pass over the due-soon window.
+
+        Returns:
+            Counts: scanned, claimed, sent, skipped, failed
+        """
+        now = now or datetime.utcnow()
+        stale_before = now - self._claim_ttl
+        stats = {"scanned": 0, "claimed": 0, "sent": 0, "skipped": 0, "failed": 0}
+        due = {"$gte": now - self._grace, "$lte": now + self._lead}
+        scans = [
+            # Never reminded (reminder_state missing) — nearly every candidate
+            {"status": "active", "reminder_state": None, "estimated_depletion_at": due},
+            # Claimed by a worker that died mid-send
+            {"status": "active", "reminder_state": "claimed", "estimated_depletion_at": due,
+             "reminder_claimed_at": {"$lt": stale_before}},
+        ]
+
+        for window in scans:
+            last_values = None
+            while True:
+                query = window if last_values is None else {"$and": [window, keyset_filter(REMINDER_SCAN_SORT, last_values)]}
+                page = await self._purchases.find(query, {"estimated_depletion_at": 1}) \
+                    .sort(REMINDER_SCAN_SORT).limit(self._batch_size).to_list(self._batch_size)
+                if not page:
+                    break
+                stats["scanned"] += len(page)
+                last_values = cursor_values(page[-1], REMINDER_SCAN_SORT)
+                await self._process([doc["_id"] for doc in page], now, stale_before, stats)
+                if len(page) < self._batch_size:
+                    break
+        return stats
+
+    async def release_skipped(self, user_id: str) -> int:
+        """
+        Make a user's skipped active purchases eligible again (called when
+        they turn email reminders on). Returns how many were released.
+        """
+        result = await self._purchases.update_many(
+            {"user_id": user_id, "status": "active", "reminder_state": "skipped"},
+            {"$unset": {field: "" for field in REMINDER_FIELDS}},
+        )
+        return result.modified_count
+
+    async def _process(self, ids: List[ObjectId], now: datetime, stale_before: datetime, stats: Dict[str, int]):
+        claim_id = uuid.uuid4().hex
+        await self._purchases.update_many(
+            {
+                "_id": {"$in": ids},
+                "status": "active",
+                "$or": [
+                    {"reminder_state": {"$exists": False}},
+                    {"reminder_state": "claimed", "reminder_claimed_at": {"$lt": stale_before}},
+                ],
+            },
+            {"$set": {"reminder_state": "claimed", "reminder_claim_id": claim_id, "reminder_claimed_at": now}},
+        )
+        claimed = await self._purchases.find({"_id": {"$in": ids}, "reminder_claim_id": claim_id}).to_list(None)
+        if not claimed:
+            return
+        stats["claimed"] += len(claimed)
+
+        user_ids = [ObjectId(p["user_id"]) for p in claimed if ObjectId.is_valid(p.get("user_id", ""))]
+        users = {
+            str(u["_id"]): u
+            for u in await self._users.find({"_id": {"$in": user_ids}}, {"email": 1, "preferences": 1}).to_list(None)
+        }
+        pets = {
+            p["public_id"]: p
+            for p in await self._pets.find(
+                {"public_id": {"$in": list({p["pet_id"] for p in claimed})}}, {"public_id": 1, "name": 1}
+            ).to_list(None)
+        }
+
+        outgoing, skipped = [], []
+        for purchase in claimed:
+            user = users.get(purchase.get("user_id"))
+            if not user or not (user.get("preferences") or {}).get("email_reminders"):
+                skipped.append(purchase["_id"])
+                continue
+            pet = pets.get(purchase.get("pet_id")) or {}
+            message = build_reminder_email(user["email"], pet.get("name", ""), purchase, self._base_url, now)
+            message["user_id"] = purchase["user_id"]
+            outgoing.append((purchase["_id"], message))
+
+        if skipped:
+            await self._purchases.update_many(
+                {"_id": {"$in": skipped}, "reminder_claim_id": claim_id},
+                {"$set": {"reminder_state": "skipped"}},
+            )
+            stats["skipped"] += len(skipped)
+
+        for start in range(0, len(outgoing), self._sender.max_batch):
+            chunk = outgoing[start:start + self._sender.max_batch]
+            chunk_ids = [purchase_id for purchase_id, _ in chunk]
+            try:
+                await self._sender.send_batch([message for _, message in chunk])
+            except Exception as e:
+                logger.warning("Reminder batch of %d failed, releasing claims: %s", len(chunk), e)
+                await self._purchases.update_many(
+                    {"_id": {"$in": chunk_ids}, "reminder_claim_id": claim_id},
+                    {"$unset": {field: "" for field in REMINDER_FIELDS}},
+                )
+                stats["failed"] += len(chunk)
+                continue
+            await self._purchases.update_many(
+                {"_id": {"$in": chunk_ids}, "reminder_claim_id": claim_id},
+                {"$set": {"reminder_state": "sent", "reminder_sent_at": datetime.utcnow()}},
+            )
+            stats["sent"] += len(chunk)
@@ -0,0 +1,843 @@
+"""
+BowlWise - Storage Repositories
+
+Data access for pets, products, users and purchases behind one async
+interface per collection, so handlers don't depend on Motor directly and
+the request path can be benchmarked and profiled without a database.
+
+Data Flow:
+    main.py handlers → repositories.pets / .products / .users / .purchases
+        → Mongo*Repository  → instrumented Motor collection (the same
+                              queries as before — see index_registry.py)
+        → Memory*Repository → documents + indexes in this process
+
+Backends (STORAGE_BACKEND):
+    - mongo (default): one Motor call per repository call, issuing exactly
+      the query shapes audit_indexes.py checks.
+    - memory: documents live in this process (per worker, gone on restart)
+      — for benchmarks and local profiling, not for production. Semantics
+      follow Mongo where the API can tell: unique indexes (_id,
+      pets.public_id, users.email) raise DuplicateKeyError (BulkWriteError
+      from create_many), product pages
+      and purchase history are read in index order with the same keyset
+      cursors, array fields match a scalar filter if they contain it,
+      datetimes are stored with millisecond precision (as BSON does) so
+      cursors round-trip, and every returned document is a copy.
+
+Limitation — the memory backend is partial:
+    Only pets, products, users and purchases move into memory. Everything
+    else still goes through Motor, so STORAGE_BACKEND=memory still needs a
+    database (a real MongoDB, or mongomock-motor as in load_test.py):
+        - auth_tokens: magic link request / verify (main.py)
+        - spending_rollups: apply_purchase / remove_purchase /
+          apply_kg_delta on every purchase write, /api/spending/trend, and
+          the dashboard totals (MemoryPetRepository reads the collection)
+        - email_outbox: EmailOutbox enqueue + delivery workers
+        - catalog_meta: CatalogVersion (product ETags, catalog reloads)
+        - _migrations and the collections migrations touch (startup.py)
+        - account_deletions: the deletion job queue and status endpoint
+    The background workers (ReminderScheduler, PetRetention,
+    AccountDeletionWorker) query the database collections directly, so
+    they never see pets, users or purchases held in memory: no reminders
+    go out and deleted accounts' in-memory data is only dropped on
+    restart. That is fine for benchmarks and profiling, which is all this
+    backend is for.
+
+Interfaces:
+    PetRepository, ProductRepository, UserRepository, PurchaseRepository
+    (typing.Protocol — both backends implement every method).
+
+Usage:
+    repositories = create_repositories({
+        "pets": pets_collection, "products": products_collection,
+        "users": users_collection, "purchases": purchases_collection,
+        "spending_rollups": spending_rollups_collection,
+    })
+    pet = await repositories.pets.get(public_id)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import logging
+import os
+import re
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from utils.pagination import keyset_filter
+from utils.pet_retention import touch_due, touch_pet
+
+logger = logging.getLogger("petai")
+
+# Product list order; backed by the (brand_key, _id) index — every page is a range scan.
+PRODUCT_LIST_SORT = [("brand_key", 1), ("_id", 1)]
+
+# Purchase history order: newest first, _id breaks ties so the order is total.
+# Backed by the (user_id, pet_id, purchased_at, _id) index — every page is a range scan.
+PURCHASE_HISTORY_SORT = [("purchased_at", -1), ("_id", -1)]
+
+# Value types a client cursor may carry for each sort field (see decode_cursor)
+PRODUCT_CURSOR_TYPES = [(str, type(None)), (str,)]
+PURCHASE_CURSOR_TYPES = [(datetime, type(None)), (ObjectId,)]
+
+# Pre-auth_tokens magic link fields, dropped from users on login
+LEGACY_USER_FIELDS = ("magic_link_token", "magic_link_expiry", "consumed_magic_token")
+
+
+def dashboard_pipeline(user_id: str, history_limit: int) -> List[Dict]:
+    """The MongoPetRepository.dashboard aggregation (also explained by audit_indexes.py)."""
+    # pets → $lookup active purchase → $lookup newest history → $lookup
+    # spending_rollups for totals. Each purchases sub-pipeline is an index
+    # range scan cut off by its own $limit: the active purchase comes from
+    # (user_id, pet_id, status, purchased_at, _id), the history page from
+    # (user_id, pet_id, purchased_at, _id). Neither reads more than
+    # history_limit + 1 purchases however long the pet's history is;
+    # totals sum one rollup per month instead of every purchase.
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$lookup": {
+            "from": "purchases",
+            "let": {"pet_id": "$public_id"},
+            "pipeline": [
+                {"$match": {"user_id": user_id, "status": "active", "$expr": {"$eq": ["$pet_id", "$$pet_id"]}}},
+                {"$sort": dict(PURCHASE_HISTORY_SORT)},
+                {"$limit": 1},
+            ],
+            "as": "active",
+        }},
+        {"$lookup": {
+            "from": "purchases",
+            "let": {"pet_id": "$public_id"},
+            "pipeline": [
+                {"$match": {"user_id": user_id, "$expr": {"$eq": ["$pet_id", "$$pet_id"]}}},
+                {"$sort": dict(PURCHASE_HISTORY_SORT)},
+                {"$limit": history_limit + 1},
+            ],
+            "as": "history",
+        }},
+        {"$lookup": {
+            "from": "spending_rollups",
+            "let": {"pet_id": "$public_id"},
+            "pipeline": [
+                {"$match": {"user_id": user_id, "$expr": {"$eq": ["$pet_id", "$$pet_id"]}}},
+                {"$group": {
+                    "_id": None,
+                    "total_cost": {"$sum": "$total_cost"},
+                    "bags": {"$sum": "$bags"},
+                    "kg": {"$sum": "$kg"},
+                    "first_purchased_at": {"$min": "$first_purchased_at"},
+                    "last_purchased_at": {"$max": "$last_purchased_at"},
+                }},
+            ],
+            "as": "totals",
+        }},
+    ]
+
+
+# ============================================
+# Interfaces
+# ============================================
+
+class PetRepository(Protocol):
+    async def get(self, public_id: str) -> Optional[Dict]: ...
+    async def get_by_session_token(self, session_token: str) -> Optional[Dict]: ...
+    async def list_for_user(self, user_id: str) -> List[Dict]: ...
+    async def create(self, doc: Dict) -> Dict: ...
+    async def create_many(self, docs: List[Dict]): ...
+    async def update(self, public_id: str, fields: Dict) -> Optional[Dict]: ...
+    async def delete(self, public_id: str) -> bool: ...
+    async def touch(self, pet: Dict): ...
+    async def dashboard(self, user_id: str, history_limit: int) -> List[Dict]:
+        """The user's pets, each with "active" (purchase | None), "history"
+        (newest first, up to history_limit + 1) and "totals" (summed rollups | None)."""
+
+
+class ProductRepository(Protocol):
+    async def get(self, product_id: str) -> Optional[Dict]: ...
+    async def get_many(self, product_ids: List[str]) -> List[Dict]: ...
+    async def all(self) -> List[Dict]:
+        """Every product, by _id."""
+    async def count(self) -> int: ...
+    async def newest_imported_at(self) -> Optional[str]: ...
+    async def page_keys(self, filters: Dict, after: Optional[List], limit: int) -> List[Dict]:
+        """
+        {"_id", "brand_key"} of up to limit products in PRODUCT_LIST_SORT order.
+
+        filters: life_stage, breed_size, grain_free (equality), brand_prefix
+        after: Sort-key values of the previous page's last product
+        """
+    async def create_many(self, docs: List[Dict]): ...
+
+
+class UserRepository(Protocol):
+    async def get(self, user_id: str) -> Optional[Dict]: ...
+    async def find_or_create(self, email: str, defaults: Dict) -> Dict: ...
+    async def record_login(self, user_id: str, now: datetime) -> Optional[Dict]:
+        """Mark the email verified; None if the user is gone or tombstoned."""
+    async def set_preferences(self, user_id: str, preferences: Dict, now: datetime) -> Optional[Dict]:
+        """Replace the preferences object; None if the user is gone or tombstoned."""
+    async def tombstone(self, user_id: str, now: datetime): ...
+    async def create_many(self, docs: List[Dict]): ...
+
+
+class PurchaseRepository(Protocol):
+    async def get(self, purchase_id: str) -> Optional[Dict]: ...
+    async def create(self, doc: Dict) -> Dict: ...
+    async def create_many(self, docs: List[Dict]): ...
+    async def close_active(self, user_id: str, pet_id: str, status: str, now: datetime) -> int: ...
+    async def history(
+        self, user_id: str, pet_id: str, *, status: Optional[str] = None,
+        before: Optional[List] = None, limit: int = 20,
+    ) -> List[Dict]:
+        """Purchases in PURCHASE_HISTORY_SORT order, after the `before` sort-key values."""
+    async def update(self, purchase_id: str, fields: Dict, unset: Iterable[str] = ()) -> Optional[Dict]: ...
+    async def delete(self, purchase_id: str) -> bool: ...
+    async def purchase_dates(self, user_id: str, pet_id: str, start: datetime, end: datetime) -> List[datetime]:
+        """purchased_at of the pet's purchases in [start, end), oldest first."""
+
+
+class Repositories:
+    """The four repositories of one backend."""
+
+    __slots__ = ("backend", "pets", "products", "users", "purchases")
+
+    def __init__(self, backend: str, pets: PetRepository, products: ProductRepository,
+                 users: UserRepository, purchases: PurchaseRepository):
+        self.backend = backend
+        self.pets = pets
+        self.products = products
+        self.users = users
+        self.purchases = purchases
+
+
+# ============================================
+# MongoDB Backend
+# ============================================
+
+class MongoPetRepository:
+    """Pets in a (instrumented) Motor collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, public_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"public_id": public_id})
+
+    async def get_by_session_token(self, session_token: str) -> Optional[Dict]:
+        return await self.collection.find_one({"session_token": session_token})
+
+    async def list_for_user(self, user_id: str) -> List[Dict]:
+        return await self.collection.find({"user_id": user_id}).to_list(None)
+
+    async def create(self, doc: Dict) -> Dict:
+        result = await self.collection.insert_one(doc)
+        return await self.collection.find_one({"_id": result.inserted_id})
+
+    async def create_many(self, docs: List[Dict]):
+        if docs:
+            await self.collection.insert_many(docs)
+
+    async def update(self, public_id: str, fields: Dict) -> Optional[Dict]:
+        await self.collection.update_one({"public_id": public_id}, {"$set": fields})
+        return await self.collection.find_one({"public_id": public_id})
+
+    async def delete(self, public_id: str) -> bool:
+        result = await self.collection.delete_one({"public_id": public_id})
+        return result.deleted_count > 0
+
+    async def touch(self, pet: Dict):
+        await touch_pet(self.collection, pet)
+
+    async def dashboard(self, user_id: str, history_limit: int) -> List[Dict]:
+        pets = []
+        async for pet in self.collection.aggregate(dashboard_pipeline(user_id, history_limit)):
+            active = pet.get("active") or []
+            totals = pet.get("totals") or []
+            pet["active"] = active[0] if active else None
+            pet["history"] = pet.get("history") or []
+            pet["totals"] = totals[0] if totals else None
+            pets.append(pet)
+        return pets
+
+
+class MongoProductRepository:
+    """Products (string _id) in a Motor collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, product_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"_id": product_id})
+
+    async def get_many(self, product_ids: List[str]) -> List[Dict]:
+        return await self.collection.find({"_id": {"$in": product_ids}}).to_list(None)
+
+    async def all(self) -> List[Dict]:
+        return await self.collection.find({}).sort("_id", 1).to_list(None)
+
+    async def count(self) -> int:
+        return await self.collection.count_documents({})
+
+    async def newest_imported_at(self) -> Optional[str]:
+        newest = await self.collection.find_one({}, {"imported_at": 1}, sort=[("imported_at", -1)])
+        return (newest or {}).get("imported_at")
+
+    async def page_keys(self, filters: Dict, after: Optional[List], limit: int) -> List[Dict]:
+        query = {field: filters[field] for field in ("life_stage", "breed_size", "grain_free") if field in filters}
+        if filters.get("brand_prefix") is not None:
+            # Anchored regex on the lowercase brand_key → tight index bounds
+            # "ori" becomes ^ori, scanning only keys in ["ori", "orj")
+            query["brand_key"] = {"$regex": "^" + re.escape(filters["brand_prefix"])}
+        if after is not None:
+            query = {"$and": [query, keyset_filter(PRODUCT_LIST_SORT, after)]}
+        # Only the sort keys are projected — bodies come from the in-memory catalog
+        return await self.collection.find(query, {"brand_key": 1}).sort(PRODUCT_LIST_SORT).limit(limit).to_list(limit)
+
+    async def create_many(self, docs: List[Dict]):
+        if docs:
+            await self.collection.insert_many(docs)
+
+
+class MongoUserRepository:
+    """Users (ObjectId _id, unique email) in a Motor collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"_id": ObjectId(user_id)})
+
+    async def find_or_create(self, email: str, defaults: Dict) -> Dict:
+        # Find or create in one round trip
+        return await self.collection.find_one_and_update(
+            {"email": email},
+            {"$setOnInsert": {**defaults, "email": email}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def record_login(self, user_id: str, now: datetime) -> Optional[Dict]:
+        return await self.collection.find_one_and_update(
+            {"_id": ObjectId(user_id), "deleted_at": {"$exists": False}},
+            {
+                "$set": {"email_verified": True, "last_login_at": now, "updated_at": now},
+                "$unset": {field: "" for field in LEGACY_USER_FIELDS},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def set_preferences(self, user_id: str, preferences: Dict, now: datetime) -> Optional[Dict]:
+        return await self.collection.find_one_and_update(
+            {"_id": ObjectId(user_id), "deleted_at": {"$exists": False}},
+            {"$set": {"preferences": preferences, "updated_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def tombstone(self, user_id: str, now: datetime):
+        await self.collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {
+                "$set": {"deleted_at": now, "email": f"deleted:{user_id}"},
+                "$unset": {"name": "", "preferences": ""},
+            },
+        )
+
+    async def create_many(self, docs: List[Dict]):
+        if docs:
+            await self.collection.insert_many(docs)
+
+
+class MongoPurchaseRepository:
+    """Purchases (ObjectId _id) in a Motor collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, purchase_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"_id": ObjectId(purchase_id)})
+
+    async def create(self, doc: Dict) -> Dict:
+        result = await self.collection.insert_one(doc)
+        return await self.collection.find_one({"_id": result.inserted_id})
+
+    async def create_many(self, docs: List[Dict]):
+        if docs:
+            await self.collection.insert_many(docs)
+
+    async def close_active(self, user_id: str, pet_id: str, status: str, now: datetime) -> int:
+        result = await self.collection.update_many(
+            {"user_id": user_id, "pet_id": pet_id, "status": "active"},
+            {"$set": {"status": status, "completed_at": now}},
+        )
+        return result.modified_count
+
+    async def history(
+        self, user_id: str, pet_id: str, *, status: Optional[str] = None,
+        before: Optional[List] = None, limit: int = 20,
+    ) -> List[Dict]:
+        query = {"user_id": user_id, "pet_id": pet_id}
+        if status:
+            query["status"] = status
+        if before is not None:
+            query = {"$and": [query, keyset_filter(PURCHASE_HISTORY_SORT, before)]}
+        return await self.collection.find(query).sort(PURCHASE_HISTORY_SORT).limit(limit).to_list(limit)
+
+    async def update(self, purchase_id: str, fields: Dict, unset: Iterable[str] = ()) -> Optional[Dict]:
+        update = {"$set": fields}
+        unset = {field: "" for field in unset}
+        if unset:
+            update["$unset"] = unset
+        await self.collection.update_one({"_id": ObjectId(purchase_id)}, update)
+        return await self.collection.find_one({"_id": ObjectId(purchase_id)})
+
+    async def delete(self, purchase_id: str) -> bool:
+        result = await self.collection.delete_one({"_id": ObjectId(purchase_id)})
+        return result.deleted_count > 0
+
+    async def purchase_dates(self, user_id: str, pet_id: str, start: datetime, end: datetime) -> List[datetime]:
+        docs = await self.collection.find(
+            {"user_id": user_id, "pet_id": pet_id, "purchased_at": {"$gte": start, "$lt": end}},
+            {"purchased_at": 1},
+        ).sort("purchased_at", 1).to_list(None)
+        return [doc["purchased_at"] for doc in docs]
+
+
+# ============================================
+# In-Memory Backend
+# ============================================
+
+def _copy(value):
+    """Copy nested dicts/lists (values themselves are immutable)."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _to_bson(value):
+    """Copy a value the way a BSON round trip changes it: tuples → lists,
+    datetimes → naive UTC with millisecond precision."""
+    if isinstance(value, dict):
+        return {k: _to_bson(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_bson(v) for v in value]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
+
+
+def _field_matches(value, expected) -> bool:
+    """Mongo equality: a scalar filter also matches an array containing it."""
+    return value == expected or (isinstance(value, list) and expected in value)
+
+
+class _MemoryTable:
+    """
+    Documents by _id, plus hash indexes.
+
+    Args:
+        name: Collection name (for DuplicateKeyError messages)
+        unique: Fields with a unique index (_id always is)
+        indexed: Fields with a non-unique index
+    """
+
+    def __init__(self, name: str, unique: Tuple[str, ...] = (), indexed: Tuple[str, ...] = ()):
+        self.name = name
+        self.docs: Dict[Any, Dict] = {}
+        self.unique: Dict[str, Dict[Any, Any]] = {field: {} for field in unique}
+        self.indexed: Dict[str, Dict[Any, Dict[Any, None]]] = {field: {} for field in indexed}
+
+    @staticmethod
+    def _key(value):
+        return tuple(value) if isinstance(value, list) else value
+
+    def _check_unique(self, doc: Dict, _id=None):
+        for field, index in self.unique.items():
+            owner = index.get(self._key(doc.get(field)))
+            if owner is not None and owner != _id:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {field}_1 "
+                    f"dup key: {{ {field}: {doc.get(field)!r} }}", code=11000,
+                )
+
+    def _index(self, doc: Dict):
+        for field, index in self.unique.items():
+            index[self._key(doc.get(field))] = doc["_id"]
+        for field, index in self.indexed.items():
+            index.setdefault(self._key(doc.get(field)), {})[doc["_id"]] = None
+
+    def _unindex(self, doc: Dict):
+        for field, index in self.unique.items():
+            index.pop(self._key(doc.get(field)), None)
+        for field, index in self.indexed.items():
+            ids = index.get(self._key(doc.get(field)))
+            if ids is not None:
+                ids.pop(doc["_id"], None)
+                if not ids:
+                    del index[self._key(doc.get(field))]
+
+    def insert(self, doc: Dict) -> Dict:
+        """Store a copy (the caller's doc gets its _id, like insert_one) and return it."""
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_ dup key: {{ _id: {doc['_id']!r} }}",
+                code=11000,
+            )
+        stored = _to_bson(doc)
+        self._check_unique(stored)
+        self.docs[stored["_id"]] = stored
+        self._index(stored)
+        return stored
+
+    def insert_many(self, docs: List[Dict]) -> List[Dict]:
+        """Ordered insert: stops at the first duplicate with a BulkWriteError, like insert_many()."""
+        stored = []
+        for i, doc in enumerate(docs):
+            try:
+                stored.append(self.insert(doc))
+            except DuplicateKeyError as e:
+                raise BulkWriteError({
+                    "writeErrors": [{"index": i, "code": 11000, "errmsg": str(e), "op": doc}],
+                    "nInserted": i,
+                })
+        return stored
+
+    def find(self, field: str, value) -> List[Dict]:
+        """Stored documents where field == value (indexed, unique or scanned)."""
+        if field == "_id":
+            doc = self.docs.get(value)
+            return [doc] if doc is not None else []
+        if field in self.unique:
+            _id = self.unique[field].get(self._key(value))
+            return [self.docs[_id]] if _id is not None else []
+        if field in self.indexed:
+            return [self.docs[_id] for _id in self.indexed[field].get(self._key(value), ())]
+        return [doc for doc in self.docs.values() if _field_matches(doc.get(field), value)]
+
+    def find_one(self, field: str, value) -> Optional[Dict]:
+        found = self.find(field, value)
+        return found[0] if found else None
+
+    def update(self, _id, fields: Dict, unset: Iterable[str] = ()) -> Optional[Dict]:
+        """$set / $unset on one stored document; returns it (None if missing)."""
+        doc = self.docs.get(_id)
+        if doc is None:
+            return None
+        updated = {**doc, **_to_bson(fields)}
+        for field in unset:
+            updated.pop(field, None)
+        self._check_unique(updated, _id)
+        self._unindex(doc)
+        doc.clear()
+        doc.update(updated)
+        self._index(doc)
+        return doc
+
+    def delete(self, _id) -> Optional[Dict]:
+        doc = self.docs.pop(_id, None)
+        if doc is not None:
+            self._unindex(doc)
+        return doc
+
+
+class MemoryPetRepository:
+    """
+    Pets in process memory: unique public_id, indexes on session_token and
+    user_id (insertion order, like a Mongo natural-order scan).
+
+    Args:
+        purchases: MemoryPurchaseRepository (dashboard)
+        rollups: Motor spending_rollups collection (dashboard totals)
+    """
+
+    def __init__(self, purchases: "MemoryPurchaseRepository", rollups=None):
+        self.table = _MemoryTable("pets", unique=("public_id",), indexed=("session_token", "user_id"))
+        self._purchases = purchases
+        self._rollups = rollups
+
+    async def get(self, public_id: str) -> Optional[Dict]:
+        return _copy(self.table.find_one("public_id", public_id))
+
+    async def get_by_session_token(self, session_token: str) -> Optional[Dict]:
+        return _copy(self.table.find_one("session_token", session_token))
+
+    async def list_for_user(self, user_id: str) -> List[Dict]:
+        return [_copy(doc) for doc in self.table.find("user_id", user_id)]
+
+    async def create(self, doc: Dict) -> Dict:
+        return _copy(self.table.insert(doc))
+
+    async def create_many(self, docs: List[Dict]):
+        self.table.insert_many(docs)
+
+    async def update(self, public_id: str, fields: Dict) -> Optional[Dict]:
+        doc = self.table.find_one("public_id", public_id)
+        return _copy(self.table.update(doc["_id"], fields)) if doc else None
+
+    async def delete(self, public_id: str) -> bool:
+        doc = self.table.find_one("public_id", public_id)
+        return doc is not None and self.table.delete(doc["_id"]) is not None
+
+    async def touch(self, pet: Dict):
+        now = datetime.utcnow()
+        if touch_due(pet, now):
+            self.table.update(pet["_id"], {"last_accessed_at": now})
+
+    async def dashboard(self, user_id: str, history_limit: int) -> List[Dict]:
+        totals: Dict[str, Dict] = {}
+        if self._rollups is not None:
+            async for rollup in self._rollups.find({"user_id": user_id}):
+                _add_rollup(totals.setdefault(rollup.get("pet_id"), _empty_totals()), rollup)
+
+        pets = []
+        for pet in await self.list_for_user(user_id):
+            pet_id = pet.get("public_id")
+            active = (p for p in self._purchases.scan(user_id, pet_id) if p.get("status") == "active")
+            pet["active"] = _copy(next(active, None))
+            pet["history"] = await self._purchases.history(user_id, pet_id, limit=history_limit + 1)
+            pet["totals"] = totals.get(pet_id)
+            pets.append(pet)
+        return pets
+
+
+def _empty_totals() -> Dict:
+    return {"_id": None, "total_cost": 0, "bags": 0, "kg": 0, "first_purchased_at": None, "last_purchased_at": None}
+
+
+def _add_rollup(totals: Dict, rollup: Dict):
+    """$group semantics: $sum skips non-numbers, $min/$max skip nulls."""
+    for field in ("total_cost", "bags", "kg"):
+        value = rollup.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            totals[field] += value
+    first, last = rollup.get("first_purchased_at"), rollup.get("last_purchased_at")
+    if first is not None and (totals["first_purchased_at"] is None or first < totals["first_purchased_at"]):
+        totals["first_purchased_at"] = first
+    if last is not None and (totals["last_purchased_at"] is None or last > totals["last_purchased_at"]):
+        totals["last_purchased_at"] = last
+
+
+def _brand_sort_key(brand_key) -> str:
+    # Products are imported with a string brand_key; a missing one sorts first
+    return brand_key if isinstance(brand_key, str) else ""
+
+
+class MemoryProductRepository:
+    """Products in process memory, with (brand_key, _id) kept sorted for paging."""
+
+    def __init__(self):
+        self.table = _MemoryTable("products")
+        self._order: Optional[List[Tuple[str, str]]] = None     # Rebuilt after writes
+
+    def _sorted_keys(self) -> List[Tuple[str, str]]:
+        if self._order is None:
+            self._order = sorted((_brand_sort_key(doc.get("brand_key")), _id) for _id, doc in self.table.docs.items())
+        return self._order
+
+    async def get(self, product_id: str) -> Optional[Dict]:
+        return _copy(self.table.find_one("_id", product_id))
+
+    async def get_many(self, product_ids: List[str]) -> List[Dict]:
+        return [_copy(self.table.docs[_id]) for _id in dict.fromkeys(product_ids) if _id in self.table.docs]
+
+    async def all(self) -> List[Dict]:
+        return [_copy(self.table.docs[_id]) for _id in sorted(self.table.docs)]
+
+    async def count(self) -> int:
+        return len(self.table.docs)
+
+    async def newest_imported_at(self) -> Optional[str]:
+        dates = [doc["imported_at"] for doc in self.table.docs.values() if doc.get("imported_at") is not None]
+        return max(dates) if dates else None
+
+    async def page_keys(self, filters: Dict, after: Optional[List], limit: int) -> List[Dict]:
+        keys = self._sorted_keys()
+        prefix = filters.get("brand_prefix")
+        start = bisect_left(keys, (prefix,)) if prefix is not None else 0
+        if after is not None:
+            start = max(start, bisect_right(keys, (_brand_sort_key(after[0]), after[1])))
+        equality = [(f, filters[f]) for f in ("life_stage", "breed_size", "grain_free") if f in filters]
+
+        page = []
+        for i in range(start, len(keys)):
+            brand_key, _id = keys[i]
+            if prefix is not None and not brand_key.startswith(prefix):
+                break       # Past the prefix range
+            doc = self.table.docs[_id]
+            if all(_field_matches(doc.get(f), v) for f, v in equality):
+                page.append({"_id": _id, "brand_key": doc.get("brand_key")})
+                if len(page) >= limit:
+                    break
+        return page
+
+    async def create_many(self, docs: List[Dict]):
+        self.table.insert_many(docs)
+        self._order = None
+
+
+class MemoryUserRepository:
+    """Users in process memory, unique on email."""
+
+    def __init__(self):
+        self.table = _MemoryTable("users", unique=("email",))
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        return _copy(self.table.find_one("_id", ObjectId(user_id)))
+
+    async def find_or_create(self, email: str, defaults: Dict) -> Dict:
+        user = self.table.find_one("email", email)
+        return _copy(user if user is not None else self.table.insert({**defaults, "email": email}))
+
+    async def record_login(self, user_id: str, now: datetime) -> Optional[Dict]:
+        user = self.table.find_one("_id", ObjectId(user_id))
+        if user is None or "deleted_at" in user:
+            return None
+        fields = {"email_verified": True, "last_login_at": now, "updated_at": now}
+        return _copy(self.table.update(user["_id"], fields, LEGACY_USER_FIELDS))
+
+    async def set_preferences(self, user_id: str, preferences: Dict, now: datetime) -> Optional[Dict]:
+        user = self.table.find_one("_id", ObjectId(user_id))
+        if user is None or "deleted_at" in user:
+            return None
+        return _copy(self.table.update(user["_id"], {"preferences": preferences, "updated_at": now}))
+
+    async def tombstone(self, user_id: str, now: datetime):
+        self.table.update(ObjectId(user_id), {"deleted_at": now, "email": f"deleted:{user_id}"}, ("name", "preferences"))
+
+    async def create_many(self, docs: List[Dict]):
+        self.table.insert_many(docs)
+
+
+def _history_key(doc: Dict) -> Tuple[datetime, ObjectId]:
+    return doc.get("purchased_at") or datetime.min, doc["_id"]
+
+
+class MemoryPurchaseRepository:
+    """Purchases in process memory; per (user_id, pet_id) a list sorted by (purchased_at, _id)."""
+
+    def __init__(self):
+        self.table = _MemoryTable("purchases")
+        self._history: Dict[Tuple[str, str], List[Tuple[datetime, ObjectId]]] = {}
+
+    def _add(self, doc: Dict):
+        insort(self._history.setdefault((doc.get("user_id"), doc.get("pet_id")), []), _history_key(doc))
+
+    def _remove(self, doc: Dict):
+        keys = self._history.get((doc.get("user_id"), doc.get("pet_id")), [])
+        i = bisect_left(keys, _history_key(doc))
+        if i < len(keys) and keys[i] == _history_key(doc):
+            del keys[i]
+
+    def scan(self, user_id: str, pet_id: str, before: Optional[List] = None):
+        """Stored purchases, newest first (PURCHASE_HISTORY_SORT), strictly after `before`."""
+        keys = self._history.get((user_id, pet_id), [])
+        end = len(keys)
+        if before is not None:
+            end = bisect_left(keys, (_to_bson(before[0]) or datetime.min, before[1]))
+        for i in range(end - 1, -1, -1):
+            yield self.table.docs[keys[i][1]]
+
+    async def get(self, purchase_id: str) -> Optional[Dict]:
+        return _copy(self.table.find_one("_id", ObjectId(purchase_id)))
+
+    async def create(self, doc: Dict) -> Dict:
+        stored = self.table.insert(doc)
+        self._add(stored)
+        return _copy(stored)
+
+    async def create_many(self, docs: List[Dict]):
+        for doc in docs:
+            self._add(self.table.insert(doc))
+
+    async def close_active(self, user_id: str, pet_id: str, status: str, now: datetime) -> int:
+        active = [doc["_id"] for doc in self.scan(user_id, pet_id) if doc.get("status") == "active"]
+        for _id in active:
+            self.table.update(_id, {"status": status, "completed_at": now})
+        return len(active)
+
+    async def history(
+        self, user_id: str, pet_id: str, *, status: Optional[str] = None,
+        before: Optional[List] = None, limit: int = 20,
+    ) -> List[Dict]:
+        page = []
+        for doc in self.scan(user_id, pet_id, before):
+            if status and not _field_matches(doc.get("status"), status):
+                continue
+            page.append(_copy(doc))
+            if len(page) >= limit:
+                break
+        return page
+
+    async def update(self, purchase_id: str, fields: Dict, unset: Iterable[str] = ()) -> Optional[Dict]:
+        doc = self.table.find_one("_id", ObjectId(purchase_id))
+        if doc is None:
+            return None
+        self._remove(doc)
+        updated = self.table.update(doc["_id"], fields, unset)
+        self._add(updated)
+        return _copy(updated)
+
+    async def delete(self, purchase_id: str) -> bool:
+        doc = self.table.delete(ObjectId(purchase_id))
+        if doc is None:
+            return False
+        self._remove(doc)
+        return True
+
+    async def purchase_dates(self, user_id: str, pet_id: str, start: datetime, end: datetime) -> List[datetime]:
+        keys = self._history.get((user_id, pet_id), [])
+        lo = bisect_left(keys, (start,))
+        hi = bisect_left(keys, (end,))
+        return [purchased_at for purchased_at, _ in keys[lo:hi]]
+
+
+# ============================================
+# Factory
+# ============================================
+
+def create_repositories(collections: Dict, backend: Optional[str] = None) -> Repositories:
+    """
+    Build the repositories for STORAGE_BACKEND (mongo | memory).
+
+    Args:
+        collections: Instrumented Motor collections by name: pets, products,
+            users, purchases, spending_rollups (the memory backend only uses
+            spending_rollups, for dashboard totals — see "Limitation" above)
+        backend: Override STORAGE_BACKEND
+    """
+    backend = (backend or os.getenv("STORAGE_BACKEND", "mongo")).lower()
+    if backend == "memory":
+        logger.warning(
+            "STORAGE_BACKEND=memory: pets, products, users and purchases live in this process only; "
+            "auth tokens, spending rollups, the email outbox, catalog_meta, migrations and account "
+            "deletions still use the database, and background workers do not see in-memory data"
+        )
+        purchases = MemoryPurchaseRepository()
+        return Repositories(
+            "memory",
+            MemoryPetRepository(purchases, collections.get("spending_rollups")),
+            MemoryProductRepository(),
+            MemoryUserRepository(),
+            purchases,
+        )
+    if backend != "mongo":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend!r} (expected mongo or memory)")
+    return Repositories(
+        "mongo",
+        MongoPetRepository(collections["pets"]),
+        MongoProductRepository(collections["products"]),
+        MongoUserRepository(collections["users"]),
+        MongoPurchaseRepository(collections["purchases"]),
+    )
@@ -0,0 +1,115 @@
+"""
+BowlWise - Request Middleware (pure ASGI)
+
+One ASGI middleware for everything the API does around each request:
+per-request timings, the Server-Timing header, security headers, the
+request log line and the /metrics request series.
+
+Data Flow:
+    ASGI server → RequestMiddleware
+        → start_request()                    (RequestTimings contextvar)
+        → app(scope, receive, send_with_headers)
+            http.response.start → + Server-Timing + security headers
+            http.response.body  → passed through untouched
+        → log line + HTTP_REQUEST_SECONDS    (after the last body chunk)
+
+How it works:
+    - Replaces two @app.middleware("http") layers. Those are
+      BaseHTTPMiddleware: each one runs the rest of the app in a separate
+      task and streams the response body through a memory channel.
+      Here the app is awaited directly and only the response start message
+      is touched — headers are appended to its header list.
+    - The app runs in the middleware's own task, so the RequestTimings bound
+      by start_request() is the one InstrumentedCollection and
+      timed_stage() record into.
+    - Server-Timing is computed when the response starts (body streaming
+      can't be in a header); the log line and latency histogram use the
+      time after the body was sent.
+    - The route label comes from scope["route"], which the router sets once
+      it has matched (template path, e.g. /api/pets/{pet_id}).
+    - New cross-cutting request behaviour belongs here rather than in a
+      new @app.middleware layer.
+
+Usage:
+    app.add_middleware(RequestMiddleware, security_headers=SECURITY_HEADERS)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import logging
+from typing import Dict, Optional
+
+from utils.instrumentation import log_fields, server_timing_header, start_request
+from utils.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT
+
+logger = logging.getLogger("petai")
+
+
+# ============================================
+# Middleware
+# ============================================
+
+class RequestMiddleware:
+    """
+    Timing, headers, logging and metrics for every HTTP request.
+
+    Args:
+        app: Next ASGI application
+        security_headers: {name: value} set on every response (replacing
+            any value the endpoint set)
+    """
+
+    def __init__(self, app, security_headers: Optional[Dict[str, str]] = None):
+        self.app = app
+        self._headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (security_headers or {}).items()]
+        self._header_names = {name for name, _ in self._headers}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request()
+        method = scope["method"]
+        status = 500        # Unless the app starts a response
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [h for h in message.get("headers", ()) if h[0] not in self._header_names]
+                headers.extend(self._headers)
+                headers.append((b"server-timing", server_timing_header(timings, timings.elapsed_ms()).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method)
+            duration_ms = timings.elapsed_ms()
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                duration_ms / 1000, method, getattr(route, "path", "unmatched"), str(status),
+            )
+            logger.info(
+                "%s %s → %d (%.0fms) %s",
+                method,
+                scope["path"],
+                status,
+                duration_ms,
+                log_fields(timings),
+                extra={
+                    "log_type": "request",
+                    "method": method,
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "duration_ms": round(duration_ms, 1),
+                    "db_ops": timings.db_ops,
+                    "db_ms": round(timings.db_ms, 1),
+                },
+            )
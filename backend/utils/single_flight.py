@@ -0,0 +1,132 @@
+"""
+BowlWise - Single-Flight Request Coalescing
+
+Lets concurrent callers asking for the same thing share one in-flight
+computation instead of each doing it. Used where bursts of identical work
+are common: recommendations right after a marketing email (many pets with
+the same profile), catalog reloads when the version changes, and product
+lookups that miss the in-memory catalog.
+
+Data Flow:
+    caller → SingleFlight.do(key, fn, *args)
+        → key in flight?  yes → wait on the existing task (shared)
+                          no  → start fn(*args) as a task (leader)
+        → every caller gets the same result (or the same exception)
+        → key is forgotten as soon as the task finishes
+
+How it works:
+    - One asyncio task per in-flight key. Callers await it through
+      asyncio.shield(), so a caller that is cancelled (client disconnect,
+      timeout) stops waiting without cancelling the work for everyone else.
+    - Nothing is cached: the key is removed when the task completes, so the
+      next call after that runs fn again. Callers that need caching keep
+      their own (catalog snapshot, ETags); this only removes duplicates that
+      overlap in time.
+    - Results are shared, not copied — fn must return something the callers
+      treat as read-only (encoded bytes, immutable snapshots, docs that are
+      only read).
+    - Per key, the group tracks how many callers are waiting and how many
+      times the key has failed (bounded, most recent keys kept, in-process
+      only — keys can carry pet profiles, so they never leave the process).
+      A failure is raised to every waiter and logged once with the waiter
+      count. Call/error counts go to /metrics by group name only.
+    - Coalescing is per process; workers on the same host still each do the
+      work once (the catalog file covers that case for catalog loads).
+
+Usage:
+    recommendation_flights = SingleFlight("recommendations")
+    body = await recommendation_flights.do(key, build_body, pet_profile)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from utils.metrics import SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_ERRORS, SINGLE_FLIGHT_IN_FLIGHT
+
+logger = logging.getLogger("petai")
+
+# Failed keys remembered per group (errors()); older keys are dropped first
+MAX_ERROR_KEYS = 100
+
+
+# ============================================
+# Single-Flight Group
+# ============================================
+
+class _Call:
+    """One in-flight computation and the number of callers sharing it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key.
+
+    Args:
+        name: Group name used in metrics and logs (e.g. "recommendations")
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._errors: "OrderedDict[Hashable, int]" = OrderedDict()
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Return fn(*args, **kwargs), sharing the call with any caller already
+        running the same key.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            SINGLE_FLIGHT_CALLS.inc(self.name, "leader")
+            SINGLE_FLIGHT_IN_FLIGHT.inc(self.name)
+        else:
+            SINGLE_FLIGHT_CALLS.inc(self.name, "shared")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+
+    def in_flight(self) -> Dict[Hashable, int]:
+        """Keys currently running → callers waiting on each."""
+        return {key: call.waiters for key, call in self._calls.items()}
+
+    def errors(self) -> Dict[Hashable, int]:
+        """Recently failed keys → failure count."""
+        return dict(self._errors)
+
+    def _finish(self, key: Hashable, call: _Call):
+        # Forget the key first so callers arriving from now on start fresh work
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        SINGLE_FLIGHT_IN_FLIGHT.dec(self.name)
+        if call.task.cancelled():
+            return
+        error = call.task.exception()   # Also marks the exception as retrieved
+        if error is None:
+            return
+        SINGLE_FLIGHT_ERRORS.inc(self.name)
+        self._errors[key] = self._errors.pop(key, 0) + 1
+        if len(self._errors) > MAX_ERROR_KEYS:
+            self._errors.popitem(last=False)
+        logger.warning(
+            "Single-flight %s failed for %s (%d waiting): %s: %s",
+            self.name, key, call.waiters, type(error).__name__, error,
+        )
+
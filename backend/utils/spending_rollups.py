@@ -0,0 +1,170 @@
+"""
+BowlWise - Spending Rollups
+
+Materialized monthly spending totals per user/pet, maintained incrementally
+as purchases are created, edited and deleted. Spending summaries and trends
+read a handful of rollup documents instead of summing every purchase.
+
+Data Flow:
+    create_purchase → apply_purchase(+1)  ─┐
+    update_purchase → apply_kg_delta()     ├→ spending_rollups ({user_id, pet_id, month})
+    delete_purchase → remove_purchase()   ─┘
+    rebuild_rollups.py → ROLLUP_PIPELINE over purchases → replace / verify
+
+Rollup document:
+    {
+        "user_id": "...", "pet_id": "...", "month": "2026-03",
+        "total_cost": 231.98, "bags": 2, "kg": 22.68,
+        "first_purchased_at": datetime, "last_purchased_at": datetime,
+        "updated_at": datetime
+    }
+
+Usage:
+    from utils.spending_rollups import apply_purchase, remove_purchase
+    await apply_purchase(spending_rollups_collection, purchase_doc)
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+from datetime import datetime
+from typing import Dict, List
+
+
+def month_key(dt: datetime) -> str:
+    """Rollup bucket for a purchase date: "YYYY-MM"."""
+    return dt.strftime("%Y-%m")
+
+
+def _rollup_filter(purchase: Dict) -> Dict:
+    return {
+        "user_id": purchase["user_id"],
+        "pet_id": purchase["pet_id"],
+        "month": month_key(purchase["purchased_at"]),
+    }
+
+
+# ============================================
+# Incremental Maintenance (async — API)
+# ============================================
+
+async def apply_purchase(rollups, purchase: Dict):
+    """Add a newly logged purchase to its month's rollup (upserts the bucket)."""
+    purchased_at = purchase["purchased_at"]
+    await rollups.update_one(
+        _rollup_filter(purchase),
+        {
+            "$inc": {
+                "total_cost": purchase.get("cost") or 0,
+                "bags": 1,
+                "kg": purchase.get("bag_size_kg") or 0,
+            },
+            "$min": {"first_purchased_at": purchased_at},
+            "$max": {"last_purchased_at": purchased_at},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        upsert=True,
+    )
+
+
+async def apply_kg_delta(rollups, purchase: Dict, kg_delta: float):
+    """Adjust kg purchased after a bag size edit."""
+    if not kg_delta:
+        return
+    await rollups.update_one(
+        _rollup_filter(purchase),
+        {"$inc": {"kg": kg_delta}, "$set": {"updated_at": datetime.utcnow()}},
+    )
+
+
+async def remove_purchase(rollups, purchases, purchase: Dict):
+    """
+    Subtract a deleted purchase from its month's rollup.
+
+    Empty buckets are removed. Otherwise first/last purchase dates are
+    re-read from the remaining purchases in that month (purchases is a
+    PurchaseRepository) — one bounded, indexed query on (user_id, pet_id,
+    purchased_at).
+    """
+    bucket = _rollup_filter(purchase)
+    updated = await rollups.find_one_and_update(
+        bucket,
+        {
+            "$inc": {
+                "total_cost": -(purchase.get("cost") or 0),
+                "bags": -1,
+                "kg": -(purchase.get("bag_size_kg") or 0),
+            },
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        return_document=True,
+    )
+    if updated is None:
+        return
+    if updated.get("bags", 0) <= 0:
+        await rollups.delete_one({"_id": updated["_id"]})
+        return
+
+    start, end = month_bounds(bucket["month"])
+    remaining = await purchases.purchase_dates(bucket["user_id"], bucket["pet_id"], start, end)
+    if remaining:
+        await rollups.update_one({"_id": updated["_id"]}, {"$set": {
+            "first_purchased_at": remaining[0],
+            "last_purchased_at": remaining[-1],
+        }})
+
+
+def month_bounds(month: str):
+    """[start, end) datetimes for a "YYYY-MM" bucket."""
+    year, mon = (int(part) for part in month.split("-"))
+    start = datetime(year, mon, 1)
+    end = datetime(year + 1, 1, 1) if mon == 12 else datetime(year, mon + 1, 1)
+    return start, end
+
+
+def recent_month_keys(months: int, now: datetime = None) -> List[str]:
+    """The last `months` bucket keys ending with the current month, oldest first."""
+    now = now or datetime.utcnow()
+    year, mon = now.year, now.month
+    keys = []
+    for _ in range(months):
+        keys.append(f"{year:04d}-{mon:02d}")
+        mon -= 1
+        if mon == 0:
+            year, mon = year - 1, 12
+    return keys[::-1]
+
+
+# ============================================
+# Full Rebuild (shared with rebuild_rollups.py)
+# ============================================
+
+# Recomputes every rollup from scratch. Mirrors the incremental rules above:
+# missing cost / bag size count as 0.
+ROLLUP_PIPELINE = [
+    {"$match": {"purchased_at": {"$type": "date"}}},
+    {"$group": {
+        "_id": {
+            "user_id": "$user_id",
+            "pet_id": "$pet_id",
+            "month": {"$dateToString": {"format": "%Y-%m", "date": "$purchased_at"}},
+        },
+        "total_cost": {"$sum": {"$ifNull": ["$cost", 0]}},
+        "bags": {"$sum": 1},
+        "kg": {"$sum": {"$ifNull": ["$bag_size_kg", 0]}},
+        "first_purchased_at": {"$min": "$purchased_at"},
+        "last_purchased_at": {"$max": "$purchased_at"},
+    }},
+    {"$project": {
+        "_id": 0,
+        "user_id": "$_id.user_id",
+        "pet_id": "$_id.pet_id",
+        "month": "$_id.month",
+        "total_cost": 1,
+        "bags": 1,
+        "kg": 1,
+        "first_purchased_at": 1,
+        "last_purchased_at": 1,
+    }},
+]
@@ -0,0 +1,358 @@
+"""
+BowlWise - Startup: Migrations + Readiness
+
+Keeps cold starts short. Schema/index migrations run once per database
+(recorded in the _migrations collection) instead of on every boot, pending
+ones run concurrently, and slow warm-up work (loading the catalog) happens
+in the background while the process already answers liveness checks.
+
+Data Flow:
+    lifespan → readiness.start() → run_migrations(database, MIGRATIONS)
+        → _migrations: which ids are already applied? (one query)
+        → pending: claim (insert _id) → apply() concurrently (asyncio.gather)
+        → mark applied | release claim on failure
+        → claimed by another instance: wait_for_migrations() in the background
+    lifespan → readiness.warm_up("catalog", product_catalog.get)
+    /health/live  → process is up (no I/O)
+    /health/ready → migrations done + warm-ups finished + Mongo reachable
+
+How it works:
+    - A migration is an id plus an async apply(database). Ids are never
+      reused: changing a migration means adding a new one. The index
+      migration's id embeds a fingerprint of INDEXES, so editing the
+      registry automatically produces a new migration on the next boot.
+      Likewise for dropping indexes listed in SUPERSEDED_INDEXES.
+    - Claims make concurrent boots safe: each instance inserts
+      {_id: migration_id, status: "running"}; the unique _id lets exactly
+      one instance apply it. The others do not report ready until it is
+      recorded as applied: wait_for_migrations() polls for it in the
+      background (the process still answers liveness checks meanwhile) and
+      takes the migration over if its claim disappears (failed elsewhere)
+      or is left "running" longer than stale_after (crashed instance).
+    - Migrations in one batch must be independent of each other — they
+      run at the same time.
+
+Usage:
+    readiness.start()                                     # first thing in the lifespan
+    result = await run_migrations(database, MIGRATIONS)   # {"applied": [...], "skipped": n, "running_elsewhere": [...]}
+    readiness.warm_up("migrations", lambda: wait_for_migrations(database, result["running_elsewhere"]))
+    readiness.warm_up("catalog", product_catalog.get)
+    readiness.ready    # True once every warm-up finished
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from utils.allergens import check_product
+from utils.catalog_version import CATALOG_META_ID
+from utils.index_registry import INDEXES, SUPERSEDED_INDEXES, drop_superseded_indexes, ensure_indexes
+
+logger = logging.getLogger("petai")
+
+MIGRATIONS_COLLECTION = "_migrations"
+
+
+# ============================================
+# Migrations
+# ============================================
+
+class Migration:
+    """
+    One-time schema/data change.
+
+    Args:
+        id: Unique, never reused (recorded in _migrations)
+        description: Shown in logs
+        apply: async fn(database) → optional result (logged, stored)
+    """
+
+    def __init__(self, id: str, description: str, apply: Callable[..., Awaitable]):
+        self.id = id
+        self.description = description
+        self.apply = apply
+
+
+def index_fingerprint() -> str:
+    """Short hash of INDEXES; changes whenever an index spec is added or edited."""
+    specs = {
+        name: [[spec.keys, sorted(spec.options.items())] for spec in specs]
+        for name, specs in INDEXES.items()
+    }
+    return hashlib.sha1(json.dumps(specs, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def superseded_fingerprint() -> str:
+    """Short hash of SUPERSEDED_INDEXES; changes whenever an index is added to it."""
+    return hashlib.sha1(json.dumps(SUPERSEDED_INDEXES, sort_keys=True).encode()).hexdigest()[:12]
+
+
+async def _create_indexes(database) -> str:
+    return f"{await ensure_indexes(database)} specs"
+
+
+async def _drop_superseded_indexes(database) -> str:
+    # Create the replacements first: this runs alongside the index migration,
+    # and dropping an old index before its successor exists would leave the
+    # queries it served scanning
+    await ensure_indexes(database)
+    dropped = await drop_superseded_indexes(database)
+    return f"dropped {', '.join(dropped) or 'nothing'}"
+
+
+async def _backfill_brand_keys(database) -> str:
+    # Products imported before brand_key/line_key existed (importers write them now)
+    result = await database["products"].update_many(
+        {"brand_key": {"$exists": False}},
+        [{"$set": {"brand_key": {"$toLower": "$brand"}, "line_key": {"$toLower": "$line"}}}],
+    )
+    return f"{result.modified_count} products"
+
+
+async def _backfill_last_accessed(database) -> str:
+    # Pets created before retention tracking (create_pet sets it now)
+    result = await database["pets"].update_many(
+        {"last_accessed_at": {"$exists": False}},
+        [{"$set": {"last_accessed_at": {"$ifNull": ["$updated_at", "$created_at"]}}}],
+    )
+    return f"{result.modified_count} pets"
+
+
+async def _backfill_allergen_terms(database) -> str:
+    # Products imported before the import-time allergen check (importers run it now)
+    return await _recheck_allergens(database, {"allergen_terms": {"$exists": False}})
+
+
+async def _recheck_substring_terms(database) -> str:
+    # allergen_terms now also holds lexicon words found inside other words
+    # ("fish" in fishmeal); products checked before that lack them
+    return await _recheck_allergens(database, {"allergen_terms": {"$exists": True}})
+
+
+async def _recheck_allergens(database, query: Dict) -> str:
+    products = database["products"]
+    updated = 0
+    async for doc in products.find(query, {"allergen_tags": 1, "ingredients": 1}):
+        check_product(doc)
+        await products.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"allergens": doc["allergens"], "allergen_terms": doc["allergen_terms"]}},
+        )
+        updated += 1
+    if updated:
+        # New fields → new catalog version, so snapshots / the catalog file pick them up
+        await database["catalog_meta"].update_one(
+            {"_id": CATALOG_META_ID},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    return f"{updated} products"
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(f"indexes-{index_fingerprint()}", "Ensure indexes from utils/index_registry.py", _create_indexes),
+    Migration("0001-products-brand-key", "Backfill products.brand_key / line_key", _backfill_brand_keys),
+    Migration("0002-pets-last-accessed-at", "Backfill pets.last_accessed_at", _backfill_last_accessed),
+    Migration("0003-products-allergen-terms", "Backfill products.allergens / allergen_terms", _backfill_allergen_terms),
+    Migration("0004-products-allergen-substring-terms", "Recheck products.allergen_terms", _recheck_substring_terms),
+    Migration(
+        f"drop-indexes-{superseded_fingerprint()}", "Drop SUPERSEDED_INDEXES from utils/index_registry.py",
+        _drop_superseded_indexes,
+    ),
+]
+
+
+async def run_migrations(
+    database,
+    migrations: List[Migration] = MIGRATIONS,
+    stale_after: timedelta = timedelta(minutes=10),
+) -> Dict:
+    """
+    Apply every migration not yet recorded in _migrations, concurrently.
+
+    Returns:
+        {"applied": [ids applied by this call], "skipped": n already applied,
+         "running_elsewhere": [ids claimed by another instance, not yet applied]}
+        Pass running_elsewhere to wait_for_migrations() before reporting ready.
+    Raises:
+        The first migration error (after every migration in the batch finished)
+    """
+    records = database[MIGRATIONS_COLLECTION]
+    done = {doc["_id"] async for doc in records.find({"status": "applied"}, {"_id": 1})}
+    pending = [m for m in migrations if m.id not in done]
+    if not pending:
+        return {"applied": [], "skipped": len(migrations), "running_elsewhere": []}
+
+    claimed = await _claim_and_apply(records, database, pending, stale_after)
+    return {
+        "applied": [m.id for m in claimed],
+        "skipped": len(migrations) - len(pending),
+        "running_elsewhere": [m.id for m in pending if m not in claimed],
+    }
+
+
+async def wait_for_migrations(
+    database,
+    ids: List[str],
+    migrations: List[Migration] = MIGRATIONS,
+    stale_after: timedelta = timedelta(minutes=10),
+    poll_seconds: float = 2.0,
+):
+    """
+    Wait until migrations claimed by other instances are applied.
+
+    Polls _migrations every poll_seconds. A migration whose claim disappears
+    (it failed elsewhere) or goes stale (the other instance crashed) is
+    claimed and applied here instead, so this returns only once every id is
+    recorded as applied.
+
+    Raises:
+        The first error of a migration taken over and applied here
+    """
+    records = database[MIGRATIONS_COLLECTION]
+    waiting = [m for m in migrations if m.id in ids]
+    while waiting:
+        await asyncio.sleep(poll_seconds)
+        applied = {
+            doc["_id"]
+            async for doc in records.find({"_id": {"$in": [m.id for m in waiting]}, "status": "applied"}, {"_id": 1})
+        }
+        waiting = [m for m in waiting if m.id not in applied]
+        if waiting:
+            taken = await _claim_and_apply(records, database, waiting, stale_after)
+            waiting = [m for m in waiting if m not in taken]
+
+
+async def _claim_and_apply(records, database, pending: List[Migration], stale_after: timedelta) -> List[Migration]:
+    """Claim what we can of pending, apply it concurrently; returns the claimed migrations."""
+    claimed = [m for m, ok in zip(pending, await asyncio.gather(*(_claim(records, m, stale_after) for m in pending))) if ok]
+    results = await asyncio.gather(*(_apply(records, database, m) for m in claimed), return_exceptions=True)
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+    return claimed
+
+
+async def _claim(records, migration: Migration, stale_after: timedelta) -> bool:
+    now = datetime.utcnow()
+    try:
+        await records.insert_one({"_id": migration.id, "status": "running", "started_at": now})
+        return True
+    except DuplicateKeyError:
+        # Applied meanwhile, running elsewhere, or abandoned by a crashed instance
+        taken = await records.find_one_and_update(
+            {"_id": migration.id, "status": "running", "started_at": {"$lt": now - stale_after}},
+            {"$set": {"started_at": now}},
+        )
+        return taken is not None
+
+
+async def _apply(records, database, migration: Migration):
+    start = time.perf_counter()
+    try:
+        result = await migration.apply(database)
+    except Exception:
+        logger.error("Migration %s failed", migration.id, exc_info=True)
+        await records.delete_one({"_id": migration.id, "status": "running"})
+        raise
+    duration_ms = (time.perf_counter() - start) * 1000
+    await records.update_one(
+        {"_id": migration.id},
+        {"$set": {
+            "status": "applied",
+            "description": migration.description,
+            "result": result,
+            "applied_at": datetime.utcnow(),
+            "duration_ms": round(duration_ms, 1),
+        }},
+    )
+    logger.info("Migration %s applied in %.0fms (%s)", migration.id, duration_ms, result)
+
+
+# ============================================
+# Readiness
+# ============================================
+
+class Readiness:
+    """
+    Tracks startup work that must finish before the instance takes traffic.
+
+    - start(): call first in the lifespan; step times are measured from
+      here, not from import (module-level setup and slow imports would
+      otherwise count as startup work)
+    - reset(): forget every step (not ready again) and stop the clock
+    - mark(name) / done(name): synchronous steps (e.g. migrations)
+    - warm_up(name, factory): background steps; factory() returns the
+      awaitable to run. Failures are logged and retried with backoff — the
+      step stays pending (not ready) until one attempt succeeds
+    """
+
+    def __init__(self):
+        self._steps: Dict[str, Optional[float]] = {}    # name → ms when finished, None while pending
+        self._started: Optional[float] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Begin a startup: clears earlier steps and starts the clock now."""
+        self.reset()
+        self._started = time.perf_counter()
+
+    def reset(self):
+        self._steps = {}
+        self._started = None
+
+    def mark(self, name: str):
+        self._steps.setdefault(name, None)
+
+    def done(self, name: str):
+        if self._started is None:
+            self._started = time.perf_counter()     # start() was skipped: time from the first step
+        self._steps[name] = round((time.perf_counter() - self._started) * 1000, 1)
+
+    def warm_up(self, name: str, factory: Callable[[], Awaitable], max_backoff_seconds: float = 30):
+        """Run factory() in the background until it succeeds; the step completes then."""
+        self.mark(name)
+
+        async def run():
+            attempt = 0
+            while True:
+                try:
+                    await factory()
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    attempt += 1
+                    delay = min(max_backoff_seconds, 2 ** attempt)
+                    logger.error("Warm-up %s failed (attempt %d, retry in %ds): %s", name, attempt, delay, e, exc_info=True)
+                    await asyncio.sleep(delay)
+            self.done(name)
+            logger.info("Warm-up %s finished (%.0fms after startup)", name, self._steps[name])
+
+        self._tasks.append(asyncio.create_task(run(), name=f"warm-up-{name}"))
+
+    async def stop(self):
+        """Cancel unfinished warm-ups (shutdown)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._steps) and all(ms is not None for ms in self._steps.values())
+
+    def status(self) -> Dict:
+        """{step: ms after startup when finished, or None while pending}."""
+        return dict(self._steps)
@@ -0,0 +1,273 @@
+"""
+BowlWise - Traffic Capture
+
+Opt-in recording of anonymized request shapes from production, so
+optimizations can be checked against the real traffic mix (hot
+profiles, multi-allergy pets, bursts) with replay_traffic.py instead of a
+synthetic one.
+
+Data Flow:
+    CaptureMiddleware (sampled requests only)
+        → endpoint notes the pet profile: note_pet(request, profile, public_id)
+        → response sent → one record: route template, status, duration,
+          anonymized path/query params, pet signature, auth key
+        → bounded queue (put_nowait; full → dropped + counted)
+    writer thread → capture-<pid>.ndjson (rotated: .1 … .N by size)
+
+Record (one JSON object per line):
+    {"t": 1760000000.123, "method": "GET", "route": "/api/recommendations/{pet_id}",
+     "status": 200, "ms": 12.4, "params": {"pet_id": "3f9c0a1b2c4d"},
+     "query": {}, "pet": {"breedSize": "large", ..., "allergies": ["chicken"]},
+     "auth": null, "conditional": false}
+
+Anonymization:
+    - Pet, purchase and deletion ids, pet_id query values and bearer tokens
+      are replaced by a keyed hash (HMAC-SHA256, CAPTURE_SALT or a random
+      per-process key): the same pet maps to the same key within a
+      capture, but keys can't be turned back into ids. Set CAPTURE_SALT to
+      keep keys stable across workers and restarts.
+    - Product ids (public catalog data) are kept.
+    - Query values are kept only for known enum-like parameters
+      (QUERY_VALUES); anything else is recorded as "~". Magic-link tokens
+      and request bodies are never recorded.
+    - The pet signature is the wizard answers without the name; allergies
+      not in the allergen lexicon become "other".
+
+Usage:
+    traffic_capture = create_traffic_capture()        # None when disabled
+    if traffic_capture:
+        app.add_middleware(CaptureMiddleware, capture=traffic_capture)
+        traffic_capture.start()                       # lifespan
+    note_pet(request, pet_profile, pet["public_id"])  # in pet endpoints
+"""
+
+# ============================================
+# Imports
+# ============================================
+
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from utils.allergens import TERMS, normalize_term
+from utils.metrics import TRAFFIC_CAPTURE_RECORDS
+
+logger = logging.getLogger("petai")
+
+# Scope key the middleware sets on sampled requests; endpoints add notes to it
+SCOPE_KEY = "bowlwise.capture"
+
+# Path params replaced by a keyed hash (everything else, e.g. product_id, is kept)
+HASHED_PARAMS = {"pet_id", "purchase_id", "deletion_id"}
+# Path params never recorded
+DROPPED_PARAMS = {"token", "profile_id"}
+# Query params whose values are kept (small, fixed sets or non-identifying numbers)
+QUERY_VALUES = {"life_stage", "breed_size", "grain_free", "brand", "limit", "status", "months"}
+
+PET_FIELDS = ("breedSize", "ageGroup", "activityLevel", "weightGoal")
+
+
+# ============================================
+# Anonymization
+# ============================================
+
+def pet_signature(profile: Dict) -> Dict:
+    """Wizard answers without the name; allergies outside the lexicon become "other"."""
+    allergies = set()
+    for allergy in profile.get("allergies") or []:
+        term = normalize_term(allergy)
+        if term:
+            allergies.add(term if term in TERMS else "other")
+    signature = {field: str(profile.get(field, "")).lower() for field in PET_FIELDS}
+    signature["allergies"] = sorted(allergies)
+    return signature
+
+
+def note_pet(request, profile: Dict, public_id: Optional[str] = None):
+    """Attach the pet's signature (and id, hashed later) to a captured request. No-op otherwise."""
+    notes = request.scope.get(SCOPE_KEY)
+    if notes is not None:
+        notes["pet"] = pet_signature(profile)
+        if public_id:
+            notes["pet_id"] = public_id
+
+
+# ============================================
+# Capture
+# ============================================
+
+class TrafficCapture:
+    """
+    Samples requests and writes anonymized records on a background thread.
+
+    Args:
+        directory: Where capture-<pid>.ndjson files are written
+        sample_rate: Fraction of matching requests recorded
+        max_bytes: Size at which the file is rotated
+        max_files: Rotated files kept per worker
+        path_prefixes: Only requests whose path starts with one of these
+        salt: Key for hashing ids (random per process when empty)
+        queue_size: Records buffered before new ones are dropped
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        sample_rate: float = 1.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_files: int = 10,
+        path_prefixes: Tuple[str, ...] = ("/api/",),
+        salt: str = "",
+        queue_size: int = 10000,
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.path_prefixes = path_prefixes
+        self._key = salt.encode() or os.urandom(32)
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Open the file and start the writer thread."""
+        if self._listener is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"capture-{os.getpid()}.ndjson")
+        output = logging.handlers.RotatingFileHandler(
+            path, maxBytes=self.max_bytes, backupCount=self.max_files, encoding="utf-8",
+        )
+        output.setFormatter(logging.Formatter("%(message)s"))
+        self._listener = logging.handlers.QueueListener(self._queue, output)
+        self._listener.start()
+        logger.info("Traffic capture on: sample_rate=%s file=%s", self.sample_rate, path)
+
+    def stop(self):
+        """Flush queued records and close the file."""
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    # --- Recording ---
+
+    def wants(self, path: str) -> bool:
+        return (
+            self._listener is not None
+            and path.startswith(self.path_prefixes)
+            and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+        )
+
+    def anonymize(self, value: str) -> str:
+        return hmac.new(self._key, value.encode(), hashlib.sha256).hexdigest()[:12]
+
+    def record(self, scope, status: int, duration_ms: float, started_at: float, notes: Dict):
+        """Build the anonymized record and queue it (never blocks)."""
+        route = scope.get("route")
+        params = {}
+        for name, value in (scope.get("path_params") or {}).items():
+            if name in DROPPED_PARAMS:
+                continue
+            params[name] = self.anonymize(str(value)) if name in HASHED_PARAMS else value
+        if "pet_id" in notes:
+            params["pet_id"] = self.anonymize(notes["pet_id"])   # Created by this request
+
+        query = {}
+        for name, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True):
+            if name == "pet_id":
+                query[name] = self.anonymize(value)
+            else:
+                query[name] = value if name in QUERY_VALUES else "~"
+
+        auth = None
+        conditional = False
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                auth = self.anonymize(value.decode("latin-1"))
+            elif name in (b"if-none-match", b"if-modified-since"):
+                conditional = True
+
+        entry = {
+            "t": round(started_at, 3),
+            "method": scope["method"],
+            "route": getattr(route, "path", None) or "unmatched",
+            "status": status,
+            "ms": round(duration_ms, 2),
+            "params": params,
+            "query": query,
+            "pet": notes.get("pet"),
+            "auth": auth,
+            "conditional": conditional,
+        }
+        try:
+            self._queue.put_nowait(logging.makeLogRecord({"msg": json.dumps(entry, separators=(",", ":"))}))
+            TRAFFIC_CAPTURE_RECORDS.inc("written")
+        except queue.Full:
+            TRAFFIC_CAPTURE_RECORDS.inc("dropped")
+
+
+# ============================================
+# Middleware
+# ============================================
+
+class CaptureMiddleware:
+    """Pure-ASGI layer that records sampled requests with a TrafficCapture."""
+
+    def __init__(self, app, capture: TrafficCapture):
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.capture.wants(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        notes = scope[SCOPE_KEY] = {}
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.capture.record(scope, status, (time.perf_counter() - start) * 1000, started_at, notes)
+
+
+def create_traffic_capture() -> Optional[TrafficCapture]:
+    """
+    Capture from the environment, or None when CAPTURE_SAMPLE_RATE is 0/unset.
+
+    CAPTURE_SAMPLE_RATE, CAPTURE_DIR, CAPTURE_MAX_BYTES, CAPTURE_MAX_FILES,
+    CAPTURE_PATHS (comma-separated prefixes), CAPTURE_SALT.
+    """
+    sample_rate = float(os.getenv("CAPTURE_SAMPLE_RATE") or 0)
+    if sample_rate <= 0:
+        return None
+    prefixes = tuple(p.strip() for p in os.getenv("CAPTURE_PATHS", "/api/").split(",") if p.strip())
+    return TrafficCapture(
+        os.getenv("CAPTURE_DIR", "captures"),
+        sample_rate=sample_rate,
+        max_bytes=int(os.getenv("CAPTURE_MAX_BYTES", str(50 * 1024 * 1024))),
+        max_files=int(os.getenv("CAPTURE_MAX_FILES", "10")),
+        path_prefixes=prefixes,
+        salt=os.getenv("CAPTURE_SALT", ""),
+    )
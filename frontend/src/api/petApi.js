@@ -216,6 +216,22 @@ export const getCurrentUser = async () => {
   return response.data;
 };
 
+/** Dashboard in one call: user, pets, active purchase, recent history, spending. GET /api/dashboard */
+export const getDashboard = async () => {
+  const response = await axios.get(`${API_URL}/api/dashboard`, {
+    headers: getAuthHeader(),
+  });
+  return response.data;
+};
+
+/** Notification preferences, e.g. { email_reminders: true }. PUT /api/auth/me/preferences */
+export const updatePreferences = async (preferences) => {
+  const response = await axios.put(`${API_URL}/api/auth/me/preferences`, preferences, {
+    headers: getAuthHeader(),
+  });
+  return response.data;
+};
+
 export const deleteAccount = async () => {
   const response = await axios.delete(`${API_URL}/api/auth/me`, {
     headers: getAuthHeader(),
@@ -232,9 +248,10 @@ export const createPurchase = async (data) => {
   return response.data;
 };
 
-export const getPurchases = async (petId) => {
+/** One page of purchase history, newest first. Pass the previous page's next_cursor as `before`. */
+export const getPurchases = async (petId, { before, limit } = {}) => {
   const response = await axios.get(`${API_URL}/api/purchases`, {
-    params: { pet_id: petId },
+    params: { pet_id: petId, before, limit },
     headers: getAuthHeader(),
   });
   return response.data;
@@ -1,11 +1,11 @@
 /**
- * AccountPage — Account settings: email display, logout, delete account with confirmation.
+ * AccountPage — Account settings: email display, reminder email opt-in, logout, delete account with confirmation.
  * Protected route.
  * @route /account
  */
 import { useState, useEffect, useLayoutEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
-import { getCurrentUser, deleteAccount } from '../api/petApi';
+import { getCurrentUser, deleteAccount, updatePreferences } from '../api/petApi';
 import { clearToken } from '../utils/auth';
 import '../styles/login.css';
 
@@ -16,6 +16,8 @@ const AccountPage = () => {
   const [showDelete, setShowDelete] = useState(false);
   const [deleting, setDeleting] = useState(false);
   const [deleteError, setDeleteError] = useState('');
+  const [savingReminders, setSavingReminders] = useState(false);
+  const [preferencesError, setPreferencesError] = useState('');
 
   useLayoutEffect(() => {
     document.documentElement.scrollTop = 0;
@@ -41,6 +43,20 @@ const AccountPage = () => {
     navigate('/', { replace: true });
   };
 
+  const handleRemindersToggle = async (event) => {
+    const enabled = event.target.checked;
+    setSavingReminders(true);
+    setPreferencesError('');
+    try {
+      const data = await updatePreferences({ email_reminders: enabled });
+      setUser((current) => ({ ...current, preferences: data.user.preferences }));
+    } catch {
+      setPreferencesError('Could not save your preference. Please try again.');
+    } finally {
+      setSavingReminders(false);
+    }
+  };
+
   const handleDelete = async () => {
     setDeleting(true);
     try {
@@ -83,6 +99,17 @@ const AccountPage = () => {
           <p>{user?.pets?.length || 0} pet{(user?.pets?.length || 0) !== 1 ? 's' : ''}</p>
         </div>
 
+        <label className="account-toggle">
+          <input
+            type="checkbox"
+            checked={Boolean(user?.preferences?.email_reminders)}
+            disabled={savingReminders}
+            onChange={handleRemindersToggle}
+          />
+          <span>Email me a few days before a bag of food runs out</span>
+        </label>
+        {preferencesError && <p className="login-error">{preferencesError}</p>}
+
         <a href="mailto:jaberi.mahyar@gmail.com?subject=BowlWise — Bug Report" className="account-feedback-link">Report an issue</a>
 
         <hr className="account-divider" />
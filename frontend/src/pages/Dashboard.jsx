@@ -6,7 +6,7 @@
  */
 import { useState, useEffect, useLayoutEffect, useMemo, useCallback, useRef } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
-import { getCurrentUser, getPurchases, getRecommendations, transformRecommendation, deletePurchase, extendPurchase } from '../api/petApi';
+import { getDashboard, getPurchases, getRecommendations, transformRecommendation, deletePurchase, extendPurchase } from '../api/petApi';
 import { clearToken } from '../utils/auth';
 import { fmtMoney } from '../utils/foodUtils';
 import LogPurchaseModal from '../components/LogPurchaseModal';
@@ -68,6 +68,10 @@ const Dashboard = () => {
   const navigate = useNavigate();
   const [user, setUser] = useState(null);
   const [purchases, setPurchases] = useState([]);
+  const [purchasesCursor, setPurchasesCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [activePurchase, setActivePurchase] = useState(null);
+  const [spendingTotals, setSpendingTotals] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [showPurchaseModal, setShowPurchaseModal] = useState(false);
@@ -78,18 +82,24 @@ const Dashboard = () => {
   const [accountOpen, setAccountOpen] = useState(false);
   const accountRef = useRef(null);
 
+  // One request: user, pets, and per pet the active purchase, recent history and spending totals
   const fetchData = useCallback(async () => {
     try {
-      const userData = await getCurrentUser();
-      setUser(userData);
-      if (userData.pets?.length > 0 && (userData.pets[0].id || userData.pets[0].public_id)) {
-        const pet = userData.pets[0];
+      const dashboard = await getDashboard();
+      setUser(dashboard);
+      if (dashboard.pets?.length > 0 && (dashboard.pets[0].id || dashboard.pets[0].public_id)) {
+        const {
+          purchases: history, purchases_next_cursor: nextCursor,
+          active_purchase: active, spending: totals, ...pet
+        } = dashboard.pets[0];
         const petId = pet.id || pet.public_id;
         // Keep localStorage fresh for Recommendations page
         localStorage.setItem('petId', petId);
         localStorage.setItem('petData', JSON.stringify(pet));
-        const purchaseData = await getPurchases(petId);
-        setPurchases(Array.isArray(purchaseData) ? purchaseData : purchaseData.purchases || []);
+        setPurchases(history || []);
+        setPurchasesCursor(nextCursor || null);
+        setActivePurchase(active || null);
+        setSpendingTotals(totals || null);
       }
     } catch (err) {
       if (err.response?.status === 401) {
@@ -103,6 +113,23 @@ const Dashboard = () => {
     }
   }, [navigate]);
 
+  // Older purchase history, one page at a time (the dashboard only carries the first page)
+  const loadOlderPurchases = async () => {
+    const petId = user?.pets?.[0]?.id || user?.pets?.[0]?.public_id;
+    if (!petId || !purchasesCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await getPurchases(petId, { before: purchasesCursor });
+      setPurchases((prev) => [...prev, ...page.purchases]);
+      setPurchasesCursor(page.next_cursor || null);
+    } catch {
+      setToast('Could not load older purchases');
+      setTimeout(() => setToast(''), 2500);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useLayoutEffect(() => {
     document.documentElement.scrollTop = 0;
     document.body.scrollTop = 0;
@@ -142,9 +169,6 @@ const Dashboard = () => {
   }, [loading, user]);
 
   const pet = user?.pets?.[0] || null;
-  const activePurchase = useMemo(() => {
-    return purchases.find((p) => p.status === 'active') || null;
-  }, [purchases]);
 
   const remaining = activePurchase ? daysRemaining(activePurchase) : null;
   const usedPct = activePurchase ? depletionPercent(activePurchase) : 0;
@@ -156,19 +180,15 @@ const Dashboard = () => {
     return Math.ceil((end - start) / (1000 * 60 * 60 * 24));
   }, [activePurchase]);
 
+  // Totals are computed server-side over the full history (not just the loaded page)
   const spending = useMemo(() => {
-    if (purchases.length < 2) return null;
-    const total = purchases.reduce((sum, p) => sum + (p.cost || 0), 0);
-    const sorted = [...purchases].sort((a, b) => new Date(a.purchased_at) - new Date(b.purchased_at));
-    const firstDate = new Date(sorted[0].purchased_at);
-    const lastDate = new Date(sorted[sorted.length - 1].purchased_at);
-    const months = Math.max(1, (lastDate - firstDate) / (1000 * 60 * 60 * 24 * 30));
+    if (!spendingTotals || spendingTotals.bags < 2) return null;
     return {
-      total,
-      bags: purchases.length,
-      avgPerMonth: total / months,
+      total: spendingTotals.total,
+      bags: spendingTotals.bags,
+      avgPerMonth: spendingTotals.avg_per_month,
     };
-  }, [purchases]);
+  }, [spendingTotals]);
 
   const handleLogout = () => {
     clearToken();
@@ -180,28 +200,15 @@ const Dashboard = () => {
 
   const handlePurchaseLogged = useCallback(async () => {
     setShowPurchaseModal(false);
-    try {
-      const petId = user?.pets?.[0]?.id || user?.pets?.[0]?.public_id;
-      if (petId) {
-        const purchaseData = await getPurchases(petId);
-        setPurchases(Array.isArray(purchaseData) ? purchaseData : purchaseData.purchases || []);
-      }
-    } catch {
-      // Fallback: full re-fetch
-      fetchData();
-    }
-  }, [user, fetchData]);
+    await fetchData();
+  }, [fetchData]);
 
   const confirmDeletePurchase = useCallback(async () => {
     if (!deleteConfirmId) return;
     try {
       await deletePurchase(deleteConfirmId);
       setDeleteConfirmId(null);
-      const petId = user?.pets?.[0]?.id || user?.pets?.[0]?.public_id;
-      if (petId) {
-        const purchaseData = await getPurchases(petId);
-        setPurchases(Array.isArray(purchaseData) ? purchaseData : purchaseData.purchases || []);
-      }
+      await fetchData();
       setToast('Purchase deleted');
       setTimeout(() => setToast(''), 2500);
     } catch {
@@ -209,24 +216,20 @@ const Dashboard = () => {
       setToast('Failed to delete purchase');
       setTimeout(() => setToast(''), 2500);
     }
-  }, [deleteConfirmId, user]);
+  }, [deleteConfirmId, fetchData]);
 
   const handleExtendBag = useCallback(async () => {
     if (!activePurchase?.id) return;
     try {
       await extendPurchase(activePurchase.id);
-      const petId = user?.pets?.[0]?.id || user?.pets?.[0]?.public_id;
-      if (petId) {
-        const purchaseData = await getPurchases(petId);
-        setPurchases(Array.isArray(purchaseData) ? purchaseData : purchaseData.purchases || []);
-      }
+      await fetchData();
       setToast('Extended by 7 days');
       setTimeout(() => setToast(''), 2500);
     } catch {
       setToast('Failed to extend');
       setTimeout(() => setToast(''), 2500);
     }
-  }, [activePurchase, user]);
+  }, [activePurchase, fetchData]);
 
   if (loading) {
     return (
@@ -564,6 +567,16 @@ const Dashboard = () => {
                   );
                 })}
             </div>
+            {purchasesCursor && (
+              <button
+                type="button"
+                className="dash-btn-outline dash-purchase-more"
+                onClick={loadOlderPurchases}
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Loading…' : 'Show older purchases'}
+              </button>
+            )}
           </section>
         )}
 